@@ -0,0 +1,140 @@
+"""离线基准测试：python -m bench [选项]
+
+起本地替身（bench/fake_server.py）、生成合成语料，把 GitHub / raw / jsDelivr / 机场
+的请求全部改发到替身，在临时目录中跑完整流水线并输出各阶段的吞吐、请求延迟与内存；
+--stage 另外对单个阶段重复测量。未映射的 host 一律走一个不存在的代理，保证不联网。
+
+    python -m bench                        # 默认规模，完整流水线
+    python -m bench --repos 200 --files 5  # 放大语料
+    python -m bench --stage validate --stage head --repeat 5
+    python -m bench --json bench.json      # 结果写成 JSON，便于前后对比
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from bench.corpus import build_corpus
+from bench.fake_server import API_LIMITS, DEFAULT_AIRPORTS, FakeServer
+
+# 未映射的 host 都发往这里（拒绝连接），而不是真实网络
+BLACKHOLE_PROXY = "http://127.0.0.1:9"
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(
+        prog="python -m bench", description=__doc__.split("\n")[0]
+    )
+    g = p.add_argument_group("语料")
+    g.add_argument("--repos", type=int, default=40, help="仓库数（默认 40）")
+    g.add_argument("--files", type=int, default=2, help="每个仓库追加的节点文件数")
+    g.add_argument("--nodes", type=int, default=12, help="每个订阅/节点文件的节点数")
+    g.add_argument("--forks", type=int, default=4, help="未改动的 fork 数")
+    g.add_argument("--big-repos", type=int, default=1, help="走 tarball 的大仓库数")
+    g.add_argument("--seed", type=int, default=1)
+    g = p.add_argument_group("替身")
+    g.add_argument(
+        "--latency", type=float, default=0.02, help="GitHub/raw/CDN 固定延迟（秒）"
+    )
+    g.add_argument("--jitter", type=float, default=0.01, help="额外随机延迟上限（秒）")
+    g.add_argument(
+        "--search-limit",
+        type=int,
+        default=API_LIMITS["search"][0],
+        help="搜索接口每分钟配额",
+    )
+    g.add_argument(
+        "--core-limit", type=int, default=API_LIMITS["core"][0], help="REST 每小时配额"
+    )
+    g = p.add_argument_group("运行")
+    g.add_argument("--keywords", type=int, default=6, help="搜索关键词个数（0=全部）")
+    g.add_argument("--no-graphql", action="store_true", help="关闭 GraphQL，走 REST")
+    g.add_argument("--stage", action="append", default=[], help="单独测量的阶段")
+    g.add_argument("--repeat", type=int, default=3, help="单阶段重复次数")
+    g.add_argument(
+        "--trace-memory", action="store_true", help="各阶段 tracemalloc 峰值（较慢）"
+    )
+    g.add_argument("--workdir", help="工作目录（默认临时目录，结束后删除）")
+    g.add_argument("--json", help="结果写入该 JSON 文件")
+    g.add_argument("-v", "--verbose", action="store_true", help="显示流水线输出")
+    return p.parse_args(argv)
+
+
+def _env(server: FakeServer, workdir: str, args) -> dict:
+    return {
+        "HTTP_HOST_OVERRIDES": server.overrides_env(),
+        "HTTP_PROXY": BLACKHOLE_PROXY,
+        "HTTPS_PROXY": BLACKHOLE_PROXY,
+        "NO_PROXY": "127.0.0.1,localhost",
+        "OUT_DIR": os.path.join(workdir, "data"),
+        "GH_GRAPHQL_ENABLE": "0" if args.no_graphql else "1",
+        "EVENT_CONSOLE_LEVEL": "warning",
+        "GIST_ID": "bench-gist",
+        "GIST_TOKEN": "bench-token",
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    corpus = build_corpus(
+        repos=args.repos,
+        files=args.files,
+        nodes=args.nodes,
+        forks=args.forks,
+        big_repos=args.big_repos,
+        airports=list(DEFAULT_AIRPORTS),
+        seed=args.seed,
+    )
+    limits = {
+        "search": (args.search_limit, API_LIMITS["search"][1]),
+        "core": (args.core_limit, API_LIMITS["core"][1]),
+    }
+    workdir = args.workdir or tempfile.mkdtemp(prefix="sub-hunter-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    json_path = os.path.abspath(args.json) if args.json else None
+    cwd = os.getcwd()
+    server = FakeServer(
+        corpus, args.latency, args.jitter, api_limits=limits, seed=args.seed
+    ).start()
+    try:
+        # 配置在导入时读取：先设环境变量、切到工作目录，再导入流水线
+        os.environ.update(_env(server, workdir, args))
+        os.chdir(workdir)
+        from bench import harness
+
+        log = "" if args.verbose else os.path.join(workdir, "bench.log")
+        ctx, pipeline, full = harness.run_pipeline(
+            args.keywords, args.trace_memory, log_path=log
+        )
+        print(f"[基准] 语料: {len(corpus.repos)} 个仓库 | 工作目录: {workdir}")
+        print(harness.format_table(full["stages"]), end="")
+        print(f"[基准] 总耗时 {full['wall_s']}s | 峰值 RSS {full['peak_rss_kb']} KiB")
+        for host, st in full["hosts"].items():
+            print(f"[基准] {host} {st}")
+        result = {"args": vars(args), "full": full, "stages": {}, "hits": server.hits}
+        for name in args.stage:
+            runs = harness.run_stage(
+                pipeline, ctx, name, args.repeat, args.trace_memory, log_path=log
+            )
+            rows = [row for r in runs for row in r["stages"] if row["stage"] == name]
+            print(f"[基准] 阶段 {name} ×{len(rows)}")
+            print(harness.format_table(rows), end="")
+            result["stages"][name] = runs
+        print(f"[基准] 替身收到的请求: {server.hits}")
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"[基准] 已写入 {json_path}")
+    finally:
+        server.stop()
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
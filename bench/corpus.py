@@ -0,0 +1,215 @@
+"""基准测试的合成语料：仓库（README / 文件树 / 文件内容）与机场订阅正文。
+
+同一 seed 生成的语料完全相同，便于前后两次运行对比。每个仓库包含：
+
+- README.md：机场订阅链接、指向本仓库文件的 jsDelivr 链接与黑名单链接
+- clash/sub.yaml（Clash 订阅）、v2ray.txt（明文节点）、nodes/sub_b64.txt（Base64 订阅）
+- subscribe/list.txt：订阅链接列表（触发递归抽取），含指向其它仓库文件的 raw 链接
+- clash/rules.yaml：规则文件（内容校验阶段应剔除）
+- extra/sub_<n>.txt：按 files 参数追加的节点文件，用于放大规模
+- 若干不会被选中的文件（源码、图片、docs/ 下的文件）
+
+另有少量 fork（文件树与父仓库相同，用于镜像去重路径）与可选的大仓库（候选文件数
+超过 tarball 阈值，走归档下载）。
+"""
+
+import base64
+import hashlib
+import json
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+# 仓库描述的词表；搜索接口按查询词是否出现在描述中匹配
+VOCAB = (
+    "clash",
+    "v2ray",
+    "free",
+    "node",
+    "nodes",
+    "subscription",
+    "proxy",
+    "trojan",
+    "vless",
+    "hysteria",
+    "mihomo",
+    "免费",
+    "节点",
+    "机场",
+    "订阅",
+    "分享",
+)
+# 大仓库的节点文件数（需大于 fetchers.gh_archive.TARBALL_THRESHOLD）
+BIG_REPO_FILES = 40
+
+
+@dataclass
+class Repo:
+    full_name: str
+    description: str
+    pushed_at: str
+    files: Dict[str, str]
+    fork_of: str = None
+
+    @property
+    def tree_oid(self) -> str:
+        blob = json.dumps(self.files, sort_keys=True).encode("utf-8")
+        return hashlib.sha1(blob).hexdigest()
+
+
+@dataclass
+class Corpus:
+    repos: Dict[str, Repo] = field(default_factory=dict)
+    # 机场 host -> 订阅正文（同一 host 下所有 token 返回相同正文）
+    subscriptions: Dict[str, str] = field(default_factory=dict)
+
+    def search(self, q: str) -> List[Repo]:
+        """按查询词（忽略 pushed: 等限定符，OR 取并集）匹配描述，按 pushed_at 倒序。"""
+        words = [
+            w.lower() for w in q.replace('"', " ").split() if w != "OR" and ":" not in w
+        ]
+        hits = [
+            r for r in self.repos.values() if any(w in r.description for w in words)
+        ]
+        return sorted(hits, key=lambda r: r.pushed_at, reverse=True)
+
+    def file(self, full: str, path: str):
+        repo = self.repos.get(full)
+        return None if repo is None else repo.files.get(path)
+
+
+def _uuid(rng: random.Random) -> str:
+    h = "%032x" % rng.getrandbits(128)
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _server(rng: random.Random) -> str:
+    return ".".join(str(rng.randint(1, 254)) for _ in range(4))
+
+
+def node_lines(rng: random.Random, n: int) -> List[str]:
+    out = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            out.append(f"trojan://{_uuid(rng)}@{_server(rng)}:443#node-{i}")
+        elif kind == 1:
+            out.append(
+                f"vless://{_uuid(rng)}@{_server(rng)}:443"
+                f"?encryption=none&security=tls#node-{i}"
+            )
+        else:
+            cred = base64.b64encode(f"aes-256-gcm:{_uuid(rng)}".encode()).decode()
+            out.append(f"ss://{cred}@{_server(rng)}:8388#node-{i}")
+    return out
+
+
+def clash_yaml(rng: random.Random, n: int) -> str:
+    lines = ["mixed-port: 7890", "proxies:"]
+    for i in range(n):
+        lines += [
+            f"  - name: node-{i}",
+            "    type: trojan",
+            f"    server: {_server(rng)}",
+            "    port: 443",
+            f"    password: {_uuid(rng)}",
+        ]
+    lines += ["proxy-groups:", "  - name: auto", "    type: url-test"]
+    return "\n".join(lines) + "\n"
+
+
+def rules_yaml(n: int = 20) -> str:
+    return "payload:\n" + "".join(
+        f"  - DOMAIN-SUFFIX,ads{i}.example.com\n" for i in range(n)
+    )
+
+
+def sub_url(host: str, rng: random.Random) -> str:
+    return f"https://{host}/api/v1/client/subscribe?token={rng.getrandbits(128):032x}"
+
+
+def build_corpus(
+    repos: int = 40,
+    files: int = 2,
+    nodes: int = 12,
+    forks: int = 4,
+    big_repos: int = 0,
+    airports=("fast.airport.test",),
+    seed: int = 1,
+) -> Corpus:
+    """repos 个仓库（另加 forks 个 fork 与 big_repos 个大仓库），每个仓库追加 files 个
+    节点文件，每个订阅 / 节点文件 nodes 个节点；订阅链接均匀分布在 airports 上。"""
+    rng = random.Random(seed)
+    airports = list(airports)
+    corpus = Corpus()
+    for host in airports:
+        corpus.subscriptions[host] = base64.b64encode(
+            "\n".join(node_lines(rng, nodes)).encode()
+        ).decode()
+
+    def pick_airport() -> str:
+        return airports[rng.randrange(len(airports))]
+
+    names = [f"user{i:03d}/free-nodes-{i:03d}" for i in range(repos)]
+    for i, full in enumerate(names):
+        words = rng.sample(VOCAB, 3)
+        other = names[(i + 1) % len(names)]
+        readme = "\n".join(
+            [
+                f"# {full}",
+                " ".join(words),
+                f"- {sub_url(pick_airport(), rng)}",
+                f"- {sub_url(pick_airport(), rng)}",
+                f"- https://cdn.jsdelivr.net/gh/{full}@main/v2ray.txt",
+                "- https://www.youtube.com/watch?v=bench",
+            ]
+        )
+        listing = [sub_url(pick_airport(), rng) for _ in range(3)]
+        listing.append(
+            f"https://raw.githubusercontent.com/{other}/main/nodes/sub_b64.txt"
+        )
+        v2 = "\n".join(node_lines(rng, nodes))
+        repo_files = {
+            "README.md": readme,
+            "clash/sub.yaml": clash_yaml(rng, nodes),
+            "v2ray.txt": v2,
+            "nodes/sub_b64.txt": base64.b64encode(v2.encode()).decode(),
+            "subscribe/list.txt": "\n".join(listing) + "\n",
+            "clash/rules.yaml": rules_yaml(),
+            "src/main.py": "print('hello')\n",
+            "assets/logo.png": "PNG",
+            "docs/clash.md": "docs",
+        }
+        for j in range(files):
+            repo_files[f"extra/sub_{j}.txt"] = "\n".join(node_lines(rng, nodes))
+        corpus.repos[full] = Repo(
+            full_name=full,
+            description=" ".join(words),
+            pushed_at=f"2025-10-{1 + i % 28:02d}T00:00:00Z",
+            files=repo_files,
+        )
+    for i in range(min(forks, repos)):
+        parent = corpus.repos[names[i]]
+        full = f"forker{i:03d}/{parent.full_name.split('/')[1]}"
+        corpus.repos[full] = Repo(
+            full_name=full,
+            description=parent.description,
+            pushed_at=parent.pushed_at,
+            files=parent.files,
+            fork_of=parent.full_name,
+        )
+    for i in range(big_repos):
+        full = f"bigorg{i:03d}/clash-sub-mirror"
+        corpus.repos[full] = Repo(
+            full_name=full,
+            description="clash subscription mirror",
+            pushed_at="2025-10-28T00:00:00Z",
+            files={
+                "README.md": f"# {full}",
+                **{
+                    f"sub/node_{j:03d}.txt": "\n".join(node_lines(rng, nodes))
+                    for j in range(BIG_REPO_FILES)
+                },
+            },
+        )
+    return corpus
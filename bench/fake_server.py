@@ -0,0 +1,446 @@
+"""本地替身服务：模拟 GitHub REST/GraphQL、raw.githubusercontent.com、jsDelivr 与机场。
+
+每个被模拟的 host 各起一个 ThreadingHTTPServer（127.0.0.1 随机端口），配合
+config.HTTP_HOST_OVERRIDES 把请求改发到这里；overrides 给出 host -> 地址的映射。
+
+- 每个 host 有一份 HostProfile：固定延迟 + 随机抖动、按概率返回错误码、每个时间窗
+  超过一定请求数返回 429 + Retry-After
+- api.github.com 按资源（core / search / graphql）维护配额，每个响应都带
+  X-RateLimit-Limit / Remaining / Reset / Resource，配额用尽返回 403
+- hits 记录每个 host 收到的请求数
+"""
+
+import gzip
+import io
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.corpus import Corpus
+
+
+@dataclass
+class HostProfile:
+    # 每个请求的固定延迟与额外的均匀随机延迟上限（秒）
+    latency: float = 0.0
+    jitter: float = 0.0
+    # 以该概率返回 error_status
+    error_rate: float = 0.0
+    error_status: int = 503
+    # 每个 window 秒内超过该请求数时返回 429（0 不限）
+    throttle_after: int = 0
+    window: float = 60.0
+    # 机场返回登录页（HTML）而不是订阅
+    html: bool = False
+
+
+# 机场 host 及其行为：多数正常，另有慢、抖动、出错、限流、失效与返回登录页的
+DEFAULT_AIRPORTS = {
+    "fast.airport.test": HostProfile(latency=0.005),
+    "cdn.airport.test": HostProfile(latency=0.02, jitter=0.02),
+    "slow.airport.test": HostProfile(latency=1.0, jitter=0.5),
+    "flaky.airport.test": HostProfile(latency=0.05, error_rate=0.3),
+    "limited.airport.test": HostProfile(latency=0.01, throttle_after=30, window=5.0),
+    "dead.airport.test": HostProfile(error_rate=1.0, error_status=404),
+    "login.airport.test": HostProfile(latency=0.02, html=True),
+}
+# GitHub 各资源的 (配额, 窗口秒)，与真实接口一致
+API_LIMITS = {"core": (5000, 3600.0), "search": (30, 60.0), "graphql": (5000, 3600.0)}
+
+LOGIN_PAGE = (
+    "<!DOCTYPE html><html><head><title>Sign in</title></head>"
+    "<body><form>sign in required</form></body></html>"
+)
+
+
+def _json(status: int, obj, headers=None):
+    return status, {"Content-Type": "application/json", **(headers or {})}, obj
+
+
+def _text(body: str, ctype: str = "text/plain; charset=utf-8"):
+    return 200, {"Content-Type": ctype}, body
+
+
+NOT_FOUND = (404, {"Content-Type": "text/plain"}, "404: Not Found")
+
+
+# ---- api.github.com ----
+_REPO_RE = re.compile(r'(\w+): repository\(owner: "([^"]+)", name: "([^"]+)"\)')
+_OBJ_RE = re.compile(r'(\w+): object\(expression: "HEAD:([^"]*)"\)')
+_BLOB_RE = re.compile(r'object\(expression: "HEAD:([^"]+)"\)')
+
+
+def _entries(files: dict, depth: int, prefix: str = "") -> list:
+    dirs, out = {}, []
+    for path, text in files.items():
+        if not path.startswith(prefix):
+            continue
+        rest = path[len(prefix) :]
+        if "/" in rest:
+            dirs.setdefault(rest.split("/", 1)[0], None)
+        else:
+            size = len(text.encode("utf-8"))
+            out.append({"name": rest, "type": "blob", "object": {"byteSize": size}})
+    for d in dirs:
+        obj = {}
+        if depth > 1:
+            obj["entries"] = _entries(files, depth - 1, prefix + d + "/")
+        out.append({"name": d, "type": "tree", "object": obj})
+    return out
+
+
+def _flat_tree(files: dict) -> list:
+    out, dirs = [], set()
+    for path, text in sorted(files.items()):
+        parts = path.split("/")
+        for i in range(1, len(parts)):
+            dirs.add("/".join(parts[:i]))
+        out.append({"path": path, "type": "blob", "size": len(text.encode("utf-8"))})
+    return [{"path": d, "type": "tree"} for d in sorted(dirs)] + out
+
+
+def _tarball(full: str, oid: str, files: dict) -> bytes:
+    buf = io.BytesIO()
+    top = f"{full.replace('/', '-')}-{oid[:7]}"
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for path, text in files.items():
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(f"{top}/{path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+class GitHubApi:
+    def __init__(self, corpus: Corpus, limits: dict = None, clock=time.time):
+        self.corpus = corpus
+        self.limits = dict(API_LIMITS, **(limits or {}))
+        self.clock = clock
+        # 资源 -> [已用次数, 窗口重置时间]
+        self._used = {}
+        self._lock = threading.Lock()
+
+    def _rate(self, resource: str):
+        limit, window = self.limits[resource]
+        now = self.clock()
+        with self._lock:
+            used, reset = self._used.get(resource, (0, now + window))
+            if now >= reset:
+                used, reset = 0, now + window
+            used += 1
+            self._used[resource] = (used, reset)
+        headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(max(0, limit - used)),
+            "X-RateLimit-Used": str(min(used, limit)),
+            "X-RateLimit-Reset": str(int(reset)),
+            "X-RateLimit-Resource": resource,
+        }
+        return used <= limit, headers
+
+    def _repo_item(self, repo) -> dict:
+        owner, name = repo.full_name.split("/")
+        created = "2025-10-29T00:00:00Z" if repo.fork_of else "2025-01-01T00:00:00Z"
+        return {
+            "full_name": repo.full_name,
+            "name": name,
+            "owner": {"login": owner},
+            "html_url": f"https://github.com/{repo.full_name}",
+            "description": repo.description,
+            "fork": bool(repo.fork_of),
+            "created_at": created,
+            "pushed_at": repo.pushed_at,
+            "default_branch": "main",
+        }
+
+    def __call__(self, method, path, query, body):
+        if path.startswith("/search/"):
+            resource = "search"
+        elif path == "/graphql":
+            resource = "graphql"
+        else:
+            resource = "core"
+        ok, headers = self._rate(resource)
+        if not ok:
+            msg = {"message": "API rate limit exceeded"}
+            return _json(403, msg, headers)
+        status, extra, payload = self._route(method, path, query, body)
+        return status, {**headers, **extra}, payload
+
+    def _route(self, method, path, query, body):
+        parts = path.strip("/").split("/")
+        if method == "GET" and path == "/search/repositories":
+            return self._search(query)
+        if method == "POST" and path == "/graphql":
+            return self._graphql(json.loads(body or b"{}").get("query", ""))
+        if method == "PATCH" and parts[0] == "gists" and len(parts) == 2:
+            return _json(200, {"id": parts[1]})
+        if len(parts) >= 4 and parts[0] == "repos":
+            repo = self.corpus.repos.get(f"{parts[1]}/{parts[2]}")
+            if repo is None:
+                return _json(404, {"message": "Not Found"})
+            if parts[3:5] == ["git", "trees"]:
+                tree = {"sha": repo.tree_oid, "tree": _flat_tree(repo.files)}
+                return _json(200, {**tree, "truncated": False})
+            if parts[3] == "tarball":
+                data = _tarball(repo.full_name, repo.tree_oid, repo.files)
+                return 200, {"Content-Type": "application/x-gzip"}, data
+        return _json(404, {"message": "Not Found"})
+
+    def _search(self, query):
+        q = (query.get("q") or [""])[0]
+        per_page = int((query.get("per_page") or ["30"])[0])
+        page = int((query.get("page") or ["1"])[0])
+        hits = self.corpus.search(q)
+        items = hits[(page - 1) * per_page : page * per_page]
+        return _json(
+            200,
+            {
+                "total_count": len(hits),
+                "incomplete_results": False,
+                "items": [self._repo_item(r) for r in items],
+            },
+        )
+
+    def _graphql(self, q: str):
+        data = {"rateLimit": {"cost": 1, "remaining": 4999, "resetAt": None}}
+        matches = list(_REPO_RE.finditer(q))
+        for k, m in enumerate(matches):
+            alias, owner, name = m.groups()
+            end = matches[k + 1].start() if k + 1 < len(matches) else len(q)
+            seg = q[m.end() : end]
+            repo = self.corpus.repos.get(f"{owner}/{name}")
+            if repo is None:
+                data[alias] = None
+            elif alias.startswith("r"):
+                data[alias] = self._repo_node(repo, seg)
+            else:
+                path = _BLOB_RE.search(seg).group(1)
+                text = repo.files.get(path)
+                obj = None if text is None else {"text": text, "isBinary": False}
+                data[alias] = {"object": obj}
+        return _json(200, {"data": data})
+
+    def _repo_node(self, repo, seg: str) -> dict:
+        node = {
+            "nameWithOwner": repo.full_name,
+            "pushedAt": repo.pushed_at,
+            "isFork": bool(repo.fork_of),
+            "parent": {"nameWithOwner": repo.fork_of} if repo.fork_of else None,
+            "defaultBranchRef": {"name": "main"},
+        }
+        for alias, path in _OBJ_RE.findall(seg):
+            if alias == "tree":
+                depth = seg.count("entries {")
+                node["tree"] = {
+                    "oid": repo.tree_oid,
+                    "entries": _entries(repo.files, max(1, depth)),
+                }
+            else:
+                text = repo.files.get(path)
+                node[alias] = (
+                    None if text is None else {"text": text, "isBinary": False}
+                )
+        return node
+
+
+# ---- raw / CDN / 机场 ----
+class RawFiles:
+    """raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}，分支任意。"""
+
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+
+    def __call__(self, method, path, query, body):
+        parts = path.lstrip("/").split("/", 3)
+        if len(parts) < 4:
+            return NOT_FOUND
+        text = self.corpus.file(f"{parts[0]}/{parts[1]}", parts[3])
+        return NOT_FOUND if text is None else _text(text)
+
+
+class JsDelivr:
+    """cdn.jsdelivr.net/gh/{owner}/{repo}[@{ver}]/{path}。"""
+
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+
+    def __call__(self, method, path, query, body):
+        parts = path.lstrip("/").split("/", 3)
+        if len(parts) < 4 or parts[0] != "gh":
+            return NOT_FOUND
+        repo = parts[2].split("@", 1)[0]
+        text = self.corpus.file(f"{parts[1]}/{repo}", parts[3])
+        return NOT_FOUND if text is None else _text(text)
+
+
+class Airport:
+    def __init__(self, corpus: Corpus, host: str, html: bool = False):
+        self.body = corpus.subscriptions.get(host, "")
+        self.html = html
+
+    def __call__(self, method, path, query, body):
+        if self.html:
+            return _text(LOGIN_PAGE, "text/html; charset=utf-8")
+        if "token" not in query:
+            return NOT_FOUND
+        return _text(self.body)
+
+
+# ---- HTTP 服务 ----
+class _HostServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str, app, profile: HostProfile, seed: int):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.host = host
+        self.app = app
+        self.profile = profile
+        self.rand = random.Random(f"{seed}:{host}")
+        self.hits = 0
+        self._window = (0.0, 0)
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """按 HostProfile 注入延迟 / 错误 / 限流；返回要直接回复的响应或 None。"""
+        p = self.profile
+        with self._lock:
+            self.hits += 1
+            draw = self.rand.random()
+            delay = p.latency + (self.rand.random() * p.jitter if p.jitter else 0.0)
+            start, n = self._window
+            now = time.monotonic()
+            if now - start >= p.window:
+                start, n = now, 0
+            n += 1
+            self._window = (start, n)
+        if delay:
+            time.sleep(delay)
+        if p.throttle_after and n > p.throttle_after:
+            wait = max(1, int(p.window - (now - start) + 0.999))
+            headers = {"Content-Type": "text/plain", "Retry-After": str(wait)}
+            return 429, headers, "Too Many Requests"
+        if p.error_rate and draw < p.error_rate:
+            return p.error_status, {"Content-Type": "text/plain"}, "error"
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _serve(self, method: str):
+        n = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(n) if n else b""
+        srv = self.server
+        resp = srv.admit()
+        if resp is None:
+            url = urllib.parse.urlsplit(self.path)
+            query = urllib.parse.parse_qs(url.query)
+            try:
+                resp = srv.app(method, url.path, query, body)
+            except Exception as e:
+                resp = (500, {"Content-Type": "text/plain"}, f"bench error: {e}")
+        status, headers, payload = resp
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload)
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        gz = (
+            "gzip" in (self.headers.get("Accept-Encoding") or "")
+            and len(payload) > 1024
+        )
+        if gz and not headers.get("Content-Type", "").endswith("gzip"):
+            payload = gzip.compress(payload, 1)
+            headers = {**headers, "Content-Encoding": "gzip"}
+        try:
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            if method != "HEAD":
+                self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已放弃（超时 / 预算用尽）
+            pass
+
+    def do_GET(self):
+        self._serve("GET")
+
+    def do_HEAD(self):
+        self._serve("HEAD")
+
+    def do_POST(self):
+        self._serve("POST")
+
+    def do_PATCH(self):
+        self._serve("PATCH")
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeServer:
+    """按 host 起本地替身；latency / jitter 作用于 GitHub、raw 与 jsDelivr。"""
+
+    def __init__(
+        self,
+        corpus: Corpus,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        airports: dict = None,
+        api_limits: dict = None,
+        seed: int = 1,
+    ):
+        github = HostProfile(latency=latency, jitter=jitter)
+        apps = {
+            "api.github.com": (GitHubApi(corpus, api_limits), github),
+            "raw.githubusercontent.com": (RawFiles(corpus), github),
+            "cdn.jsdelivr.net": (JsDelivr(corpus), github),
+        }
+        for host, prof in (DEFAULT_AIRPORTS if airports is None else airports).items():
+            apps[host] = (Airport(corpus, host, prof.html), prof)
+        self.servers = {
+            host: _HostServer(host, app, prof, seed)
+            for host, (app, prof) in apps.items()
+        }
+        self._threads = []
+
+    def start(self):
+        for srv in self.servers.values():
+            t = threading.Thread(
+                target=srv.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        for srv in self.servers.values():
+            srv.shutdown()
+            srv.server_close()
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def overrides(self) -> dict:
+        """host -> "127.0.0.1:端口"，可直接用作 HTTP_HOST_OVERRIDES。"""
+        return {h: f"127.0.0.1:{s.server_port}" for h, s in self.servers.items()}
+
+    def overrides_env(self) -> str:
+        return ",".join(f"{h}={t}" for h, t in self.overrides.items())
+
+    @property
+    def hits(self) -> dict:
+        return {h: s.hits for h, s in self.servers.items()}
@@ -0,0 +1,233 @@
+"""基准测试驱动：对本地替身跑完整流水线或单个阶段，汇总吞吐、请求延迟与内存。
+
+须在设置好 HTTP_HOST_OVERRIDES / OUT_DIR 等环境变量之后再导入（见 bench/__main__.py），
+各模块在导入时读取配置。
+
+- 延迟：BenchReport 在运行报告的 request() 埋点上记录每个请求的耗时，按阶段与 host
+  给出 p50 / p95；这与运行报告、Prometheus 指标用的是同一组埋点
+- 吞吐：阶段主输入（search 为输出）条数 / 阶段耗时，以及每秒请求数
+- 内存：进程峰值 RSS；trace_memory 时另用 Profiler(memory=True) 记录各阶段的
+  tracemalloc 峰值（会明显拖慢 CPU 密集的阶段）
+"""
+
+import contextlib
+import io
+import os
+import time
+import unicodedata
+
+import main_extract_fast as mef
+import utils.profiling as profiling
+import utils.run_report as run_report
+from config import OUT_DIR
+from pipeline.engine import PipelineStop
+from utils.deadline import start_run
+from utils.events import get_event_log
+from utils.profiling import Profiler, profile_stage
+from utils.run_report import RunReport
+from utils.token_pool import TokenPool
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class BenchReport(RunReport):
+    """运行报告 + 每个请求的耗时样本（按阶段、host）。"""
+
+    def reset(self):
+        super().reset()
+        self.samples = {}
+
+    def request(self, host, nbytes=0, status=None, seconds=None):
+        super().request(host, nbytes, status, seconds)
+        if seconds is not None:
+            key = (self.current_stage or "-", host or "?")
+            with self._lock:
+                self.samples.setdefault(key, []).append(seconds)
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def peak_rss_kb():
+    """进程峰值 RSS（KiB），不支持的平台返回 None。"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def summarize(report: BenchReport) -> dict:
+    """每个阶段一行：耗时、条数、吞吐、请求数、延迟分位数、限速等待与内存峰值。"""
+    rows = []
+    for st in report.to_dict()["stages"]:
+        if st["name"] == run_report.OUTSIDE and not st["hosts"]:
+            continue
+        lat = [
+            s
+            for (stage, _), v in report.samples.items()
+            if stage == st["name"]
+            for s in v
+        ]
+        requests = sum(h["requests"] for h in st["hosts"].values())
+        wall = st.get("wall_s") or 0.0
+        items = next(iter(st.get("in", {}).values()), None)
+        if items is None or st["name"] == "search":
+            items = next(iter(st.get("out", {}).values()), 0)
+        rows.append(
+            {
+                "stage": st["name"],
+                "status": st.get("status", "-"),
+                "wall_s": wall,
+                "items": items,
+                "items_per_s": round(items / wall, 1) if wall else None,
+                "requests": requests,
+                "req_per_s": round(requests / wall, 1) if wall else None,
+                "p50_ms": round(percentile(lat, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(lat, 0.95) * 1000, 1),
+                "limiter_sleep_s": round(
+                    sum(h["limiter_sleep_s"] for h in st["hosts"].values()), 2
+                ),
+                "peak_kb": ((st.get("profile") or {}).get("memory") or {}).get(
+                    "peak_kb"
+                ),
+            }
+        )
+    hosts = {}
+    for (_, host), v in report.samples.items():
+        hosts.setdefault(host, []).extend(v)
+    return {
+        "stages": rows,
+        "hosts": {
+            h: {
+                "requests": len(v),
+                "p50_ms": round(percentile(v, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(v, 0.95) * 1000, 1),
+            }
+            for h, v in sorted(hosts.items())
+        },
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def _install(trace_memory: bool, profile_dir: str) -> BenchReport:
+    report = BenchReport()
+    run_report._default_report = report
+    profiling._default_profiler = Profiler(out_dir=profile_dir, memory=trace_memory)
+    return report
+
+
+@contextlib.contextmanager
+def _quiet(log_path: str):
+    """verbose 关闭时把流水线的 print 写入日志文件。"""
+    if not log_path:
+        yield
+        return
+    with open(log_path, "a", encoding="utf-8") as f, contextlib.redirect_stdout(f):
+        yield
+
+
+def run_pipeline(
+    keywords: int = 6,
+    trace_memory: bool = False,
+    log_path: str = "",
+    profile_dir: str = "profile",
+):
+    """跑一遍完整流水线，返回 (上下文, 流水线, 汇总)。
+
+    keywords 限制搜索关键词个数：搜索接口按 30 次/分钟限速，关键词全开时搜索阶段
+    主要在等待限速器。
+    """
+    if keywords:
+        mef.KEYWORDS = mef.KEYWORDS[:keywords]
+    report = _install(trace_memory, profile_dir)
+    pool = TokenPool(["bench-token"])
+    pipeline = mef.build_pipeline(
+        pool, checkpoint_dir=os.path.join(OUT_DIR, "checkpoints"), resume=False
+    )
+    start_run()
+    t0 = time.monotonic()
+    with _quiet(log_path):
+        try:
+            ctx = pipeline.run()
+        finally:
+            get_event_log().close()
+    summary = summarize(report)
+    summary["wall_s"] = round(time.monotonic() - t0, 3)
+    return ctx, pipeline, summary
+
+
+def run_stage(
+    pipeline,
+    ctx: dict,
+    name: str,
+    repeat: int = 3,
+    trace_memory: bool = False,
+    log_path: str = "",
+    profile_dir: str = "profile",
+) -> list:
+    """用完整运行留下的上下文重复执行单个阶段，返回每次的汇总。
+
+    各缓存（负缓存、元数据缓存、历史等）保持上一次执行后的状态，与长驻运行的稳态一致。
+    """
+    stage = next((s for s in pipeline.stages if s.name == name), None)
+    if stage is None:
+        raise KeyError(f"未知阶段: {name}（可选: {[s.name for s in pipeline.stages]}）")
+    missing = [k for k in stage.inputs if k not in ctx]
+    if missing:
+        raise KeyError(f"阶段 {name} 缺少输入 {missing}（完整运行提前结束？）")
+    inputs = {k: ctx[k] for k in stage.inputs}
+    out = []
+    for _ in range(max(1, repeat)):
+        report = _install(trace_memory, profile_dir)
+        start_run()
+        report.begin_stage(name, inputs)
+        status = "ran"
+        with _quiet(log_path):
+            try:
+                with profile_stage(name):
+                    stage.fn(**inputs)
+            except PipelineStop:
+                status = "stopped"
+            finally:
+                report.end_stage(status)
+                get_event_log().close()
+        out.append(summarize(report))
+    return out
+
+
+def _width(s: str) -> int:
+    """终端显示宽度（中文占两列）。"""
+    return sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in s)
+
+
+def format_table(rows: list) -> str:
+    cols = (
+        ("stage", "阶段", "{}"),
+        ("status", "状态", "{}"),
+        ("wall_s", "耗时s", "{:.2f}"),
+        ("items", "条数", "{}"),
+        ("items_per_s", "条/s", "{}"),
+        ("requests", "请求", "{}"),
+        ("req_per_s", "请求/s", "{}"),
+        ("p50_ms", "p50ms", "{}"),
+        ("p95_ms", "p95ms", "{}"),
+        ("limiter_sleep_s", "限速s", "{}"),
+        ("peak_kb", "峰值KiB", "{}"),
+    )
+    lines = [[title for _, title, _ in cols]]
+    for r in rows:
+        lines.append(
+            ["-" if r.get(key) is None else fmt.format(r[key]) for key, _, fmt in cols]
+        )
+    widths = [max(_width(line[i]) for line in lines) for i in range(len(cols))]
+    buf = io.StringIO()
+    for line in lines:
+        cells = [c + " " * (w - _width(c)) for c, w in zip(line, widths)]
+        buf.write("  ".join(cells).rstrip() + "\n")
+    return buf.getvalue()
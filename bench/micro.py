@@ -0,0 +1,394 @@
+"""热路径微基准与回归门禁：python -m bench.micro [选项]
+
+在 bench/micro_corpus.py 的语料上逐个测量逐 URL / 逐正文执行的函数：
+filters.validator.is_valid_subscription、extract_candidate_urls、canonicalize_url、
+_maybe_base64_subscription 与 is_subscription_url。
+
+- 每个用例先跑一次预热并据此定出每轮调用次数（每轮不少于 min_time 秒），再取 repeat
+  轮中最快的一轮，折算为单次调用耗时
+- 同时测量一段固定的纯 Python 校准负载，结果以「用例耗时 / 校准耗时」的比值保存，
+  基线因此在不同机器之间大致可比
+- 基线在 bench/micro_baseline.json；比值超过 基线 × (1 + 容差) 即视为回归。容差取
+  用例自身的 tolerance，其次是文件顶层的 tolerance；超出容差的用例会复测，取最好成绩
+
+测量期间事件日志只计数不落盘，负缓存换成内存中的空实例，受信任源二次 GET 关闭：
+只测 CPU 上的启发式规则，不受磁盘与网络影响。
+
+    python -m bench.micro                     # 测量并与基线对比
+    python -m bench.micro --check             # 有回归时退出码为 1
+    python -m bench.micro --case validator.   # 只跑名称含该子串的用例
+    python -m bench.micro --update            # 用本次结果重写基线
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+import main_extract_fast as mef
+import storage.negative_cache as negative_cache
+import utils.events as events
+from bench.harness import _width
+from bench.micro_corpus import MicroCorpus, build_micro_corpus
+from filters import validator
+from filters.extract import extract_candidate_urls
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "micro_baseline.json"
+)
+DEFAULT_TOLERANCE = 0.5
+# 校验器 / 抽取 / Base64 探测各自覆盖的正文
+VALIDATOR_BODIES = (
+    "clash_big",
+    "v2_plain",
+    "b64_dump",
+    "airport_b64",
+    "rule_provider",
+    "rule_list",
+    "html_404",
+    "html_challenge",
+    "html_login",
+)
+EXTRACT_BODIES = ("readme", "html_404", "rule_list")
+BASE64_BODIES = ("b64_dump", "v2_plain", "clash_big", "html_404")
+
+_CAL_RE = re.compile(r"https?://([^/]+)/([^?#]*)")
+
+
+@dataclass
+class Case:
+    name: str
+    fn: Callable[[], object]
+    # 每次调用处理的条数：URL 个数或正文 KiB
+    items: float
+    unit: str
+
+
+def build_cases(corpus: MicroCorpus) -> List[Case]:
+    cases = []
+
+    def body_case(prefix, name, fn):
+        url, body = corpus.bodies[name]
+        cases.append(
+            Case(f"{prefix}.{name}", lambda: fn(url, body), len(body) / 1024, "KiB")
+        )
+
+    for name in VALIDATOR_BODIES:
+        body_case("validator", name, validator.is_valid_subscription)
+    for name in EXTRACT_BODIES:
+        body_case("extract", name, lambda url, body: list(extract_candidate_urls(body)))
+    for name in BASE64_BODIES:
+        body_case(
+            "base64", name, lambda url, body: mef._maybe_base64_subscription(body)
+        )
+    urls = corpus.urls
+    cases.append(
+        Case(
+            "canonicalize.readme_urls",
+            lambda: [mef.canonicalize_url(u) for u in urls],
+            len(urls),
+            "url",
+        )
+    )
+    cases.append(
+        Case(
+            "admit.readme_urls",
+            lambda: [mef.is_subscription_url(u) for u in urls],
+            len(urls),
+            "url",
+        )
+    )
+    return cases
+
+
+def _calibration_work() -> int:
+    """固定的校准负载：字符串切分、小写化、正则与字典操作，与热路径的构成相近。"""
+    n = 0
+    seen = {}
+    for i in range(4000):
+        u = f"https://raw.githubusercontent.com/user{i % 97}/repo-{i}/main/sub_{i}.yaml?t={i}"
+        m = _CAL_RE.match(u)
+        last = u.split("/")[-1].split("?")[0].lower()
+        seen[m.group(1)] = seen.get(m.group(1), 0) + len(last)
+        n += last.endswith((".yaml", ".yml", ".txt")) + ("sub" in u.lower())
+    return n + len(seen)
+
+
+def measure(fn: Callable[[], object], min_time: float = 0.1, repeat: int = 5) -> float:
+    """单次调用耗时（秒）：预热一次定出每轮次数，取 repeat 轮中最快的一轮。"""
+    t0 = time.perf_counter()
+    fn()
+    first = time.perf_counter() - t0
+    number = max(1, math.ceil(min_time / first)) if first > 0 else 1000
+    best = first
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+def _sig(x: float) -> float:
+    """保留 4 位有效数字。"""
+    return float(f"{x:.4g}")
+
+
+@contextlib.contextmanager
+def isolated():
+    """事件只计数、负缓存换成内存实例、关闭受信任源二次 GET；退出时恢复。"""
+    saved = (events._default_log, negative_cache._default_cache, mef.TRUSTED_GET_VERIFY)
+    events._default_log = events.EventLog(path=None, console_level="error")
+    negative_cache._default_cache = negative_cache.NegativeCache(path=None)
+    mef.TRUSTED_GET_VERIFY = False
+    try:
+        yield
+    finally:
+        events._default_log, negative_cache._default_cache, mef.TRUSTED_GET_VERIFY = (
+            saved
+        )
+
+
+def run(
+    cases: List[Case] = None,
+    min_time: float = 0.1,
+    repeat: int = 5,
+    scale: float = 1.0,
+    seed: int = 1,
+) -> dict:
+    """测量全部用例，返回 {"calibration_s", "cases": {名称: {seconds, ratio, ...}}}。"""
+    if cases is None:
+        cases = build_cases(build_micro_corpus(seed=seed, scale=scale))
+    with isolated():
+        before = measure(_calibration_work, min_time, repeat)
+        secs = {case.name: measure(case.fn, min_time, repeat) for case in cases}
+        # 前后各测一次校准负载取较快者，减小频率调节与后台负载的影响
+        cal = min(before, measure(_calibration_work, min_time, repeat))
+    out = {}
+    for case in cases:
+        sec = secs[case.name]
+        out[case.name] = {
+            "seconds": _sig(sec),
+            "ratio": _sig(sec / cal),
+            "per_item_us": _sig(sec / case.items * 1e6) if case.items else None,
+            "unit": case.unit,
+        }
+    return {"calibration_s": _sig(cal), "scale": scale, "seed": seed, "cases": out}
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"tolerance": DEFAULT_TOLERANCE, "cases": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict, path: str = BASELINE_PATH, old: dict = None) -> dict:
+    """用本次结果重写基线；保留旧基线中的顶层与各用例 tolerance。"""
+    old = old or {}
+    old_cases = old.get("cases", {})
+    data = {
+        "tolerance": old.get("tolerance", DEFAULT_TOLERANCE),
+        "scale": results.get("scale", 1.0),
+        "seed": results.get("seed", 1),
+        "calibration_s": results["calibration_s"],
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": {},
+    }
+    for name, r in sorted(results["cases"].items()):
+        entry = {"ratio": r["ratio"], "seconds": r["seconds"]}
+        if "tolerance" in old_cases.get(name, {}):
+            entry["tolerance"] = old_cases[name]["tolerance"]
+        data["cases"][name] = entry
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    return data
+
+
+def compare(results: dict, baseline: dict, tolerance: float = None) -> List[dict]:
+    """逐用例与基线对比。status：ok / regressed（变慢超出容差）/ improved（变快超出
+    容差，可考虑更新基线）/ new（基线中没有）。tolerance 非空时覆盖基线中的容差。"""
+    rows = []
+    base_cases = baseline.get("cases", {})
+    for name, r in results["cases"].items():
+        base = base_cases.get(name)
+        row = {
+            "case": name,
+            "ratio": r["ratio"],
+            "seconds": r["seconds"],
+            "per_item_us": r.get("per_item_us"),
+            "unit": r.get("unit"),
+        }
+        if base is None:
+            row.update(status="new", base_ratio=None, change=None, tolerance=None)
+            rows.append(row)
+            continue
+        tol = tolerance
+        if tol is None:
+            tol = base.get("tolerance", baseline.get("tolerance", DEFAULT_TOLERANCE))
+        change = r["ratio"] / base["ratio"] - 1 if base["ratio"] else 0.0
+        if change > tol:
+            status = "regressed"
+        elif change < -tol:
+            status = "improved"
+        else:
+            status = "ok"
+        row.update(
+            status=status,
+            base_ratio=base["ratio"],
+            change=round(change, 3),
+            tolerance=tol,
+        )
+        rows.append(row)
+    return rows
+
+
+def regressions(rows: List[dict]) -> List[dict]:
+    return [r for r in rows if r["status"] == "regressed"]
+
+
+def gate(
+    cases: List[Case],
+    baseline: dict,
+    tolerance: float = None,
+    min_time: float = 0.1,
+    repeat: int = 5,
+    retries: int = 2,
+    scale: float = 1.0,
+    seed: int = 1,
+):
+    """测量并与基线对比，返回 (结果, 对比行)。
+
+    超出容差的用例再复测至多 retries 次并取最好成绩：单核或繁忙的机器上偶发的抖动
+    不会被当成回归，稳定的变慢则每次都会复现。
+    """
+    results = run(cases, min_time, repeat, scale, seed)
+    rows = compare(results, baseline, tolerance)
+    for _ in range(retries):
+        bad = {r["case"] for r in regressions(rows)}
+        if not bad:
+            break
+        again = run([c for c in cases if c.name in bad], min_time, repeat, scale, seed)
+        for name, r in again["cases"].items():
+            if r["ratio"] < results["cases"][name]["ratio"]:
+                results["cases"][name] = r
+        rows = compare(results, baseline, tolerance)
+    return results, rows
+
+
+def format_table(rows: List[dict]) -> str:
+    cols = (
+        ("case", "用例", "{}"),
+        ("seconds", "单次ms", None),
+        ("per_item_us", "每条µs", "{}"),
+        ("unit", "单位", "{}"),
+        ("ratio", "比值", "{}"),
+        ("base_ratio", "基线", "{}"),
+        ("change", "变化", "{:+.0%}"),
+        ("status", "状态", "{}"),
+    )
+    lines = [[title for _, title, _ in cols]]
+    for r in rows:
+        line = []
+        for key, _, fmt in cols:
+            v = r.get(key)
+            if v is None:
+                line.append("-")
+            elif fmt is None:
+                line.append(f"{v * 1000:.3f}")
+            else:
+                line.append(fmt.format(v))
+        lines.append(line)
+    widths = [max(_width(line[i]) for line in lines) for i in range(len(cols))]
+    return "".join(
+        "  ".join(c + " " * (w - _width(c)) for c, w in zip(line, widths)).rstrip()
+        + "\n"
+        for line in lines
+    )
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(
+        prog="python -m bench.micro", description=__doc__.split("\n")[0]
+    )
+    p.add_argument(
+        "--case", action="append", default=[], help="只跑名称含该子串的用例（可重复）"
+    )
+    p.add_argument("--min-time", type=float, default=0.1, help="每轮最短耗时（秒）")
+    p.add_argument("--repeat", type=int, default=5, help="测量轮数，取最快一轮")
+    p.add_argument(
+        "--scale", type=float, default=1.0, help="语料规模倍数（基线按 1.0 录制）"
+    )
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--baseline", default=BASELINE_PATH, help="基线文件")
+    p.add_argument(
+        "--tolerance", type=float, help="覆盖基线中的容差（0.5 = 允许慢 50%%）"
+    )
+    p.add_argument("--retries", type=int, default=2, help="超出容差的用例复测次数")
+    p.add_argument("--update", action="store_true", help="用本次结果重写基线")
+    p.add_argument("--check", action="store_true", help="有回归时退出码为 1")
+    p.add_argument("--json", help="结果写入该 JSON 文件")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    cases = build_cases(build_micro_corpus(seed=args.seed, scale=args.scale))
+    if args.case:
+        cases = [c for c in cases if any(s in c.name for s in args.case)]
+    if not cases:
+        print(f"[微基准] 没有匹配的用例: {args.case}")
+        return 2
+    baseline = load_baseline(args.baseline)
+    if not args.update and baseline.get("scale", 1.0) != args.scale:
+        print(
+            f"[微基准] 基线按 scale={baseline.get('scale', 1.0)} 录制，比值不可直接对比"
+        )
+    results, rows = gate(
+        cases,
+        baseline,
+        args.tolerance,
+        args.min_time,
+        args.repeat,
+        0 if args.update else args.retries,
+        args.scale,
+        args.seed,
+    )
+    print(
+        f"[微基准] 校准负载 {results['calibration_s'] * 1000:.3f}ms | 基线: {args.baseline}"
+    )
+    print(format_table(rows), end="")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"results": results, "rows": rows}, f, ensure_ascii=False, indent=2
+            )
+        print(f"[微基准] 已写入 {args.json}")
+    if args.update:
+        if args.case:
+            # 只更新本次测到的用例，其余沿用旧基线（比值已按校准负载归一，可以合并）
+            merged = {**baseline.get("cases", {}), **results["cases"]}
+            results = {**results, "cases": merged}
+        save_baseline(results, args.baseline, baseline)
+        print(f"[微基准] 基线已更新: {args.baseline}")
+        return 0
+    bad = regressions(rows)
+    for r in bad:
+        print(
+            f"[微基准] 回归: {r['case']} 比值 {r['base_ratio']} -> {r['ratio']}"
+            f"（{r['change']:+.0%}，容差 {r['tolerance']:.0%}）"
+        )
+    return 1 if bad and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""微基准的输入语料：按真实形态合成、同一 seed 完全相同。
+
+覆盖逐 URL / 逐正文执行的热路径会遇到的几类输入：
+
+- 大型 Clash 配置（多协议 proxies + 引用全部节点的 proxy-groups + rules）
+- Base64 订阅转储、明文节点列表（含 vmess base64-JSON）
+- 规则集（rule-provider payload 与纯文本分流列表），内容校验应剔除
+- HTML 错误页：GitHub 404、Cloudflare 验证页、机场登录页
+- 含数千条链接的 README：raw / blob / jsDelivr / 代理包装 / Pages / 机场订阅 /
+  徽章图片 / 无关站点，混有中文标点与 Markdown 语法
+
+scale 按比例放大或缩小各输入的条数，便于在慢机器上快速跑一遍。
+"""
+
+import base64
+import json
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from bench.corpus import _server, _uuid, node_lines, sub_url
+from filters.extract import URL_RE, normalize_url
+
+AIRPORT_HOSTS = ("fast.airport.test", "cheap.airport.test", "vip.cloud.test")
+PROXY_WRAPPERS = (
+    "https://ghproxy.com/",
+    "https://mirror.ghproxy.com/",
+    "https://gh-proxy.com/",
+)
+SUB_PATHS = (
+    "clash.yaml",
+    "sub/clash.yml",
+    "v2ray.txt",
+    "nodes/sub_b64.txt",
+    "subscribe/list.txt",
+    "proxies",
+    "sub",
+)
+OTHER_PATHS = (
+    "README.md",
+    "LICENSE",
+    "config.yaml",
+    "dist/clash.js",
+    "docs/index.html",
+    "assets/logo.png",
+    "template/example.yaml",
+    "releases",
+)
+
+
+@dataclass
+class MicroCorpus:
+    # 名称 -> (URL, 正文)；URL 决定校验器走哪条分支
+    bodies: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    # 从 README 抽出的链接，按出现顺序（含重复）
+    urls: List[str] = field(default_factory=list)
+
+
+def vmess_link(rng: random.Random, i: int) -> str:
+    cfg = {
+        "v": "2",
+        "ps": f"vmess-{i}",
+        "add": _server(rng),
+        "port": "443",
+        "id": _uuid(rng),
+        "aid": "0",
+        "net": "ws",
+        "type": "none",
+        "host": "",
+        "path": "/ws",
+        "tls": "tls",
+    }
+    return "vmess://" + base64.b64encode(json.dumps(cfg).encode()).decode()
+
+
+def plain_nodes(rng: random.Random, n: int) -> str:
+    """明文节点列表：trojan / vless / ss 之外每四条插一条 vmess。"""
+    lines = node_lines(rng, n)
+    for i in range(0, len(lines), 4):
+        lines[i] = vmess_link(rng, i)
+    return "\n".join(lines) + "\n"
+
+
+def clash_config(rng: random.Random, n: int, rules: int) -> str:
+    """完整的 Clash 配置：混合协议的 proxies、引用全部节点的分组与规则。"""
+    lines = [
+        "port: 7890",
+        "socks-port: 7891",
+        "allow-lan: false",
+        "mode: rule",
+        "log-level: info",
+        "dns:",
+        "  enable: true",
+        "  nameserver:",
+        "    - 223.5.5.5",
+        "    - https://doh.pub/dns-query",
+        "proxies:",
+    ]
+    names = []
+    for i in range(n):
+        name = f"🇭🇰 香港 {i:04d}"
+        names.append(name)
+        kind = i % 4
+        lines.append(f'  - name: "{name}"')
+        if kind == 0:
+            lines += [
+                "    type: vmess",
+                f"    server: {_server(rng)}",
+                "    port: 443",
+                f"    uuid: {_uuid(rng)}",
+                "    alterId: 0",
+                "    cipher: auto",
+                "    tls: true",
+                "    network: ws",
+                "    ws-opts:",
+                "      path: /ws",
+                "      headers:",
+                "        Host: cdn.example.com",
+            ]
+        elif kind == 1:
+            lines += [
+                "    type: ss",
+                f"    server: {_server(rng)}",
+                "    port: 8388",
+                "    cipher: aes-256-gcm",
+                f"    password: {_uuid(rng)}",
+                "    udp: true",
+            ]
+        elif kind == 2:
+            lines += [
+                "    type: trojan",
+                f"    server: {_server(rng)}",
+                "    port: 443",
+                f"    password: {_uuid(rng)}",
+                "    sni: cdn.example.com",
+                "    skip-cert-verify: true",
+            ]
+        else:
+            lines += [
+                "    type: vless",
+                f"    server: {_server(rng)}",
+                "    port: 443",
+                f"    uuid: {_uuid(rng)}",
+                "    network: tcp",
+                "    tls: true",
+                "    servername: cdn.example.com",
+            ]
+    lines.append("proxy-groups:")
+    for group, gtype in (("🚀 节点选择", "select"), ("♻️ 自动选择", "url-test")):
+        lines += [f"  - name: {group}", f"    type: {gtype}", "    proxies:"]
+        lines += [f'      - "{name}"' for name in names]
+    lines.append("rules:")
+    lines += [rule_line(i, "🚀 节点选择") for i in range(rules)]
+    lines.append("  - MATCH,🚀 节点选择")
+    return "\n".join(lines) + "\n"
+
+
+def rule_line(i: int, target: str = "") -> str:
+    kind = i % 4
+    if kind == 0:
+        rule = f"DOMAIN-SUFFIX,ads{i}.example.com"
+    elif kind == 1:
+        rule = f"DOMAIN-KEYWORD,tracker{i}"
+    elif kind == 2:
+        rule = f"DOMAIN,api{i}.example.net"
+    else:
+        rule = f"IP-CIDR,10.{i // 256 % 256}.{i % 256}.0/24,no-resolve"
+    if target:
+        parts = rule.split(",")
+        parts.insert(2, target)
+        rule = ",".join(parts)
+    return f"  - {rule}"
+
+
+def rule_provider(n: int) -> str:
+    return "payload:\n" + "\n".join(rule_line(i) for i in range(n)) + "\n"
+
+
+def rule_list(n: int) -> str:
+    """Surge / Clash classical 纯文本分流列表。"""
+    head = ["# NAME: Advertising", "# TOTAL: %d" % n, ""]
+    return "\n".join(head + [rule_line(i)[4:] for i in range(n)]) + "\n"
+
+
+def github_404(links: int) -> str:
+    nav = "\n".join(
+        f'<li><a href="https://github.com/topics/topic-{i}" '
+        f'class="Link--secondary">topic-{i}</a></li>'
+        for i in range(links)
+    )
+    scripts = "\n".join(
+        f'<script crossorigin="anonymous" defer="defer" type="application/javascript" '
+        f'src="https://github.githubassets.com/assets/chunk-{i:05x}.js"></script>'
+        for i in range(links // 4)
+    )
+    return (
+        "<!DOCTYPE html>\n<html lang='en'>\n<head>\n<meta charset='utf-8'>\n"
+        "<title>Page not found · GitHub</title>\n"
+        f"{scripts}\n</head>\n<body class='logged-out env-production'>\n"
+        "<div class='container'><h1>404</h1>\n"
+        "<p>This is not the web page you are looking for.</p>\n"
+        f"<ul>{nav}</ul>\n"
+        "<a href='https://github.com/login'>Sign in</a>\n</div>\n</body>\n</html>\n"
+    )
+
+
+def cloudflare_challenge() -> str:
+    return (
+        "<!DOCTYPE html><html lang='en-US'><head><title>Just a moment...</title>"
+        "<meta http-equiv='refresh' content='390'>"
+        "<script src='/cdn-cgi/challenge-platform/h/b/orchestrate/chl_page/v1'>"
+        "</script></head><body><div class='main-wrapper'><h1>fast.airport.test</h1>"
+        "<h2>Checking if the site connection is secure</h2>"
+        "<div id='turnstile-wrapper' class='captcha'></div>"
+        "<p>Enable JavaScript and cookies to continue</p>"
+        "<div class='footer'>Ray ID: 8a1b2c3d4e5f6789 · Performance &amp; security "
+        "by <a href='https://www.cloudflare.com'>Cloudflare</a></div>"
+        "</div></body></html>\n" + "<!-- padding -->\n" * 64
+    )
+
+
+def airport_login() -> str:
+    return (
+        "<!DOCTYPE html><html><head><title>登录 - 机场</title>"
+        "<link rel='stylesheet' href='/theme/default/assets/umi.css'></head>"
+        "<body><div id='root'><form action='/api/v1/passport/auth/login'>"
+        "<input name='email'><input name='password' type='password'>"
+        "<button>Sign in</button></form>"
+        "<p>订阅已过期，请登录后续费 / permission denied</p></div>"
+        "<script src='/theme/default/assets/umi.js'></script></body></html>\n"
+    )
+
+
+def _readme_link(rng: random.Random, i: int) -> str:
+    user, repo = f"user{i % 97:03d}", f"free-nodes-{i % 31:02d}"
+    sub = SUB_PATHS[i % len(SUB_PATHS)]
+    other = OTHER_PATHS[i % len(OTHER_PATHS)]
+    raw = f"https://raw.githubusercontent.com/{user}/{repo}/main/{sub}"
+    kind = i % 12
+    if kind in (0, 1):
+        return sub_url(AIRPORT_HOSTS[i % len(AIRPORT_HOSTS)], rng)
+    if kind == 2:
+        return raw
+    if kind == 3:
+        return f"https://github.com/{user}/{repo}/blob/main/{sub}"
+    if kind == 4:
+        return f"https://github.com/{user}/{repo}/raw/refs/heads/main/{sub}"
+    if kind == 5:
+        return f"https://cdn.jsdelivr.net/gh/{user}/{repo}@main/{sub}"
+    if kind == 6:
+        return PROXY_WRAPPERS[i % len(PROXY_WRAPPERS)] + raw
+    if kind == 7:
+        return f"https://{user}.github.io/{repo}/{sub}"
+    if kind == 8:
+        return f"https://raw.githubusercontent.com/{user}/{repo}/main/{other}"
+    if kind == 9:
+        return f"https://img.shields.io/github/stars/{user}/{repo}?style=flat-square"
+    if kind == 10:
+        return f"https://github.com/{user}/{repo}/{other}"
+    return f"https://t.me/share_{i}"
+
+
+def readme(rng: random.Random, links: int) -> str:
+    """链接放在表格、列表、尖括号与中文括号里，夹着说明文字。"""
+    out = [
+        "# 免费节点 / Free Nodes",
+        "",
+        "[![Stars](https://img.shields.io/github/stars/user000/free-nodes-00)]"
+        "(https://github.com/user000/free-nodes-00)",
+        "",
+        "| 名称 | 订阅地址 | 更新时间 |",
+        "| --- | --- | --- |",
+    ]
+    for i in range(links):
+        url = _readme_link(rng, i)
+        style = i % 5
+        if style == 0:
+            out.append(f"| 节点 {i} | {url} | 2025-10-{1 + i % 28:02d} |")
+        elif style == 1:
+            out.append(f"- [订阅 {i}]({url})")
+        elif style == 2:
+            out.append(f"- <{url}>")
+        elif style == 3:
+            out.append(f"订阅链接（{url}），每日更新。")
+        else:
+            out.append(f'<a href="{url}">{url}</a>')
+        if i % 50 == 49:
+            out += ["", f"## 第 {i // 50 + 1} 组", ""]
+    return "\n".join(out) + "\n"
+
+
+def build_micro_corpus(seed: int = 1, scale: float = 1.0) -> MicroCorpus:
+    rng = random.Random(seed)
+
+    def n(base: int) -> int:
+        return max(1, int(base * scale))
+
+    corpus = MicroCorpus()
+    v2 = plain_nodes(rng, n(1000))
+    base = "https://raw.githubusercontent.com/user000/free-nodes-00/main"
+    corpus.bodies = {
+        "clash_big": (f"{base}/clash.yaml", clash_config(rng, n(200), n(600))),
+        "v2_plain": (f"{base}/v2ray.txt", v2),
+        "b64_dump": (
+            f"{base}/nodes/sub_b64.txt",
+            base64.b64encode(plain_nodes(rng, n(1000)).encode()).decode(),
+        ),
+        "airport_b64": (
+            f"https://{AIRPORT_HOSTS[0]}/link/{rng.getrandbits(64):016x}/sub",
+            base64.b64encode(v2.encode()).decode(),
+        ),
+        "rule_provider": (f"{base}/rules/ads.yaml", rule_provider(n(2000))),
+        "rule_list": (f"{base}/rules/ads.txt", rule_list(n(2000))),
+        "html_404": (f"{base}/sub", github_404(n(400))),
+        "html_challenge": (f"https://{AIRPORT_HOSTS[0]}/sub", cloudflare_challenge()),
+        "html_login": (sub_url(AIRPORT_HOSTS[1], rng) + "&flag=sub", airport_login()),
+        "readme": (f"{base}/README.md", readme(rng, n(2000))),
+    }
+    corpus.urls = _urls_of(corpus.bodies["readme"][1])
+    return corpus
+
+
+def _urls_of(text: str) -> List[str]:
+    return [u for u in (normalize_url(m) for m in URL_RE.findall(text)) if u]
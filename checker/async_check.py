@@ -1,68 +1,122 @@
 import asyncio
+import time
+import urllib.parse
 from typing import Any
 
+from utils.http_client import resolve_url
+from utils.metrics import get_metrics
+from utils.profiling import get_profiler
+from utils.run_report import get_run_report
+
 try:
     import aiohttp  # type: ignore[reportMissingImports]
 except Exception:
     aiohttp = None  # type: ignore
 
 
+def _host(url: str) -> str:
+    return urllib.parse.urlsplit(url).hostname or ""
+
+
 async def _check_one(session: Any, url: str, timeout: int = 8) -> bool:
+    report = get_run_report()
+    host = _host(url)
+    t0 = time.monotonic()
     try:
-        async with session.get(url, timeout=timeout, allow_redirects=True) as r:
-            if r.status == 200:
-                # 读一点点，确认不是空洞 200
-                _ = await r.content.read(1024)
-                return True
-            return False
+        with get_metrics().in_flight(host):
+            async with session.get(
+                resolve_url(url), timeout=timeout, allow_redirects=True
+            ) as r:
+                if r.status == 200:
+                    # 读一点点，确认不是空洞 200
+                    head = await r.content.read(1024)
+                    report.request(host, len(head), r.status, time.monotonic() - t0)
+                    return True
+                report.request(host, 0, r.status, time.monotonic() - t0)
+                return False
     except Exception:
+        report.request(host, seconds=time.monotonic() - t0)
         return False
 
 
-def _sync_head_check(urls, concurrency: int = 12, timeout: int = 8):
+def _sync_head_check(
+    urls, concurrency: int = 12, timeout: int = 8, deadline=None, deferred=None
+):
     # Fallback when aiohttp is not available: use requests in threads
     import concurrent.futures
 
     import requests
 
     ok = []
+    report = get_run_report()
 
     def _one(u: str):
+        host = _host(u)
+        t0 = time.monotonic()
         try:
-            r = requests.get(u, timeout=timeout, stream=True)
-            if r.status_code == 200:
-                # read a bit
-                _ = r.raw.read(1024)
-                return u
+            with get_metrics().in_flight(host):
+                r = requests.get(resolve_url(u), timeout=timeout, stream=True)
+                if r.status_code == 200:
+                    # read a bit
+                    head = r.raw.read(1024)
+                    report.request(
+                        host, len(head), r.status_code, time.monotonic() - t0
+                    )
+                    return u
+            report.request(host, 0, r.status_code, time.monotonic() - t0)
         except Exception:
+            report.request(host, seconds=time.monotonic() - t0)
             return None
         return None
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as ex:
-        futs = {ex.submit(_one, u): u for u in urls}
-        for fut in concurrent.futures.as_completed(futs):
+    ex = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    futs = {ex.submit(_one, u): u for u in urls}
+    try:
+        for fut in concurrent.futures.as_completed(futs, timeout=deadline):
             try:
                 r = fut.result()
             except Exception:
                 r = None
             if r:
                 ok.append(r)
+    except concurrent.futures.TimeoutError:
+        # 预算用尽：未完成的按原顺序交给调用方推迟
+        if deferred is not None:
+            deferred.extend(u for f, u in futs.items() if not f.done())
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
     return ok
 
 
-async def check_urls(urls, concurrency: int = 12, timeout: int = 8):
+async def check_urls(
+    urls, concurrency: int = 12, timeout: int = 8, deadline=None, deferred=None
+):
     """
     高并发连通性检测
     - concurrency: 并发量（建议 8~16 之间）
     - timeout: 单链接秒级超时
+    - deadline: 整批检测的剩余预算（秒），为空不限；到期时取消未完成的检测，
+      这些 URL 按原顺序追加到 deferred（若提供）
     - 读取系统代理(HTTP_PROXY/HTTPS_PROXY)，以穿透网络限制
+    - PROFILE_LOOP_LAG 开启时同时监测事件循环延迟，记入运行报告
     """
+    urls = list(urls)
+    profiler = get_profiler()
+    lag = profiler.loop_lag_monitor()
+    try:
+        return await _check_urls(urls, concurrency, timeout, deadline, deferred)
+    finally:
+        if lag is not None:
+            profiler.record_loop_lag(await lag.stop())
+
+
+async def _check_urls(urls, concurrency, timeout, deadline, deferred):
     # If aiohttp is not available, fall back to thread-based requests implementation
     if aiohttp is None:
         # run blocking sync check in executor to keep async API
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
-            None, _sync_head_check, urls, concurrency, timeout
+            None, _sync_head_check, urls, concurrency, timeout, deadline, deferred
         )
 
     ok = []
@@ -75,5 +129,14 @@ async def check_urls(urls, concurrency: int = 12, timeout: int = 8):
                 if good:
                     ok.append(u)
 
-        await asyncio.gather(*[worker(u) for u in urls])
+        tasks = [asyncio.ensure_future(worker(u)) for u in urls]
+        if not tasks:
+            return ok
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            if deferred is not None:
+                deferred.extend(u for u, t in zip(urls, tasks) if t in pending)
     return ok
@@ -66,3 +66,145 @@ TRUSTED_GET_HOSTS = set(
 # 并发与超时配置
 TRUSTED_GET_CONCURRENCY = int(os.environ.get("TRUSTED_GET_CONCURRENCY", "6"))
 TRUSTED_GET_TIMEOUT = int(os.environ.get("TRUSTED_GET_TIMEOUT", "10"))
+
+# ===== 负缓存：记住被拒绝的 URL 与失效仓库，避免每次运行重复评估 =====
+NEG_CACHE_ENABLE = os.environ.get("NEG_CACHE_ENABLE", "1") in ("1", "true", "True")
+NEG_CACHE_PATH = os.environ.get(
+    "NEG_CACHE_PATH", os.path.join(OUT_DIR, "negative_cache.json")
+)
+NEG_CACHE_CAPACITY = int(os.environ.get("NEG_CACHE_CAPACITY", "200000"))
+
+# ===== 资源元数据缓存（owner_key/base/lastmod/etag/摘要/节点数） =====
+META_CACHE_PATH = os.environ.get(
+    "META_CACHE_PATH", os.path.join(OUT_DIR, "meta_cache.json")
+)
+# lastmod/etag 的有效期（秒），过期后在裁剪阶段批量刷新
+LASTMOD_CACHE_TTL = int(os.environ.get("LASTMOD_CACHE_TTL", "86400"))
+META_CACHE_MAX_ENTRIES = int(os.environ.get("META_CACHE_MAX_ENTRIES", "50000"))
+# 超过该天数未被访问的条目在保存时淘汰
+META_CACHE_IDLE_DAYS = int(os.environ.get("META_CACHE_IDLE_DAYS", "30"))
+
+# ===== 存储格式：history / 缓存文件的序列化格式（读取时自动识别） =====
+# auto（默认：*.json 写纯 JSON，其它文件有 msgpack 用 msgpack，否则 zlib 压缩 JSON）| json | zjson | msgpack
+STORAGE_FORMAT = os.environ.get("STORAGE_FORMAT", "auto").lower()
+
+# ===== 淘汰归档（替代 reserve-<ts>.json 导出） =====
+RESERVE_RETENTION_DAYS = int(os.environ.get("RESERVE_RETENTION_DAYS", "90"))
+RESERVE_MAX_ENTRIES = int(os.environ.get("RESERVE_MAX_ENTRIES", "20000"))
+
+# ===== 关键词产出统计（关键词 -> 仓库 -> 候选 -> 有效订阅） =====
+KEYWORD_STATS_PATH = os.environ.get(
+    "KEYWORD_STATS_PATH", os.path.join(OUT_DIR, "keyword_stats.json")
+)
+# 每个关键词保留最近多少次运行的记录
+KEYWORD_HISTORY_RUNS = int(os.environ.get("KEYWORD_HISTORY_RUNS", "30"))
+
+# ===== 仓库产出历史（按预期产出排序抓取） =====
+REPO_STATS_PATH = os.environ.get(
+    "REPO_STATS_PATH", os.path.join(OUT_DIR, "repo_stats.json")
+)
+REPO_STATS_MAX_ENTRIES = int(os.environ.get("REPO_STATS_MAX_ENTRIES", "20000"))
+
+# ===== 流水线检查点（崩溃/中断后从最后完成的阶段续跑） =====
+PIPELINE_RESUME = os.environ.get("PIPELINE_RESUME", "1") in ("1", "true", "True")
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR", os.path.join(OUT_DIR, "checkpoints"))
+# 未完成运行的检查点超过该小时数视为过期，重新从头运行
+CHECKPOINT_MAX_AGE_HOURS = float(os.environ.get("CHECKPOINT_MAX_AGE_HOURS", "12"))
+
+# ===== 守护进程模式（main_extract_fast.py --daemon） =====
+# 各任务的执行间隔（分钟）
+DAEMON_DISCOVERY_MINUTES = float(os.environ.get("DAEMON_DISCOVERY_MINUTES", "360"))
+DAEMON_RECHECK_MINUTES = float(os.environ.get("DAEMON_RECHECK_MINUTES", "30"))
+DAEMON_PUBLISH_MINUTES = float(os.environ.get("DAEMON_PUBLISH_MINUTES", "60"))
+# 每次复检的历史条目数（按游标轮转，整份历史分多轮复检完）
+DAEMON_RECHECK_BATCH = int(os.environ.get("DAEMON_RECHECK_BATCH", "200"))
+# 进程内 DNS 缓存时长（秒），0 关闭
+DAEMON_DNS_TTL = float(os.environ.get("DAEMON_DNS_TTL", "300"))
+
+# ===== 分片执行（python -m pipeline.sharded coordinator|worker） =====
+# 共享工作队列（SQLite 文件）；跨机器运行时需放在各机器都能访问且支持文件锁的存储上
+SHARD_QUEUE_PATH = os.environ.get(
+    "SHARD_QUEUE_PATH", os.path.join(OUT_DIR, "work_queue.db")
+)
+# 一致性哈希环上的分片数与每个分片的虚拟节点数
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", "16"))
+SHARD_VNODES = int(os.environ.get("SHARD_VNODES", "64"))
+# 分片租约（秒）：worker 崩溃后租约到期，分片可被其它 worker 重新领取
+SHARD_LEASE_SECONDS = float(os.environ.get("SHARD_LEASE_SECONDS", "900"))
+# 队列空闲时的轮询间隔（秒）
+SHARD_POLL_SECONDS = float(os.environ.get("SHARD_POLL_SECONDS", "5"))
+
+# ===== 运行时限与阶段预算（定时任务时段固定：宁可按时发布略少的新列表） =====
+# 整次运行的时限（分钟），0 不限
+RUN_DEADLINE_MINUTES = float(os.environ.get("RUN_DEADLINE_MINUTES", "0"))
+# 各阶段预算（秒），0 不限；同时受整次运行时限约束
+SEARCH_BUDGET_SECONDS = float(os.environ.get("SEARCH_BUDGET_SECONDS", "0"))
+CHECK_BUDGET_SECONDS = float(os.environ.get("CHECK_BUDGET_SECONDS", "0"))
+VALIDATE_BUDGET_SECONDS = float(os.environ.get("VALIDATE_BUDGET_SECONDS", "0"))
+HEAD_BUDGET_SECONDS = float(os.environ.get("HEAD_BUDGET_SECONDS", "0"))
+# 为写回历史与发布预留的时间（秒），检测类阶段不会占用
+PUBLISH_RESERVE_SECONDS = float(os.environ.get("PUBLISH_RESERVE_SECONDS", "120"))
+# 预算用尽而推迟的 URL，下次运行优先检测
+DEFERRED_PATH = os.environ.get("DEFERRED_PATH", os.path.join(OUT_DIR, "deferred.json"))
+
+# ===== 运行报告（各阶段耗时、按 host 的请求/字节/重试、限速等待、缓存命中、剔除原因） =====
+RUN_REPORT_PATH = os.environ.get(
+    "RUN_REPORT_PATH", os.path.join("output", "run_report.json")
+)
+
+# ===== Prometheus 指标（node_exporter textfile / 守护进程本地 HTTP 端点） =====
+# 每次运行（守护进程每个任务）结束写出的 textfile，空则不写；
+# 例如 /var/lib/node_exporter/textfile_collector/sub_hunter.prom
+METRICS_TEXTFILE = os.environ.get("METRICS_TEXTFILE", "")
+# 守护进程 / 分片 worker 的 /metrics 端口，0 关闭
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_ADDR = os.environ.get("METRICS_ADDR", "127.0.0.1")
+# 按 host 打标签的 HTTP 指标只单列这些 host（含 api.github.com/search 这类限速子键），
+# 其余（订阅链接所在的任意主机）统一记为 host="other"，避免标签基数随候选链接无限增长
+_METRICS_HOSTS_ENV = os.environ.get(
+    "METRICS_HOSTS",
+    "api.github.com,github.com,raw.githubusercontent.com,gist.githubusercontent.com,"
+    "codeload.github.com,objects.githubusercontent.com,cdn.jsdelivr.net,"
+    "fastly.jsdelivr.net,gitee.com,gitlab.com",
+)
+METRICS_HOSTS = set(
+    h.strip().lower() for h in _METRICS_HOSTS_ENV.split(",") if h.strip()
+)
+
+# ===== 结构化事件日志（替代热循环中逐 URL 的 print） =====
+# 控制台 / NDJSON 的最低级别：debug / info / warning / error；生产环境可把控制台设为 warning
+EVENT_CONSOLE_LEVEL = os.environ.get("EVENT_CONSOLE_LEVEL", "info")
+EVENT_FILE_LEVEL = os.environ.get("EVENT_FILE_LEVEL", "warning")
+# NDJSON 事件文件，空则不写；剔除类审计事件总会写入
+EVENT_LOG_PATH = os.environ.get(
+    "EVENT_LOG_PATH", os.path.join("output", "events.ndjson")
+)
+# 单个文件上限（字节）与轮转保留份数
+EVENT_LOG_MAX_BYTES = int(os.environ.get("EVENT_LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+EVENT_LOG_BACKUPS = int(os.environ.get("EVENT_LOG_BACKUPS", "5"))
+# 高频事件（逐 URL 的保存/递归/转换等）的抽样比例
+EVENT_SAMPLE_RATE = float(os.environ.get("EVENT_SAMPLE_RATE", "0.01"))
+
+# ===== 性能剖析（默认关闭；输出到运行报告目录下的 profile/） =====
+PROFILE_CPU = os.environ.get("PROFILE_CPU", "0") in ("1", "true", "True")
+PROFILE_MEMORY = os.environ.get("PROFILE_MEMORY", "0") in ("1", "true", "True")
+PROFILE_LOOP_LAG = os.environ.get("PROFILE_LOOP_LAG", "0") in ("1", "true", "True")
+PROFILE_STACKS = os.environ.get("PROFILE_STACKS", "0") in ("1", "true", "True")
+# 栈采样间隔（秒）
+PROFILE_STACK_INTERVAL = float(os.environ.get("PROFILE_STACK_INTERVAL", "0.1"))
+# 文本摘要中列出的函数 / 分配点个数
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "30"))
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(os.path.dirname(RUN_REPORT_PATH) or ".", "profile")
+)
+
+# ===== 本地替身（基准测试 / 离线调试） =====
+# host=地址:端口，逗号分隔；命中的请求改用 http 发往该地址（路径与查询不变），
+# 限速、令牌配额与运行报告仍按原 host 计。例如
+# HTTP_HOST_OVERRIDES="api.github.com=127.0.0.1:8001,raw.githubusercontent.com=127.0.0.1:8002"
+_HOST_OVERRIDES_ENV = os.environ.get("HTTP_HOST_OVERRIDES", "")
+HTTP_HOST_OVERRIDES = {
+    h.strip().lower(): t.strip()
+    for h, _, t in (p.partition("=") for p in _HOST_OVERRIDES_ENV.split(","))
+    if h.strip() and t.strip()
+}
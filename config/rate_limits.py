@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass
 
 
@@ -6,12 +7,20 @@ class RatePlan:
     per_minute: int
     burst: int = 5
     min_interval: float = 0.05
+    # 初始的单 host 并发上限（自适应模式下会随反馈增减）
+    concurrency: int = 8
+    # 服务端按令牌硬性限额（如搜索接口每令牌 30 次/分钟）：自适应速率不超过计划值
+    hard_quota: bool = False
 
 
 PLANS = {
     "api.github.com": RatePlan(
         per_minute=900, burst=10, min_interval=0.05
     ),  # 保守值，<5000/h
+    # 搜索接口单独计量：每令牌硬性 30 次/分钟，且有二级限流
+    "api.github.com/search": RatePlan(
+        per_minute=30, burst=5, min_interval=0.2, concurrency=2, hard_quota=True
+    ),
     "gitlab.com": RatePlan(per_minute=600, burst=8, min_interval=0.05),
     "gitee.com": RatePlan(per_minute=300, burst=6, min_interval=0.05),
 }
@@ -19,3 +28,16 @@ DEFAULT = RatePlan(per_minute=120, burst=4, min_interval=0.05)
 
 MAX_BACKOFF = 60
 MAX_RETRIES = 5
+
+# ===== 自适应限速（AIMD）=====
+# 关闭后退回静态计划（仍会遵守 Retry-After / X-RateLimit-Reset 暂停）
+ADAPTIVE_RATE = os.environ.get("ADAPTIVE_RATE", "1") in ("1", "true", "True")
+# 已知 host 的速率上限 = 计划值 × 该倍数（hard_quota 的计划上限即计划值）；
+# 未知 host 的上限为 ADAPT_MAX_PER_MINUTE
+ADAPT_MAX_FACTOR = float(os.environ.get("ADAPT_MAX_FACTOR", "4"))
+ADAPT_MAX_PER_MINUTE = int(os.environ.get("ADAPT_MAX_PER_MINUTE", "1200"))
+ADAPT_MIN_PER_MINUTE = int(os.environ.get("ADAPT_MIN_PER_MINUTE", "6"))
+ADAPT_MAX_CONCURRENCY = int(os.environ.get("ADAPT_MAX_CONCURRENCY", "64"))
+# 加性增长步长（占初始速率的比例）与乘性减小系数
+ADAPT_INCREASE_RATIO = float(os.environ.get("ADAPT_INCREASE_RATIO", "0.1"))
+ADAPT_DECREASE = float(os.environ.get("ADAPT_DECREASE", "0.5"))
@@ -1,6 +1,33 @@
+import os
+
 # 近多少天（≈3个月=92天）
 DAYS_BACK = 3
 # 初始切片宽度（天），过大将自动二分
 SLICE_DAYS = 10
 # 每页条数（GitHub 搜索上限 100）
 PER_PAGE = 100
+# 并发执行的搜索请求数（实际速率仍受限速器 api.github.com/search 与令牌池约束）
+SEARCH_CONCURRENCY = max(1, int(os.environ.get("SEARCH_CONCURRENCY", "4")))
+
+# ===== 关键词规划（按历史产出排序/剔除/合并） =====
+KEYWORD_PLANNER = os.environ.get("KEYWORD_PLANNER", "1") in ("1", "true", "True")
+# 至少运行过这么多次才会因低产出被剔除
+KEYWORD_MIN_RUNS = int(os.environ.get("KEYWORD_MIN_RUNS", "3"))
+# 最近 KEYWORD_MIN_RUNS 次平均有效订阅数低于该值即视为低产出
+KEYWORD_DROP_BELOW = float(os.environ.get("KEYWORD_DROP_BELOW", "0.5"))
+# 被剔除的关键词每隔多少天重新试探一次
+KEYWORD_RETRY_DAYS = int(os.environ.get("KEYWORD_RETRY_DAYS", "7"))
+# 单个查询中用 OR 合并的单词关键词个数上限（GitHub 搜索最多 5 个逻辑运算符）
+KEYWORD_OR_MAX = max(1, min(6, int(os.environ.get("KEYWORD_OR_MAX", "5"))))
+
+# ===== 仓库优先级抓取 =====
+# 留给从未抓取过的新仓库的名额比例
+REPO_EXPLORE_RATIO = float(os.environ.get("REPO_EXPLORE_RATIO", "0.2"))
+# 新仓库的先验预期产出：预期产出低于它的已知仓库排在新仓库之后
+REPO_NEW_PRIOR = float(os.environ.get("REPO_NEW_PRIOR", "0.25"))
+# 搜索阶段多取的倍数，给优先级排序留出挑选空间
+REPO_SEARCH_OVERFETCH = max(1, int(os.environ.get("REPO_SEARCH_OVERFETCH", "3")))
+# 新鲜度半衰期（天）：仓库最近一次 push 距今越久，预期产出打折越多
+REPO_FRESH_HALFLIFE_DAYS = float(os.environ.get("REPO_FRESH_HALFLIFE_DAYS", "14"))
+# fork/镜像去重：根树 SHA 相同的仓库只抓取一个代表
+REPO_MIRROR_DEDUP = os.environ.get("REPO_MIRROR_DEDUP", "1") in ("1", "true", "True")
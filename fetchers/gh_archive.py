@@ -0,0 +1,98 @@
+"""大仓库的 tarball 模式：候选文件过多时整仓下载一次归档，在内存中流式解压，
+只取出命中 candidate_paths 的成员，代替逐个文件的 raw 请求。"""
+
+import os
+import tarfile
+from typing import Dict, Iterable
+
+from filters.extract import MAX_BYTES
+from utils.http_client import request
+
+# 候选文件数超过该值时改走 tarball（0 = 关闭）
+TARBALL_THRESHOLD = int(os.environ.get("TARBALL_THRESHOLD", "30"))
+# 归档传输总字节上限（压缩后），超出即中止，已解出的成员仍然可用
+TARBALL_MAX_BYTES = int(os.environ.get("TARBALL_MAX_BYTES", str(64 * 1024 * 1024)))
+TARBALL_TIMEOUT = int(os.environ.get("TARBALL_TIMEOUT", "120"))
+
+API = "https://api.github.com"
+
+
+class ArchiveTooLarge(Exception):
+    pass
+
+
+class _CappedReader:
+    """包装响应流，累计读取字节数超过上限时抛出 ArchiveTooLarge。"""
+
+    def __init__(self, raw, cap: int):
+        self.raw = raw
+        self.cap = cap
+        self.read_bytes = 0
+
+    def read(self, n=-1):
+        chunk = self.raw.read(n)
+        self.read_bytes += len(chunk)
+        if self.cap and self.read_bytes > self.cap:
+            raise ArchiveTooLarge(f"archive exceeds {self.cap} bytes")
+        return chunk
+
+
+def extract_members(
+    fileobj, wanted: Iterable[str], member_max: int = MAX_BYTES
+) -> Dict[str, str]:
+    """从 tar.gz 流中取出 wanted 路径的文本（路径不含归档顶层目录），单个成员截断到 member_max。"""
+    wanted = set(wanted)
+    out: Dict[str, str] = {}
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|gz") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                # GitHub 归档的顶层目录为 <owner>-<repo>-<sha>/
+                _, _, path = member.name.partition("/")
+                if path not in wanted:
+                    continue
+                f = tar.extractfile(member)
+                if f is None:
+                    continue
+                out[path] = f.read(member_max).decode("utf-8", "ignore")
+                if len(out) == len(wanted):
+                    break
+    except ArchiveTooLarge as e:
+        print(f"[tarball] 超出大小上限，已取得 {len(out)} 个文件: {e}")
+    except (tarfile.TarError, EOFError, OSError) as e:
+        # 流被截断等情况：保留已解出的成员
+        print(f"[tarball] 解压中断，已取得 {len(out)} 个文件: {e}")
+    return out
+
+
+def fetch_repo_archive(
+    full: str,
+    token,
+    wanted: Iterable[str],
+    max_bytes: int = TARBALL_MAX_BYTES,
+    base: str = API,
+) -> Dict[str, str]:
+    """下载仓库 HEAD 的 tarball 并返回 path -> 文本；失败时返回已取得的部分（可能为空）。"""
+    try:
+        r = request(
+            "GET",
+            f"{base}/repos/{full}/tarball",
+            token=token,
+            timeout=TARBALL_TIMEOUT,
+            stream=True,
+        )
+    except Exception as e:
+        print(f"[tarball] 下载失败 {full}: {e}")
+        return {}
+    try:
+        if not r.ok:
+            print(f"[tarball] {full} HTTP {r.status_code}")
+            return {}
+        r.raw.decode_content = False
+        return extract_members(_CappedReader(r.raw, max_bytes), wanted)
+    except Exception as e:
+        print(f"[tarball] 解压失败 {full}: {e}")
+        return {}
+    finally:
+        r.close()
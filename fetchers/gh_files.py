@@ -1,4 +1,4 @@
-from utils.http_client import request
+from utils.http_client import QuotaExhausted, request
 
 SKIP_REPO_SUBSTR = ("github.io",)
 KEEP_EXT = (".yaml", ".yml", ".txt", ".conf", ".ini", ".md")
@@ -22,18 +22,34 @@ SKIP_DIRS = (
 )
 
 
-def list_repo_tree(full: str, token: str):
+def fetch_repo_tree_info(full: str, token: str):
+    """返回 (tree, status, sha)；sha 为根树 SHA（用于识别 fork/镜像），取不到时为 None。"""
     if any(s in full.lower() for s in SKIP_REPO_SUBSTR):
-        return []
+        return [], 200, None
     url = f"https://api.github.com/repos/{full}/git/trees/HEAD"
     try:
         r = request("GET", url, params={"recursive": "1"}, token=token, timeout=45)
         if not r.ok:
-            return []
-        return r.json().get("tree", []) or []
+            return [], r.status_code, None
+        data = r.json() or {}
+        return data.get("tree", []) or [], r.status_code, data.get("sha")
+    except QuotaExhausted:
+        # 不是仓库本身的问题，交给调用方停止本轮抓取
+        raise
     except Exception:
         # 单仓异常直接跳过，防止整条任务中断
-        return []
+        return [], 0, None
+
+
+def fetch_repo_tree(full: str, token: str):
+    """返回 (tree, status)；status 为 HTTP 状态码，网络异常时为 0。"""
+    tree, status, _ = fetch_repo_tree_info(full, token)
+    return tree, status
+
+
+def list_repo_tree(full: str, token: str):
+    tree, _ = fetch_repo_tree(full, token)
+    return tree
 
 
 def candidate_paths(tree):
@@ -0,0 +1,219 @@
+"""GitHub GraphQL 批量抓取：一次查询取回一批仓库的默认分支、pushed_at、README、
+浅层文件树，第二次查询取回所有命中 candidate_paths 规则的小文件内容。
+
+REST 方式每个仓库要 1 次 README + 1 次 tree + N 次 raw 文件请求；这里一批 20–50 个仓库
+只需两次查询，且计入独立的 graphql 配额（由令牌池按 X-RateLimit-Resource 跟踪）。
+
+GraphQL 无法递归列树，文件树只展开到 GH_GRAPHQL_TREE_DEPTH 层；树中还有未展开的子目录时
+仓库信息带 tree_truncated，调用方据此回退 REST 递归树（fetch_repo_tree_info）。
+"""
+
+import json
+import os
+from typing import Any, Dict, List
+
+from fetchers.gh_files import SKIP_REPO_SUBSTR, candidate_paths
+from utils.http_client import request
+
+GH_GRAPHQL_ENABLE = os.environ.get("GH_GRAPHQL_ENABLE", "1") in ("1", "true", "True")
+GRAPHQL_URL = os.environ.get("GH_GRAPHQL_URL", "https://api.github.com/graphql")
+# 每次查询的仓库数（20–50）
+GH_GRAPHQL_BATCH = max(1, min(50, int(os.environ.get("GH_GRAPHQL_BATCH", "25"))))
+# 文件树展开层数（1 = 只取根目录）
+GH_GRAPHQL_TREE_DEPTH = max(1, int(os.environ.get("GH_GRAPHQL_TREE_DEPTH", "3")))
+# 仅内联抓取不超过该字节数的文件，更大的文件交由 raw 下载
+GH_GRAPHQL_BLOB_MAX = int(os.environ.get("GH_GRAPHQL_BLOB_MAX", str(256 * 1024)))
+# 每次 blob 查询的文件数
+GH_GRAPHQL_BLOBS_PER_QUERY = int(os.environ.get("GH_GRAPHQL_BLOBS_PER_QUERY", "60"))
+
+_README_NAMES = ("README.md", "readme.md", "README")
+
+
+def _entries_fragment(depth: int) -> str:
+    inner = "... on Blob { byteSize }"
+    if depth > 1:
+        inner += f" ... on Tree {{ {_entries_fragment(depth - 1)} }}"
+    return f"entries {{ name type object {{ {inner} }} }}"
+
+
+def build_repo_query(repos: List[str], depth: int = GH_GRAPHQL_TREE_DEPTH) -> str:
+    parts = []
+    for i, full in enumerate(repos):
+        owner, _, name = full.partition("/")
+        readme = " ".join(
+            f'readme{j}: object(expression: {json.dumps("HEAD:" + n)}) '
+            f"{{ ... on Blob {{ text isBinary }} }}"
+            for j, n in enumerate(_README_NAMES)
+        )
+        parts.append(
+            f"r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{ "
+            f"nameWithOwner pushedAt isFork parent {{ nameWithOwner }} "
+            f"defaultBranchRef {{ name }} {readme} "
+            f'tree: object(expression: "HEAD:") {{ ... on Tree {{ oid {_entries_fragment(depth)} }} }} }}'
+        )
+    return "query { rateLimit { cost remaining resetAt } " + " ".join(parts) + " }"
+
+
+def build_blob_query(items: List[tuple]) -> str:
+    """items: [(full, path), ...] -> 每个文件一个 repository 别名。"""
+    parts = []
+    for i, (full, path) in enumerate(items):
+        owner, _, name = full.partition("/")
+        parts.append(
+            f"b{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{ "
+            f"object(expression: {json.dumps('HEAD:' + path)}) "
+            f"{{ ... on Blob {{ text isBinary }} }} }}"
+        )
+    return "query { " + " ".join(parts) + " }"
+
+
+def _flatten_tree(entries, prefix: str = "") -> List[Dict[str, Any]]:
+    """把嵌套的 GraphQL 树转换为与 REST git/trees 相同的扁平结构。"""
+    out = []
+    for e in entries or []:
+        path = f"{prefix}{e.get('name', '')}"
+        obj = e.get("object") or {}
+        if e.get("type") == "blob":
+            out.append({"path": path, "type": "blob", "size": obj.get("byteSize")})
+        elif e.get("type") == "tree":
+            out.append({"path": path, "type": "tree"})
+            out.extend(_flatten_tree(obj.get("entries"), prefix=path + "/"))
+    return out
+
+
+def _tree_truncated(entries) -> bool:
+    """是否有子目录因达到展开层数而没有 entries（其下文件未列出）。"""
+    for e in entries or []:
+        if e.get("type") != "tree":
+            continue
+        obj = e.get("object") or {}
+        if "entries" not in obj or _tree_truncated(obj["entries"]):
+            return True
+    return False
+
+
+def _post(query: str, token, endpoint: str, timeout: int = 60) -> Dict[str, Any]:
+    r = request("POST", endpoint, json={"query": query}, token=token, timeout=timeout)
+    r.raise_for_status()
+    payload = r.json() or {}
+    # 部分仓库不存在时 data 仍然返回其余仓库，errors 只记录缺失项
+    return payload.get("data") or {}
+
+
+def _parse_repo(node) -> Dict[str, Any] | None:
+    if not node:
+        return None
+    readme = ""
+    for j in range(len(_README_NAMES)):
+        blob = node.get(f"readme{j}") or {}
+        if blob.get("text") and not blob.get("isBinary"):
+            readme = blob["text"]
+            break
+    tree_obj = node.get("tree") or {}
+    return {
+        "full_name": node.get("nameWithOwner"),
+        "default_branch": (node.get("defaultBranchRef") or {}).get("name"),
+        "pushed_at": node.get("pushedAt"),
+        "fork": bool(node.get("isFork")),
+        "parent": (node.get("parent") or {}).get("nameWithOwner"),
+        "tree_oid": tree_obj.get("oid"),
+        "mirror_of": None,
+        "readme": readme,
+        "tree": _flatten_tree(tree_obj.get("entries")),
+        "tree_truncated": _tree_truncated(tree_obj.get("entries")),
+        "blobs": {},
+    }
+
+
+def fetch_repos_batch(
+    repos: List[str],
+    token,
+    endpoint: str = GRAPHQL_URL,
+    depth: int = GH_GRAPHQL_TREE_DEPTH,
+    blob_max: int = GH_GRAPHQL_BLOB_MAX,
+    seen_trees: Dict[str, str] | None = None,
+) -> Dict[str, Dict[str, Any] | None]:
+    """返回 full_name -> 仓库信息；仓库不存在或无权限时值为 None。
+
+    仓库信息包含 default_branch、pushed_at、fork、parent、tree_oid、readme、
+    tree（扁平列表）、tree_truncated（树超出展开层数）与 blobs（path -> 文本，仅包含命中 candidate_paths 且不超过
+    blob_max 的文件）。整个查询失败时抛出异常，由调用方回退 REST。
+
+    seen_trees（根树 oid -> 代表仓库，跨批次共享）非空时，根树已有代表的仓库
+    标记 mirror_of 且不再取文件内容；同批内非 fork 仓库优先成为代表。
+    """
+    out: Dict[str, Dict[str, Any] | None] = {}
+    if not repos:
+        return out
+    data = _post(build_repo_query(repos, depth), token, endpoint)
+    for i, full in enumerate(repos):
+        out[full] = _parse_repo(data.get(f"r{i}"))
+    _fill_blobs(out, _plan_blobs(out, repos, blob_max, seen_trees), token, endpoint)
+    return out
+
+
+def _plan_blobs(out, repos, blob_max: int, seen_trees=None) -> List[tuple]:
+    """标记镜像仓库并列出要内联抓取的 (full, path)。"""
+    pending = []
+    # 稳定排序：非 fork 在前，各自保持原有优先级顺序
+    for full in sorted(repos, key=lambda f: bool((out[f] or {}).get("fork"))):
+        info = out[full]
+        if info is None:
+            continue
+        if seen_trees is not None and info["tree_oid"]:
+            rep = seen_trees.setdefault(info["tree_oid"], full)
+            if rep != full:
+                info["mirror_of"] = rep
+                continue
+        if any(x in full.lower() for x in SKIP_REPO_SUBSTR):
+            # 与 REST 路径一致：这类仓库只看 README，不扫文件树
+            info["tree"] = []
+            continue
+        sizes = {t["path"]: t.get("size") for t in info["tree"]}
+        for path in candidate_paths(info["tree"]):
+            size = sizes.get(path)
+            if size is not None and size <= blob_max:
+                pending.append((full, path))
+    return pending
+
+
+def _fill_blobs(out, pending: List[tuple], token, endpoint: str) -> None:
+    for start in range(0, len(pending), max(1, GH_GRAPHQL_BLOBS_PER_QUERY)):
+        chunk = pending[start : start + GH_GRAPHQL_BLOBS_PER_QUERY]
+        try:
+            bdata = _post(build_blob_query(chunk), token, endpoint)
+        except Exception as e:
+            # 文件内容取不到时调用方会逐个回退 raw 下载
+            print(f"[GraphQL] blob 批量查询失败: {e}")
+            continue
+        for i, (full, path) in enumerate(chunk):
+            obj = (bdata.get(f"b{i}") or {}).get("object") or {}
+            if obj.get("text") is not None and not obj.get("isBinary"):
+                out[full]["blobs"][path] = obj["text"]
+
+
+def iter_repo_batches(repos: List[str], token, batch: int = GH_GRAPHQL_BATCH, **kw):
+    """按批次产出 (该批仓库名列表, fetch_repos_batch 结果或 None)。"""
+    for start in range(0, len(repos), batch):
+        chunk = repos[start : start + batch]
+        try:
+            yield chunk, fetch_repos_batch(chunk, token, **kw)
+        except Exception as e:
+            print(f"[GraphQL] 批量查询失败，本批回退 REST: {e}")
+            yield chunk, None
+
+
+def iter_repo_info(
+    full_names: List[str], token, enabled: bool = GH_GRAPHQL_ENABLE, **kw
+):
+    """逐个产出 (full_name, 仓库信息或 None)；None 表示需要走 REST（未启用/查询失败/仓库缺失）。
+
+    其余关键字参数（如 seen_trees）透传给 fetch_repos_batch。
+    """
+    if not enabled:
+        for full in full_names:
+            yield full, None
+        return
+    for chunk, res in iter_repo_batches(full_names, token, **kw):
+        for full in chunk:
+            yield full, (res or {}).get(full)
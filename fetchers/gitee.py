@@ -1,6 +1,7 @@
 from utils.http_client import request
 
-BASE = "https://gitee.com/api/v5"
+WEB_BASE = "https://gitee.com"
+BASE = f"{WEB_BASE}/api/v5"
 
 
 def ge_search_repos(keyword: str, page: int = 1, per_page: int = 20, token: str = None):
@@ -33,3 +34,22 @@ def iter_search_repos(keywords, max_pages: int = 2, token: str = None):
             if len(items) < 20:
                 break
     return results
+
+
+def ge_fetch_tree(full: str, ref: str = "master", token: str = None):
+    """返回 (tree, status)；tree 与 GitHub git/trees 结构相同（path / type），网络异常时 status 为 0。"""
+    url = f"{BASE}/repos/{full}/git/trees/{ref}"
+    params = {"recursive": 1}
+    if token:
+        params["access_token"] = token
+    try:
+        resp = request("GET", url, params=params, timeout=30)
+        if not resp.ok:
+            return [], resp.status_code
+        return (resp.json() or {}).get("tree") or [], resp.status_code
+    except Exception:
+        return [], 0
+
+
+def raw_url(full: str, ref: str, path: str) -> str:
+    return f"{WEB_BASE}/{full}/raw/{ref}/{path}"
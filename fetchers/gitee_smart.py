@@ -1,12 +1,218 @@
-from typing import List
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
 
+from fetchers import gitee
+from fetchers.gh_files import candidate_paths
+from fetchers.gitee import ge_search_repos
 from fetchers.gitee import iter_search_repos as api_iter
 from fetchers.gitee_html import html_search_iter as html_iter
+from fetchers.gitee_html import html_search_once
+from fetchers.utils import extract_links
 from storage.secure import get_secret
+from utils.http_client import request
 
+# 并发发现模式：关键词 × 页并发请求（速率由 config.rate_limits 的 gitee.com 计划约束）
+GITEE_CONCURRENT = os.environ.get("GITEE_CONCURRENT", "1") in ("1", "true", "True")
+GITEE_CONCURRENCY = max(1, int(os.environ.get("GITEE_CONCURRENCY", "6")))
+# API 超过该秒数仍未返回（慢或被限流重试中）时，并行启动同一关键词的 HTML 抓取
+GITEE_HEDGE_DELAY = float(os.environ.get("GITEE_HEDGE_DELAY", "3"))
+# 是否拉取仓库文件树，按与 GitHub 相同的 candidate_paths 规则扫描文件
+GITEE_SCAN_TREE = os.environ.get("GITEE_SCAN_TREE", "1") in ("1", "true", "True")
+API_PER_PAGE = 20
 
-def gitee_search_smart(keywords: List[str], max_pages: int = 2) -> List[str]:
+
+def _repo_key(full: str) -> str:
+    return full.strip("/").lower()
+
+
+def _from_api(it: dict) -> dict | None:
+    full = it.get("full_name") or it.get("path_with_namespace")
+    if not full:
+        return None
+    return {
+        "full_name": full,
+        "html_url": it.get("html_url") or f"{gitee.WEB_BASE}/{full}",
+        "default_branch": it.get("default_branch"),
+        "source": "api",
+    }
+
+
+def _from_html(path: str) -> dict:
+    full = path.strip("/")
+    return {
+        "full_name": full,
+        "html_url": f"{gitee.WEB_BASE}/{full}",
+        "default_branch": None,
+        "source": "html",
+    }
+
+
+def _merge_repo(merged: Dict[str, Dict], item) -> None:
+    """按 owner/repo 合并；同一仓库 API 结果优先（带 default_branch）。"""
+    if not item:
+        return
+    key = _repo_key(item["full_name"])
+    old = merged.get(key)
+    if old is None:
+        merged[key] = item
+    elif old["source"] == "html" and item["source"] == "api":
+        merged[key] = {**item, "source": "both"}
+    elif old["source"] != item["source"]:
+        old["source"] = "both"
+
+
+class _HedgedSearch:
+    """API 搜索为主、HTML 搜索对冲：跟踪在途请求，按结果决定翻页或对冲。"""
+
+    def __init__(self, ex, token, max_pages: int, hedge_delay: float):
+        self.ex = ex
+        self.token = token
+        self.max_pages = max_pages
+        self.hedge_delay = hedge_delay
+        # future -> (kind, kw, page, started)
+        self.pending = {}
+        self.hedged = set()
+
+    def submit(self, kind: str, kw: str, page: int):
+        if kind == "api":
+            fut = self.ex.submit(ge_search_repos, kw, page, API_PER_PAGE, self.token)
+        else:
+            fut = self.ex.submit(html_search_once, kw, page)
+        self.pending[fut] = (kind, kw, page, time.monotonic())
+
+    def hedge(self, kw: str):
+        if kw not in self.hedged:
+            self.hedged.add(kw)
+            self.submit("html", kw, 1)
+
+    def hedge_slow(self):
+        """API 超过 hedge_delay 仍未返回的关键词启动 HTML 抓取。"""
+        now = time.monotonic()
+        for kind, kw, _, started in list(self.pending.values()):
+            if kind == "api" and now - started >= self.hedge_delay:
+                self.hedge(kw)
+
+    def handle(self, fut) -> List[Dict]:
+        """处理一个完成的请求，返回其中的仓库并按需提交后续请求。"""
+        kind, kw, page, _ = self.pending.pop(fut)
+        try:
+            items = fut.result() or []
+        except Exception as e:
+            print(f"[Gitee] {kind} 搜索失败 {kw} p{page}: {e}")
+            if kind == "api":
+                self.hedge(kw)
+            return []
+        if kind == "api":
+            return self._on_api(kw, page, items)
+        if items and page < self.max_pages:
+            self.submit("html", kw, page + 1)
+        return [_from_html(path) for path in items]
+
+    def _on_api(self, kw: str, page: int, items: list) -> List[Dict]:
+        if not items and page == 1:
+            self.hedge(kw)
+        if len(items) >= API_PER_PAGE and page < self.max_pages:
+            self.submit("api", kw, page + 1)
+        return [_from_api(it) for it in items]
+
+
+def discover_repos(
+    keywords: List[str],
+    max_pages: int = 2,
+    token: str = None,
+    concurrency: int = GITEE_CONCURRENCY,
+    hedge_delay: float = GITEE_HEDGE_DELAY,
+) -> List[Dict]:
+    """并发搜索 Gitee 仓库，返回按发现顺序去重后的仓库列表。
+
+    - 每个关键词先发 API 第 1 页，满页才继续翻页
+    - API 出错、首页为空或超过 hedge_delay 秒未返回时，同一关键词并行走 HTML 搜索
+    - 两路结果按 owner/repo 合并；同一仓库 API 结果优先（带 default_branch）
+    """
+    merged: Dict[str, Dict] = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+        search = _HedgedSearch(ex, token, max_pages, hedge_delay)
+        for kw in keywords:
+            search.submit("api", kw, 1)
+        while search.pending:
+            done, _ = wait(
+                search.pending,
+                timeout=max(0.05, hedge_delay / 4),
+                return_when=FIRST_COMPLETED,
+            )
+            for fut in done:
+                for item in search.handle(fut):
+                    _merge_repo(merged, item)
+            search.hedge_slow()
+    return list(merged.values())
+
+
+def _fetch_tree(repo: Dict, token: str = None):
+    """返回 (分支, 文件树)；各分支都取不到时返回 (None, [])。"""
+    refs = [repo["default_branch"]] if repo.get("default_branch") else []
+    # HTML 结果不带默认分支：依次尝试常见分支名
+    refs += [r for r in ("master", "main") if r not in refs]
+    for ref in refs:
+        tree, status = gitee.ge_fetch_tree(repo["full_name"], ref, token)
+        if status == 200:
+            return ref, tree
+    return None, []
+
+
+def _file_links(url: str, path: str) -> List[str]:
+    if path.lower().endswith((".yaml", ".yml", ".txt")):
+        # 订阅文件本身直接作为候选
+        return [url]
+    try:
+        r = request("GET", url, timeout=15)
+    except Exception:
+        return []
+    return extract_links(r.text) if r.status_code == 200 else []
+
+
+def _repo_files(repo: Dict, token: str = None) -> List[str]:
+    full = repo["full_name"]
+    ref, tree = _fetch_tree(repo, token)
+    links = []
+    for path in candidate_paths(tree):
+        links += _file_links(gitee.raw_url(full, ref, path), path)
+    return links
+
+
+def collect_repo_files(
+    repos: List[Dict], token: str = None, concurrency: int = GITEE_CONCURRENCY
+) -> List[str]:
+    """并发拉取每个仓库的文件树，返回命中 candidate_paths 的订阅文件及其中抽取的链接。"""
+    seen, out = set(), []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+        for links in ex.map(lambda r: _repo_files(r, token), repos):
+            for u in links:
+                if u not in seen:
+                    seen.add(u)
+                    out.append(u)
+    return out
+
+
+def gitee_collect_links(
+    keywords: List[str], max_pages: int = 2, scan_tree: bool = GITEE_SCAN_TREE
+) -> List[str]:
+    """并发发现仓库并（可选）扫描文件树；返回仓库链接与文件级候选链接。"""
+    tok = get_secret("sub-hunter", "GITEE_TOKEN")
+    repos = discover_repos(keywords, max_pages=max_pages, token=tok)
+    urls = [r["html_url"] for r in repos]
+    if scan_tree:
+        urls += collect_repo_files(repos, token=tok)
+    return urls
+
+
+def gitee_search_smart(
+    keywords: List[str], max_pages: int = 2, concurrent: bool = GITEE_CONCURRENT
+) -> List[str]:
     tok = get_secret("sub-hunter", "GITEE_TOKEN")
+    if concurrent:
+        return [r["html_url"] for r in discover_repos(keywords, max_pages, token=tok)]
     try:
         items = api_iter(keywords, max_pages=max_pages, token=tok)
     except Exception:
@@ -1,54 +1,33 @@
+import concurrent.futures
 import datetime as _dt
-from typing import Any, Dict, Iterable, List, Tuple
+import threading
+from typing import Any, Dict, List, Tuple
 
-from config.search_policy import DAYS_BACK, PER_PAGE, SLICE_DAYS
-from utils.http_client import request
+from config.search_policy import DAYS_BACK, PER_PAGE, SEARCH_CONCURRENCY, SLICE_DAYS
+from utils.http_client import QuotaExhausted, request
 
 BASE = "https://api.github.com"
+# GitHub 对单次搜索最多返回前 1000 条
+SEARCH_CAP = 1000
 
 
 def _date_str(d: _dt.date) -> str:
     return d.isoformat()
 
 
-def _preflight_repo_count(q: str, token: str) -> int:
-    # 轻量探测：per_page=1 拿 total_count
-    params = {"q": q, "per_page": 1}
+def _search_page(q: str, token, page: int) -> Dict[str, Any]:
+    params = {
+        "q": q,
+        "page": page,
+        "per_page": PER_PAGE,
+        "sort": "updated",
+        "order": "desc",
+    }
     r = request(
-        "GET", f"{BASE}/search/repositories", params=params, token=token, timeout=45
+        "GET", f"{BASE}/search/repositories", params=params, token=token, timeout=60
     )
     r.raise_for_status()
-    return int(r.json().get("total_count", 0))
-
-
-def _page_all_repos(q: str, token: str) -> Iterable[Dict[str, Any]]:
-    page = 1
-    fetched = 0
-    while True:
-        params = {
-            "q": q,
-            "page": page,
-            "per_page": PER_PAGE,
-            "sort": "updated",
-            "order": "desc",
-        }
-        r = request(
-            "GET", f"{BASE}/search/repositories", params=params, token=token, timeout=60
-        )
-        r.raise_for_status()
-        data = r.json()
-        items = data.get("items", []) or []
-        if not items:
-            break
-        for it in items:
-            yield it
-        fetched += len(items)
-        # GitHub 对单次搜索最多返回前 1000 条
-        if fetched >= 1000:
-            break
-        if len(items) < PER_PAGE:
-            break
-        page += 1
+    return r.json()
 
 
 def _split_range(
@@ -58,48 +37,97 @@ def _split_range(
     return (s, mid - _dt.timedelta(days=1)), (mid, e)
 
 
-def _search_window(
-    keyword: str, start: _dt.date, end: _dt.date, token: str
-) -> Iterable[Dict[str, Any]]:
-    """
-    对 [start, end] 作仓库搜索；若命中>=1000，递归二分时间区间。
+def plan_windows(keywords: List[str], today: _dt.date = None) -> List[tuple]:
+    """预先展开全部 (关键词, 起, 止) 窗口：近 DAYS_BACK 天按 SLICE_DAYS 切片。"""
+    today = today or _dt.date.today()
+    since = today - _dt.timedelta(days=DAYS_BACK)
+    tasks = []
+    for kw in keywords:
+        s = since
+        while s <= today:
+            e = min(s + _dt.timedelta(days=SLICE_DAYS - 1), today)
+            tasks.append(("window", kw, s, e))
+            s = e + _dt.timedelta(days=1)
+    return tasks
+
+
+def _run_task(task: tuple, token, stop: threading.Event):
+    """执行一个搜索任务，返回 (关键词, 本页仓库, 后续任务)。
+
+    - window：取第 1 页，用其 total_count 代替单独的预检请求；命中 >=1000 时二分窗口，
+      否则把剩余页作为独立任务并发抓取
+    - page：取指定页
     """
-    q = f"{keyword} pushed:{_date_str(start)}..{_date_str(end)}"
-    total = _preflight_repo_count(q, token)
-    if total >= 1000 and (end - start).days >= 1:
-        a, b = _split_range(start, end)
-        yield from _search_window(keyword, a[0], a[1], token)
-        yield from _search_window(keyword, b[0], b[1], token)
-    else:
-        yield from _page_all_repos(q, token)
+    if stop.is_set():
+        return task[1], [], []
+    if task[0] == "page":
+        _, kw, q, page = task
+        return kw, _search_page(q, token, page).get("items", []) or [], []
+    _, kw, s, e = task
+    q = f"{kw} pushed:{_date_str(s)}..{_date_str(e)}"
+    data = _search_page(q, token, 1)
+    items = data.get("items", []) or []
+    total = int(data.get("total_count", 0))
+    if total >= SEARCH_CAP and (e - s).days >= 1:
+        a, b = _split_range(s, e)
+        # 第 1 页的结果照常保留，子窗口中的重复项由调用方去重
+        return kw, items, [("window", kw, a[0], a[1]), ("window", kw, b[0], b[1])]
+    if len(items) < PER_PAGE:
+        return kw, items, []
+    pages = -(-min(total, SEARCH_CAP) // PER_PAGE)
+    return kw, items, [("page", kw, q, p) for p in range(2, pages + 1)]
 
 
 def search_recent_repos(
-    keywords: List[str], token: str, limit: int | None = None
+    keywords: List[str],
+    token,
+    limit: int | None = None,
+    concurrency: int = SEARCH_CONCURRENCY,
+    provenance: Dict[str, List[str]] | None = None,
 ) -> List[Dict[str, Any]]:
     """
-    近 DAYS_BACK 天内，按 SLICE_DAYS 切片；对每个关键词覆盖所有结果（无页数上限），自动避开1000限制
+    近 DAYS_BACK 天内，按 SLICE_DAYS 切片；对每个关键词覆盖所有结果（无页数上限），自动避开1000限制。
+    所有 (关键词, 窗口) 一次性展开后并发执行，结果边到边去重，达到 limit 立即停止。
+    传入 provenance 时填充 full_name -> 命中该仓库的关键词列表。
     """
-    today = _dt.date.today()
-    since = today - _dt.timedelta(days=DAYS_BACK)
-    out: Dict[str, Dict[str, Any]] = {}  # full_name -> repo
-
     if limit is not None and limit <= 0:
         limit = None
-    for kw in keywords:
-        # 滚动窗口（大窗口可能仍会被递归二分）
-        s = since
-        while s <= today:
-            e = min(s + _dt.timedelta(days=SLICE_DAYS - 1), today)
-            for it in _search_window(kw, s, e, token):
-                name = it.get("full_name")
-                if name and name not in out:
-                    out[name] = it
-                    if limit and len(out) >= limit:
-                        return list(out.values())
-            if limit and len(out) >= limit:
+    out: Dict[str, Dict[str, Any]] = {}  # full_name -> repo
+    stop = threading.Event()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as ex:
+        pending = {ex.submit(_run_task, t, token, stop) for t in plan_windows(keywords)}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for fut in done:
+                if stop.is_set():
+                    break
+                try:
+                    kw, items, follow = fut.result()
+                except QuotaExhausted as e:
+                    # 配额要到运行时限之后才恢复：停止搜索，用已拿到的结果继续
+                    print(f"[搜索] {e}，停止搜索")
+                    stop.set()
+                    break
+                except Exception as e:
+                    print(f"[搜索] 任务失败: {e}")
+                    continue
+                for it in items:
+                    name = it.get("full_name")
+                    if name and provenance is not None:
+                        hits = provenance.setdefault(name, [])
+                        if kw not in hits:
+                            hits.append(kw)
+                    if name and name not in out:
+                        out[name] = it
+                        if limit and len(out) >= limit:
+                            stop.set()
+                            break
+                if not stop.is_set():
+                    pending |= {ex.submit(_run_task, t, token, stop) for t in follow}
+            if stop.is_set():
+                for fut in pending:
+                    fut.cancel()
                 break
-            s = e + _dt.timedelta(days=1)
-        if limit and len(out) >= limit:
-            break
     return list(out.values())
@@ -1,42 +1,177 @@
-import requests
+"""GitLab 项目抓取：经由共享 HTTP 客户端（限速 / 重试 / 令牌），asyncio 有界并发。
 
-from .utils import extract_links, http_get
+- 项目搜索使用 keyset 分页（跟随 Link: rel="next"），不再只取第一页
+- README 按项目的 default_branch 只取一次
+- 可选扫描文件树，按与 GitHub 相同的 candidate_paths 规则挑选订阅文件
+"""
 
-# 公共 GitLab
-SEARCH = "https://gitlab.com/api/v4/projects"
+import asyncio
+import os
+from typing import Dict, List
 
+from fetchers.gh_files import candidate_paths
+from utils.http_client import request
 
-def search_repos(keyword: str, n: int):
-    r = requests.get(
-        SEARCH, params={"search": keyword, "simple": "true", "per_page": n}, timeout=20
-    )
-    r.raise_for_status()
-    return r.json()
+from .utils import extract_links
 
+# 公共 GitLab；自建实例可通过 GITLAB_BASE 指定
+GITLAB_BASE = os.environ.get("GITLAB_BASE", "https://gitlab.com").rstrip("/")
+GITLAB_TOKEN = os.environ.get("GITLAB_TOKEN", "")
+GITLAB_CONCURRENCY = max(1, int(os.environ.get("GITLAB_CONCURRENCY", "8")))
+# 是否扫描文件树（每个项目额外 1+ 次 tree 请求与若干次文件请求）
+GITLAB_SCAN_TREE = os.environ.get("GITLAB_SCAN_TREE", "0") in ("1", "true", "True")
+# 文件树最多翻页数（每页 100 项）
+GITLAB_TREE_MAX_PAGES = int(os.environ.get("GITLAB_TREE_MAX_PAGES", "5"))
+PER_PAGE_MAX = 100
 
-def fetch_readme_links(path_with_ns: str):
-    # 尝试 main/master
-    for branch in ("main", "master"):
-        raw = f"https://gitlab.com/{path_with_ns}/-/raw/{branch}/README.md"
-        try:
-            t = http_get(raw, timeout=15)
-            if t.status_code == 200:
-                return extract_links(t.text)
-        except Exception:
-            pass
-    return []
 
+def _api(base: str) -> str:
+    return f"{base.rstrip('/')}/api/v4"
 
-def collect_links(keywords: list[str], per_key: int):
-    results = set()
-    for kw in keywords:
+
+def raw_url(path_with_ns: str, branch: str, path: str, base: str = GITLAB_BASE):
+    return f"{base.rstrip('/')}/{path_with_ns}/-/raw/{branch}/{path}"
+
+
+async def _get(sem: asyncio.Semaphore, url: str, params=None, token=None, timeout=20):
+    # 共享客户端是同步的：放到线程里执行，由信号量限制并发
+    async with sem:
+        return await asyncio.to_thread(
+            request, "GET", url, params=params, token=token or None, timeout=timeout
+        )
+
+
+async def _paginate(
+    sem, url: str, params: dict, token, limit: int = None, max_pages=None
+):
+    """按 Link: rel="next" 逐页取回 JSON 列表，直到取够 limit 条或没有下一页。"""
+    out: List[dict] = []
+    pages = 0
+    while url:
+        r = await _get(sem, url, params=params, token=token)
+        r.raise_for_status()
+        out.extend(r.json() or [])
+        pages += 1
+        if limit and len(out) >= limit:
+            return out[:limit]
+        if max_pages and pages >= max_pages:
+            break
+        # next 链接已带全部查询参数
+        url, params = (r.links.get("next") or {}).get("url"), None
+    return out
+
+
+async def search_projects(
+    sem, keyword: str, n: int, token=None, base: str = GITLAB_BASE
+) -> List[dict]:
+    params = {
+        "search": keyword,
+        "simple": "true",
+        "pagination": "keyset",
+        "order_by": "id",
+        "sort": "desc",
+        "per_page": min(PER_PAGE_MAX, max(1, n)),
+    }
+    return await _paginate(sem, f"{_api(base)}/projects", params, token, limit=n)
+
+
+async def fetch_readme(sem, project: dict, token=None, base: str = GITLAB_BASE) -> str:
+    branch = project.get("default_branch")
+    if not branch:
+        # 空仓库没有默认分支
+        return ""
+    url = f"{_api(base)}/projects/{project['id']}/repository/files/README.md/raw"
+    try:
+        r = await _get(sem, url, params={"ref": branch}, token=token, timeout=15)
+    except Exception:
+        return ""
+    return r.text if r.status_code == 200 else ""
+
+
+async def fetch_tree(
+    sem,
+    project: dict,
+    token=None,
+    base: str = GITLAB_BASE,
+    max_pages: int = GITLAB_TREE_MAX_PAGES,
+) -> List[dict]:
+    """返回与 GitHub git/trees 相同结构的扁平列表（path / type）。"""
+    branch = project.get("default_branch")
+    if not branch:
+        return []
+    params = {
+        "ref": branch,
+        "recursive": "true",
+        "pagination": "keyset",
+        "per_page": PER_PAGE_MAX,
+    }
+    url = f"{_api(base)}/projects/{project['id']}/repository/tree"
+    try:
+        return await _paginate(sem, url, params, token, max_pages=max_pages)
+    except Exception:
+        return []
+
+
+async def _project_links(sem, project: dict, token, scan_tree: bool, base: str):
+    links = set(extract_links(await fetch_readme(sem, project, token, base)))
+    if not scan_tree:
+        return links
+    ns, branch = project["path_with_namespace"], project["default_branch"]
+    tree = await fetch_tree(sem, project, token, base)
+
+    async def one(path: str):
+        u = raw_url(ns, branch, path, base)
+        lp = path.lower()
+        if lp.endswith((".yaml", ".yml", ".txt")):
+            # 与 GitHub 路径一致：订阅文件本身直接作为候选
+            return [u]
         try:
-            for proj in search_repos(kw, per_key):
-                path = proj.get("path_with_namespace")
-                if not path:
-                    continue
-                for u in fetch_readme_links(path):
-                    results.add(u)
+            r = await _get(sem, u, token=token, timeout=15)
         except Exception:
+            return []
+        return extract_links(r.text) if r.status_code == 200 else []
+
+    for got in await asyncio.gather(*[one(p) for p in candidate_paths(tree)]):
+        links.update(got)
+    return links
+
+
+async def collect_links_async(
+    keywords: List[str],
+    per_key: int,
+    token: str = None,
+    scan_tree: bool = GITLAB_SCAN_TREE,
+    base: str = GITLAB_BASE,
+    concurrency: int = GITLAB_CONCURRENCY,
+) -> List[str]:
+    token = token if token is not None else GITLAB_TOKEN
+    sem = asyncio.Semaphore(max(1, concurrency))
+    searches = await asyncio.gather(
+        *[search_projects(sem, kw, per_key, token, base) for kw in keywords],
+        return_exceptions=True,
+    )
+    projects: Dict[int, dict] = {}
+    for kw, res in zip(keywords, searches):
+        if isinstance(res, Exception):
+            print(f"[GitLab] 搜索失败 {kw}: {res}")
             continue
+        for proj in res:
+            if proj.get("id") is not None and proj.get("path_with_namespace"):
+                projects.setdefault(proj["id"], proj)
+    per_project = await asyncio.gather(
+        *[
+            _project_links(sem, p, token, scan_tree, base)
+            for p in projects.values()
+            if p.get("default_branch")
+        ],
+        return_exceptions=True,
+    )
+    results = set()
+    for res in per_project:
+        if not isinstance(res, Exception):
+            results.update(res)
     return list(results)
+
+
+def collect_links(keywords: list[str], per_key: int, **kw):
+    return asyncio.run(collect_links_async(keywords, per_key, **kw))
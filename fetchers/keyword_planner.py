@@ -0,0 +1,98 @@
+"""按历史产出规划搜索关键词：排序、剔除低产出/被覆盖的关键词，并把单词关键词用 OR 合并。"""
+
+import time
+from typing import Dict, List, Tuple
+
+from config.search_policy import (
+    KEYWORD_DROP_BELOW,
+    KEYWORD_MIN_RUNS,
+    KEYWORD_OR_MAX,
+    KEYWORD_RETRY_DAYS,
+)
+
+
+def _tokens(kw: str) -> frozenset:
+    return frozenset(kw.lower().split())
+
+
+def _is_single_token(kw: str) -> bool:
+    # 含限定符或引号的关键词不参与 OR 合并
+    return len(kw.split()) == 1 and not any(c in kw for c in ':"()')
+
+
+def plan_queries(
+    keywords: List[str],
+    stats,
+    min_runs: int = KEYWORD_MIN_RUNS,
+    drop_below: float = KEYWORD_DROP_BELOW,
+    retry_days: int = KEYWORD_RETRY_DAYS,
+    or_max: int = KEYWORD_OR_MAX,
+    now: int = None,
+) -> Tuple[List[Tuple[str, List[str]]], List[str]]:
+    """返回 ([(查询串, 覆盖的关键词), ...] 按预期产出降序, 被剔除的关键词)。
+
+    - 历史不足 min_runs 次的关键词按最高产出对待（优先探索）
+    - 最近 min_runs 次平均有效订阅数 < drop_below 的关键词剔除，但每 retry_days 天重新试探一次
+    - 词集合是另一保留关键词的真超集的关键词被覆盖（其结果是后者的子集），直接剔除
+    - 单词关键词按顺序每 or_max 个合并为一个 "a OR b" 查询
+    """
+    now = int(now or time.time())
+    keywords = list(dict.fromkeys(k.strip() for k in keywords if k and k.strip()))
+    scores: Dict[str, float] = {}
+    unknown = []
+    dropped = []
+    for kw in keywords:
+        if stats.run_count(kw) < min_runs:
+            unknown.append(kw)
+            continue
+        y = stats.recent_yield(kw, min_runs) or 0.0
+        if y < drop_below and now - stats.last_run(kw) < retry_days * 86400:
+            dropped.append(kw)
+            continue
+        scores[kw] = stats.recent_yield(kw) or 0.0
+    top = max(scores.values(), default=0.0)
+    for kw in unknown:
+        scores[kw] = top
+
+    kept = [k for k in keywords if k in scores]
+    token_sets = {k: _tokens(k) for k in kept}
+    covered = [
+        k for k in kept if any(token_sets[o] < token_sets[k] for o in kept if o != k)
+    ]
+    dropped += covered
+    kept = [k for k in kept if k not in covered]
+    # 稳定排序：产出高的在前，同分保持原始顺序
+    kept.sort(key=lambda k: -scores[k])
+
+    queries: List[Tuple[str, List[str]]] = []
+    singles = [k for k in kept if _is_single_token(k)]
+    group_of = {}
+    for i in range(0, len(singles), or_max):
+        grp = singles[i : i + or_max]
+        for k in grp:
+            group_of[k] = grp
+    emitted = set()
+    for k in kept:
+        grp = group_of.get(k)
+        if grp is None:
+            queries.append((k, [k]))
+        elif grp[0] not in emitted:
+            emitted.add(grp[0])
+            queries.append((" OR ".join(grp), list(grp)))
+    return queries, dropped
+
+
+def attribute_keywords(repo: dict, members: List[str]) -> List[str]:
+    """把 OR 合并查询命中的仓库归属到具体关键词：按名称/描述/topics 中出现的词判断，
+    都不出现时归属到全部成员。"""
+    if len(members) <= 1:
+        return list(members)
+    hay = " ".join(
+        [
+            repo.get("full_name") or "",
+            repo.get("description") or "",
+            " ".join(repo.get("topics") or []),
+        ]
+    ).lower()
+    hit = [m for m in members if m.lower() in hay]
+    return hit or list(members)
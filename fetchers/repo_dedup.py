@@ -0,0 +1,49 @@
+"""Fork / 镜像仓库去重：同一棵根树（tree SHA 相同）只抓取一个代表仓库，其余记为镜像。
+
+代表仓库之外的 owner 仍保留在 mirrors 中，供归属统计与报告使用。
+"""
+
+from typing import Dict, List
+
+from storage.repo_stats import parse_iso_ts
+
+
+def is_unmodified_fork(repo: dict) -> bool:
+    """fork 之后从未 push 过（pushed_at 不晚于 created_at）的仓库。"""
+    if not repo.get("fork"):
+        return False
+    created = parse_iso_ts(repo.get("created_at"))
+    pushed = parse_iso_ts(repo.get("pushed_at"))
+    return bool(created and pushed and pushed <= created)
+
+
+class TreeDeduper:
+    def __init__(self):
+        # 根树 SHA -> 代表仓库
+        self.by_tree: Dict[str, str] = {}
+        # 代表仓库 -> 被折叠的镜像仓库
+        self.mirrors: Dict[str, List[str]] = {}
+
+    def claim(self, full: str, tree_sha: str | None) -> str | None:
+        """登记仓库的根树；已有代表时记为镜像并返回代表仓库名，否则返回 None（需要抓取）。"""
+        if not tree_sha:
+            return None
+        rep = self.by_tree.setdefault(tree_sha, full)
+        if rep == full:
+            return None
+        self.add_mirror(rep, full)
+        return rep
+
+    def add_mirror(self, rep: str, full: str):
+        lst = self.mirrors.setdefault(rep, [])
+        if full != rep and full not in lst:
+            lst.append(full)
+
+    def mirrors_of(self, rep: str) -> List[str]:
+        return list(self.mirrors.get(rep, []))
+
+    def stats(self) -> dict:
+        return {
+            "trees": len(self.by_tree),
+            "mirrors": sum(len(v) for v in self.mirrors.values()),
+        }
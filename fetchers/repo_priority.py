@@ -0,0 +1,104 @@
+"""按预期产出给待抓取仓库排序：已知仓库按历史产出 × 新鲜度 × 成功率打分入堆，
+新仓库保留一小部分探索名额，按搜索顺序（最近更新优先）进入；预期产出低于新仓库
+先验（REPO_NEW_PRIOR）的已知仓库排在所有新仓库之后。"""
+
+import heapq
+import math
+import time
+from typing import Dict, List
+
+from config.search_policy import (
+    REPO_EXPLORE_RATIO,
+    REPO_FRESH_HALFLIFE_DAYS,
+    REPO_NEW_PRIOR,
+)
+from storage.repo_stats import parse_iso_ts
+
+
+def expected_yield(
+    ent: dict,
+    pushed_at=None,
+    now: int = None,
+    halflife_days: float = REPO_FRESH_HALFLIFE_DAYS,
+) -> float:
+    """预期产出 = 有效订阅数滑动平均 × 新鲜度 × (1 - 失败率)。
+
+    新鲜度按最近 push 时间指数衰减，但保留一半底分：不常更新的仓库也可能长期可用。
+    """
+    now = now or int(time.time())
+    crawls = max(1, int(ent.get("crawls", 0)))
+    fail_rate = min(1.0, int(ent.get("fails", 0)) / crawls)
+    pushed = parse_iso_ts(pushed_at) or int(ent.get("pushed_at") or 0)
+    if pushed and halflife_days > 0:
+        age_days = max(0.0, (now - pushed) / 86400)
+        fresh = math.pow(0.5, age_days / halflife_days)
+    else:
+        fresh = 0.0
+    return float(ent.get("ewma", 0.0)) * (0.5 + 0.5 * fresh) * (1.0 - fail_rate)
+
+
+def prioritize_repos(
+    repos: List[Dict],
+    stats,
+    budget: int | None = None,
+    explore_ratio: float = REPO_EXPLORE_RATIO,
+    include_known: bool = True,
+    now: int = None,
+    prior: float = REPO_NEW_PRIOR,
+) -> List[Dict]:
+    """返回按抓取优先级排列的仓库列表（最多 budget 个，None 表示不截断）。
+
+    - 新仓库（无历史）占至多 ceil(budget × explore_ratio) 个名额，其余名额按预期产出分配
+    - 新仓库按先验 prior 计分：预期产出低于 prior 的已知仓库只在新仓库用完后才补位
+    - 任一侧不足时由另一侧补齐
+    - include_known=True 时，本次搜索未命中但历史上产出过订阅的仓库也加入候选
+    """
+    now = now or int(time.time())
+    by_name: Dict[str, Dict] = {}
+    for r in repos:
+        name = r.get("full_name")
+        if name and name not in by_name:
+            by_name[name] = r
+    if include_known:
+        for name, ent in stats.entries.items():
+            if name not in by_name and ent.get("valid_total"):
+                by_name[name] = {"full_name": name}
+
+    fresh_repos: List[Dict] = []
+    heap = []
+    for seq, (name, repo) in enumerate(by_name.items()):
+        ent = stats.get(name)
+        if ent is None:
+            fresh_repos.append(repo)
+            continue
+        score = expected_yield(ent, repo.get("pushed_at"), now)
+        heapq.heappush(heap, (-score, seq, name))
+    known, below = [], []
+    while heap:
+        neg, _, name = heapq.heappop(heap)
+        (known if -neg >= prior else below).append(by_name[name])
+
+    if budget is None or budget <= 0:
+        budget = len(known) + len(below) + len(fresh_repos)
+    n_explore = min(len(fresh_repos), math.ceil(budget * max(0.0, explore_ratio)))
+    n_known = min(len(known), budget - n_explore)
+    # 已知仓库不够时把剩余名额还给新仓库，新仓库也不够时才轮到低产出的已知仓库
+    n_explore = min(len(fresh_repos), budget - n_known)
+    n_below = min(len(below), budget - n_known - n_explore)
+
+    out = known[:n_known]
+    explore = fresh_repos[:n_explore]
+    tail = below[:n_below]
+    # 探索名额穿插在已知仓库之间，避免时间预算耗尽时新仓库全被挤到末尾
+    if explore and out:
+        step = max(1, len(out) // len(explore))
+        merged = []
+        ei = 0
+        for i, r in enumerate(out):
+            merged.append(r)
+            if (i + 1) % step == 0 and ei < len(explore):
+                merged.append(explore[ei])
+                ei += 1
+        merged.extend(explore[ei:])
+        return merged + tail
+    return out + explore + tail
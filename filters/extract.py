@@ -1,6 +1,8 @@
+import os
 import re
 
 from utils.http_client import request
+from utils.run_report import get_run_report
 
 _HEAD_TRIM = "([\"'`《〈「『【（“”"
 _TAIL_TRIM = ")>\"'`，。、；：！？》〉」』】）“”"
@@ -40,6 +42,50 @@ FETCH_TIMEOUT = 10  # 单文件最大10s
 MAX_BYTES = 256 * 1024  # 最多读取256KB，防止大文件卡住
 
 
+# 抓取阶段已拿到内容的订阅文件（GraphQL blob / tarball 成员），供内容校验阶段直接复用
+PREFETCH_MAX_BYTES = int(os.environ.get("PREFETCH_MAX_BYTES", str(64 * 1024 * 1024)))
+_prefetched: dict = {}
+_prefetched_bytes = 0
+_prefetch_full_warned = False
+
+
+def clear_prefetched() -> None:
+    """丢弃暂存的文本；每次运行开始时调用，避免 daemon 下复用上一轮的旧内容。"""
+    global _prefetched_bytes, _prefetch_full_warned
+    _prefetched.clear()
+    _prefetched_bytes = 0
+    _prefetch_full_warned = False
+
+
+def remember_text(url: str, text: str) -> bool:
+    """暂存已抓到的文本，总量超过 PREFETCH_MAX_BYTES 后不再接收。"""
+    global _prefetched_bytes, _prefetch_full_warned
+    if not url or text is None or url in _prefetched:
+        return False
+    size = len(text)
+    if _prefetched_bytes + size > PREFETCH_MAX_BYTES:
+        if not _prefetch_full_warned:
+            _prefetch_full_warned = True
+            print(
+                f"[预取] 暂存已满 PREFETCH_MAX_BYTES={PREFETCH_MAX_BYTES}，"
+                f"其余文件在校验阶段重新下载"
+            )
+        return False
+    _prefetched[url] = text
+    _prefetched_bytes += size
+    return True
+
+
+def take_text(url: str):
+    """取出（并释放）暂存的文本，没有时返回 None。"""
+    global _prefetched_bytes
+    text = _prefetched.pop(url, None)
+    get_run_report().cache("prefetch", text is not None)
+    if text is not None:
+        _prefetched_bytes -= len(text)
+    return text
+
+
 def fetch_text(url: str, timeout: int = FETCH_TIMEOUT) -> str:
     r = request("GET", url, timeout=timeout)
     r.raise_for_status()
@@ -0,0 +1,112 @@
+import os
+
+from storage.meta_cache import get_meta_cache
+
+# 裁剪阶段 Last-Modified 采样控制（环境变量覆盖）
+PRUNE_LASTMOD_ENABLE = os.environ.get("PRUNE_LASTMOD_ENABLE", "1") in (
+    "1",
+    "true",
+    "True",
+)
+# 每个大发布者采样其列表头部的前 N 条
+PRUNE_LASTMOD_SAMPLE = int(os.environ.get("PRUNE_LASTMOD_SAMPLE", "10"))
+# 全部发布者共用一次采样的总并发与单 host 并发
+PRUNE_LASTMOD_CONCURRENCY = int(os.environ.get("PRUNE_LASTMOD_CONCURRENCY", "16"))
+PRUNE_LASTMOD_HOST_CONCURRENCY = int(
+    os.environ.get("PRUNE_LASTMOD_HOST_CONCURRENCY", "4")
+)
+PRUNE_LASTMOD_TIMEOUT = int(os.environ.get("PRUNE_LASTMOD_TIMEOUT", "6"))
+# 发布者条目数超过该值才做 lastmod 采样，否则按原始顺序保留前 limit 条
+OWNER_LASTMOD_TRIGGER = int(os.environ.get("OWNER_LASTMOD_TRIGGER", "20"))
+
+
+def group_by_owner(urls, resolve_owner, meta_cache) -> dict:
+    """按发布者分组并保持首次出现顺序：owner -> [(url, 原始下标), ...]"""
+    owners = {}
+    for idx, u in enumerate(urls):
+        owner = None
+        meta = meta_cache.get(u)
+        if meta and meta.owner_key:
+            owner = meta.owner_key
+        if not owner:
+            try:
+                owner = resolve_owner(u)
+            except Exception:
+                owner = "__no_owner__"
+        owners.setdefault(owner or "__no_owner__", []).append((u, idx))
+    return owners
+
+
+def prune_by_owner(
+    urls,
+    limit: int,
+    resolve_owner,
+    meta_cache=None,
+    resource_keys: dict = None,
+    sample_enabled: bool = PRUNE_LASTMOD_ENABLE,
+    sample_size: int = PRUNE_LASTMOD_SAMPLE,
+    trigger: int = OWNER_LASTMOD_TRIGGER,
+):
+    """对合并后的待检测列表做发布者级裁剪，每个发布者最多保留 limit 条。
+
+    三个阶段，避免旧实现里每个发布者各建一次线程池/会话并各写一次 history：
+    1) 分组后一次性收集所有大发布者中缺失或过期的 lastmod 采样目标
+    2) 用一次有界并发的批量刷新完成全部采样（遵循按 host 的速率计划）
+    3) 在内存中按 lastmod 做每个发布者的 top-N 选择，最后只持久化一次缓存
+
+    返回 (保留列表, 跳过条数)。
+    """
+    if meta_cache is None:
+        meta_cache = get_meta_cache()
+    if resource_keys:
+        meta_cache.import_resource_keys(resource_keys)
+
+    owners = group_by_owner(urls, resolve_owner, meta_cache)
+
+    # 1) 收集
+    sampled_owners = set()
+    to_sample = []
+    if sample_enabled and limit > 0:
+        for owner, items in owners.items():
+            if len(items) > limit and len(items) > trigger:
+                sampled_owners.add(owner)
+                to_sample.extend(u for u, _ in items[:sample_size])
+        to_sample = meta_cache.stale(dict.fromkeys(to_sample))
+
+    # 2) 一次批量采样
+    if to_sample:
+        print(
+            f"[裁剪采样] {len(sampled_owners)} 个发布者共 {len(to_sample)} 条需刷新 lastmod"
+        )
+        try:
+            meta_cache.refresh(
+                to_sample,
+                concurrency=PRUNE_LASTMOD_CONCURRENCY,
+                timeout=PRUNE_LASTMOD_TIMEOUT,
+                host_concurrency=PRUNE_LASTMOD_HOST_CONCURRENCY,
+            )
+        except Exception as e:
+            print(f"[LastMod采样异常] {e}")
+
+    # 3) 内存中选择
+    out = []
+    skipped = 0
+    for owner, items in owners.items():
+        if len(items) <= limit:
+            out.extend(u for u, _ in items)
+            continue
+        if owner in sampled_owners:
+            # sort by lastmod desc, then original index
+            enriched = sorted(items, key=lambda t: (-meta_cache.lastmod(t[0]), t[1]))
+            chosen = [u for u, _ in enriched[:limit]]
+        else:
+            # Preserve the first `limit` items in original order to avoid accidental data loss.
+            chosen = [u for u, _ in items[:limit]]
+        out.extend(chosen)
+        skipped += len(items) - len(chosen)
+
+    try:
+        meta_cache.save()
+    except Exception as e:
+        print(f"[保存 LastMod 缓存失败] {e}")
+    return out, skipped
@@ -16,7 +16,7 @@ from config import (
     get_gist_token,
     get_github_token,
 )
-from fetchers.gitee import collect_links as ge_collect
+from fetchers.gitee_smart import gitee_collect_links as ge_collect
 from fetchers.github import collect_links as gh_collect
 from fetchers.gitlab import collect_links as gl_collect
 from fetchers.utils import http_get
@@ -32,8 +32,8 @@ def fetch_all_candidates():
     gh = gh_collect(KEYWORDS, per_key=20, token=token)
     # GitLab
     gl = gl_collect(KEYWORDS, per_key=15)
-    # Gitee（当前占位，返回空列表）
-    ge = ge_collect(KEYWORDS, per_key=10)
+    # Gitee：并发发现仓库，GITEE_SCAN_TREE=1 时同时扫描文件树
+    ge = ge_collect(KEYWORDS, max_pages=1)
 
     urls = list(set(gh + gl + ge))
     return urls
@@ -13,16 +13,56 @@ from config import (
     DAILY_INCREMENT,
     FAIL_THRESHOLD,
     HIST_PATH,
+    RUN_REPORT_PATH,
     TRUSTED_GET_HOSTS,
     TRUSTED_GET_TIMEOUT,
     TRUSTED_GET_VERIFY,
 )
-from fetchers.gh_files import candidate_paths, list_repo_tree, raw_url
+from config.search_policy import (
+    KEYWORD_PLANNER,
+    REPO_MIRROR_DEDUP,
+    REPO_SEARCH_OVERFETCH,
+)
+from fetchers.gh_archive import TARBALL_THRESHOLD, fetch_repo_archive
+from fetchers.gh_files import candidate_paths, fetch_repo_tree_info, raw_url
+from fetchers.gh_graphql import iter_repo_info
 from fetchers.github_adv import search_recent_repos
+from fetchers.keyword_planner import attribute_keywords, plan_queries
+from fetchers.repo_dedup import TreeDeduper, is_unmodified_fork
+from fetchers.repo_priority import prioritize_repos
 from filters.deduper import owner_of_repo, score_link
-from filters.extract import extract_candidate_urls, fetch_text, normalize_url
+from filters.extract import (
+    SUFFIX_WHITELIST,
+    clear_prefetched,
+    extract_candidate_urls,
+    fetch_text,
+    normalize_url,
+    remember_text,
+    take_text,
+)
+from filters.owner_prune import prune_by_owner
+from pipeline.engine import Pipeline, PipelineStop, Stage
+from storage.deferred import get_deferred_queue
 from storage.history import ensure_increment, load_history, save_history
+from storage.keyword_stats import get_keyword_stats
+from storage.meta_cache import content_fingerprint, get_meta_cache, parse_http_date
+from storage.negative_cache import (
+    THROTTLE_STATUSES,
+    get_negative_cache,
+    reason_from_exception,
+    reason_from_status,
+)
+from storage.repo_stats import get_repo_stats
 from storage.secure import get_secret
+from utils import events as ev
+from utils.deadline import Budget, stage_budget, start_run
+from utils.events import emit, get_event_log
+from utils.http_client import QuotaExhausted, record_response, resolve_url
+from utils.metrics import export_run
+from utils.profiling import get_profiler
+from utils.rate_limiter import limiter
+from utils.run_report import get_run_report
+from utils.token_pool import get_token_pool
 
 KEYWORDS = [
     # Core English phrases
@@ -104,7 +144,109 @@ PRINT_EVERY_REPO = 10  # 每处理多少仓库打一次进度
 PRINT_EVERY_FILE = 50  # 每检查多少文件打一次进度
 
 
-def gather_candidates(token):
+def plan_repos(token):
+    """关键词规划 + 仓库搜索 + 按预期产出排序，返回 (repos, repo_keywords)。"""
+    limit = MAX_REPOS if MAX_REPOS else None
+    # 关键词规划：按历史产出排序、剔除低产出/被覆盖关键词、单词关键词 OR 合并
+    kw_stats = get_keyword_stats()
+    if KEYWORD_PLANNER:
+        plan, dropped = plan_queries(KEYWORDS, kw_stats)
+        if dropped:
+            print(f"[关键词规划] 本次跳过 {len(dropped)} 个: {dropped}")
+    else:
+        plan = [(k, [k]) for k in KEYWORDS]
+    print(f"[关键词规划] {len(KEYWORDS)} 个关键词 -> {len(plan)} 个查询")
+    members_of = dict(plan)
+    kw_stats.note_queried(k for _, members in plan for k in members)
+    provenance = {}
+    # 多搜一些再按预期产出挑选：历史高产仓库优先，新仓库保留探索名额
+    repo_stats = get_repo_stats()
+    repos = search_recent_repos(
+        [q for q, _ in plan],
+        token=token,
+        limit=limit * REPO_SEARCH_OVERFETCH if limit else None,
+        provenance=provenance,
+    )
+    repos = prioritize_repos(repos, repo_stats, budget=limit)
+    # 溯源：仓库 -> 命中它的关键词
+    repo_keywords = {}
+    for repo in repos:
+        full = repo.get("full_name")
+        kws = []
+        for q in provenance.get(full, []):
+            kws += attribute_keywords(repo, members_of.get(q, [q]))
+        repo_keywords[full] = list(dict.fromkeys(kws))
+        for kw in repo_keywords[full]:
+            kw_stats.note(kw, repos=1)
+    print(f"[I] 待处理仓库: {len(repos)}")
+    return repos, repo_keywords
+
+
+def dedup_candidates(found: list) -> list:
+    """同一发布者的同名资源只保留一份（优先 .txt），再按 URL 全局去重。"""
+    # 先按发布者与基础 URL（去除常见后缀）进行分组，优先保留 .txt 格式
+
+    groups = {}
+
+    def strip_known_ext(u: str) -> str:
+        low = u.lower()
+        for ext in (".yaml", ".yml", ".txt"):
+            if low.endswith(ext):
+                return u[: -len(ext)]
+        return u
+
+    for it in found:
+        owner = it.get("owner") or "__no_owner__"
+        key = (owner, strip_known_ext(it.get("url", "")))
+        groups.setdefault(key, []).append(it)
+
+    filtered_found = []
+    for key, items in groups.items():
+        if len(items) == 1:
+            filtered_found.append(items[0])
+            continue
+        # 多个后缀版本：尝试优先保留 .txt
+        txts = [i for i in items if i.get("url", "").lower().endswith(".txt")]
+        if txts:
+            chosen = txts[0]
+            filtered_found.append(chosen)
+            for i in items:
+                if i is not chosen:
+                    emit(
+                        ev.OWNER_DEDUP,
+                        url=i.get("url"),
+                        kept=chosen.get("url"),
+                        reason="same_name",
+                    )
+        else:
+            # 否则保留第一个遇到的（保持稳定性）
+            chosen = items[0]
+            filtered_found.append(chosen)
+            for i in items[1:]:
+                emit(
+                    ev.OWNER_DEDUP,
+                    url=i.get("url"),
+                    kept=chosen.get("url"),
+                    reason="same_name",
+                )
+    # 最后按 URL 去重（跨发布者同 URL 也只保留一份）
+    uniq, seen = [], set()
+    for it in filtered_found:
+        if it["url"] not in seen:
+            uniq.append(it)
+            seen.add(it["url"])
+    print(f"[I] 去重后链接数: {len(uniq)}")
+    return uniq
+
+
+def crawl_repos(repos, token, repo_keywords, budget: Budget = None):
+    """抓取仓库 README / 文件树 / 候选文件并递归抽取订阅链接，返回去重后的候选条目。
+
+    分片执行时每个 worker 只抓取自己分片内的仓库（pipeline/sharded.py）。
+    budget 用尽时不再抓取剩余仓库（它们下次搜索仍会被排序选中）。
+    """
+    neg_cache = get_negative_cache()
+
     # 递归抓取所有链接，递归深度可配置
     def recursive_extract(urls, depth=2, visited=None, owner=None, src=None, path=None):
         if visited is None:
@@ -153,7 +295,7 @@ def gather_candidates(token):
                 canon = url
             # soft cap to avoid runaway recursion
             if len(visited) > 2000:
-                print(f"[R] 访问集合过大，跳过剩余: {len(visited)}")
+                emit(ev.CRAWL_VISIT_CAP, visited=len(visited))
                 break
             if canon in visited:
                 continue
@@ -161,12 +303,12 @@ def gather_candidates(token):
             try:
                 domain = urlparse(url).netloc.lower()
             except Exception as e:
-                print(f"[R] urlparse失败跳过: {url} ({e})")
+                emit(ev.CRAWL_BAD_URL, url=url, error=str(e))
                 continue
             last = url.split("/")[-1].split("?")[0].split("#")[0].lower()
             # 黑名单域名直接跳过
             if domain in DOMAIN_BLACKLIST:
-                print(f"[R] 黑名单域名跳过: {url}")
+                emit(ev.CRAWL_BLACKLISTED, url=url)
                 continue
             # 命中白名单后缀或关键词的链接无条件保存
             from filters.extract import EXT_KEYS, SUFFIX_WHITELIST
@@ -176,7 +318,7 @@ def gather_candidates(token):
             url_lc = url.lower()
             fuzzy_hit = any(k.lower() in url_lc for k in EXT_KEYS)
             if suf in SUFFIX_WHITELIST or fuzzy_hit:
-                print(f"[R] 直接保存URL（命中白名单/关键词）: {url}")
+                emit(ev.CRAWL_SAVED, url=url)
                 results.append(
                     {
                         "owner": owner,
@@ -190,7 +332,9 @@ def gather_candidates(token):
                 if suf not in SUFFIX_DIRECT_SAVE and any(
                     last.endswith(suf2) for suf2 in TEXT_EXTS
                 ):
-                    print(f"[R] 递归抓取: url={url} depth={depth}")
+                    if neg_cache.check_url(url):
+                        continue
+                    emit(ev.CRAWL_RECURSE, url=url, depth=depth)
                     import concurrent.futures
 
                     txt = None
@@ -204,13 +348,13 @@ def gather_candidates(token):
                         ) as executor:
                             future = executor.submit(fetch_with_timeout, url)
                             txt = future.result(timeout=10)
-                    except Exception:
-                        print(f"[R] 抓取失败或超时: url={url} depth={depth}")
+                    except Exception as e:
+                        reason = reason_from_exception(e)
+                        emit(ev.CRAWL_FETCH_FAILED, url=url, depth=depth, reason=reason)
+                        neg_cache.add_url(url, reason)
                         continue
                     extracted = list(extract_candidate_urls(txt))
-                    print(
-                        f"[R] url={url} depth={depth} 抽取到新链接数: {len(extracted)}"
-                    )
+                    emit(ev.CRAWL_EXTRACTED, url=url, depth=depth, count=len(extracted))
                     canonical_extracted = []
                     for u in extracted:
                         nu = normalize_url(u)
@@ -242,7 +386,9 @@ def gather_candidates(token):
                 continue
             # 其它情况，只有文本类才递归
             if any(last.endswith(suf) for suf in TEXT_EXTS):
-                print(f"[R] 递归抓取: url={url} depth={depth}")
+                if neg_cache.check_url(url):
+                    continue
+                emit(ev.CRAWL_RECURSE, url=url, depth=depth)
                 import concurrent.futures
 
                 txt = None
@@ -256,11 +402,13 @@ def gather_candidates(token):
                     ) as executor:
                         future = executor.submit(fetch_with_timeout, url)
                         txt = future.result(timeout=10)
-                except Exception:
-                    print(f"[R] 抓取失败或超时: url={url} depth={depth}")
+                except Exception as e:
+                    reason = reason_from_exception(e)
+                    emit(ev.CRAWL_FETCH_FAILED, url=url, depth=depth, reason=reason)
+                    neg_cache.add_url(url, reason)
                     continue
                 extracted = list(extract_candidate_urls(txt))
-                print(f"[R] url={url} depth={depth} 抽取到新链接数: {len(extracted)}")
+                emit(ev.CRAWL_EXTRACTED, url=url, depth=depth, count=len(extracted))
                 canonical_extracted = []
                 for u in extracted:
                     nu = normalize_url(u)
@@ -292,36 +440,94 @@ def gather_candidates(token):
         return results
 
     t0 = time.time()
-    limit = MAX_REPOS if MAX_REPOS else None
-    repos = search_recent_repos(KEYWORDS, token=token, limit=limit)
-    if limit and len(repos) > limit:
-        repos = repos[:limit]
-    print(f"[I] 待处理仓库: {len(repos)}")
+    kw_stats = get_keyword_stats()
+    repo_stats = get_repo_stats()
     found = []
     repo_cnt = 0
     file_cnt = 0
 
+    by_name = {}
     for repo in repos:
         full = repo.get("full_name")
         if not full:
             continue
+        neg_reason = neg_cache.check_repo(full)
+        if neg_reason:
+            emit(ev.REPO_NEG_CACHED, repo=full, reason=neg_reason)
+            continue
+        by_name.setdefault(full, repo)
+
+    # GraphQL 批量取 README / 文件树 / 小文件内容；未命中的仓库回退 REST
+    deduper = TreeDeduper()
+    gql_kw = {"seen_trees": deduper.by_tree} if REPO_MIRROR_DEDUP else {}
+    for full, gql in iter_repo_info(list(by_name), token, **gql_kw):
+        if budget is not None and budget.expired():
+            print(f"[预算] 搜索阶段预算用尽，跳过剩余 {len(by_name) - repo_cnt} 个仓库")
+            break
+        repo = by_name[full]
         repo_cnt += 1
+        found_before = len(found)
         if repo_cnt % PRINT_EVERY_REPO == 0:
             print(
-                f"[I] 仓库进度: {repo_cnt}/{len(repos)} | 已命中链接: {len(found)} | 耗时: {int(time.time()-t0)}s"
+                f"[I] 仓库进度: {repo_cnt}/{len(by_name)} | 已命中链接: {len(found)} | 耗时: {int(time.time()-t0)}s"
+            )
+        # 先取文件树：根树与已抓仓库相同（fork/镜像）时整仓跳过
+        tree_sha = None
+        try:
+            if gql is None:
+                tree, tree_status, tree_sha = fetch_repo_tree_info(full, token)
+            elif gql.get("tree_truncated") and not gql.get("mirror_of"):
+                # GraphQL 树只展开到 GH_GRAPHQL_TREE_DEPTH 层，更深的文件要靠 REST 递归树
+                tree, tree_status, _ = fetch_repo_tree_info(full, token)
+            else:
+                tree, tree_status = gql["tree"], 200
+        except QuotaExhausted as e:
+            print(f"[预算] {e}，跳过剩余 {len(by_name) - repo_cnt + 1} 个仓库")
+            break
+        if gql is not None and tree_status != 200:
+            print(f"[GraphQL] 仓库:{full} REST 文件树失败({tree_status})，只扫浅层树")
+            tree, tree_status = gql["tree"], 200
+        if tree_status != 200:
+            if tree_status in (404, 409, 451):
+                tree_reason = "repo_not_found"
+            elif tree_status in THROTTLE_STATUSES:
+                tree_reason = "throttled"
+            else:
+                tree_reason = "repo_tree_fail"
+            neg_cache.add_repo(full, tree_reason)
+        rep = None
+        if REPO_MIRROR_DEDUP:
+            if gql is not None:
+                rep = gql.get("mirror_of")
+                parent = gql.get("parent")
+                if not rep and parent in by_name and is_unmodified_fork(repo):
+                    # fork 后从未提交：内容就是父仓库某个旧版本，抓父仓库即可
+                    rep = parent
+                if rep:
+                    deduper.add_mirror(rep, full)
+            else:
+                rep = deduper.claim(full, tree_sha)
+        if rep:
+            emit(ev.REPO_MIRROR_SKIPPED, repo=full, rep=rep)
+            repo_keywords[rep] = list(
+                dict.fromkeys(repo_keywords.get(rep, []) + repo_keywords.get(full, []))
             )
+            continue
         # 抓取 README.md 和 description
         desc = repo.get("description") or ""
-        default_branch = repo.get("default_branch") or "HEAD"
-        readme_branch = default_branch if default_branch else "HEAD"
-        readme_url = (
-            f"https://raw.githubusercontent.com/{full}/{readme_branch}/README.md"
-        )
         readme_txt = ""
-        try:
-            readme_txt = fetch_text(readme_url)
-        except Exception:
-            pass
+        if gql is not None:
+            readme_txt = gql["readme"]
+        else:
+            default_branch = repo.get("default_branch") or "HEAD"
+            readme_branch = default_branch if default_branch else "HEAD"
+            readme_url = (
+                f"https://raw.githubusercontent.com/{full}/{readme_branch}/README.md"
+            )
+            try:
+                readme_txt = fetch_text(readme_url)
+            except Exception:
+                pass
         from filters.extract import URL_RE
 
         meta_links = {
@@ -329,14 +535,22 @@ def gather_candidates(token):
             for u in (URL_RE.findall(desc) + URL_RE.findall(readme_txt))
             if normalize_url(u)
         }
-        print(f"[D] 仓库:{full} meta页面抽取到链接数:{len(meta_links)}")
+        emit(ev.REPO_META_LINKS, repo=full, count=len(meta_links))
         # 递归抓取 meta_links
         found += recursive_extract(
             meta_links, depth=3, owner=owner_of_repo(full), src=full
         )
-        # 继续原有文件树抓取
-        tree = list_repo_tree(full, token)
-        for path in candidate_paths(tree):
+        paths = list(candidate_paths(tree))
+        prefetched = dict(gql["blobs"]) if gql is not None else {}
+        missing = [p for p in paths if p not in prefetched]
+        if TARBALL_THRESHOLD and len(missing) > TARBALL_THRESHOLD:
+            # 文件过多：整仓下载一次归档，代替逐个 raw 请求
+            got = fetch_repo_archive(full, token, missing)
+            print(
+                f"[tarball] 仓库:{full} 候选 {len(missing)} 个，归档取得 {len(got)} 个"
+            )
+            prefetched.update(got)
+        for path in paths:
             file_cnt += 1
             if file_cnt % PRINT_EVERY_FILE == 0:
                 print(
@@ -345,8 +559,10 @@ def gather_candidates(token):
             url = raw_url(full, path)
             url = normalize_url(url)
             lp = path.lower()
+            if path in prefetched and lp.endswith((".yaml", ".yml", ".txt")):
+                remember_text(url, prefetched[path])
             if lp.endswith((".yaml", ".yml")):
-                print(f"[D] 仓库:{full} 路径:{path} 直接保存订阅文件URL: {url}")
+                emit(ev.REPO_FILE_SAVED, repo=full, path=path, url=url)
                 found.append(
                     {
                         "owner": owner_of_repo(full),
@@ -358,7 +574,7 @@ def gather_candidates(token):
                 )
                 continue
             if lp.endswith(".txt"):
-                print(f"[D] 仓库:{full} 路径:{path} 保存并递归解析TXT: {url}")
+                emit(ev.REPO_TXT_SAVED, repo=full, path=path, url=url)
                 found.append(
                     {
                         "owner": owner_of_repo(full),
@@ -368,64 +584,45 @@ def gather_candidates(token):
                         "score": score_link(url, path),
                     }
                 )
-            try:
-                txt = fetch_text(url)
-            except Exception:
+            if neg_cache.check_url(url):
                 continue
+            txt = prefetched.get(path)
+            if txt is None:
+                try:
+                    txt = fetch_text(url)
+                except Exception as e:
+                    neg_cache.add_url(url, reason_from_exception(e))
+                    continue
             extracted = list(extract_candidate_urls(txt))
-            print(f"[D] 仓库:{full} 路径:{path} 抽取到链接数:{len(extracted)}")
+            emit(ev.REPO_EXTRACTED, repo=full, path=path, count=len(extracted))
             # 递归抓取文件内容抽取到的链接
             found += recursive_extract(
                 extracted, depth=3, owner=owner_of_repo(full), src=full, path=path
             )
+        repo_stats.note_crawl(
+            full,
+            ok=tree_status == 200,
+            candidates=len(found) - found_before,
+            pushed_at=repo.get("pushed_at") or (gql or {}).get("pushed_at"),
+        )
     print(f"[I] 抓取/抽取后总链接数: {len(found)}")
-    # 先按发布者与基础 URL（去除常见后缀）进行分组，优先保留 .txt 格式
+    if deduper.mirrors:
+        print(f"[镜像去重] {deduper.stats()}")
+    neg_cache.save()
+    uniq = dedup_candidates(found)
+    for it in uniq:
+        it["keywords"] = repo_keywords.get(it.get("src"), [])
+        # 被折叠的 fork/镜像仓库仍归属到同一候选，便于报告
+        it["mirrors"] = deduper.mirrors_of(it.get("src"))
+        for kw in it["keywords"]:
+            kw_stats.note(kw, candidates=1)
+    return uniq
 
-    groups = {}
 
-    def strip_known_ext(u: str) -> str:
-        low = u.lower()
-        for ext in (".yaml", ".yml", ".txt"):
-            if low.endswith(ext):
-                return u[: -len(ext)]
-        return u
-
-    for it in found:
-        owner = it.get("owner") or "__no_owner__"
-        key = (owner, strip_known_ext(it.get("url", "")))
-        groups.setdefault(key, []).append(it)
-
-    filtered_found = []
-    for key, items in groups.items():
-        if len(items) == 1:
-            filtered_found.append(items[0])
-            continue
-        # 多个后缀版本：尝试优先保留 .txt
-        txts = [i for i in items if i.get("url", "").lower().endswith(".txt")]
-        if txts:
-            chosen = txts[0]
-            filtered_found.append(chosen)
-            for i in items:
-                if i is not chosen:
-                    print(
-                        f"[发布者同名去重] 保留 .txt：{chosen.get('url')}，剔除：{i.get('url')}"
-                    )
-        else:
-            # 否则保留第一个遇到的（保持稳定性）
-            chosen = items[0]
-            filtered_found.append(chosen)
-            for i in items[1:]:
-                print(
-                    f"[发布者同名去重] 保留：{chosen.get('url')}，剔除：{i.get('url')}"
-                )
-    # 最后按 URL 去重（跨发布者同 URL 也只保留一份）
-    uniq, seen = [], set()
-    for it in filtered_found:
-        if it["url"] not in seen:
-            uniq.append(it)
-            seen.add(it["url"])
-    print(f"[I] 去重后链接数: {len(uniq)}")
-    return uniq
+def gather_candidates(token):
+    budget = stage_budget("search")
+    repos, repo_keywords = plan_repos(token)
+    return crawl_repos(repos, token, repo_keywords, budget=budget)
 
 
 def _is_valid_token(token: str) -> bool:
@@ -438,35 +635,50 @@ def _is_valid_token(token: str) -> bool:
     """
     if not token or len(token) < 8:
         return False
-    
+
     # 过长的 token（可能是错误的）
     if len(token) > 128:
         return False
-    
+
     token_lower = token.lower()
-    
+
     # 检查明显的占位符
     placeholders = {
-        'demo', 'test', 'example', 'placeholder', 'sample', 'fake',
-        'invalid', 'expired', 'none', 'null', 'undefined', 'default',
-        'temp', 'temporary', 'admin', 'user', 'guest', 'public'
+        "demo",
+        "test",
+        "example",
+        "placeholder",
+        "sample",
+        "fake",
+        "invalid",
+        "expired",
+        "none",
+        "null",
+        "undefined",
+        "default",
+        "temp",
+        "temporary",
+        "admin",
+        "user",
+        "guest",
+        "public",
     }
-    
+
     for placeholder in placeholders:
         if placeholder in token_lower:
             return False
-    
+
     # 检查是否全是相同字符
     if len(set(token)) <= 2:  # 只有1-2个不同字符
         return False
-    
+
     # 检查是否为简单递增数字序列（123456...）
     if token.isdigit():
         if len(token) >= 6:
             # 检查是否为连续数字
             is_sequential = True
             for i in range(1, len(token)):
-                if int(token[i]) != (int(token[i-1]) + 1) % 10:
+                if int(token[i]) != (int(token[i - 1]) + 1) % 10:
                     is_sequential = False
                     break
             if is_sequential:
@@ -474,15 +686,17 @@ def _is_valid_token(token: str) -> bool:
         # 检查是否为重复数字（111111, 222222等）
         if len(set(token)) == 1:
             return False
-    
+
     # 检查十六进制模式中的明显无效值
-    if re.match(r'^[0-9a-fA-F]+$', token):
+    if re.match(r"^[0-9a-fA-F]+$", token):
         # 全0或全F的十六进制
-        if token_lower in ['00000000', 'ffffffff'] or \
-           token_lower == '0' * len(token) or \
-           token_lower == 'f' * len(token):
+        if (
+            token_lower in ["00000000", "ffffffff"]
+            or token_lower == "0" * len(token)
+            or token_lower == "f" * len(token)
+        ):
             return False
-    
+
     return True
 
 
@@ -491,26 +705,27 @@ def _validate_subscription_url_params(url: str) -> bool:
     主要检查 token/key 等参数的合法性。
     """
     try:
-        from urllib.parse import urlparse, parse_qs
+        from urllib.parse import parse_qs, urlparse
+
         parsed = urlparse(url)
         params = parse_qs(parsed.query)
-        
+
         # 检查 token 参数
-        if 'token' in params:
-            tokens = params['token']
+        if "token" in params:
+            tokens = params["token"]
             if tokens:  # token 参数存在
                 token = tokens[0]  # 取第一个 token 值
                 if not _is_valid_token(token):
                     return False
-        
+
         # 检查 key 参数（有些机场用 key 而不是 token）
-        if 'key' in params:
-            keys = params['key']
+        if "key" in params:
+            keys = params["key"]
             if keys:
                 key = keys[0]
                 if not _is_valid_token(key):
                     return False
-        
+
         return True
     except Exception:
         return True  # 解析失败时不拒绝，避免误杀
@@ -557,7 +772,13 @@ def _maybe_base64_subscription(text: str) -> bool:
     return False
 
 
-def filter_subscription_content(urls):
+def filter_subscription_content(urls, budget: Budget = None, deferred=None):
+    """逐条获取内容并校验，返回 (kept, pending)。
+
+    budget 用尽后剩余 URL 不再获取，按原顺序追加到 deferred（若提供）。
+    """
+    budget = budget or Budget()
+    urls = list(urls)
     POSITIVE = (
         "proxies:",
         "proxy-groups",
@@ -586,38 +807,52 @@ def filter_subscription_content(urls):
     # Use centralized validator for content validation to reduce false positives.
     from filters import validator
 
-    for url in urls:
+    meta_cache = get_meta_cache()
+    for i, url in enumerate(urls):
+        if budget.expired():
+            print(f"[预算] 内容校验预算用尽，推迟剩余 {len(urls) - i} 条")
+            if deferred is not None:
+                deferred.extend(urls[i:])
+            break
         try:
-            text = fetch_text(url, timeout=25)
+            text = take_text(url)
+            if text is None:
+                text = fetch_text(url, timeout=budget.cap(25))
         except Exception:
-            print(f"[内容获取失败缓存] {url}")
+            if budget.expired() and deferred is not None:
+                deferred.append(url)
+                continue
+            emit(ev.CONTENT_RETRY, url=url)
             pending.append(url)
             continue
         snippet = text.strip()
         if not snippet:
-            print(f"[内容为空剔除] {url}")
+            _reject(ev.CONTENT_REJECTED, url, "empty", "内容为空剔除")
             continue
 
         # Prefer strict validator which applies length checks, HTML detection,
         # YAML parsing and base64 heuristics consistently.
         try:
-            if validator.is_valid_subscription(url, snippet):
+            if validator.is_valid_subscription(url, snippet) or (
+                # If the centralized validator rejects, still perform a lightweight
+                # base64 heuristic as a final check (covers some short base64 subs).
+                _maybe_base64_subscription(snippet)
+            ):
                 kept.append(url)
+                digest, nodes = content_fingerprint(snippet)
+                meta_cache.upsert(url, digest=digest, nodes=nodes)
                 continue
             else:
-                # If the centralized validator rejects, still perform a lightweight
-                # base64 heuristic as a final check (covers some short base64 subs).
-                if _maybe_base64_subscription(snippet):
-                    kept.append(url)
-                    continue
                 # Count negative indicators - if many, treat as rules/config file and drop.
                 neg_hits = sum(snippet.lower().count(kw) for kw in NEGATIVE)
                 if neg_hits >= 3:
-                    print(f"[判定为规则剔除] {url}")
+                    _reject(ev.CONTENT_REJECTED, url, "rules", "判定为规则剔除")
                     continue
-                print(f"[缺少订阅特征剔除] {url}")
+                _reject(
+                    ev.CONTENT_REJECTED, url, "not_subscription", "缺少订阅特征剔除"
+                )
         except Exception as e:
-            print(f"[验证器异常] {url} -> {e}")
+            emit(ev.VALIDATOR_ERROR, url=url, error=str(e))
             # on validator error, move to pending for retry
             pending.append(url)
             continue
@@ -638,7 +873,7 @@ def upload_gist_from_file(filepath):
         return False, f"file read error: {e}"
     payload = {"files": {"zhuquejisu.txt": {"content": content}}}
     r = requests.patch(
-        f"https://api.github.com/gists/{gid}",
+        resolve_url(f"https://api.github.com/gists/{gid}"),
         headers={
             "Authorization": f"Bearer {tok}",
             "Accept": "application/vnd.github+json",
@@ -649,6 +884,12 @@ def upload_gist_from_file(filepath):
     return r.ok, r.status_code
 
 
+def _reject(etype, url: str, reason: str, label: str):
+    """记录剔除事件并写入负缓存。"""
+    emit(etype, url=url, reason=reason, label=label)
+    get_negative_cache().add_url(url, reason)
+
+
 # 新增：规范化 URL（去 proxy 包装、把 github.com/raw/... 转为 raw.githubusercontent.com）
 def canonicalize_url(url: str) -> str:
     if not url:
@@ -662,21 +903,21 @@ def canonicalize_url(url: str) -> str:
         p = urlparse(s)
         host = (p.netloc or "").lower()
         path = p.path or ""
-        
+
         # 使用智能 GitHub 检测和转换
         username, repo, branch, detected_path = _detect_github_info_from_url(s)
         if username and repo and detected_path:
             converted_url = f"https://raw.githubusercontent.com/{username}/{repo}/{branch}{detected_path}"
-            print(f"[智能GitHub转换] {s} -> {converted_url}")
+            emit(ev.CANONICAL_REWRITE, src=s, dst=converted_url, label="智能GitHub转换")
             return converted_url
-        
+
         # GitHub.com raw 地址转换
         if host == "github.com" and "/raw/" in path:
             new_path = path.replace("/raw/refs/heads/", "/")
             new_path = new_path.replace("/raw/refs/", "/")
             new_path = new_path.replace("/raw/", "/")
             converted_url = f"https://raw.githubusercontent.com{new_path}"
-            print(f"[GitHub Raw转换] {s} -> {converted_url}")
+            emit(ev.CANONICAL_REWRITE, src=s, dst=converted_url, label="GitHub Raw转换")
             return converted_url
     except Exception:
         pass
@@ -684,7 +925,10 @@ def canonicalize_url(url: str) -> str:
 
 
 # 新增：并发 HEAD 检查（回退到 GET），剔除非 2xx 或 content-type 明显非文本的 URL
-def head_check_urls(urls, concurrency=12, timeout=15):
+def head_check_urls(
+    urls, concurrency=12, timeout=15, budget: Budget = None, deferred=None
+):
+    """budget 用尽时不再等待未完成的检查，这些 URL 按原顺序追加到 deferred（若提供）。"""
     import concurrent.futures
 
     import requests
@@ -702,17 +946,23 @@ def head_check_urls(urls, concurrency=12, timeout=15):
 
     session = requests.Session()
     session.headers.update({"User-Agent": "sub-hunter/1.0 (+https://github.com)"})
+    session.hooks["response"].append(record_response)
+    report = get_run_report()
 
     ok_list = []
     removed = []
 
     def _check(u):
         try:
-            r = session.head(u, allow_redirects=True, timeout=timeout)
+            r = session.head(resolve_url(u), allow_redirects=True, timeout=timeout)
         except Exception:
+            report.request(urlparse(u).hostname)
             try:
-                r = session.get(u, allow_redirects=True, stream=True, timeout=timeout)
+                r = session.get(
+                    resolve_url(u), allow_redirects=True, stream=True, timeout=timeout
+                )
             except Exception as e:
+                report.request(urlparse(u).hostname)
                 return (u, False, f"network:{e}")
         code = getattr(r, "status_code", 0)
         if code < 200 or code >= 300:
@@ -723,7 +973,7 @@ def head_check_urls(urls, concurrency=12, timeout=15):
             # 如果 HEAD 没有返回 content-type，尝试 GET 以避免过度剔除（某些服务器在 HEAD 不提供 headers）
             try:
                 r_get = session.get(
-                    u, allow_redirects=True, stream=True, timeout=timeout
+                    resolve_url(u), allow_redirects=True, stream=True, timeout=timeout
                 )
                 ctype_get = (r_get.headers.get("content-type") or "").lower()
                 if ctype_get:
@@ -762,9 +1012,11 @@ def head_check_urls(urls, concurrency=12, timeout=15):
                 return (u, False, f"ctype_nontext:{ctype}")
         return (u, True, f"ok:{code}:{ctype}")
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as ex:
-        futs = {ex.submit(_check, u): u for u in urls}
-        for fut in concurrent.futures.as_completed(futs):
+    wait = budget.as_timeout() if budget is not None else None
+    ex = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    futs = {ex.submit(_check, u): u for u in urls}
+    try:
+        for fut in concurrent.futures.as_completed(futs, timeout=wait):
             try:
                 u, ok, reason = fut.result()
             except Exception as e:
@@ -775,9 +1027,32 @@ def head_check_urls(urls, concurrency=12, timeout=15):
                 ok_list.append(u)
             else:
                 removed.append((u, reason))
+    except concurrent.futures.TimeoutError:
+        if deferred is not None:
+            deferred.extend(u for f, u in futs.items() if not f.done())
+    finally:
+        # 预算用尽时不等待仍在进行的请求
+        ex.shutdown(wait=False, cancel_futures=True)
+    neg_cache = get_negative_cache()
+    for u, reason in removed:
+        neg_cache.add_url(u, _head_reject_reason(reason))
     return ok_list, removed
 
 
+def _head_reject_reason(reason: str) -> str:
+    """把 head_check_urls 的剔除原因映射为负缓存原因。"""
+    if reason.startswith("status:"):
+        try:
+            return reason_from_status(int(reason.split(":", 1)[1]))
+        except ValueError:
+            return "http_4xx"
+    if reason.startswith("ctype"):
+        return "ctype"
+    if "timeout" in reason.lower():
+        return "timeout"
+    return "network"
+
+
 # 新增：对受信任 host 在被判定为“规则/剔除”前做一次 GET 验证
 def trusted_verify_single(url: str, timeout: int | None = None):
     """对单个 URL 做 GET 并由 centralized validator 复审。返回 (bool, reason).
@@ -804,248 +1079,265 @@ def trusted_verify_single(url: str, timeout: int | None = None):
     return False, "not_subscription"
 
 
-def main():
-    tok = get_secret("sub-hunter", "GITHUB_TOKEN") or get_secret(
-        "sub-hunter", "GIST_TOKEN"
-    )
-    if not tok:
-        print("ERROR: no GitHub token in keychain (GITHUB_TOKEN/GIST_TOKEN).")
-        sys.exit(2)
-
-    print(">>> 搜索 & 抽取…(可见进度)")
-    items = gather_candidates(tok)
+def stage_search(pool) -> dict:
+    print(f">>> 搜索 & 抽取…(可见进度，令牌池 {len(pool)} 个)")
+    # 预取内容只在本次运行内有效
+    clear_prefetched()
+    items = gather_candidates(pool)
+    for row in pool.snapshot():
+        print(f"[令牌池] {row['token']} 请求 {row['requests']} 次 {row['budgets']}")
+    for host, st in limiter.snapshot().items():
+        print(f"[限速] {host} {st}")
     print(f">>> 发布者去重后候选: {len(items)}")
     # 统计输出
     print(f"[I] main流程收到 items 数量: {len(items)}")
 
     if len(items) == 0:
-        print(">>> 去重后结果为0，跳过连通性检测和 Gist 上传！")
-        return
+        raise PipelineStop("去重后结果为0，跳过连通性检测和 Gist 上传")
+    return {"items": items}
+
+
+# 强化排除后缀，彻底剔除所有无关链接
+ADMIT_EXCLUDE_SUFFIXES = [
+    ".lock",
+    ".cache",
+    ".pid",
+    ".sock",
+    ".out",
+    ".err",
+    ".log",
+    ".tmp",
+    ".swp",
+    ".swo",
+    ".swn",
+    ".bak",
+    ".old",
+    ".orig",
+    ".sample",
+    ".test",
+    ".demo",
+    ".example",
+    ".template",
+    ".config",
+    ".settings",
+    ".env",
+    ".mrs",
+    ".list",
+    ".html",
+    ".ini",
+    ".atom",
+    ".git",
+    ".go",
+    ".md",
+    ".pdf",
+    ".doc",
+    ".xls",
+    ".ppt",
+    ".exe",
+    ".apk",
+    ".zip",
+    ".tar",
+    ".gz",
+    ".rar",
+    ".7z",
+    ".bmp",
+    ".ttf",
+    ".otf",
+    ".eot",
+    ".mp3",
+    ".mp4",
+    ".avi",
+    ".mov",
+    ".mkv",
+    ".webm",
+    ".json",
+    ".xml",
+    ".rss",
+    ".atom",
+    ".map",
+    ".psd",
+    ".ai",
+    ".eps",
+    ".dmg",
+    ".iso",
+    ".bin",
+    ".csv",
+    ".ts",
+    ".tsx",
+    ".jsx",
+    ".vue",
+    ".svelte",
+    ".php",
+    ".asp",
+    ".aspx",
+    ".jsp",
+    ".cgi",
+    ".pl",
+    ".rb",
+    ".go",
+    ".rs",
+    ".swift",
+    ".kt",
+    ".dart",
+    ".sh",
+    ".bat",
+    ".cmd",
+    ".ps1",
+    ".dockerfile",
+    ".gitignore",
+    ".gitattributes",
+    ".editorconfig",
+    ".npmignore",
+    ".yarn.lock",
+    ".woff2",
+    ".ico",
+    ".svg",
+    ".png",
+    ".jpg",
+    ".webp",
+    ".css",
+    ".js",
+    ".fonts",
+]
+ADMIT_KEYWORDS = [
+    "subscribe",
+    "sub",
+    "clash",
+    "v2ray",
+    "ss",
+    "vless",
+    "vmess",
+    "trojan",
+    "hysteria2",
+    "tuic",
+    "yaml",
+    "list",
+    "v2",
+    "free",
+    "public",
+    "Router",
+]
 
-    # 强化排除后缀，彻底剔除所有无关链接
-    EXCLUDE_SUFFIXES = [
-        ".lock",
-        ".cache",
-        ".pid",
-        ".sock",
-        ".out",
-        ".err",
-        ".log",
-        ".tmp",
-        ".swp",
-        ".swo",
-        ".swn",
-        ".bak",
-        ".old",
-        ".orig",
-        ".sample",
-        ".test",
-        ".demo",
-        ".example",
-        ".template",
-        ".config",
-        ".settings",
-        ".env",
-        ".mrs",
-        ".list",
-        ".html",
-        ".ini",
-        ".atom",
-        ".git",
-        ".go",
-        ".md",
-        ".pdf",
-        ".doc",
-        ".xls",
-        ".ppt",
-        ".exe",
-        ".apk",
-        ".zip",
-        ".tar",
-        ".gz",
-        ".rar",
-        ".7z",
-        ".bmp",
-        ".ttf",
-        ".otf",
-        ".eot",
-        ".mp3",
-        ".mp4",
-        ".avi",
-        ".mov",
-        ".mkv",
-        ".webm",
-        ".json",
-        ".xml",
-        ".rss",
-        ".atom",
-        ".map",
-        ".psd",
-        ".ai",
-        ".eps",
-        ".dmg",
-        ".iso",
-        ".bin",
-        ".csv",
-        ".ts",
-        ".tsx",
-        ".jsx",
-        ".vue",
-        ".svelte",
-        ".php",
-        ".asp",
-        ".aspx",
-        ".jsp",
-        ".cgi",
-        ".pl",
-        ".rb",
-        ".go",
-        ".rs",
-        ".swift",
-        ".kt",
-        ".dart",
-        ".sh",
-        ".bat",
-        ".cmd",
-        ".ps1",
-        ".dockerfile",
-        ".gitignore",
-        ".gitattributes",
-        ".editorconfig",
-        ".npmignore",
-        ".yarn.lock",
-        ".woff2",
-        ".ico",
-        ".svg",
-        ".png",
-        ".jpg",
-        ".webp",
-        ".css",
-        ".js",
-        ".fonts",
-    ]
-    KEYWORDS = [
+
+def is_subscription_url(url):
+    """按 URL 规则判断是否为订阅链接；剔除的 URL 记录事件并写入负缓存。"""
+    last = url.split("/")[-1].split("?")[0].split("#")[0]
+    full_lc = url.lower()
+    if any(sub in full_lc for sub in URL_SUBSTR_BLACKLIST):
+        _reject(ev.URL_REJECTED, url, "blacklist", "黑名单URL剔除")
+        return False
+
+    # 验证 URL 参数（特别是 token）
+    if not _validate_subscription_url_params(url):
+        _reject(ev.URL_REJECTED, url, "bad_token", "无效token剔除")
+        return False
+    try:
+        from urllib.parse import urlparse
+
+        path = urlparse(url).path.lower()
+    except Exception:
+        path = ""
+    if path.endswith("/releases") or path.endswith("/releases/"):
+        _reject(ev.URL_REJECTED, url, "releases", "Releases剔除")
+        return False
+    # 0. 先排除EXCLUDE_SUFFIXES（无论是否有后缀）
+    for suf in ADMIT_EXCLUDE_SUFFIXES:
+        if last.lower().endswith(suf):
+            _reject(ev.URL_REJECTED, url, "excluded_suffix", "排除后缀剔除")
+            return False
+
+    # 新增：基于文件名/路径的黑名单，排除常见的 config/template/dist 等目录或文件名
+    NAME_EXCLUDE_TOKENS = (
+        "config",
+        "clash_config",
+        "dist",
+        "dist_",
+        "template",
+        "example",
+        "sample",
+        "settings",
+        "env",
+        "ci",
+        "docker",
+        "init",
+        "default",
+        "readme",
+    )
+    # NOTE: do NOT treat generic 'clash' token as subscription indicator here — config files often include 'clash' in name
+    SUB_KEYWORDS = (
         "subscribe",
+        "subscription",
         "sub",
-        "clash",
+        "nodes",
+        "proxies",
+        "proxy",
         "v2ray",
-        "ss",
-        "vless",
         "vmess",
+        "vless",
         "trojan",
-        "hysteria2",
+        "ss",
+        "hysteria",
         "tuic",
-        "yaml",
+        "mix",
+        "meta",
         "list",
-        "v2",
-        "free",
-        "public",
-        "Router",
-    ]
-    from filters.extract import SUFFIX_WHITELIST
-
-    def is_subscription_url(url):
-        last = url.split("/")[-1].split("?")[0].split("#")[0]
-        full_lc = url.lower()
-        if any(sub in full_lc for sub in URL_SUBSTR_BLACKLIST):
-            print(f"[黑名单URL剔除] {url}")
-            return False
-        
-        # 验证 URL 参数（特别是 token）
-        if not _validate_subscription_url_params(url):
-            print(f"[无效token剔除] {url}")
-            return False
-        try:
-            from urllib.parse import urlparse
-
-            path = urlparse(url).path.lower()
-        except Exception:
-            path = ""
-        if path.endswith("/releases") or path.endswith("/releases/"):
-            print(f"[Releases剔除] {url}")
+        "share",
+    )
+    last_lc = last.lower()
+    url_lc = url.lower()
+    if ("/dist/" in url_lc) or any(tok in last_lc for tok in NAME_EXCLUDE_TOKENS):
+        # 如果 URL 本身没有明显的订阅相关关键词，则认为它是配置/模板文件，剔除
+        if not any(k in url_lc for k in SUB_KEYWORDS):
+            _reject(ev.URL_REJECTED, url, "name_blacklist", "文件名黑名单剔除")
             return False
-        # 0. 先排除EXCLUDE_SUFFIXES（无论是否有后缀）
-        for suf in EXCLUDE_SUFFIXES:
-            if last.lower().endswith(suf):
-                print(f"[排除后缀剔除] {url}")
-                return False
-
-        # 新增：基于文件名/路径的黑名单，排除常见的 config/template/dist 等目录或文件名
-        NAME_EXCLUDE_TOKENS = (
-            "config",
-            "clash_config",
-            "dist",
-            "dist_",
-            "template",
-            "example",
-            "sample",
-            "settings",
-            "env",
-            "ci",
-            "docker",
-            "init",
-            "default",
-            "readme",
-        )
-        # NOTE: do NOT treat generic 'clash' token as subscription indicator here — config files often include 'clash' in name
-        SUB_KEYWORDS = (
-            "subscribe",
-            "subscription",
-            "sub",
-            "nodes",
-            "proxies",
-            "proxy",
-            "v2ray",
-            "vmess",
-            "vless",
-            "trojan",
-            "ss",
-            "hysteria",
-            "tuic",
-            "mix",
-            "meta",
-            "list",
-            "share",
-        )
-        last_lc = last.lower()
-        url_lc = url.lower()
-        if ("/dist/" in url_lc) or any(tok in last_lc for tok in NAME_EXCLUDE_TOKENS):
-            # 如果 URL 本身没有明显的订阅相关关键词，则认为它是配置/模板文件，剔除
-            if not any(k in url_lc for k in SUB_KEYWORDS):
-                print(f"[文件名黑名单剔除] {url}")
-                return False
 
-        # 1. 后缀为yaml/yml/txt强制保留
-        if "." in last:
-            suf = last.split(".")[-1].lower()
-            if suf in SUFFIX_WHITELIST:
-                print(f"[机场订阅保留] {url}")
-                return True
-        # 2. 无后缀链接，仍需命中关键词（放宽为子串匹配）
-        url_lc = url.lower()
-        for k in KEYWORDS:
-            k_lc = k.lower()
-            if k_lc in url_lc:
-                print(f"[关键词保留] {url}")
-                return True
-        # 3. 其余全部剔除 — 在完全剔除前，对受信任的 host 尝试一次 GET 验证以降低误判
+    # 1. 后缀为yaml/yml/txt强制保留
+    if "." in last:
+        suf = last.split(".")[-1].lower()
+        if suf in SUFFIX_WHITELIST:
+            emit(ev.URL_KEPT, url=url, reason="suffix", label="机场订阅保留")
+            return True
+    # 2. 无后缀链接，仍需命中关键词（放宽为子串匹配）
+    url_lc = url.lower()
+    for k in ADMIT_KEYWORDS:
+        k_lc = k.lower()
+        if k_lc in url_lc:
+            emit(ev.URL_KEPT, url=url, reason="keyword", label="关键词保留")
+            return True
+    # 3. 其余全部剔除 — 在完全剔除前，对受信任的 host 尝试一次 GET 验证以降低误判
+    host = ""
+    try:
+        host = urlparse(url).netloc.lower()
+    except Exception:
         host = ""
-        try:
-            host = urlparse(url).netloc.lower()
-        except Exception:
-            host = ""
-        if TRUSTED_GET_VERIFY and host in TRUSTED_GET_HOSTS:
-            print(f"[受信任源二次GET验证触发] {url}")
-            ok, reason = trusted_verify_single(url)
-            if ok:
-                print(f"[受信任源二次GET验证通过] {url} -> {reason}")
-                return True
-            else:
-                print(f"[受信任源二次GET验证未通过] {url} -> {reason}")
-        print(f"[剔除] {url}")
-        return False
+    if TRUSTED_GET_VERIFY and host in TRUSTED_GET_HOSTS:
+        emit(ev.TRUSTED_GET, url=url, label="受信任源二次GET验证触发", detail="")
+        ok, reason = trusted_verify_single(url)
+        if ok:
+            emit(
+                ev.URL_KEPT,
+                url=url,
+                reason="trusted_get",
+                label="受信任源二次GET验证通过",
+            )
+            return True
+        else:
+            emit(
+                ev.TRUSTED_GET,
+                url=url,
+                label="受信任源二次GET验证未通过",
+                detail=f"-> {reason}",
+            )
+    _reject(ev.URL_REJECTED, url, "no_keyword", "剔除")
+    return False
 
+
+def stage_admit(items: list) -> dict:
+    """URL 规则筛选；候选条目中的 url 会被替换为转换后的形式。"""
+    items = [dict(it) for it in items]
+    neg_cache = get_negative_cache()
     urls = []
+    neg_skipped = 0
     for it in items:
         nu = normalize_url(it.get("url"))
         if not nu:
@@ -1053,10 +1345,22 @@ def main():
         # 应用 GitHub Pages 转换
         converted_url = _convert_github_pages_to_raw(nu)
         it["url"] = converted_url
+        # 负缓存命中：此前已被拒绝且未过期，直接跳过（不再做任何网络验证）
+        if neg_cache.check_url(converted_url):
+            neg_skipped += 1
+            continue
         if is_subscription_url(converted_url):
             urls.append(converted_url)
-    print(f"[统计] 抓取总数: {len(items)}，筛选后订阅数: {len(urls)}")
+    neg_cache.save()
+    print(
+        f"[统计] 抓取总数: {len(items)}，筛选后订阅数: {len(urls)}，负缓存跳过: {neg_skipped}"
+    )
+    return {"cand_items": items, "urls": urls}
+
 
+def stage_merge(urls: list) -> dict:
+    """与历史合并、过负缓存，并按发布者裁剪。"""
+    neg_cache = get_negative_cache()
     hist = load_history(HIST_PATH)
     existing_raw = hist.get("seen", []) or []
     existing = []
@@ -1065,9 +1369,13 @@ def main():
         if nu:
             existing.append(nu)
 
+    # 上次因预算推迟的 URL 排在最前，保持推迟时的先后次序
+    carried = get_deferred_queue().take()
+    if carried:
+        print(f"[预算] 上次推迟的 {len(carried)} 条优先检测")
     merged = []
     seen_urls = set()
-    for u in existing:
+    for u in carried + existing:
         if u and u not in seen_urls:
             merged.append(u)
             seen_urls.add(u)
@@ -1076,154 +1384,87 @@ def main():
             merged.append(u)
             seen_urls.add(u)
 
-    print(f"[统计] 历史合并后待检测: {len(merged)}")
+    # 负缓存只过滤历史之外的链接：历史条目跳过检测会在 ensure_increment 中被记为失败，
+    # 一次内容/HEAD 剔除就可能让原本有效的历史链接在负缓存有效期内累计到淘汰阈值
+    known = set(existing)
+    known.update(normalize_url(u) for u in hist.get("links") or [])
+    fresh, neg_hits = neg_cache.filter_urls([u for u in merged if u not in known])
+    fresh = set(fresh)
+    merged = [u for u in merged if u in known or u in fresh]
+    print(f"[统计] 历史合并后待检测: {len(merged)} (负缓存跳过 {len(neg_hits)})")
     # === 新增：对 merged 列表做 owner 级别裁剪，避免历史累积导致单一发布者资源过多 ===
     PER_OWNER_LIMIT = int(os.environ.get("PER_OWNER_LIMIT", "5"))
 
-    def prune_merged_by_owner(merged_list, hist, limit: int):
-        res_keys = hist.get("resource_keys", {}) or {}
-        # env controls for last-mod sampling during pruning
-        PRUNE_LASTMOD_ENABLE = os.environ.get("PRUNE_LASTMOD_ENABLE", "1") in (
-            "1",
-            "true",
-            "True",
-        )
-        PRUNE_LASTMOD_SAMPLE = int(os.environ.get("PRUNE_LASTMOD_SAMPLE", "10"))
-        PRUNE_LASTMOD_CONCURRENCY = int(
-            os.environ.get("PRUNE_LASTMOD_CONCURRENCY", "6")
-        )
-        PRUNE_LASTMOD_TIMEOUT = int(os.environ.get("PRUNE_LASTMOD_TIMEOUT", "6"))
-        OWNER_LASTMOD_TRIGGER = int(os.environ.get("OWNER_LASTMOD_TRIGGER", "20"))
-
-        # group urls by owner preserving original order
-        owners = {}
-        owner_seq = []
-        for idx, u in enumerate(merged_list):
-            # determine owner via resource_keys if present
-            owner = None
-            try:
-                meta = res_keys.get(u)
-                if meta and meta.get("owner_key"):
-                    owner = meta.get("owner_key")
-            except Exception:
-                owner = None
-            if not owner:
-                try:
-                    owner, _ = get_resource_key(u)
-                except Exception:
-                    owner = "__no_owner__"
-            if owner not in owners:
-                owners[owner] = []
-                owner_seq.append(owner)
-            owners[owner].append((u, idx))
-
-        out = []
-        skipped_total = 0
-
-        for owner in owner_seq:
-            items = owners[owner]
-            if len(items) <= limit:
-                # small owners keep all
-                out.extend([u for u, _ in items])
-                continue
-
-            # If last-mod sampling enabled, sample up to PRUNE_LASTMOD_SAMPLE candidates (head of owner's list)
-            if PRUNE_LASTMOD_ENABLE and len(items) > OWNER_LASTMOD_TRIGGER:
-                # cache TTL for lastmod (seconds)
-                LASTMOD_CACHE_TTL = int(os.environ.get("LASTMOD_CACHE_TTL", "86400"))
-                now_ts = int(time.time())
-                # decide which URLs actually need sampling (missing or stale cache)
-                to_sample = []
-                sample_candidates = [u for u, _ in items[:PRUNE_LASTMOD_SAMPLE]]
-                for u in sample_candidates:
-                    cached = None
-                    try:
-                        cached = hist.get("resource_keys", {}).get(u, {}).get("lastmod")
-                    except Exception:
-                        cached = None
-                    if not cached or (now_ts - int(cached) > LASTMOD_CACHE_TTL):
-                        to_sample.append(u)
-
-                lm_map = {}
-                if to_sample:
-                    # avoid re-sampling same URL globally in this run
-                    try:
-                        lm_map = sample_last_modified(
-                            to_sample,
-                            concurrency=PRUNE_LASTMOD_CONCURRENCY,
-                            timeout=PRUNE_LASTMOD_TIMEOUT,
-                        )
-                    except Exception as e:
-                        print(f"[LastMod采样异常] {e}")
-                        lm_map = {}
-
-                # build enriched list with timestamps from sampled results or cache
-                enriched = []
-                for u, idx in items:
-                    ts = None
-                    if u in lm_map and lm_map[u] is not None:
-                        ts = lm_map[u]
-                        hist.setdefault("resource_keys", {})
-                        hist["resource_keys"].setdefault(u, {})
-                        hist["resource_keys"][u]["lastmod"] = ts
-                    else:
-                        try:
-                            ts = hist.get("resource_keys", {}).get(u, {}).get("lastmod")
-                        except Exception:
-                            ts = None
-                    ts_val = int(ts) if ts else 0
-                    enriched.append((u, ts_val, idx))
-
-                # persist cache to disk to reduce future sampling
-                try:
-                    save_history(hist, HIST_PATH)
-                except Exception as e:
-                    print(f"[保存 LastMod 缓存失败] {e}")
-
-                # sort by lastmod desc, then original index
-                enriched.sort(key=lambda t: (-t[1], t[2]))
-                # choose top N
-                chosen_urls = [t[0] for t in enriched[:limit]]
-                out.extend(chosen_urls)
-                # count skipped items for reporting
-                skipped_total += max(0, len(items) - len(chosen_urls))
-            else:
-                # Fallback when last-mod sampling is disabled or owner list is not large enough for sampling.
-                # Preserve the first `limit` items in original order to avoid accidental data loss.
-                chosen_urls = [u for u, _ in items[:limit]]
-                out.extend(chosen_urls)
-                skipped_total += max(0, len(items) - len(chosen_urls))
-
-        if skipped_total:
-            print(f"[裁剪历史] 共跳过 {skipped_total} 条 (每发布者限 {limit})")
-        return out
-
-    merged_pruned = prune_merged_by_owner(merged, hist, PER_OWNER_LIMIT)
+    # 所有大发布者的 lastmod 采样合并为一次批量刷新，再在内存中做 top-N 选择
+    merged_pruned, skipped_total = prune_by_owner(
+        merged,
+        PER_OWNER_LIMIT,
+        resolve_owner=lambda u: get_resource_key(u)[0],
+        meta_cache=get_meta_cache(),
+        resource_keys=hist.get("resource_keys", {}) or {},
+    )
+    if skipped_total:
+        print(f"[裁剪历史] 共跳过 {skipped_total} 条 (每发布者限 {PER_OWNER_LIMIT})")
     print(f"[统计] 裁剪后待检测数: {len(merged_pruned)} (原始 {len(merged)})")
     merged = merged_pruned
+    if carried:
+        # 裁剪按发布者分组输出，这里把结转条目重新提到最前
+        rank = {u: i for i, u in enumerate(carried)}
+        merged = sorted(merged, key=lambda u: rank.get(u, len(rank)))
     if not merged:
-        print(">>> 无可检测链接，跳过连通性检测和 Gist 上传！")
-        return
+        raise PipelineStop("无可检测链接，跳过连通性检测和 Gist 上传")
+    return {"merged": merged}
 
+
+def _defer(deferred, urls, stage: str) -> list:
+    """把本阶段推迟的 URL 以 [url, stage] 追加到已有的推迟列表。"""
+    out = [list(d) for d in deferred or ()]
+    out += [[u, stage] for u in urls]
+    if urls:
+        print(f"[预算] {stage} 阶段推迟 {len(urls)} 条到下次运行")
+    return out
+
+
+def stage_check(merged: list) -> dict:
     print(">>> 连通性检测…")
-    ok = asyncio.run(check_urls(merged, concurrency=16))
+    budget = stage_budget("check")
+    late = []
+    ok = asyncio.run(
+        check_urls(merged, concurrency=16, deadline=budget.as_timeout(), deferred=late)
+    )
     print(f"[统计] 可用订阅链接: {len(ok)}")
+    return {"reachable": ok, "deferred": _defer((), late, "check")}
+
 
-    filtered_ok, pending = filter_subscription_content(ok)
+def stage_validate(reachable: list, deferred: list = ()) -> dict:
+    """内容校验，获取失败的链接再放宽超时重试一次。"""
+    budget = stage_budget("validate")
+    late = []
+    filtered_ok, pending = filter_subscription_content(
+        reachable, budget=budget, deferred=late
+    )
     print(f"[统计] 内容校验后保留: {len(filtered_ok)} | 待重试: {len(pending)}")
 
     if pending:
         print(">>> 对内容获取失败链接进行二次尝试…")
         retried_ok = []
-        for url in pending:
+        for i, url in enumerate(pending):
+            if budget.expired():
+                late += pending[i:]
+                break
             try:
-                text = fetch_text(url, timeout=45)
-            except Exception:
-                print(f"[二次尝试失败] {url}")
+                text = fetch_text(url, timeout=budget.cap(45))
+            except Exception as e:
+                if budget.expired():
+                    late.append(url)
+                    continue
+                _reject(
+                    ev.CONTENT_REJECTED, url, reason_from_exception(e), "二次尝试失败"
+                )
                 continue
             snippet = text.strip()
             if not snippet:
-                print(f"[二次尝试内容为空] {url}")
+                _reject(ev.CONTENT_REJECTED, url, "empty", "二次尝试内容为空")
                 continue
             lower = snippet.lower()
             if any(
@@ -1242,11 +1483,33 @@ def main():
             ) or _maybe_base64_subscription(snippet):
                 retried_ok.append(url)
             else:
-                print(f"[二次尝试缺少特征] {url}")
+                _reject(
+                    ev.CONTENT_REJECTED, url, "not_subscription", "二次尝试缺少特征"
+                )
         if retried_ok:
             print(f"[统计] 二次尝试成功: {len(retried_ok)}")
             filtered_ok.extend(retried_ok)
+    return {"valid": filtered_ok, "deferred": _defer(deferred, late, "validate")}
+
 
+def _build_cand_map(items: list) -> dict:
+    """url -> {owner, path, keywords, src, mirrors}（items 来自 gather_candidates）。"""
+    cand_map = {}
+    for entry in items:
+        u0 = normalize_url(entry.get("url") or "")
+        if not u0:
+            continue
+        cand_map[u0] = {
+            "owner": entry.get("owner") or "__no_owner__",
+            "path": entry.get("path") or u0,
+            "keywords": entry.get("keywords") or [],
+            "src": entry.get("src"),
+            "mirrors": entry.get("mirrors") or [],
+        }
+    return cand_map
+
+
+def stage_canonical(valid: list, cand_items: list) -> dict:
     # 使用 ensure_increment 对历史进行每日增量/淘汰处理并写回统一的 hist_path
     # ---------------
     # 在写入前执行：
@@ -1258,15 +1521,7 @@ def main():
     # ---------------
 
     # 构建 url -> {owner,path} 映射（items 来自 gather_candidates，包含 owner/path）
-    cand_map = {}
-    for entry in items:
-        u0 = normalize_url(entry.get("url") or "")
-        if not u0:
-            continue
-        cand_map[u0] = {
-            "owner": entry.get("owner") or "__no_owner__",
-            "path": entry.get("path") or u0,
-        }
+    cand_map = _build_cand_map(cand_items)
 
     def strip_known_ext(u: str) -> str:
         low = u.lower()
@@ -1296,7 +1551,8 @@ def main():
 
     # canonicalize 并按 owner+base 分组
     groups = {}
-    for u in filtered_ok:
+    canon_meta = {}
+    for u in valid:
         orig = u
         canon = canonicalize_url(orig)
         meta = (
@@ -1304,6 +1560,7 @@ def main():
             or cand_map.get(normalize_url(canon))
             or {"owner": "__no_owner__", "path": orig}
         )
+        canon_meta.setdefault(canon, meta)
         owner = meta.get("owner") or "__no_owner__"
         base = strip_known_ext(canon)
         groups.setdefault((owner, base), []).append(canon)
@@ -1321,30 +1578,71 @@ def main():
             chosen.append(txts[0])
             for v in lst:
                 if v != txts[0]:
-                    print(f"[发布者同名去重] 保留：{txts[0]}，剔除：{v}")
+                    emit(ev.OWNER_DEDUP, url=v, kept=txts[0], reason="same_name")
             continue
         # 否则按 host 优先级排序
         lst.sort(key=lambda v: (host_rank(v), v))
         chosen.append(lst[0])
         for v in lst[1:]:
-            print(f"[发布者同名去重] 保留：{lst[0]}，剔除：{v}")
+            emit(ev.OWNER_DEDUP, url=v, kept=lst[0], reason="same_name")
+    return {"chosen": chosen, "canon_meta": canon_meta}
 
+
+def stage_head(chosen: list, deferred: list = ()) -> dict:
+    neg_cache = get_negative_cache()
     # 最终 HEAD 检查
     print(">>> 最终可用性校验（HEAD content-type）...")
-    ok_head, removed_head = head_check_urls(chosen, concurrency=16, timeout=15)
+    late = []
+    ok_head, removed_head = head_check_urls(
+        chosen, concurrency=16, timeout=15, budget=stage_budget("head"), deferred=late
+    )
     for u, reason in removed_head:
-        print(f"[可用性剔除] {u} -> {reason}")
+        emit(ev.HEAD_REJECTED, url=u, reason=_head_reject_reason(reason), detail=reason)
+    neg_cache.save()
+    print(f"[负缓存] {neg_cache.stats()}")
 
     # persist removed list for audit
     os.makedirs("output", exist_ok=True)
     removed_file = os.path.join("output", "subs_removed.txt")
     with open(removed_file, "w", encoding="utf-8") as rf:
         for u, reason in removed_head:
-            line = f"[可用性剔除] {u}\t{reason}\n"
-            rf.write(line)
-            print(line, end="")
+            # 控制台输出已由 HEAD_REJECTED 事件负责，这里只写审计文件
+            rf.write(f"[可用性剔除] {u}\t{reason}\n")
     # also persist other rejection logs captured earlier via printed messages is difficult; we ensure
     # filter_subscription_content writes its own logs; here we dump the final removed_head for audit
+    return {
+        "ok_head": ok_head,
+        "removed_head": [list(r) for r in removed_head],
+        "deferred": _defer(deferred, late, "head"),
+    }
+
+
+def stage_increment(
+    ok_head: list,
+    cand_items: list,
+    canon_meta: dict,
+    merged: list = (),
+    deferred: list = (),
+    checked=None,
+) -> dict:
+    """写回历史（每日增量/淘汰）并把有效订阅回溯到关键词与仓库统计。
+
+    checked 见 ensure_increment：为空时本次视为检测了全部历史。deferred（[url, 阶段]）
+    中的条目因预算用尽未完成检测，不计失败，按在 merged 中的次序结转到下次运行。
+    """
+    cand_map = _build_cand_map(cand_items)
+    if deferred:
+        late = [u for u, _ in deferred]
+        skip = set(late)
+        if checked is None:
+            hist = load_history(HIST_PATH)
+            checked = hist.get("links") or hist.get("seen") or []
+        checked = [u for u in checked if u not in skip]
+        queue = get_deferred_queue()
+        for stage in dict.fromkeys(st for _, st in deferred):
+            queue.defer([u for u, st in deferred if st == stage], stage, order=merged)
+        queue.save()
+        print(f"[预算] 结转到下次运行: {queue.stats()}")
 
     # 为历史保存构建 resource_map（url -> {owner_key, base}），便于长期去重追踪
     resource_map = {}
@@ -1357,10 +1655,40 @@ def main():
 
     # 写回历史与输出（把 resource_map 传入 ensure_increment）
     all_urls = ensure_increment(
-        ok_head, HIST_PATH, DAILY_INCREMENT, FAIL_THRESHOLD, resource_map=resource_map
+        ok_head,
+        HIST_PATH,
+        DAILY_INCREMENT,
+        FAIL_THRESHOLD,
+        resource_map=resource_map,
+        meta_cache=get_meta_cache(),
+        checked=checked,
     )
     print(f"[统计] 本次全量覆盖: {len(all_urls)} 条")
+    get_meta_cache().save()
 
+    # 关键词产出：通过最终校验的订阅回溯到关键词
+    kw_stats = get_keyword_stats()
+    repo_stats = get_repo_stats()
+    mirrored = {}
+    for u in ok_head:
+        meta = canon_meta.get(u) or {}
+        for kw in meta.get("keywords") or []:
+            kw_stats.note(kw, valid=1)
+        if meta.get("src"):
+            repo_stats.note_valid(meta["src"])
+        if meta.get("mirrors"):
+            mirrored[meta["src"]] = meta["mirrors"]
+    for src, mirrors in mirrored.items():
+        print(f"[镜像归属] {src} 的有效订阅同时来自: {', '.join(mirrors)}")
+    kw_stats.commit_run()
+    kw_stats.save()
+    repo_stats.commit_run()
+    repo_stats.save()
+    print(f"[仓库统计] {repo_stats.stats()}")
+    return {"all_urls": all_urls}
+
+
+def stage_publish(all_urls: list) -> dict:
     os.makedirs("output", exist_ok=True)
     with open("output/subs_latest.txt", "w", encoding="utf-8") as f:
         f.write("\n".join(all_urls))
@@ -1368,10 +1696,82 @@ def main():
 
     if len(all_urls) == 0:
         print(">>> 订阅链接数量为0，跳过 Gist 上传！")
-        return
+        return {}
 
     ok_up, code = upload_gist_from_file("output/subs_latest.txt")
     print(f">>> Gist上传: {ok_up} ({code})")
+    return {}
+
+
+def build_pipeline(pool, **kw) -> Pipeline:
+    """search → admit → merge → check → validate → canonical → head → increment → publish。"""
+    return Pipeline(
+        [
+            Stage("search", lambda: stage_search(pool), (), {"items": list}),
+            Stage("admit", stage_admit, ("items",), {"cand_items": list, "urls": list}),
+            Stage("merge", stage_merge, ("urls",), {"merged": list}),
+            Stage(
+                "check",
+                stage_check,
+                ("merged",),
+                {"reachable": list, "deferred": list},
+            ),
+            Stage(
+                "validate",
+                stage_validate,
+                ("reachable", "deferred"),
+                {"valid": list, "deferred": list},
+            ),
+            Stage(
+                "canonical",
+                stage_canonical,
+                ("valid", "cand_items"),
+                {"chosen": list, "canon_meta": dict},
+            ),
+            Stage(
+                "head",
+                stage_head,
+                ("chosen", "deferred"),
+                {"ok_head": list, "removed_head": list, "deferred": list},
+            ),
+            Stage(
+                "increment",
+                stage_increment,
+                ("ok_head", "cand_items", "canon_meta", "merged", "deferred"),
+                {"all_urls": list},
+            ),
+            # 发布只是把最终列表写出并上传，续跑时总是重新执行
+            Stage("publish", stage_publish, ("all_urls",), checkpoint=False),
+        ],
+        **kw,
+    )
+
+
+def main():
+    pool = get_token_pool()
+    if not pool:
+        print(
+            "ERROR: no GitHub token in keychain (GITHUB_TOKENS/GITHUB_TOKEN/GIST_TOKEN)."
+        )
+        sys.exit(2)
+    if "--daemon" in sys.argv[1:]:
+        from pipeline.daemon import Daemon
+
+        Daemon(pool).run()
+        return
+    start_run()
+    report = get_run_report()
+    report.reset()
+    profiler = get_profiler()
+    profiler.start_run()
+    try:
+        build_pipeline(pool).run()
+    finally:
+        profiler.finish_run()
+        # 中途失败也写出已完成阶段的报告
+        print(f">>> 已写入运行报告 {report.write(RUN_REPORT_PATH)}")
+        export_run()
+        get_event_log().close()
 
 
 # 新增：在 main() 之前定义资源键提取函数，避免运行时 NameError
@@ -1425,10 +1825,17 @@ def extract_github_owner_repo_path(url: str):
 def get_resource_key(url: str, owner_from_meta: str | None = None):
     """Return a stable (owner_key, base_path) used for deduplication.
     Prefer explicit GitHub owner/repo extraction; fall back to provided owner or host+path base.
+    Authoritative keys (GitHub owner/repo or explicit owner metadata) are memoised in the
+    shared metadata cache so later runs skip canonicalisation.
     """
+    meta_cache = get_meta_cache()
+    cached = meta_cache.get(url)
+    if cached and cached.owner_key and cached.base is not None:
+        return cached.owner_key, cached.base
     canon = canonicalize_url(url)
     owner_repo, base = extract_github_owner_repo_path(canon)
     if owner_repo:
+        meta_cache.upsert(url, owner_key=owner_repo, base=base)
         return owner_repo, base
     # if we have owner metadata from gather_candidates, use it
     if owner_from_meta and owner_from_meta != "__no_owner__":
@@ -1437,9 +1844,10 @@ def get_resource_key(url: str, owner_from_meta: str | None = None):
             p = urlparse(canon)
             rel = (p.path or "").lstrip("/")
             base = rel.rsplit(".", 1)[0] if "." in rel else rel
-            return owner_from_meta, base
         except Exception:
-            return owner_from_meta, canon
+            base = canon
+        meta_cache.upsert(url, owner_key=owner_from_meta, base=base)
+        return owner_from_meta, base
     # generic fallback: host + path base
     try:
         p = urlparse(canon)
@@ -1452,14 +1860,7 @@ def get_resource_key(url: str, owner_from_meta: str | None = None):
 
 
 def _parse_last_modified(h: str):
-    try:
-        from email.utils import parseddate_to_datetime
-
-        dt = parseddate_to_datetime(h)
-        # normalize to timestamp
-        return int(dt.timestamp())
-    except Exception:
-        return None
+    return parse_http_date(h)
 
 
 def _detect_github_info_from_url(url: str) -> tuple:
@@ -1471,13 +1872,13 @@ def _detect_github_info_from_url(url: str) -> tuple:
         p = urlparse(url)
         host = p.netloc.lower()
         path = p.path or ""
-        
+
         # 1. 标准 GitHub Pages: *.github.io
         if host.endswith(".github.io"):
             username = host.replace(".github.io", "")
             if username:
                 return username, f"{username}.github.io", "main", path
-        
+
         # 2. jsdelivr CDN: cdn.jsdelivr.net/gh/user/repo
         if host == "cdn.jsdelivr.net" and path.startswith("/gh/"):
             parts = path[4:].split("/")  # 移除 "/gh/"
@@ -1490,58 +1891,83 @@ def _detect_github_info_from_url(url: str) -> tuple:
                     branch = "main"
                 remaining_path = "/" + "/".join(parts[2:]) if len(parts) > 2 else ""
                 return user, repo, branch, remaining_path
-        
+
         # 3. 其他可能的 GitHub Pages 代理域名
         # 通过路径模式识别：包含 /uploads/YYYY/MM/ 这种典型的 GitHub Pages 模式
         github_page_patterns = [
             r"/uploads/\d{4}/\d{2}/[^/]+\.(txt|yaml|yml)$",  # /uploads/2025/10/file.txt
-            r"/\d{4}/\d{2}/[^/]+\.(txt|yaml|yml)$",           # /2025/10/file.txt  
-            r"/files/[^/]+\.(txt|yaml|yml)$",                 # /files/file.txt
-            r"/raw/[^/]+\.(txt|yaml|yml)$",                   # /raw/file.txt
+            r"/\d{4}/\d{2}/[^/]+\.(txt|yaml|yml)$",  # /2025/10/file.txt
+            r"/files/[^/]+\.(txt|yaml|yml)$",  # /files/file.txt
+            r"/raw/[^/]+\.(txt|yaml|yml)$",  # /raw/file.txt
         ]
-        
+
         for pattern in github_page_patterns:
             if re.search(pattern, path):
                 # 尝试从域名推断 GitHub 用户名
                 # 很多 GitHub Pages 使用自定义域名，但域名通常包含用户名信息
-                
+
                 # 方法1: 提取域名中可能的用户名（去掉常见后缀）
-                domain_parts = host.split('.')
+                domain_parts = host.split(".")
                 if len(domain_parts) >= 2:
                     # 移除常见的CDN/代理标识，尝试多种组合
                     potential_usernames = []
-                    
+
                     # 原始第一部分
                     first_part = domain_parts[0]
-                    
+
                     # 尝试不同的清理方式
                     candidates = [
                         first_part,  # 原始
-                        re.sub(r'^(www|cdn|api|node|free|sub|clash)[-_]?', '', first_part),  # 移除前缀
-                        re.sub(r'[-_]?(node|cc|site|net|page|cdn)$', '', first_part),      # 移除后缀
-                        re.sub(r'^(www|cdn|api|node|free|sub|clash)[-_]?', '', 
-                               re.sub(r'[-_]?(node|cc|site|net|page|cdn)$', '', first_part)) # 移除前缀+后缀
+                        re.sub(
+                            r"^(www|cdn|api|node|free|sub|clash)[-_]?", "", first_part
+                        ),  # 移除前缀
+                        re.sub(
+                            r"[-_]?(node|cc|site|net|page|cdn)$", "", first_part
+                        ),  # 移除后缀
+                        re.sub(
+                            r"^(www|cdn|api|node|free|sub|clash)[-_]?",
+                            "",
+                            re.sub(
+                                r"[-_]?(node|cc|site|net|page|cdn)$", "", first_part
+                            ),
+                        ),  # 移除前缀+后缀
                     ]
-                    
+
                     # 特殊处理：如果是 node.xxxxx.cc 格式，优先使用中间部分作为用户名
                     if len(domain_parts) >= 2:
                         # 对于二级域名，检查第一部分是否为常见前缀
-                        if len(domain_parts) == 3 and first_part in ['node', 'api', 'cdn', 'sub', 'www']:
+                        if len(domain_parts) == 3 and first_part in [
+                            "node",
+                            "api",
+                            "cdn",
+                            "sub",
+                            "www",
+                        ]:
                             middle_part = domain_parts[1]
                             # 将完整的中间部分放在最前面（优先级最高）
                             candidates.insert(0, middle_part)
-                            
+
                         # 对于所有情况，也尝试使用二级域名的第一部分
                         if len(domain_parts) >= 2:
-                            second_level = domain_parts[-2] if len(domain_parts) >= 2 else domain_parts[0]
+                            second_level = (
+                                domain_parts[-2]
+                                if len(domain_parts) >= 2
+                                else domain_parts[0]
+                            )
                             if second_level != first_part:  # 避免重复
                                 candidates.insert(0, second_level)
-                    
+
                     # 选择最佳候选用户名（按优先级顺序）
                     for candidate in candidates:
-                        if candidate and len(candidate) >= 3 and re.match(r'^[a-zA-Z0-9][a-zA-Z0-9_-]*[a-zA-Z0-9]$', candidate):
+                        if (
+                            candidate
+                            and len(candidate) >= 3
+                            and re.match(
+                                r"^[a-zA-Z0-9][a-zA-Z0-9_-]*[a-zA-Z0-9]$", candidate
+                            )
+                        ):
                             return candidate, f"{candidate}.github.io", "main", path
-        
+
         return None, None, None, None
     except Exception:
         return None, None, None, None
@@ -1552,54 +1978,26 @@ def _convert_github_pages_to_raw(url: str) -> str:
     智能转换各种 GitHub Pages 和 CDN 地址为 raw.githubusercontent.com 地址
     支持：
     1. *.github.io
-    2. cdn.jsdelivr.net/gh/user/repo  
+    2. cdn.jsdelivr.net/gh/user/repo
     3. 自定义域名的 GitHub Pages（通过路径模式识别）
     """
     username, repo, branch, path = _detect_github_info_from_url(url)
-    
+
     if username and repo and path:
-        converted_url = f"https://raw.githubusercontent.com/{username}/{repo}/{branch}{path}"
-        print(f"[智能GitHub转换] {url} -> {converted_url}")
+        converted_url = (
+            f"https://raw.githubusercontent.com/{username}/{repo}/{branch}{path}"
+        )
+        emit(ev.CANONICAL_REWRITE, src=url, dst=converted_url, label="智能GitHub转换")
         return converted_url
-    
+
     return url
 
 
 def sample_last_modified(urls, concurrency=8, timeout=6):
     """并发对一组 URL 做 HEAD（回退 GET）请求，提取 Last-Modified header 的时间戳。
-    返回 dict: url -> unix_ts 或 None
+    结果写入共享的元数据缓存；返回 dict: url -> unix_ts 或 None
     """
-    import concurrent.futures
-
-    import requests
-
-    sess = requests.Session()
-    sess.headers.update({"User-Agent": "sub-hunter/lastmod/1.0"})
-
-    def _one(u: str):
-        try:
-            r = sess.head(u, allow_redirects=True, timeout=timeout)
-        except Exception:
-            try:
-                r = sess.get(u, allow_redirects=True, stream=True, timeout=timeout)
-            except Exception:
-                return u, None
-        lm = r.headers.get("Last-Modified") or r.headers.get("last-modified")
-        if lm:
-            ts = _parse_last_modified(lm)
-            return u, ts
-        return u, None
-
-    out = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as ex:
-        futs = {ex.submit(_one, u): u for u in urls}
-        for fut in concurrent.futures.as_completed(futs):
-            try:
-                u, ts = fut.result()
-            except Exception:
-                u, ts = futs.get(fut, "<unknown>"), None
-            out[u] = ts
-    return out
+    return get_meta_cache().refresh(urls, concurrency=concurrency, timeout=timeout)
 
 
 # Ensure script entrypoint exists so running the file executes main()
@@ -0,0 +1,288 @@
+"""守护进程模式：进程常驻，按各自间隔执行 发现 / 复检 / 发布 三类任务。
+
+- discovery: 搜索并抽取候选，只检测历史中没有的新链接（连同上次因预算推迟的条目），
+             通过的增量写入历史
+- recheck:   按游标每次复检一批历史链接，只更新这一批的失败计数
+- publish:   历史有变化时写出 output/subs_latest.txt 并上传 Gist
+
+连接池（utils.http_client 共享 Session）、DNS 缓存、各类缓存与历史在进程内常驻；
+每个任务结束后持久化缓存。SIGTERM/SIGINT 时让当前任务的运行时限立即到期（进行中的
+阶段停止领取新工作），并在阶段之间放弃剩余阶段后退出；再次收到信号则立即中止当前任务。
+两种情况都会在退出前保存状态。每个任务结束后写出该任务的运行
+报告（RUN_REPORT_PATH 加任务名后缀，如 output/run_report.discovery.json）并更新
+Prometheus 指标（METRICS_TEXTFILE；METRICS_PORT 非 0 时另提供本地 /metrics 端点）。
+"""
+
+import hashlib
+import os
+import signal
+
+from config import (
+    DAEMON_DISCOVERY_MINUTES,
+    DAEMON_DNS_TTL,
+    DAEMON_PUBLISH_MINUTES,
+    DAEMON_RECHECK_BATCH,
+    DAEMON_RECHECK_MINUTES,
+    DAILY_INCREMENT,
+    FAIL_THRESHOLD,
+    HIST_PATH,
+    METRICS_ADDR,
+    METRICS_PORT,
+    RUN_REPORT_PATH,
+)
+from pipeline.engine import PipelineStop
+from pipeline.scheduler import Job, Scheduler
+from storage.deferred import get_deferred_queue
+from storage.history import ensure_increment, keep_resident, load_history
+from utils.deadline import expire_run, start_run
+from utils.events import get_event_log
+from utils.metrics import export_run, get_metrics
+from utils.profiling import get_profiler, profile_stage
+from utils.run_report import get_run_report
+
+
+def _default_stores():
+    from storage.keyword_stats import get_keyword_stats
+    from storage.meta_cache import get_meta_cache
+    from storage.negative_cache import get_negative_cache
+    from storage.repo_stats import get_repo_stats
+
+    return [
+        get_deferred_queue(),
+        get_negative_cache(),
+        get_meta_cache(),
+        get_keyword_stats(),
+        get_repo_stats(),
+    ]
+
+
+class Daemon:
+    def __init__(
+        self,
+        pool,
+        flow=None,
+        hist_path: str = HIST_PATH,
+        recheck_batch: int = DAEMON_RECHECK_BATCH,
+        stores=None,
+        report_path: str = RUN_REPORT_PATH,
+    ):
+        if flow is None:
+            import main_extract_fast as flow
+        self.pool = pool
+        # 提供 stage_* 阶段函数的模块（默认 main_extract_fast）
+        self.flow = flow
+        self.hist_path = hist_path
+        self.recheck_batch = max(1, recheck_batch)
+        self.recheck_cursor = 0
+        self.published_digest = None
+        self._stores = stores
+        # 为空时不写运行报告
+        self.report_path = report_path
+        self.scheduler = Scheduler(
+            [
+                Job("discovery", DAEMON_DISCOVERY_MINUTES * 60, self.discover),
+                # 复检与发布错开启动，先让发现任务跑完第一轮
+                Job("recheck", DAEMON_RECHECK_MINUTES * 60, self.recheck, delay=60),
+                Job("publish", DAEMON_PUBLISH_MINUTES * 60, self.publish, delay=120),
+            ]
+        )
+        self.scheduler.before_job = self._before_job
+        self.scheduler.after_job = self._after_job
+
+    # ---- 任务 ----
+    def discover(self):
+        # 每个任务各自按 RUN_DEADLINE_MINUTES 计时
+        start_run()
+        try:
+            self._discover()
+        except PipelineStop as e:
+            print(f"[守护] 发现任务提前结束: {e}")
+
+    def _discover(self):
+        flow = self.flow
+        try:
+            items = self._stage("search", flow.stage_search, self.pool)["items"]
+        except PipelineStop as e:
+            if self.scheduler.stopping:
+                raise
+            # 没有新候选时仍检测上次推迟的条目
+            print(f"[守护] 发现任务无候选: {e}")
+            items = []
+        if items:
+            admitted = self._stage("admit", flow.stage_admit, items)
+        else:
+            admitted = {"cand_items": [], "urls": []}
+        known = set(load_history(self.hist_path).get("links") or [])
+        queue = get_deferred_queue()
+        # 上次因预算推迟的新链接排在最前，保持推迟时的先后次序
+        carried = [u for u in queue.take() if u not in known]
+        fresh = [u for u in admitted["urls"] if u not in known]
+        new = list(dict.fromkeys(carried + fresh))
+        print(
+            f"[守护] 新候选 {len(fresh)} 条（历史已有 {len(admitted['urls']) - len(fresh)}，"
+            f"上次推迟 {len(carried)}）"
+        )
+        if not new:
+            return
+        try:
+            checked = self._stage("check", flow.stage_check, new)
+            out = self._stage(
+                "validate",
+                flow.stage_validate,
+                checked["reachable"],
+                checked["deferred"],
+            )
+            canon = self._stage(
+                "canonical", flow.stage_canonical, out["valid"], admitted["cand_items"]
+            )
+            head = self._stage(
+                "head", flow.stage_head, canon["chosen"], out["deferred"]
+            )
+        except PipelineStop:
+            # 被打断时取出的推迟条目放回队列，下次发现任务继续检测
+            queue.defer(carried, "check", order=carried)
+            raise
+        # 只追加新链接，不触碰已有条目的失败计数；推迟的新链接结转到下次
+        self._stage(
+            "increment",
+            flow.stage_increment,
+            head["ok_head"],
+            admitted["cand_items"],
+            canon["canon_meta"],
+            merged=new,
+            deferred=head["deferred"],
+            checked=(),
+        )
+
+    def next_recheck_batch(self) -> list:
+        links = load_history(self.hist_path).get("links") or []
+        if not links:
+            return []
+        if self.recheck_cursor >= len(links):
+            self.recheck_cursor = 0
+        batch = links[self.recheck_cursor : self.recheck_cursor + self.recheck_batch]
+        self.recheck_cursor += len(batch)
+        return batch
+
+    def recheck(self):
+        batch = self.next_recheck_batch()
+        if not batch:
+            return
+        start_run()
+        try:
+            self._recheck(batch)
+        except PipelineStop as e:
+            print(f"[守护] 复检任务提前结束: {e}")
+
+    def _recheck(self, batch: list):
+        flow = self.flow
+        checked = self._stage("check", flow.stage_check, batch)
+        out = self._stage(
+            "validate", flow.stage_validate, checked["reachable"], checked["deferred"]
+        )
+        if out["valid"]:
+            head = self._stage("head", flow.stage_head, out["valid"], out["deferred"])
+        else:
+            head = {"ok_head": [], "deferred": out["deferred"]}
+        if self.scheduler.stopping:
+            # 中途被打断的一批不写回失败计数，下一轮轮转到时重新复检
+            raise PipelineStop("收到退出信号，本批不计失败")
+        ok_head = head["ok_head"]
+        # 预算用尽未检测完的条目不计失败，下一轮轮转到时再复检
+        late = {u for u, _ in head["deferred"]}
+        final = ensure_increment(
+            ok_head,
+            self.hist_path,
+            DAILY_INCREMENT,
+            FAIL_THRESHOLD,
+            checked=[u for u in batch if u not in late],
+        )
+        print(f"[守护] 复检 {len(batch)} 条，通过 {len(ok_head)}，历史 {len(final)} 条")
+
+    def publish(self):
+        links = load_history(self.hist_path).get("links") or []
+        digest = hashlib.sha256("\n".join(links).encode("utf-8")).hexdigest()
+        if digest == self.published_digest:
+            print("[守护] 历史无变化，跳过发布")
+            return
+        self.flow.stage_publish(links)
+        self.published_digest = digest
+
+    def _stage(self, name: str, fn, *args, **kwargs):
+        """执行一个阶段函数并计入运行报告（输入条数按第一个列表参数计）。
+
+        已收到退出信号时不再开始新阶段，抛出 PipelineStop。
+        """
+        if self.scheduler.stopping:
+            raise PipelineStop(f"收到退出信号，跳过 {name} 及之后的阶段")
+        report = get_run_report()
+        first = args[0] if args and isinstance(args[0], list) else None
+        report.begin_stage(name, {"items": first} if first is not None else None)
+        try:
+            with profile_stage(name):
+                out = fn(*args, **kwargs)
+        except PipelineStop:
+            report.end_stage("stopped")
+            raise
+        except BaseException:
+            report.end_stage("failed")
+            raise
+        report.end_stage("ran", out if isinstance(out, dict) else None)
+        return out
+
+    # ---- 生命周期 ----
+    def _before_job(self, job: Job):
+        get_run_report().reset()
+        get_profiler().start_run()
+
+    def _after_job(self, job: Job):
+        get_profiler().finish_run()
+        self.persist()
+        if self.report_path:
+            root, ext = os.path.splitext(self.report_path)
+            try:
+                get_run_report().write(f"{root}.{job.name}{ext}")
+            except OSError as e:
+                print(f"[守护] 运行报告写出失败: {e}")
+        export_run()
+        get_event_log().close()
+
+    def persist(self):
+        stores = self._stores if self._stores is not None else _default_stores()
+        for store in stores:
+            try:
+                store.save()
+            except Exception as e:
+                print(f"[守护] 状态保存失败 {type(store).__name__}: {e}")
+
+    def _on_signal(self, signum, frame):
+        if self.scheduler.stopping:
+            print("[守护] 再次收到退出信号，立即中止当前任务")
+            raise SystemExit(128 + signum)
+        print("[守护] 收到退出信号，当前阶段收尾后退出")
+        self.scheduler.stop()
+        # 进行中的阶段按预算用尽处理：停止领取新工作，尽快返回
+        expire_run()
+
+    def run(self):
+        if DAEMON_DNS_TTL > 0:
+            from utils import dns_cache
+
+            dns_cache.install(DAEMON_DNS_TTL)
+        keep_resident(True)
+        if METRICS_PORT > 0:
+            get_metrics().serve(METRICS_PORT, METRICS_ADDR)
+            print(f"[守护] 指标端点 http://{METRICS_ADDR}:{METRICS_PORT}/metrics")
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        print(
+            "[守护] 已启动："
+            + ", ".join(
+                f"{j.name} 每 {j.interval / 60:g} 分钟" for j in self.scheduler.jobs
+            )
+        )
+        try:
+            self.scheduler.run_forever()
+        finally:
+            self.persist()
+            print("[守护] 状态已保存，退出")
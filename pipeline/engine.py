@@ -0,0 +1,176 @@
+"""按阶段执行的流水线：每个阶段声明输入键与带类型的输出键，完成后把输出写成检查点。
+
+检查点目录下的 manifest 记录本次运行的状态与各阶段输入指纹：
+
+    {"started": ts, "status": "running" | "done", "stages": {name: {"fingerprint", "ts"}}}
+
+上一次运行未完成（status=running 且未超过 max_age）时，重跑会复用输入指纹一致的阶段
+检查点，从第一个输入发生变化或尚未完成的阶段继续；上一次已完成则清空检查点从头运行。
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+from config import CHECKPOINT_DIR, CHECKPOINT_MAX_AGE_HOURS, PIPELINE_RESUME
+from storage.serializer import dump_file, load_file
+from utils.profiling import profile_stage
+from utils.run_report import get_run_report
+
+MANIFEST = "manifest"
+
+
+class PipelineStop(Exception):
+    """阶段主动结束整条流水线（例如没有候选可继续处理），视为正常完成。"""
+
+
+class StageOutputError(TypeError):
+    """阶段返回的输出缺少声明的键或类型不符。"""
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[..., Dict[str, Any]]
+    # 从上下文中取出、按同名关键字参数传给 fn 的键
+    inputs: Tuple[str, ...] = ()
+    # 输出键 -> 类型；fn 返回的 dict 必须包含这些键
+    outputs: Dict[str, type] = field(default_factory=dict)
+    # 发布等纯副作用阶段不写检查点，续跑时总会重新执行
+    checkpoint: bool = True
+
+    def check_outputs(self, out) -> Dict[str, Any]:
+        if out is None:
+            out = {}
+        if not isinstance(out, dict):
+            raise StageOutputError(f"阶段 {self.name} 应返回 dict，实际 {type(out)}")
+        for key, typ in self.outputs.items():
+            if key not in out:
+                raise StageOutputError(f"阶段 {self.name} 缺少输出 {key}")
+            if not isinstance(out[key], typ):
+                raise StageOutputError(
+                    f"阶段 {self.name} 输出 {key} 类型应为 {typ.__name__}，"
+                    f"实际 {type(out[key]).__name__}"
+                )
+        return out
+
+
+def fingerprint(name: str, inputs: Dict[str, Any]) -> str:
+    raw = json.dumps(
+        {"stage": name, "inputs": inputs},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Pipeline:
+    def __init__(
+        self,
+        stages: List[Stage],
+        checkpoint_dir: str = CHECKPOINT_DIR,
+        resume: bool = PIPELINE_RESUME,
+        max_age_hours: float = CHECKPOINT_MAX_AGE_HOURS,
+    ):
+        names = [s.name for s in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"阶段名重复: {names}")
+        self.stages = stages
+        self.checkpoint_dir = checkpoint_dir
+        self.resume = resume
+        self.max_age = max_age_hours * 3600
+        # 最近一次 run() 中各阶段的结果：ran / resumed / stopped
+        self.trace: List[Tuple[str, str]] = []
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{name}.ckpt")
+
+    def _load_manifest(self) -> Dict[str, Any] | None:
+        try:
+            return load_file(self._path(MANIFEST))
+        except Exception as e:
+            print(f"[流水线] manifest 读取失败，从头运行: {e}")
+            return None
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        dump_file(manifest, self._path(MANIFEST))
+
+    def reset(self):
+        """删除全部检查点。"""
+        if not os.path.isdir(self.checkpoint_dir):
+            return
+        for fn in os.listdir(self.checkpoint_dir):
+            if fn.endswith(".ckpt"):
+                os.remove(os.path.join(self.checkpoint_dir, fn))
+
+    def _start(self, now: int) -> Dict[str, Any]:
+        manifest = self._load_manifest() if self.resume else None
+        if (
+            manifest
+            and manifest.get("status") == "running"
+            and now - int(manifest.get("started", 0)) < self.max_age
+        ):
+            done = ", ".join(manifest.get("stages") or {}) or "无"
+            print(f"[流水线] 续跑未完成的运行（已完成阶段: {done}）")
+            return manifest
+        self.reset()
+        manifest = {"started": now, "status": "running", "stages": {}}
+        self._save_manifest(manifest)
+        return manifest
+
+    def run(self, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """依次执行各阶段，返回包含所有阶段输出的上下文。"""
+        ctx = dict(context or {})
+        self.trace = []
+        manifest = self._start(int(time.time()))
+        report = get_run_report()
+        for st in self.stages:
+            missing = [k for k in st.inputs if k not in ctx]
+            if missing:
+                raise KeyError(f"阶段 {st.name} 缺少输入: {missing}")
+            inputs = {k: ctx[k] for k in st.inputs}
+            fp = fingerprint(st.name, inputs)
+            rec = manifest["stages"].get(st.name)
+            if st.checkpoint and rec and rec.get("fingerprint") == fp:
+                try:
+                    out = st.check_outputs(load_file(self._path(st.name)))
+                except Exception as e:
+                    print(f"[流水线] 阶段 {st.name} 检查点不可用，重新执行: {e}")
+                else:
+                    print(f"[流水线] 阶段 {st.name} 输入未变，复用检查点")
+                    ctx.update(out)
+                    report.begin_stage(st.name, inputs)
+                    report.end_stage("resumed", out)
+                    self.trace.append((st.name, "resumed"))
+                    continue
+            t0 = time.time()
+            report.begin_stage(st.name, inputs)
+            try:
+                with profile_stage(st.name):
+                    out = st.check_outputs(st.fn(**inputs))
+            except PipelineStop as e:
+                report.end_stage("stopped")
+                print(f"[流水线] 阶段 {st.name} 结束流水线: {e}")
+                self.trace.append((st.name, "stopped"))
+                break
+            except BaseException:
+                report.end_stage("failed")
+                raise
+            report.end_stage("ran", out)
+            ctx.update(out)
+            self.trace.append((st.name, "ran"))
+            print(f"[流水线] 阶段 {st.name} 完成，用时 {time.time() - t0:.1f}s")
+            if st.checkpoint:
+                dump_file(out, self._path(st.name))
+                manifest["stages"][st.name] = {
+                    "fingerprint": fp,
+                    "ts": int(time.time()),
+                }
+                self._save_manifest(manifest)
+        manifest["status"] = "done"
+        self._save_manifest(manifest)
+        return ctx
@@ -0,0 +1,81 @@
+"""守护进程内部调度器：若干个按固定间隔执行的任务，在同一线程里依次运行。
+
+任务串行执行，避免多个任务同时改写历史与缓存；某个任务异常时记录日志并按
+间隔的 1/4（至少 60 秒）提前重试，不影响其它任务。
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float
+    fn: Callable[[], object]
+    # 首次执行相对启动时刻的延迟（秒）
+    delay: float = 0.0
+    next_run: float = field(default=0.0, compare=False)
+    runs: int = 0
+    failures: int = 0
+    last_error: str = ""
+
+
+class Scheduler:
+    def __init__(self, jobs: List[Job], clock=time.monotonic):
+        self.jobs = jobs
+        self.clock = clock
+        self._stop = threading.Event()
+        # 每个任务开始前 / 执行完后调用（例如重置运行报告、持久化缓存）
+        self.before_job: Callable[[Job], object] | None = None
+        self.after_job: Callable[[Job], object] | None = None
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def run_pending(self) -> List[str]:
+        """执行所有已到期的任务，返回执行过的任务名。"""
+        ran = []
+        for job in sorted(self.jobs, key=lambda j: j.next_run):
+            if self._stop.is_set() or job.next_run > self.clock():
+                continue
+            self._run(job)
+            ran.append(job.name)
+        return ran
+
+    def _run(self, job: Job):
+        t0 = self.clock()
+        print(f"[调度] 开始任务 {job.name}")
+        if self.before_job is not None:
+            self.before_job(job)
+        try:
+            job.fn()
+        except Exception as e:
+            job.failures += 1
+            job.last_error = repr(e)
+            job.next_run = self.clock() + max(60.0, job.interval / 4)
+            print(f"[调度] 任务 {job.name} 失败: {e!r}")
+        else:
+            job.runs += 1
+            job.next_run = t0 + job.interval
+            print(f"[调度] 任务 {job.name} 完成，用时 {self.clock() - t0:.1f}s")
+        if self.after_job is not None:
+            self.after_job(job)
+
+    def run_forever(self):
+        start = self.clock()
+        for job in self.jobs:
+            job.next_run = start + job.delay
+        while not self._stop.is_set():
+            self.run_pending()
+            if self._stop.is_set():
+                break
+            wait = min(j.next_run for j in self.jobs) - self.clock()
+            if wait > 0:
+                self._stop.wait(wait)
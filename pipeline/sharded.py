@@ -0,0 +1,324 @@
+"""分片执行：多个 worker（可跨进程、跨机器）经共享工作队列分担抓取与检测。
+
+- 协调者（coordinator）按原流水线执行，把两个重活拆成分片任务登记到队列：
+    crawl:    仓库按 full_name 一致性哈希分片，worker 抓取 README / 文件树并抽取候选
+    validate: 候选 URL 按规范化 URL 一致性哈希分片，worker 做连通性检测与内容校验
+  其余阶段（admit / merge / canonical / head / increment / publish）仍由协调者执行，
+  历史只由协调者按 ensure_increment 的语义写回。协调者默认也作为一个 worker 参与处理。
+- worker 循环领取分片、处理、提交结果；分片租约过期（worker 崩溃）后由其它 worker 接手。
+
+用法：
+
+    python -m pipeline.sharded coordinator [--no-work]
+    python -m pipeline.sharded worker [--id NAME] [--exit-when-idle]
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+from config import (
+    CHECKPOINT_DIR,
+    CHECKPOINT_MAX_AGE_HOURS,
+    METRICS_ADDR,
+    METRICS_PORT,
+    RUN_REPORT_PATH,
+    SHARD_LEASE_SECONDS,
+    SHARD_POLL_SECONDS,
+)
+from filters.extract import clear_prefetched
+from pipeline.engine import Pipeline, PipelineStop, Stage, fingerprint
+from pipeline.workqueue import HashRing, WorkQueue
+from utils.deadline import stage_budget, start_run
+from utils.events import get_event_log
+from utils.metrics import export_run, get_metrics
+from utils.profiling import get_profiler
+from utils.run_report import get_run_report
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _flow():
+    import main_extract_fast
+
+    return main_extract_fast
+
+
+class Worker:
+    def __init__(
+        self,
+        queue: WorkQueue,
+        worker_id: str = None,
+        flow=None,
+        token=None,
+        lease: float = SHARD_LEASE_SECONDS,
+        retry_after: float = SHARD_POLL_SECONDS,
+    ):
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        # 提供 crawl_repos / stage_check / stage_validate 的模块（默认 main_extract_fast）
+        self.flow = flow or _flow()
+        self.token = token
+        self.lease = lease
+        # 处理失败的分片隔多久可再被领取，避免反复失败时空转
+        self.retry_after = retry_after
+        # 处理过的分片号：再次领取时优先同号分片，复用本机缓存
+        self.affinity = set()
+        self.handlers = {"crawl": self.crawl_shard, "validate": self.validate_shard}
+        # 当前处理的运行号：换到新一轮运行时清空上一轮的预取内容
+        self.run_id = None
+
+    # ---- 分片处理 ----
+    def crawl_shard(self, tasks: dict) -> dict:
+        repos = [p["repo"] for p in tasks.values()]
+        keywords = {k: p.get("keywords") or [] for k, p in tasks.items()}
+        items = self.flow.crawl_repos(
+            repos, self.token, keywords, budget=stage_budget("search")
+        )
+        out = {k: [] for k in tasks}
+        for it in items:
+            src = it.get("src")
+            out[src if src in out else next(iter(out))].append(it)
+        return out
+
+    def validate_shard(self, tasks: dict) -> dict:
+        """u -> True / False；因预算用尽推迟的为 None。"""
+        urls = list(tasks)
+        checked = self.flow.stage_check(urls)
+        out = self.flow.stage_validate(checked["reachable"], checked["deferred"])
+        valid = set(out["valid"])
+        late = {u for u, _ in out["deferred"]}
+        return {u: None if u in late else u in valid for u in urls}
+
+    # ---- 领取循环 ----
+    def _heartbeat(self, claim, done: threading.Event):
+        while not done.wait(self.lease / 3):
+            if not self.queue.renew(*claim, self.worker_id, self.lease):
+                print(f"[分片] {self.worker_id} 租约已被接手: {claim}")
+                return
+
+    def run_once(self) -> bool:
+        """领取并处理一个分片；没有可领取的分片时返回 False。"""
+        claim = self.queue.claim(self.worker_id, self.lease, prefer=self.affinity)
+        if claim is None:
+            return False
+        run, kind, shard = claim
+        if run != self.run_id:
+            clear_prefetched()
+            self.run_id = run
+        tasks = self.queue.tasks(run, kind, shard)
+        print(f"[分片] {self.worker_id} 领取 {kind} 分片 {shard}（{len(tasks)} 项）")
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(claim, done), daemon=True)
+        beat.start()
+        try:
+            results = self.handlers[kind](tasks) if tasks else {}
+        except Exception as e:
+            print(f"[分片] {self.worker_id} 处理 {kind} 分片 {shard} 失败: {e!r}")
+            self.queue.release(run, kind, shard, self.worker_id, self.retry_after)
+            return True
+        except BaseException:
+            self.queue.release(run, kind, shard, self.worker_id)
+            raise
+        finally:
+            done.set()
+            beat.join()
+        if self.queue.complete(run, kind, shard, self.worker_id, results):
+            self.affinity.add(shard)
+        else:
+            print(
+                f"[分片] {self.worker_id} 分片 {shard} 已由其它 worker 提交，丢弃结果"
+            )
+        return True
+
+    def run(self, exit_when_idle: bool = False, poll: float = SHARD_POLL_SECONDS):
+        print(f"[分片] worker {self.worker_id} 已启动，队列 {self.queue.path}")
+        while True:
+            if self.run_once():
+                continue
+            if exit_when_idle:
+                return
+            time.sleep(poll)
+
+
+class Coordinator:
+    def __init__(
+        self,
+        queue: WorkQueue,
+        pool,
+        flow=None,
+        ring: HashRing = None,
+        work: bool = True,
+        poll: float = SHARD_POLL_SECONDS,
+    ):
+        self.queue = queue
+        self.pool = pool
+        self.flow = flow or _flow()
+        self.ring = ring or HashRing()
+        self.poll = poll
+        # work=True 时协调者也作为一个 worker 处理分片
+        self.worker = Worker(queue, flow=self.flow, token=pool) if work else None
+
+    def _run_sharded(self, kind: str, tasks: dict, budget, shard_key=None) -> dict:
+        """登记任务并等待全部分片完成，返回 key -> 结果。
+
+        run 取任务集合的指纹：协调者中途退出后以相同输入重跑时，已完成的分片直接复用。
+        budget 用尽时不再等待，只返回已提交的结果（未完成分片的 key 不在结果中）。
+        """
+        run = f"{kind}-{fingerprint(kind, {'keys': sorted(tasks)})[:16]}"
+        n = self.queue.enqueue(run, kind, tasks, self.ring, shard_key=shard_key)
+        print(f"[分片] {kind}: {len(tasks)} 项 -> {n} 个分片 (run {run})")
+        while True:
+            left = self.queue.remaining(run, kind)
+            if not left:
+                break
+            if budget.expired():
+                print(f"[预算] {kind}: 时限用尽，放弃等待 {left} 个分片")
+                break
+            if self.worker is not None and self.worker.run_once():
+                continue
+            print(f"[分片] {kind}: 等待 {left} 个分片完成…")
+            time.sleep(self.poll)
+        results = self.queue.results(run, kind)
+        self.queue.drop(run)
+        return results
+
+    # ---- 替换原流水线中的阶段 ----
+    def stage_plan(self) -> dict:
+        repos, repo_keywords = self.flow.plan_repos(self.pool)
+        return {"repos": repos, "repo_keywords": repo_keywords}
+
+    def stage_crawl(self, repos: list, repo_keywords: dict) -> dict:
+        tasks = {}
+        for repo in repos:
+            full = repo.get("full_name")
+            if full and full not in tasks:
+                tasks[full] = {"repo": repo, "keywords": repo_keywords.get(full, [])}
+        budget = stage_budget("search")
+        results = self._run_sharded("crawl", tasks, budget) if tasks else {}
+        # 按规划顺序（预期产出从高到低）拼接，再做跨分片的发布者/URL 去重
+        found = [it for full in tasks for it in results.get(full) or []]
+        items = self.flow.dedup_candidates(found)
+        print(f">>> 分片抓取合并后候选: {len(items)}")
+        if not items:
+            raise PipelineStop("去重后结果为0，跳过连通性检测和 Gist 上传")
+        return {"items": items}
+
+    def stage_validate(self, merged: list) -> dict:
+        tasks = {u: None for u in merged}
+        results = (
+            # 各分片内 check / validate 仍按各自的阶段预算执行，这里只受整次运行时限约束
+            self._run_sharded(
+                "validate",
+                tasks,
+                stage_budget("sharded_validate"),
+                shard_key=self.flow.canonicalize_url,
+            )
+            if tasks
+            else {}
+        )
+        valid = [u for u in merged if results.get(u)]
+        late = [[u, "validate"] for u in merged if results.get(u) is None]
+        print(f"[统计] 分片检测后有效: {len(valid)} / {len(merged)}，推迟 {len(late)}")
+        return {"valid": valid, "deferred": late}
+
+    def build_pipeline(self, **kw) -> Pipeline:
+        """在原流水线上把 search 换成 plan + crawl，把 check + validate 换成分片校验。"""
+        pipe = self.flow.build_pipeline(self.pool, **kw)
+        stages = []
+        for st in pipe.stages:
+            if st.name == "search":
+                stages += [
+                    Stage(
+                        "plan",
+                        self.stage_plan,
+                        (),
+                        {"repos": list, "repo_keywords": dict},
+                    ),
+                    Stage(
+                        "crawl",
+                        self.stage_crawl,
+                        ("repos", "repo_keywords"),
+                        {"items": list},
+                    ),
+                ]
+            elif st.name == "check":
+                continue
+            elif st.name == "validate":
+                stages.append(
+                    Stage(
+                        "validate",
+                        self.stage_validate,
+                        ("merged",),
+                        {"valid": list, "deferred": list},
+                    )
+                )
+            else:
+                stages.append(st)
+        pipe.stages = stages
+        return pipe
+
+    def run(self, **kw):
+        stale = self.queue.purge(CHECKPOINT_MAX_AGE_HOURS * 3600)
+        if stale:
+            print(f"[分片] 清理过期任务 {stale} 批")
+        # 阶段与单进程流水线不同，检查点单独存放
+        kw.setdefault("checkpoint_dir", os.path.join(CHECKPOINT_DIR, "sharded"))
+        return self.build_pipeline(**kw).run()
+
+
+def _main(argv):
+    from utils.token_pool import get_token_pool
+
+    ap = argparse.ArgumentParser(prog="python -m pipeline.sharded")
+    ap.add_argument("--queue", default=None, help="工作队列 SQLite 文件")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    co = sub.add_parser("coordinator", help="执行流水线并把抓取/检测分片给 worker")
+    co.add_argument("--no-work", action="store_true", help="协调者自身不处理分片")
+    wk = sub.add_parser("worker", help="循环领取并处理分片")
+    wk.add_argument("--id", default=None)
+    wk.add_argument("--exit-when-idle", action="store_true")
+    sub.add_parser("status", help="查看队列中各批任务的进度")
+    args = ap.parse_args(argv)
+
+    queue = WorkQueue(args.queue) if args.queue else WorkQueue()
+    if args.cmd == "status":
+        for run, kind, total, left in queue.stats():
+            print(f"{run}\t{kind}\t分片 {total}\t未完成 {left}")
+        return
+    pool = get_token_pool()
+    if not pool:
+        print(
+            "ERROR: no GitHub token in keychain (GITHUB_TOKENS/GITHUB_TOKEN/GIST_TOKEN)."
+        )
+        sys.exit(2)
+    if args.cmd == "coordinator":
+        start_run()
+        report = get_run_report()
+        report.reset()
+        profiler = get_profiler()
+        profiler.start_run()
+        try:
+            Coordinator(queue, pool, work=not args.no_work).run()
+        finally:
+            profiler.finish_run()
+            # 其它 worker 处理分片时的请求计数留在各自进程中，不在此报告内
+            print(f">>> 已写入运行报告 {report.write(RUN_REPORT_PATH)}")
+            export_run()
+            get_event_log().close()
+    else:
+        # 常驻 worker 不受整次运行时限约束，各分片仍按阶段预算执行
+        start_run(0)
+        if METRICS_PORT > 0:
+            get_metrics().serve(METRICS_PORT, METRICS_ADDR)
+            print(f"[指标] http://{METRICS_ADDR}:{METRICS_PORT}/metrics")
+        Worker(queue, args.id, token=pool).run(exit_when_idle=args.exit_when_idle)
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
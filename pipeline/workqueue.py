@@ -0,0 +1,272 @@
+"""分片执行用的共享工作队列（SQLite 文件）与一致性哈希环。
+
+任务按 key（仓库 full_name 或规范化 URL）经一致性哈希落到固定数量的分片上，worker
+以分片为单位领取：领取时写入带过期时间的租约，处理完在同一事务中写回结果并把分片
+标记为完成。租约只能由持有者提交，worker 崩溃后租约到期，分片会被其它 worker 重新
+领取；同一分片的结果最多提交一次。
+
+表结构：
+
+    shards(run, kind, shard, worker, lease_until, done, created)
+    tasks(run, kind, key, shard, payload, result, done)
+
+payload / result 为 JSON 文本。每次连接单独打开，可在多线程、多进程间共享同一文件。
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import SHARD_COUNT, SHARD_QUEUE_PATH, SHARD_VNODES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    run TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    worker TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    PRIMARY KEY (run, kind, shard)
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    run TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    payload TEXT,
+    result TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run, kind, key)
+);
+CREATE INDEX IF NOT EXISTS tasks_shard ON tasks (run, kind, shard);
+"""
+
+
+def _hash(s: str) -> int:
+    return int.from_bytes(hashlib.sha1(s.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """一致性哈希环：每个分片在环上放 vnodes 个虚拟节点，key 顺时针落到最近的节点。
+
+    调整分片数时只有少量 key 改变归属，同一仓库/URL 在各次运行中稳定落在同一分片，
+    领取同号分片的 worker 能复用本机的负缓存与元数据缓存。
+    """
+
+    def __init__(self, shards: int = SHARD_COUNT, vnodes: int = SHARD_VNODES):
+        if shards < 1:
+            raise ValueError("shards 至少为 1")
+        self.shards = shards
+        points = sorted(
+            (_hash(f"shard-{s}#{v}"), s)
+            for s in range(shards)
+            for v in range(max(1, vnodes))
+        )
+        self._keys = [h for h, _ in points]
+        self._owners = [s for _, s in points]
+
+    def shard_for(self, key: str) -> int:
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+
+class WorkQueue:
+    def __init__(self, path: str = SHARD_QUEUE_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _conn(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA busy_timeout=30000")
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _tx(self):
+        """写事务：BEGIN IMMEDIATE 先拿写锁，避免两个 worker 同时领取同一分片。"""
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # ---- 协调者 ----
+    def enqueue(
+        self,
+        run: str,
+        kind: str,
+        tasks: Dict[str, object],
+        ring: HashRing,
+        shard_key: Optional[Callable[[str], str]] = None,
+    ) -> int:
+        """登记一批任务，返回涉及的分片数。已存在的 (run, kind, key) 保持原状。"""
+        now = self.clock()
+        rows = []
+        for key, payload in tasks.items():
+            shard = ring.shard_for(shard_key(key) if shard_key else key)
+            rows.append(
+                (run, kind, key, shard, json.dumps(payload, ensure_ascii=False))
+            )
+        shards = sorted({r[3] for r in rows})
+        with self._tx() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (run, kind, key, shard, payload)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO shards (run, kind, shard, created)"
+                " VALUES (?, ?, ?, ?)",
+                [(run, kind, s, now) for s in shards],
+            )
+        return len(shards)
+
+    def remaining(self, run: str, kind: str) -> int:
+        with self._conn() as conn:
+            (n,) = conn.execute(
+                "SELECT COUNT(*) FROM shards WHERE run=? AND kind=? AND done=0",
+                (run, kind),
+            ).fetchone()
+        return n
+
+    def results(self, run: str, kind: str) -> Dict[str, object]:
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT key, result FROM tasks WHERE run=? AND kind=? AND done=1",
+                (run, kind),
+            ).fetchall()
+        return {k: json.loads(r) for k, r in rows}
+
+    def drop(self, run: str):
+        """删除一次运行的全部任务（协调者取走结果后调用）。"""
+        with self._tx() as conn:
+            conn.execute("DELETE FROM tasks WHERE run=?", (run,))
+            conn.execute("DELETE FROM shards WHERE run=?", (run,))
+
+    def purge(self, max_age: float) -> int:
+        """删除创建超过 max_age 秒的运行（协调者中途退出后遗留的任务）。"""
+        cutoff = self.clock() - max_age
+        with self._tx() as conn:
+            runs = [
+                r
+                for (r,) in conn.execute(
+                    "SELECT DISTINCT run FROM shards WHERE created < ?", (cutoff,)
+                )
+            ]
+            for run in runs:
+                conn.execute("DELETE FROM tasks WHERE run=?", (run,))
+                conn.execute("DELETE FROM shards WHERE run=?", (run,))
+        return len(runs)
+
+    # ---- worker ----
+    def claim(
+        self, worker: str, lease: float, prefer: Iterable[int] = ()
+    ) -> Optional[Tuple[str, str, int]]:
+        """领取一个未完成且无有效租约的分片，返回 (run, kind, shard)。
+
+        优先最早登记的运行；同一运行内优先 prefer 中的分片（该 worker 之前处理过的）。
+        """
+        prefer = set(prefer)
+        now = self.clock()
+        with self._tx() as conn:
+            rows = conn.execute(
+                "SELECT run, kind, shard, created FROM shards"
+                " WHERE done=0 AND lease_until < ? ORDER BY created, run, kind, shard",
+                (now,),
+            ).fetchall()
+            if not rows:
+                return None
+            first = rows[0][3], rows[0][0], rows[0][1]
+            same = [r for r in rows if (r[3], r[0], r[1]) == first]
+            run, kind, shard, _ = next((r for r in same if r[2] in prefer), same[0])
+            conn.execute(
+                "UPDATE shards SET worker=?, lease_until=?"
+                " WHERE run=? AND kind=? AND shard=?",
+                (worker, now + lease, run, kind, shard),
+            )
+        return run, kind, shard
+
+    def renew(self, run: str, kind: str, shard: int, worker: str, lease: float):
+        """延长租约；租约已被他人接手时返回 False。"""
+        with self._tx() as conn:
+            cur = conn.execute(
+                "UPDATE shards SET lease_until=?"
+                " WHERE run=? AND kind=? AND shard=? AND worker=? AND done=0",
+                (self.clock() + lease, run, kind, shard, worker),
+            )
+        return cur.rowcount == 1
+
+    def release(
+        self, run: str, kind: str, shard: int, worker: str, retry_after: float = 0
+    ):
+        """放弃租约（处理失败时），分片 retry_after 秒后可被重新领取。"""
+        with self._tx() as conn:
+            conn.execute(
+                "UPDATE shards SET worker=NULL, lease_until=?"
+                " WHERE run=? AND kind=? AND shard=? AND worker=? AND done=0",
+                (self.clock() + retry_after, run, kind, shard, worker),
+            )
+
+    def tasks(self, run: str, kind: str, shard: int) -> Dict[str, object]:
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT key, payload FROM tasks"
+                " WHERE run=? AND kind=? AND shard=? AND done=0 ORDER BY rowid",
+                (run, kind, shard),
+            ).fetchall()
+        return {k: json.loads(p) for k, p in rows}
+
+    def complete(
+        self,
+        run: str,
+        kind: str,
+        shard: int,
+        worker: str,
+        results: Dict[str, object],
+    ) -> bool:
+        """提交分片结果并标记完成；租约已不属于 worker（超时被接手）时丢弃并返回 False。"""
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT worker, done FROM shards WHERE run=? AND kind=? AND shard=?",
+                (run, kind, shard),
+            ).fetchone()
+            if not row or row[0] != worker or row[1]:
+                return False
+            conn.executemany(
+                "UPDATE tasks SET result=? WHERE run=? AND kind=? AND key=? AND shard=?",
+                [
+                    (json.dumps(v, ensure_ascii=False), run, kind, k, shard)
+                    for k, v in results.items()
+                ],
+            )
+            for table in ("tasks", "shards"):
+                conn.execute(
+                    f"UPDATE {table} SET done=1 WHERE run=? AND kind=? AND shard=?",
+                    (run, kind, shard),
+                )
+        return True
+
+    def stats(self) -> List[Tuple[str, str, int, int]]:
+        """[(run, kind, 分片数, 未完成分片数)]"""
+        with self._conn() as conn:
+            return conn.execute(
+                "SELECT run, kind, COUNT(*), SUM(done=0) FROM shards"
+                " GROUP BY run, kind ORDER BY MIN(created)"
+            ).fetchall()
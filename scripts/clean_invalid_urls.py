@@ -7,7 +7,6 @@
 3. GitHub 非订阅页面
 """
 
-import json
 import os
 import sys
 from urllib.parse import urlparse, parse_qs
@@ -17,6 +16,7 @@ import re
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main_extract_fast import _is_valid_token, _validate_subscription_url_params
+from storage.serializer import dump_file, load_file
 
 def is_valid_subscription_url(url: str) -> bool:
     """检查 URL 是否为有效的订阅链接"""
@@ -74,13 +74,11 @@ def clean_history_file(filepath: str):
     
     print(f"正在清理历史文件: {filepath}")
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_file(filepath)
     
-    # 备份原始数据
+    # 备份原始数据（保持人类可读的 JSON）
     backup_path = filepath + '.backup'
-    with open(backup_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    dump_file(data, backup_path, fmt='json')
     print(f"已备份原始数据到: {backup_path}")
     
     original_seen_count = len(data.get('seen', []))
@@ -115,8 +113,7 @@ def clean_history_file(filepath: str):
         print(f"fail: {original_fail_count} -> {len(valid_fail)} (-{original_fail_count - len(valid_fail)})")
     
     # 保存清理后的数据
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    dump_file(data, filepath)
     
     print(f"✅ 历史文件清理完成: {filepath}")
 
@@ -3,7 +3,6 @@
 更新历史数据中的 GitHub Pages 地址为 raw.githubusercontent.com 格式
 """
 
-import json
 import os
 import sys
 
@@ -11,6 +10,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main_extract_fast import _convert_github_pages_to_raw, canonicalize_url
+from storage.serializer import dump_file, load_file
 
 def update_history_urls(filepath: str):
     """更新历史文件中的 GitHub Pages 地址"""
@@ -21,13 +21,11 @@ def update_history_urls(filepath: str):
     
     print(f"正在更新历史文件: {filepath}")
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_file(filepath)
     
-    # 备份原始数据
+    # 备份原始数据（保持人类可读的 JSON）
     backup_path = filepath + '.url_update_backup'
-    with open(backup_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    dump_file(data, backup_path, fmt='json')
     print(f"已备份原始数据到: {backup_path}")
     
     conversion_count = 0
@@ -77,8 +75,7 @@ def update_history_urls(filepath: str):
         data['fail'] = updated_fail
     
     # 保存更新后的数据
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    dump_file(data, filepath)
     
     print(f"✅ URL 更新完成，共转换了 {conversion_count} 个地址")
 
@@ -0,0 +1,87 @@
+"""因阶段预算用尽而推迟的 URL，结转到下一次运行优先检测。
+
+priority 为条目在推迟它的那次运行待检测列表中的相对位置（0 最靠前）；下次运行
+take() 按 priority 取出并排在待检测列表最前面，原有的先后次序保持不变。
+"""
+
+import threading
+import time
+
+from config import DEFERRED_PATH
+from storage.serializer import dump_file, load_file
+
+
+class DeferredQueue:
+    def __init__(self, path: str = None):
+        self.path = path
+        # url -> {"priority": float, "stage": str, "ts": int, "runs": int}
+        self.entries: dict[str, dict] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def defer(self, urls, stage: str, order=None):
+        """推迟一批 URL；order 为本次运行的待检测列表，用于计算 priority。"""
+        rank = {u: i for i, u in enumerate(order or [])}
+        total = max(1, len(rank))
+        now = int(time.time())
+        with self._lock:
+            for i, u in enumerate(urls):
+                prev = self.entries.get(u) or {}
+                self.entries[u] = {
+                    "priority": rank.get(u, total + i) / total,
+                    "stage": stage,
+                    "ts": prev.get("ts", now),
+                    "runs": prev.get("runs", 0) + 1,
+                }
+            if urls:
+                self.dirty = True
+
+    def take(self) -> list:
+        """按 priority 取出全部推迟的 URL 并清空。"""
+        with self._lock:
+            urls = sorted(self.entries, key=lambda u: self.entries[u]["priority"])
+            if urls:
+                self.entries = {}
+                self.dirty = True
+        return urls
+
+    def stats(self) -> dict:
+        by_stage = {}
+        for ent in self.entries.values():
+            by_stage[ent["stage"]] = by_stage.get(ent["stage"], 0) + 1
+        return {"entries": len(self.entries), "by_stage": by_stage}
+
+    def load(self):
+        try:
+            data = load_file(self.path)
+        except Exception as e:
+            print(f"[推迟队列读取失败] {self.path} -> {e}")
+            return self
+        if data:
+            self.entries = {
+                k: dict(v)
+                for k, v in (data.get("entries") or {}).items()
+                if isinstance(v, dict)
+            }
+        self.dirty = False
+        return self
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        dump_file({"ts": int(time.time()), "entries": self.entries}, self.path)
+        self.dirty = False
+
+
+_default_queue = None
+
+
+def get_deferred_queue() -> DeferredQueue:
+    """进程内共享的推迟队列（首次调用时从 DEFERRED_PATH 加载）。"""
+    global _default_queue
+    if _default_queue is None:
+        _default_queue = DeferredQueue(DEFERRED_PATH).load()
+    return _default_queue
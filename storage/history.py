@@ -1,7 +1,12 @@
-import json
+import copy
 import os
 import time
 
+from storage.meta_cache import get_meta_cache
+from storage.reserve_archive import ReserveArchive, archive_path_for
+from storage.serializer import dump_file, load_file
+from utils.metrics import get_metrics
+
 HIST_FILE = "storage/history.json"
 
 # Control automatic history backups. Default: disabled to avoid unexpected .bak files.
@@ -12,6 +17,22 @@ ENABLE_HISTORY_BACKUP = os.environ.get("ENABLE_HISTORY_BACKUP", "false").lower()
     "yes",
 )
 
+# 常驻模式（守护进程）：按文件签名缓存已解析的历史，文件未变化时不再读盘解码
+_resident = {}
+_resident_enabled = False
+
+
+def keep_resident(enabled: bool = True):
+    global _resident_enabled
+    _resident_enabled = enabled
+    if not enabled:
+        _resident.clear()
+
+
+def _signature(p: str):
+    st = os.stat(p)
+    return (st.st_mtime_ns, st.st_size)
+
 
 def load_history(path: str = None):
     """读取历史文件，path 为空时使用模块默认 HIST_FILE。
@@ -30,20 +51,27 @@ def load_history(path: str = None):
             # 新增：resource_keys 用于记录每个 URL 的资源键（owner/repo/base 等），方便长期去重
             "resource_keys": {},
         }
-    with open(p, "r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-        except Exception:
-            # 损坏的历史文件以安全默认替代
-            return {
-                "seen": [],
-                "links": [],
-                "last_total": 0,
-                "ts": int(time.time()),
-                "fail": {},
-                "reserve": [],
-                "resource_keys": {},
-            }
+    key = os.path.abspath(p)
+    if _resident_enabled and key in _resident:
+        sig, cached = _resident[key]
+        if sig == _signature(p):
+            # 返回副本：调用方会就地修改后再 save_history
+            return copy.deepcopy(cached)
+    try:
+        data = load_file(p)
+        if not isinstance(data, dict):
+            raise ValueError("history root is not an object")
+    except Exception:
+        # 损坏的历史文件以安全默认替代
+        return {
+            "seen": [],
+            "links": [],
+            "last_total": 0,
+            "ts": int(time.time()),
+            "fail": {},
+            "reserve": [],
+            "resource_keys": {},
+        }
     # 兼容处理：保证字段存在
     if "seen" not in data and "links" in data:
         data["seen"] = data.get("links", [])
@@ -55,14 +83,18 @@ def load_history(path: str = None):
     data.setdefault("reserve", [])
     # 确保 resource_keys 字段存在并为 dict
     data.setdefault("resource_keys", {})
+    if _resident_enabled:
+        _resident[key] = (_signature(p), copy.deepcopy(data))
     return data
 
 
 def save_history(data: dict, path: str = None):
+    """写回历史文件；格式由 STORAGE_FORMAT 决定（见 storage.serializer）。"""
     p = path or HIST_FILE
-    os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
-    with open(p, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    dump_file(data, p)
+    get_metrics().observe_history(data)
+    if _resident_enabled:
+        _resident[os.path.abspath(p)] = (_signature(p), copy.deepcopy(data))
 
 
 def update_all(history: dict, items: list[str], path: str = None):
@@ -93,6 +125,8 @@ def ensure_increment(
     daily_increment: int,
     fail_threshold: int,
     resource_map: dict = None,
+    meta_cache=None,
+    checked=None,
 ) -> list:
     """按每日增量/失败阈值更新历史并返回最终保留列表。
 
@@ -100,18 +134,34 @@ def ensure_increment(
     - 读取 hist_path（若不存在则初始化空历史结构）
     - 对历史列表中的每个已有 url：
         - 若在本次 valid 中出现：保留，并清除失败计数
-        - 否则失败计数 +1；若失败计数 >= fail_threshold 则移入 reserve（删除），否则仍保留
+        - 否则失败计数 +1；若失败计数 >= fail_threshold 则移入淘汰归档（删除），否则仍保留
     - 将本次 valid 中未包含在最终保留中的新 url 作为候选，按 daily_increment 限额追加到最终列表
-    - 更新并写回 hist_path
+    - 更新并写回 hist_path；被淘汰的 url 连同时间与原因写入同目录的淘汰归档
+      （storage.reserve_archive），不再每次导出 reserve-<ts>.json
+
+    meta_cache 为空时使用共享的元数据缓存（storage.meta_cache），lastmod 优先从中读取。
+
+    checked 非空时为增量模式：只有 checked 中的已有条目视为本次检测过，其余条目
+    原样保留、失败计数不变（守护进程按批次轮转复检历史时使用）。
     """
     # 读取目标历史
     hist = load_history(hist_path)
     # 兼容字段
     current_links = hist.get("links") or hist.get("seen") or []
     fail_map = hist.get("fail", {})
-    reserve = hist.get("reserve", [])
     resource_keys = hist.get("resource_keys", {})
+    if meta_cache is None:
+        meta_cache = get_meta_cache()
+    archive = ReserveArchive(archive_path_for(hist_path)).load()
+    run_started = int(time.time())
+    legacy_reserve = list(hist.get("reserve", []) or [])
+    # 旧版 history 内的 reserve 列表一次性迁入归档
+    for u in legacy_reserve:
+        if u and u not in archive:
+            archive.retire(u, "legacy", ts=hist.get("ts"))
 
+    if checked is not None:
+        checked = set(checked)
     # 规范化 valid
     valid_set = []
     seen_set = set()
@@ -128,15 +178,18 @@ def ensure_increment(
             final.append(url)
             if url in fail_map:
                 del fail_map[url]
+        elif checked is not None and url not in checked:
+            # 本批未检测，保持原状
+            final.append(url)
         else:
             # 本次检测未命中，失败计数+1
             fail_map[url] = int(fail_map.get(url, 0)) + 1
             if fail_map[url] < fail_threshold:
                 final.append(url)
             else:
-                # 淘汰并放到 reserve
-                if url not in reserve:
-                    reserve.append(url)
+                # 淘汰并写入归档
+                archive.retire(url, "fail_threshold", fails=fail_map[url])
+                del fail_map[url]
 
     # 2) 新增的有效链接按 daily_increment 限额追加
     to_add = []
@@ -157,6 +210,11 @@ def ensure_increment(
     for u in final:
         if u in resource_map:
             resource_keys[u] = resource_map[u]
+            meta_cache.upsert(
+                u,
+                owner_key=resource_map[u].get("owner_key"),
+                base=resource_map[u].get("base"),
+            )
         else:
             # 保持原有映射（若存在），否则不新增空映射
             resource_keys.setdefault(u, resource_keys.get(u))
@@ -178,12 +236,13 @@ def ensure_increment(
                 or (resource_map.get(u) or {}).get("owner_key")
                 or u
             )
-            # lastmod 支持多个来源：resource_keys cache 优先，其次 resource_map
-            lastmod = None
-            try:
-                lastmod = meta.get("lastmod")
-            except Exception:
-                lastmod = None
+            # lastmod 支持多个来源：元数据缓存优先，其次 resource_keys，再次 resource_map
+            lastmod = meta_cache.lastmod(u) or None
+            if not lastmod:
+                try:
+                    lastmod = meta.get("lastmod")
+                except Exception:
+                    lastmod = None
             if not lastmod and u in resource_map:
                 try:
                     lastmod = resource_map[u].get("lastmod")
@@ -195,7 +254,7 @@ def ensure_increment(
                 lastmod_val = 0
             owner_map.setdefault(owner_key, []).append((u, lastmod_val))
 
-        # 对每个 owner 保留 per_owner_limit 条最新的，其余移入 reserve
+        # 对每个 owner 保留 per_owner_limit 条最新的，其余移入淘汰归档
         to_remove = set()
         for owner, items in owner_map.items():
             if len(items) <= per_owner_limit:
@@ -206,25 +265,28 @@ def ensure_increment(
             for u, _ in items_sorted[per_owner_limit:]:
                 to_remove.add(u)
         if to_remove:
-            # 移到 reserve 并从 final 中删除
+            # 写入归档并从 final 中删除
+            owner_of = {u: o for o, lst in owner_map.items() for u, _ in lst}
+            final = [u for u in final if u not in to_remove]
             for u in to_remove:
-                if u in final:
-                    final.remove(u)
-                    reserve.append(u)
+                archive.retire(u, "owner_limit", owner_key=owner_of.get(u))
             # 更新统计
             # Note: we do not decrement last_total here because last_total reflects final length
             # but we update last_total below when writing.
             # 将 resource_keys 中被移除的项保留（以便后续复原或审计）
             print(
-                f"[历史压缩] 根据 lastmod 每发布者保留 {per_owner_limit} 条，移除 {len(to_remove)} 条至 reserve"
+                f"[历史压缩] 根据 lastmod 每发布者保留 {per_owner_limit} 条，移除 {len(to_remove)} 条至淘汰归档"
             )
 
+    # 重新变为可用的 url 不再留在归档中
+    for u in final:
+        archive.discard(u)
+
     # 3) 更新历史结构并写回
     hist["seen"] = final
     hist["links"] = final
     hist["last_total"] = len(final)
     hist["fail"] = fail_map
-    hist["reserve"] = reserve
     hist["resource_keys"] = resource_keys
     hist["ts"] = int(time.time())
 
@@ -242,16 +304,21 @@ def ensure_increment(
             pass
     except Exception as e:
         print(f"[历史备份失败] {e}")
-    save_history(hist, hist_path)
-    # export reserve list for audit
+    # 先写归档，成功后才清空 history 中的 reserve：归档写入失败时，旧 reserve 与本次
+    # 淘汰的 url 仍留在 history 的 reserve 里，下次运行重新迁入，不会丢失
     try:
-        if hist.get("reserve"):
-            reserve_path = os.path.join(
-                os.path.dirname(hist_path) or ".", f"reserve-{int(time.time())}.json"
-            )
-            with open(reserve_path, "w", encoding="utf-8") as rf:
-                json.dump(hist.get("reserve", []), rf, ensure_ascii=False, indent=2)
-            print(f"[历史保留导出] 已导出 reserve 到: {reserve_path}")
+        dropped = archive.apply_retention()
+        archive.save()
+        print(f"[淘汰归档] {archive.stats()} (按保留策略清理 {dropped} 条)")
+        # reserve 已迁入淘汰归档，history 中仅保留空列表以兼容旧读取方
+        hist["reserve"] = []
     except Exception as e:
-        print(f"[导出 reserve 失败] {e}")
+        print(f"[淘汰归档写入失败] {e}")
+        retired = [
+            u
+            for u, ent in archive.entries.items()
+            if int(ent.get("retired_at", 0)) >= run_started
+        ]
+        hist["reserve"] = list(dict.fromkeys(legacy_reserve + retired))
+    save_history(hist, hist_path)
     return final
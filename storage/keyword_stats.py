@@ -0,0 +1,116 @@
+"""关键词产出统计：记录每次运行中各关键词 搜到的仓库 -> 抽取的候选 -> 验证通过的订阅 数量。
+
+运行中先由 note_* 累积到 current，运行结束 commit_run() 写入每个关键词的滚动历史：
+
+    {"runs": {kw: [[ts, repos, candidates, valid], ...]}}
+"""
+
+import threading
+import time
+
+from config import KEYWORD_HISTORY_RUNS, KEYWORD_STATS_PATH
+from storage.serializer import dump_file, load_file
+
+
+class KeywordStats:
+    def __init__(self, path: str = None, history_runs: int = KEYWORD_HISTORY_RUNS):
+        self.path = path
+        self.history_runs = history_runs
+        self.runs: dict[str, list] = {}
+        # 本次运行的累积值 kw -> [repos, candidates, valid]
+        self.current: dict[str, list] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    # ---- 本次运行累积 ----
+    def _cur(self, kw: str) -> list:
+        return self.current.setdefault(kw, [0, 0, 0])
+
+    def note_queried(self, keywords):
+        """登记本次实际搜索过的关键词（即使零产出也要记一笔）。"""
+        with self._lock:
+            for kw in keywords:
+                self._cur(kw)
+
+    def note(self, kw: str, repos: int = 0, candidates: int = 0, valid: int = 0):
+        with self._lock:
+            cur = self._cur(kw)
+            cur[0] += repos
+            cur[1] += candidates
+            cur[2] += valid
+
+    def commit_run(self, ts: int = None) -> int:
+        """把本次累积写入历史并清空，返回记录的关键词数。"""
+        ts = int(ts or time.time())
+        with self._lock:
+            for kw, (repos, cands, valid) in self.current.items():
+                hist = self.runs.setdefault(kw, [])
+                hist.append([ts, repos, cands, valid])
+                if self.history_runs > 0:
+                    del hist[: -self.history_runs]
+            n = len(self.current)
+            self.current = {}
+            if n:
+                self.dirty = True
+        return n
+
+    # ---- 查询 ----
+    def run_count(self, kw: str) -> int:
+        return len(self.runs.get(kw, []))
+
+    def last_run(self, kw: str) -> int:
+        hist = self.runs.get(kw)
+        return int(hist[-1][0]) if hist else 0
+
+    def recent_yield(self, kw: str, n: int = None):
+        """最近 n 次运行的平均有效订阅数；没有历史时返回 None。"""
+        hist = self.runs.get(kw)
+        if not hist:
+            return None
+        hist = hist[-n:] if n else hist
+        return sum(r[3] for r in hist) / len(hist)
+
+    def summary(self) -> dict:
+        out = {}
+        for kw, hist in self.runs.items():
+            out[kw] = {
+                "runs": len(hist),
+                "repos": sum(r[1] for r in hist),
+                "candidates": sum(r[2] for r in hist),
+                "valid": sum(r[3] for r in hist),
+                "avg_valid": round(self.recent_yield(kw) or 0.0, 2),
+            }
+        return out
+
+    # ---- 持久化 ----
+    def load(self):
+        try:
+            data = load_file(self.path)
+        except Exception as e:
+            print(f"[关键词统计读取失败] {self.path} -> {e}")
+            return self
+        if data:
+            self.runs = {
+                kw: [list(r) for r in hist]
+                for kw, hist in (data.get("runs") or {}).items()
+                if isinstance(hist, list)
+            }
+        self.dirty = False
+        return self
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        dump_file({"ts": int(time.time()), "runs": self.runs}, self.path)
+        self.dirty = False
+
+
+_default_stats = None
+
+
+def get_keyword_stats() -> KeywordStats:
+    """进程内共享的关键词统计（首次调用时从 KEYWORD_STATS_PATH 加载）。"""
+    global _default_stats
+    if _default_stats is None:
+        _default_stats = KeywordStats(KEYWORD_STATS_PATH).load()
+    return _default_stats
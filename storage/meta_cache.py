@@ -0,0 +1,343 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import re
+import threading
+import time
+import urllib.parse
+from dataclasses import asdict, dataclass, fields
+
+from config import (
+    LASTMOD_CACHE_TTL,
+    META_CACHE_IDLE_DAYS,
+    META_CACHE_MAX_ENTRIES,
+    META_CACHE_PATH,
+)
+from storage.serializer import dump_file, load_file
+from utils.http_client import resolve_url
+from utils.rate_limiter import limiter
+from utils.run_report import get_run_report
+
+try:
+    import aiohttp  # type: ignore[reportMissingImports]
+except Exception:
+    aiohttp = None  # type: ignore
+
+UA = "sub-hunter/lastmod/1.0"
+
+_NODE_LINE_RE = re.compile(
+    r"(?im)^\s*(?:-\s*\{?\s*name\s*:|(?:vmess|vless|trojan|ssr?|hysteria2?|tuic)://)"
+)
+
+
+@dataclass
+class ResourceMeta:
+    """单个 URL 的资源元数据。"""
+
+    owner_key: str | None = None
+    base: str | None = None
+    lastmod: int | None = None
+    etag: str | None = None
+    digest: str | None = None
+    nodes: int | None = None
+    # 最近一次刷新 lastmod/etag 的时间（用于 TTL 判断）
+    checked_at: int = 0
+    # 最近一次被读取/写入的时间（用于淘汰）
+    touched_at: int = 0
+
+
+_FIELDS = tuple(f.name for f in fields(ResourceMeta))
+
+
+def parse_http_date(value: str):
+    """解析 Last-Modified 等 HTTP 日期头，返回 unix 时间戳或 None。"""
+    try:
+        from email.utils import parsedate_to_datetime
+
+        return int(parsedate_to_datetime(value).timestamp())
+    except Exception:
+        return None
+
+
+def content_fingerprint(text: str):
+    """返回 (内容摘要, 节点数估计)，节点数按协议行与 Clash `- name:` 条目计数。"""
+    digest = hashlib.sha1((text or "").encode("utf-8", "ignore")).hexdigest()
+    return digest, len(_NODE_LINE_RE.findall(text or ""))
+
+
+def _host(url: str) -> str:
+    return urllib.parse.urlsplit(url).hostname or ""
+
+
+class MetaCache:
+    """URL -> ResourceMeta 的持久化缓存。
+
+    - TTL：lastmod/etag 超过 ttl 秒未刷新视为过期，由 refresh() 批量异步刷新
+    - 淘汰：保存时丢弃 idle_days 天未访问的条目，超出 max_entries 时按最近访问时间淘汰
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        ttl: int = LASTMOD_CACHE_TTL,
+        max_entries: int = META_CACHE_MAX_ENTRIES,
+        idle_days: int = META_CACHE_IDLE_DAYS,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.idle_days = idle_days
+        self.entries: dict[str, ResourceMeta] = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    # ---- 读写 ----
+    def get(self, url: str, touch: bool = True):
+        ent = self.entries.get(url)
+        get_run_report().cache("meta", ent is not None)
+        if ent is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if touch:
+            ent.touched_at = int(time.time())
+        return ent
+
+    def upsert(self, url: str, **values) -> ResourceMeta:
+        now = int(time.time())
+        with self._lock:
+            ent = self.entries.get(url)
+            if ent is None:
+                ent = ResourceMeta()
+                self.entries[url] = ent
+            for k, v in values.items():
+                if k in _FIELDS and v is not None:
+                    setattr(ent, k, v)
+            ent.touched_at = now
+            self.dirty = True
+        return ent
+
+    def lastmod(self, url: str) -> int:
+        ent = self.get(url)
+        return int(ent.lastmod) if ent and ent.lastmod else 0
+
+    def is_stale(self, url: str, now: int = None) -> bool:
+        ent = self.entries.get(url)
+        if not ent or not ent.checked_at:
+            return True
+        return (now or int(time.time())) - ent.checked_at > self.ttl
+
+    def stale(self, urls) -> list:
+        now = int(time.time())
+        return [u for u in urls if self.is_stale(u, now)]
+
+    def import_resource_keys(self, resource_keys: dict) -> int:
+        """把历史文件中旧的 resource_keys 映射并入缓存（仅补齐缺失字段）。"""
+        n = 0
+        for u, meta in (resource_keys or {}).items():
+            if not isinstance(meta, dict):
+                continue
+            ent = self.entries.get(u)
+            if ent is None:
+                ent = ResourceMeta(touched_at=int(time.time()))
+                self.entries[u] = ent
+                n += 1
+            for k in ("owner_key", "base", "lastmod"):
+                if getattr(ent, k) is None and meta.get(k) is not None:
+                    setattr(ent, k, meta.get(k))
+        if n:
+            self.dirty = True
+        return n
+
+    # ---- 批量刷新 lastmod/etag ----
+    def _apply(self, url: str, status, lastmod_hdr, etag) -> int | None:
+        now = int(time.time())
+        if status is None:
+            return None
+        ent = self.upsert(url, checked_at=now)
+        if status == 304:
+            return ent.lastmod
+        if lastmod_hdr:
+            ts = parse_http_date(lastmod_hdr)
+            if ts:
+                ent.lastmod = ts
+        if etag:
+            ent.etag = etag
+        return ent.lastmod
+
+    async def _refresh_async(
+        self, urls, concurrency: int, timeout: int, host_concurrency: int
+    ):
+        sem = asyncio.Semaphore(max(1, concurrency))
+        host_sems: dict[str, asyncio.Semaphore] = {}
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with aiohttp.ClientSession(
+            trust_env=True, headers={"User-Agent": UA}
+        ) as session:
+
+            async def one(u: str):
+                ent = self.entries.get(u)
+                headers = {"If-None-Match": ent.etag} if ent and ent.etag else {}
+                host = _host(u)
+                hsem = host_sems.setdefault(
+                    host, asyncio.Semaphore(max(1, host_concurrency))
+                )
+                async with sem, hsem:
+                    for method in ("HEAD", "GET"):
+                        # 遵循 config.rate_limits 中的按 host 速率计划
+                        await limiter.acquire_async(host)
+                        try:
+                            async with session.request(
+                                method,
+                                resolve_url(u),
+                                headers=headers,
+                                allow_redirects=True,
+                                timeout=client_timeout,
+                            ) as r:
+                                limiter.feedback(host, r.status, r.headers)
+                                return (
+                                    u,
+                                    r.status,
+                                    r.headers.get("Last-Modified"),
+                                    r.headers.get("ETag"),
+                                )
+                        except Exception:
+                            continue
+                return u, None, None, None
+
+            return await asyncio.gather(*[one(u) for u in urls])
+
+    def _refresh_threads(self, urls, concurrency: int, timeout: int):
+        import requests
+
+        sess = requests.Session()
+        sess.headers.update({"User-Agent": UA})
+
+        def one(u: str):
+            ent = self.entries.get(u)
+            headers = {"If-None-Match": ent.etag} if ent and ent.etag else {}
+            limiter.acquire(_host(u))
+            try:
+                r = sess.head(
+                    resolve_url(u),
+                    headers=headers,
+                    allow_redirects=True,
+                    timeout=timeout,
+                )
+            except Exception:
+                limiter.acquire(_host(u))
+                try:
+                    r = sess.get(
+                        resolve_url(u),
+                        headers=headers,
+                        allow_redirects=True,
+                        stream=True,
+                        timeout=timeout,
+                    )
+                except Exception:
+                    return u, None, None, None
+            limiter.feedback(_host(u), r.status_code, r.headers)
+            return (
+                u,
+                r.status_code,
+                r.headers.get("Last-Modified"),
+                r.headers.get("ETag"),
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as ex:
+            return list(ex.map(one, urls))
+
+    def refresh(
+        self,
+        urls,
+        concurrency: int = 8,
+        timeout: int = 6,
+        host_concurrency: int = 4,
+    ) -> dict:
+        """对一批 URL 并发做 HEAD（回退 GET），带 If-None-Match 条件请求。
+        总并发受 concurrency 限制，同一 host 额外受 host_concurrency 与限速器约束。
+        返回 dict: url -> lastmod 时间戳或 None。
+        """
+        urls = list(dict.fromkeys(u for u in urls if u))
+        if not urls:
+            return {}
+        if aiohttp is None:
+            rows = self._refresh_threads(urls, concurrency, timeout)
+        else:
+            coro_args = (urls, concurrency, timeout, host_concurrency)
+            try:
+                asyncio.get_running_loop()
+                running = True
+            except RuntimeError:
+                running = False
+            if running:
+                # 已处于事件循环中（如守护进程），放到独立线程里跑一个新循环
+                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
+                    rows = ex.submit(
+                        asyncio.run, self._refresh_async(*coro_args)
+                    ).result()
+            else:
+                rows = asyncio.run(self._refresh_async(*coro_args))
+        return {u: self._apply(u, status, lm, etag) for u, status, lm, etag in rows}
+
+    # ---- 淘汰与持久化 ----
+    def evict(self) -> int:
+        before = len(self.entries)
+        if self.idle_days > 0:
+            cutoff = int(time.time()) - self.idle_days * 86400
+            self.entries = {
+                u: e for u, e in self.entries.items() if e.touched_at >= cutoff
+            }
+        if self.max_entries > 0 and len(self.entries) > self.max_entries:
+            keep = sorted(self.entries.items(), key=lambda kv: -kv[1].touched_at)
+            self.entries = dict(keep[: self.max_entries])
+        removed = before - len(self.entries)
+        if removed:
+            self.dirty = True
+        return removed
+
+    def stats(self) -> dict:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    def load(self):
+        try:
+            data = load_file(self.path)
+        except Exception as e:
+            print(f"[元数据缓存读取失败] {self.path} -> {e}")
+            return self
+        if not data:
+            return self
+        for u, row in (data.get("entries") or {}).items():
+            if isinstance(row, dict):
+                self.entries[u] = ResourceMeta(
+                    **{k: v for k, v in row.items() if k in _FIELDS}
+                )
+        self.dirty = False
+        return self
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        self.evict()
+        payload = {
+            "ts": int(time.time()),
+            "entries": {
+                u: {k: v for k, v in asdict(e).items() if v is not None}
+                for u, e in self.entries.items()
+            },
+        }
+        dump_file(payload, self.path)
+        self.dirty = False
+
+
+_default_cache = None
+
+
+def get_meta_cache() -> MetaCache:
+    """进程内共享的元数据缓存（首次调用时从 META_CACHE_PATH 加载）。"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MetaCache(META_CACHE_PATH).load()
+    return _default_cache
@@ -0,0 +1,273 @@
+import hashlib
+import math
+import os
+import threading
+import time
+
+from config import NEG_CACHE_CAPACITY, NEG_CACHE_ENABLE, NEG_CACHE_PATH
+from storage.serializer import dump_file, load_file
+from utils.run_report import get_run_report
+
+DAY = 86400
+
+# 各拒绝原因的默认记忆时长（秒）；可用环境变量 NEG_TTL_<REASON> 覆盖（如 NEG_TTL_HTTP_404）
+# 原则：确定性的拒绝（404、黑名单、规则文件）记得久，瞬时性的失败（超时、5xx）记得短
+REASON_TTLS = {
+    "http_404": 14 * DAY,
+    "http_410": 30 * DAY,
+    "http_4xx": 3 * DAY,
+    "http_5xx": DAY // 2,
+    "timeout": DAY // 4,
+    "network": DAY // 4,
+    "blacklist": 30 * DAY,
+    "bad_token": 30 * DAY,
+    "excluded_suffix": 30 * DAY,
+    "name_blacklist": 14 * DAY,
+    "releases": 30 * DAY,
+    "no_keyword": 7 * DAY,
+    "rules": 7 * DAY,
+    "not_subscription": 3 * DAY,
+    "empty": DAY,
+    "ctype": 3 * DAY,
+    "repo_not_found": 14 * DAY,
+    "repo_tree_fail": DAY,
+    # 403/429 多为限流，与目标本身无关：只记几分钟，避免一次限流把正常的仓库 / URL 拉黑数天
+    "throttled": 15 * 60,
+}
+DEFAULT_TTL = DAY
+# 视为限流的状态码
+THROTTLE_STATUSES = (403, 429)
+
+
+def _ttl_for(reason: str) -> int:
+    env = os.environ.get(f"NEG_TTL_{reason.upper()}")
+    if env:
+        try:
+            return int(env)
+        except ValueError:
+            pass
+    return REASON_TTLS.get(reason, DEFAULT_TTL)
+
+
+def reason_from_status(code: int) -> str:
+    """把 HTTP 状态码映射为拒绝原因。"""
+    if code == 404:
+        return "http_404"
+    if code == 410:
+        return "http_410"
+    if code in THROTTLE_STATUSES:
+        return "throttled"
+    if 500 <= code < 600:
+        return "http_5xx"
+    return "http_4xx"
+
+
+def reason_from_exception(e: Exception) -> str:
+    """把抓取异常映射为拒绝原因（HTTPError 按状态码，超时与其它网络错误分开）。"""
+    resp = getattr(e, "response", None)
+    code = getattr(resp, "status_code", None)
+    if code:
+        return reason_from_status(int(code))
+    name = type(e).__name__.lower()
+    if "timeout" in name or "timeout" in str(e).lower():
+        return "timeout"
+    return "network"
+
+
+class BloomFilter:
+    """定长位数组 + 双重哈希的布隆过滤器，只用于快速判定“肯定不在缓存里”。"""
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01):
+        capacity = max(1000, int(capacity))
+        m = int(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        self.size = max(8, (m + 7) // 8 * 8)
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray(self.size // 8)
+
+    def _positions(self, key: str):
+        d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key)
+        )
+
+
+class NegativeCache:
+    """被拒绝 URL / 失效仓库的持久化负缓存。
+
+    - 布隆过滤器做前置判定，绝大多数未命中无需查表
+    - 精确表 key -> [reason, expires_at, hits] 负责确认命中与过期
+    - 每个原因有独立的过期时间（见 REASON_TTLS）
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        capacity: int = NEG_CACHE_CAPACITY,
+        enabled: bool = True,
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.enabled = enabled
+        self.entries = {}
+        self.bloom = BloomFilter(capacity)
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    # ---- key helpers ----
+    @staticmethod
+    def url_key(url: str) -> str:
+        return "url:" + (url or "").strip()
+
+    @staticmethod
+    def repo_key(full_name: str) -> str:
+        return "repo:" + (full_name or "").strip().lower()
+
+    # ---- core ----
+    def check(self, key: str):
+        """命中且未过期时返回拒绝原因，否则返回 None。"""
+        if not self.enabled:
+            return None
+        reason = self._check(key)
+        get_run_report().cache("negative", reason is not None)
+        return reason
+
+    def _check(self, key: str):
+        if key not in self.bloom:
+            self.misses += 1
+            return None
+        with self._lock:
+            ent = self.entries.get(key)
+            if not ent:
+                self.misses += 1
+                return None
+            if ent[1] <= time.time():
+                del self.entries[key]
+                self.dirty = True
+                self.misses += 1
+                return None
+            ent[2] += 1
+            self.hits += 1
+            return ent[0]
+
+    def add(self, key: str, reason: str, ttl: int = None):
+        # 负缓存关闭时拒绝仍然发生，照样计入运行报告
+        get_run_report().reject(reason)
+        if not self.enabled:
+            return
+        expires = int(time.time()) + int(ttl if ttl is not None else _ttl_for(reason))
+        with self._lock:
+            ent = self.entries.get(key)
+            # 已有更长的记忆时不缩短（例如 404 之后又遇到一次超时）
+            if ent and ent[1] >= expires:
+                return
+            self.entries[key] = [reason, expires, ent[2] if ent else 0]
+            self.bloom.add(key)
+            self.dirty = True
+
+    def discard(self, key: str):
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                self.dirty = True
+
+    def check_url(self, url: str):
+        return self.check(self.url_key(url))
+
+    def add_url(self, url: str, reason: str, ttl: int = None):
+        self.add(self.url_key(url), reason, ttl)
+
+    def check_repo(self, full_name: str):
+        return self.check(self.repo_key(full_name))
+
+    def add_repo(self, full_name: str, reason: str, ttl: int = None):
+        self.add(self.repo_key(full_name), reason, ttl)
+
+    def filter_urls(self, urls):
+        """返回 (未命中列表, [(url, reason), ...] 命中列表)。"""
+        kept, skipped = [], []
+        for u in urls:
+            reason = self.check_url(u)
+            if reason:
+                skipped.append((u, reason))
+            else:
+                kept.append(u)
+        return kept, skipped
+
+    # ---- maintenance ----
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            dead = [k for k, ent in self.entries.items() if ent[1] <= now]
+            for k in dead:
+                del self.entries[k]
+            if dead:
+                self.dirty = True
+        return len(dead)
+
+    def _rebuild_bloom(self):
+        self.bloom = BloomFilter(max(self.capacity, len(self.entries) * 2))
+        for k in self.entries:
+            self.bloom.add(k)
+
+    def stats(self) -> dict:
+        by_reason = {}
+        for ent in self.entries.values():
+            by_reason[ent[0]] = by_reason.get(ent[0], 0) + 1
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "by_reason": by_reason,
+        }
+
+    # ---- persistence ----
+    def load(self):
+        try:
+            data = load_file(self.path)
+        except Exception as e:
+            print(f"[负缓存读取失败] {self.path} -> {e}")
+            return self
+        if not data:
+            return self
+        self.entries = {
+            k: [v[0], int(v[1]), int(v[2]) if len(v) > 2 else 0]
+            for k, v in (data.get("entries") or {}).items()
+        }
+        self.purge_expired()
+        self._rebuild_bloom()
+        self.dirty = False
+        return self
+
+    def save(self):
+        if not self.enabled or not self.path or not self.dirty:
+            return
+        self.purge_expired()
+        # 超出容量时按过期时间淘汰最早到期的条目
+        if len(self.entries) > self.capacity:
+            keep = sorted(self.entries.items(), key=lambda kv: -kv[1][1])
+            self.entries = dict(keep[: self.capacity])
+            self._rebuild_bloom()
+        dump_file({"ts": int(time.time()), "entries": self.entries}, self.path)
+        self.dirty = False
+
+
+_default_cache = None
+
+
+def get_negative_cache() -> NegativeCache:
+    """进程内共享的负缓存（首次调用时从 NEG_CACHE_PATH 加载）。"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = NegativeCache(NEG_CACHE_PATH, enabled=NEG_CACHE_ENABLE).load()
+    return _default_cache
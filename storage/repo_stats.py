@@ -0,0 +1,133 @@
+"""仓库产出历史：每个仓库被抓取的次数、失败次数、验证通过的订阅数（含指数滑动平均）与最近 push 时间。
+
+运行中先由 note_* 累积到 current，运行结束 commit_run() 合并进历史。
+"""
+
+import datetime as _dt
+import threading
+import time
+
+from config import REPO_STATS_MAX_ENTRIES, REPO_STATS_PATH
+from storage.serializer import dump_file, load_file
+
+# 有效订阅数的滑动平均系数（越大越看重最近一次）
+EWMA_ALPHA = 0.5
+
+
+def parse_iso_ts(value) -> int:
+    """解析 GitHub 的 ISO8601 时间（如 2025-10-01T08:00:00Z），失败返回 0。"""
+    if not value:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(
+            _dt.datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+        )
+    except ValueError:
+        return 0
+
+
+class RepoStats:
+    def __init__(self, path: str = None, max_entries: int = REPO_STATS_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        # full_name -> {crawls, fails, valid_total, ewma, pushed_at, last_crawl, last_valid}
+        self.entries: dict[str, dict] = {}
+        # 本次运行 full_name -> {"ok": bool, "candidates": n, "valid": n, "pushed_at": ts}
+        self.current: dict[str, dict] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def get(self, full: str):
+        return self.entries.get(full)
+
+    def note_crawl(
+        self, full: str, ok: bool = True, candidates: int = 0, pushed_at=None
+    ):
+        with self._lock:
+            cur = self.current.setdefault(
+                full, {"ok": True, "candidates": 0, "valid": 0}
+            )
+            cur["ok"] = cur["ok"] and ok
+            cur["candidates"] += candidates
+            ts = parse_iso_ts(pushed_at)
+            if ts:
+                cur["pushed_at"] = ts
+
+    def note_valid(self, full: str, n: int = 1):
+        with self._lock:
+            cur = self.current.get(full)
+            if cur is not None:
+                cur["valid"] += n
+
+    def commit_run(self, ts: int = None) -> int:
+        ts = int(ts or time.time())
+        with self._lock:
+            for full, cur in self.current.items():
+                ent = self.entries.setdefault(
+                    full,
+                    {"crawls": 0, "fails": 0, "valid_total": 0, "ewma": 0.0},
+                )
+                ent["crawls"] += 1
+                ent["fails"] += 0 if cur["ok"] else 1
+                ent["valid_total"] += cur["valid"]
+                ent["ewma"] = round(
+                    EWMA_ALPHA * cur["valid"] + (1 - EWMA_ALPHA) * ent["ewma"], 4
+                )
+                ent["last_crawl"] = ts
+                if cur["valid"]:
+                    ent["last_valid"] = ts
+                if cur.get("pushed_at"):
+                    ent["pushed_at"] = cur["pushed_at"]
+            n = len(self.current)
+            self.current = {}
+            if n:
+                self.dirty = True
+        return n
+
+    def stats(self) -> dict:
+        productive = sum(1 for e in self.entries.values() if e.get("valid_total"))
+        return {"entries": len(self.entries), "productive": productive}
+
+    def load(self):
+        try:
+            data = load_file(self.path)
+        except Exception as e:
+            print(f"[仓库统计读取失败] {self.path} -> {e}")
+            return self
+        if data:
+            self.entries = {
+                k: dict(v)
+                for k, v in (data.get("entries") or {}).items()
+                if isinstance(v, dict)
+            }
+        self.dirty = False
+        return self
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        if self.max_entries > 0 and len(self.entries) > self.max_entries:
+            # 先淘汰从未产出过的，再按最近抓取时间淘汰
+            keep = sorted(
+                self.entries.items(),
+                key=lambda kv: (
+                    0 if kv[1].get("valid_total") else 1,
+                    -kv[1].get("last_crawl", 0),
+                ),
+            )
+            self.entries = dict(keep[: self.max_entries])
+        dump_file({"ts": int(time.time()), "entries": self.entries}, self.path)
+        self.dirty = False
+
+
+_default_stats = None
+
+
+def get_repo_stats() -> RepoStats:
+    """进程内共享的仓库产出历史（首次调用时从 REPO_STATS_PATH 加载）。"""
+    global _default_stats
+    if _default_stats is None:
+        _default_stats = RepoStats(REPO_STATS_PATH).load()
+    return _default_stats
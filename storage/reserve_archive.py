@@ -0,0 +1,225 @@
+"""淘汰订阅的归档（替代每次运行导出的 reserve-<ts>.json）。
+
+单个文件按 URL 建索引，记录淘汰时间、原因与次数，支持保留策略与批量恢复：
+
+    python -m storage.reserve_archive stats
+    python -m storage.reserve_archive list --reason fail_threshold --since-days 7
+    python -m storage.reserve_archive restore --reason owner_limit
+    python -m storage.reserve_archive restore --url https://example.com/sub.txt
+    python -m storage.reserve_archive import-legacy --delete
+"""
+
+import glob
+import os
+import sys
+import time
+
+from config import HIST_PATH, RESERVE_MAX_ENTRIES, RESERVE_RETENTION_DAYS
+from storage.serializer import dump_file, load_file
+
+ARCHIVE_NAME = "reserve_archive.json"
+
+
+def archive_path_for(hist_path: str) -> str:
+    """归档文件与 history 放在同一目录；RESERVE_ARCHIVE_PATH 可覆盖。"""
+    return os.environ.get("RESERVE_ARCHIVE_PATH") or os.path.join(
+        os.path.dirname(hist_path) or ".", ARCHIVE_NAME
+    )
+
+
+class ReserveArchive:
+    """url -> {retired_at, first_retired_at, reason, count, ...附加信息}"""
+
+    def __init__(
+        self,
+        path: str,
+        retention_days: int = RESERVE_RETENTION_DAYS,
+        max_entries: int = RESERVE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_entries = max_entries
+        self.entries: dict[str, dict] = {}
+        self.dirty = False
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def retire(self, url: str, reason: str, ts: int = None, **extra):
+        ts = int(ts or time.time())
+        ent = self.entries.get(url)
+        if ent is None:
+            ent = {"first_retired_at": ts, "count": 0}
+            self.entries[url] = ent
+        ent["retired_at"] = ts
+        ent["reason"] = reason
+        ent["count"] = int(ent.get("count", 0)) + 1
+        ent.update({k: v for k, v in extra.items() if v is not None})
+        self.dirty = True
+
+    def discard(self, url: str) -> bool:
+        if self.entries.pop(url, None) is not None:
+            self.dirty = True
+            return True
+        return False
+
+    def select(self, urls=None, reason: str = None, since: int = None) -> list:
+        """按 URL 列表 / 原因 / 淘汰时间下限筛选，返回匹配的 URL（按淘汰时间倒序）。"""
+        wanted = set(urls) if urls else None
+        out = []
+        for u, ent in self.entries.items():
+            if wanted is not None and u not in wanted:
+                continue
+            if reason and ent.get("reason") != reason:
+                continue
+            if since and int(ent.get("retired_at", 0)) < since:
+                continue
+            out.append(u)
+        out.sort(key=lambda u: -int(self.entries[u].get("retired_at", 0)))
+        return out
+
+    def apply_retention(self) -> int:
+        """丢弃超过保留天数的条目，超出容量时按淘汰时间从旧到新丢弃。"""
+        before = len(self.entries)
+        if self.retention_days > 0:
+            cutoff = int(time.time()) - self.retention_days * 86400
+            self.entries = {
+                u: e
+                for u, e in self.entries.items()
+                if int(e.get("retired_at", 0)) >= cutoff
+            }
+        if self.max_entries > 0 and len(self.entries) > self.max_entries:
+            keep = sorted(
+                self.entries.items(), key=lambda kv: -int(kv[1].get("retired_at", 0))
+            )
+            self.entries = dict(keep[: self.max_entries])
+        removed = before - len(self.entries)
+        if removed:
+            self.dirty = True
+        return removed
+
+    def stats(self) -> dict:
+        by_reason = {}
+        for ent in self.entries.values():
+            r = ent.get("reason", "unknown")
+            by_reason[r] = by_reason.get(r, 0) + 1
+        return {"entries": len(self.entries), "by_reason": by_reason}
+
+    def load(self):
+        try:
+            data = load_file(self.path)
+        except Exception as e:
+            print(f"[淘汰归档读取失败] {self.path} -> {e}")
+            return self
+        if data:
+            self.entries = dict(data.get("entries") or {})
+        self.dirty = False
+        return self
+
+    def save(self):
+        if not self.dirty:
+            return
+        dump_file({"ts": int(time.time()), "entries": self.entries}, self.path)
+        self.dirty = False
+
+
+def restore_urls(
+    hist_path: str = HIST_PATH, urls=None, reason: str = None, since: int = None
+) -> list:
+    """把归档中匹配的 URL 批量放回 history 的活跃列表（并清零失败计数）。"""
+    from storage.history import load_history, save_history
+
+    archive = ReserveArchive(archive_path_for(hist_path)).load()
+    picked = archive.select(urls=urls, reason=reason, since=since)
+    if not picked:
+        return []
+    hist = load_history(hist_path)
+    links = list(hist.get("links") or hist.get("seen") or [])
+    present = set(links)
+    fail_map = hist.get("fail", {})
+    for u in picked:
+        if u not in present:
+            links.append(u)
+            present.add(u)
+        fail_map.pop(u, None)
+        archive.discard(u)
+    hist["seen"] = links
+    hist["links"] = links
+    hist["last_total"] = len(links)
+    hist["fail"] = fail_map
+    picked_set = set(picked)
+    hist["reserve"] = [u for u in hist.get("reserve", []) if u not in picked_set]
+    save_history(hist, hist_path)
+    archive.save()
+    return picked
+
+
+def import_legacy_exports(hist_path: str = HIST_PATH, delete: bool = False) -> int:
+    """导入旧版 reserve-<ts>.json 导出（各文件都是累计全量，只需最新一份）。"""
+    data_dir = os.path.dirname(hist_path) or "."
+    files = sorted(
+        glob.glob(os.path.join(data_dir, "reserve-*.json")),
+        key=lambda p: os.path.getmtime(p),
+    )
+    if not files:
+        return 0
+    archive = ReserveArchive(archive_path_for(hist_path)).load()
+    newest = files[-1]
+    ts = int(os.path.getmtime(newest))
+    n = 0
+    for u in load_file(newest, default=[]) or []:
+        if u and u not in archive:
+            archive.retire(u, "legacy", ts=ts)
+            n += 1
+    archive.save()
+    if delete:
+        for p in files:
+            os.remove(p)
+    return n
+
+
+def _main(argv):
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m storage.reserve_archive")
+    ap.add_argument("--hist", default=HIST_PATH, help="history 文件路径")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="按原因统计归档条目")
+    for name, help_text in (
+        ("list", "列出归档条目"),
+        ("restore", "批量恢复到活跃列表"),
+    ):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--reason")
+        p.add_argument("--since-days", type=int)
+        p.add_argument("--url", action="append")
+    p_imp = sub.add_parser("import-legacy", help="导入旧的 reserve-<ts>.json")
+    p_imp.add_argument("--delete", action="store_true", help="导入后删除旧文件")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "stats":
+        print(ReserveArchive(archive_path_for(args.hist)).load().stats())
+        return
+    if args.cmd == "import-legacy":
+        n = import_legacy_exports(args.hist, delete=args.delete)
+        print(f"[淘汰归档] 导入 {n} 条旧 reserve 记录")
+        return
+    since = int(time.time()) - args.since_days * 86400 if args.since_days else None
+    if args.cmd == "list":
+        archive = ReserveArchive(archive_path_for(args.hist)).load()
+        for u in archive.select(urls=args.url, reason=args.reason, since=since):
+            ent = archive.entries[u]
+            when = time.strftime("%Y-%m-%d", time.localtime(ent.get("retired_at", 0)))
+            print(f"{when}\t{ent.get('reason')}\t{ent.get('count')}\t{u}")
+    elif args.cmd == "restore":
+        restored = restore_urls(
+            args.hist, urls=args.url, reason=args.reason, since=since
+        )
+        print(f"[淘汰归档] 已恢复 {len(restored)} 条到活跃列表")
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
@@ -0,0 +1,142 @@
+"""history / 缓存 / 健康数据的可插拔序列化层。
+
+支持的格式（读取时按文件头自动识别，写入格式由 STORAGE_FORMAT 决定）：
+
+- json:    纯 JSON（紧凑写法，兼容旧版 indent=2 的文件）
+- zjson:   b"SHZ1" + zlib 压缩的紧凑 JSON（仅依赖标准库）
+- msgpack: b"SHM1" + MessagePack（可选依赖 msgpack，未安装时回退 zjson）
+
+STORAGE_FORMAT=auto（默认）时，*.json 文件（history 以及各缓存，部分纳入 git）一律
+写纯 JSON，保证可 diff、外部 json.load 可读；其它文件（如流水线检查点 *.ckpt）才用
+二进制格式。显式设置 zjson / msgpack 时所有文件都按该格式写入。
+
+人类可读的 JSON 导出：
+
+    python -m storage.serializer export data/history.json [out.json]
+    python -m storage.serializer convert data/history.json --format msgpack
+"""
+
+import json
+import os
+import sys
+import zlib
+
+from config import STORAGE_FORMAT
+
+try:
+    import msgpack  # type: ignore[reportMissingImports]
+except Exception:
+    msgpack = None  # type: ignore
+
+MAGIC_ZJSON = b"SHZ1"
+MAGIC_MSGPACK = b"SHM1"
+FORMATS = ("json", "zjson", "msgpack")
+
+
+def resolve_format(fmt: str = None, path: str = None) -> str:
+    """把 auto/未知/不可用的格式落到一个当前环境可写的格式上。
+
+    auto 对 *.json 路径取 json，不把二进制内容写进 .json 文件名下。
+    """
+    fmt = (fmt or STORAGE_FORMAT or "auto").lower()
+    if fmt == "auto":
+        if path and path.lower().endswith(".json"):
+            return "json"
+        return "msgpack" if msgpack is not None else "zjson"
+    if fmt == "msgpack" and msgpack is None:
+        return "zjson"
+    return fmt if fmt in FORMATS else "json"
+
+
+def detect_format(data: bytes) -> str:
+    if data.startswith(MAGIC_MSGPACK):
+        return "msgpack"
+    if data.startswith(MAGIC_ZJSON):
+        return "zjson"
+    return "json"
+
+
+def dumps(obj, fmt: str = None) -> bytes:
+    fmt = resolve_format(fmt)
+    if fmt == "msgpack":
+        return MAGIC_MSGPACK + msgpack.packb(obj, use_bin_type=True)
+    raw = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if fmt == "zjson":
+        return MAGIC_ZJSON + zlib.compress(raw, 6)
+    return raw
+
+
+def loads(data: bytes):
+    fmt = detect_format(data)
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("msgpack 格式文件需要安装 msgpack")
+        return msgpack.unpackb(data[4:], raw=False, strict_map_key=False)
+    if fmt == "zjson":
+        data = zlib.decompress(data[4:])
+    return json.loads(data.decode("utf-8-sig"))
+
+
+def load_file(path: str, default=None):
+    """读取并自动识别格式；文件不存在时返回 default，损坏时抛出异常由调用方决定如何降级。"""
+    if not path or not os.path.exists(path):
+        return default
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.strip():
+        return default
+    return loads(data)
+
+
+def dump_file(obj, path: str, fmt: str = None):
+    """原子写入（先写临时文件再 rename），避免中途崩溃留下半个文件。"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(dumps(obj, resolve_format(fmt, path)))
+    os.replace(tmp, path)
+
+
+def export_json(src: str, dst: str = None) -> str:
+    """导出为人类可读（indent=2）的 JSON；dst 为空时输出到 <src>.export.json。"""
+    obj = load_file(src)
+    if obj is None:
+        raise FileNotFoundError(src)
+    dst = dst or f"{src}.export.json"
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    return dst
+
+
+def _main(argv):
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m storage.serializer")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_exp = sub.add_parser("export", help="导出为人类可读 JSON")
+    p_exp.add_argument("src")
+    p_exp.add_argument("dst", nargs="?")
+    p_conv = sub.add_parser("convert", help="就地转换存储格式")
+    p_conv.add_argument("src")
+    p_conv.add_argument("--format", default="auto", choices=("auto",) + FORMATS)
+    p_info = sub.add_parser("info", help="查看文件格式与大小")
+    p_info.add_argument("src")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "export":
+        print(export_json(args.src, args.dst))
+    elif args.cmd == "convert":
+        obj = load_file(args.src)
+        if obj is None:
+            raise SystemExit(f"文件不存在: {args.src}")
+        fmt = resolve_format(args.format, args.src)
+        dump_file(obj, args.src, fmt)
+        print(f"{args.src} -> {fmt} ({os.path.getsize(args.src)} bytes)")
+    elif args.cmd == "info":
+        with open(args.src, "rb") as f:
+            head = f.read(4)
+        print(f"{args.src}: {detect_format(head)} ({os.path.getsize(args.src)} bytes)")
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
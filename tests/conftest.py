@@ -0,0 +1,12 @@
+import pytest
+
+import utils.events as events
+
+
+@pytest.fixture(autouse=True)
+def _event_log(tmp_path, monkeypatch):
+    # keep audit events out of ./output while the suite runs
+    log = events.EventLog(path=str(tmp_path / "events.ndjson"))
+    monkeypatch.setattr(events, "_default_log", log)
+    yield log
+    log.close()
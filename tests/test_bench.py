@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+import requests
+
+from bench.corpus import build_corpus
+from bench.fake_server import FakeServer, HostProfile
+from checker.async_check import check_urls
+from fetchers.gh_files import fetch_repo_tree_info
+from fetchers.gh_graphql import fetch_repos_batch
+from filters.extract import fetch_text
+from filters.validator import is_valid_subscription
+from utils import http_client
+from utils.http_client import resolve_url
+from utils.rate_limiter import RateLimiter
+
+AIRPORTS = {
+    "fast.airport.test": HostProfile(),
+    "dead.airport.test": HostProfile(error_rate=1.0, error_status=404),
+    "limited.airport.test": HostProfile(throttle_after=1, window=60.0),
+}
+
+
+@pytest.fixture()
+def server(monkeypatch):
+    corpus = build_corpus(repos=3, files=1, nodes=4, forks=1, airports=AIRPORTS)
+    with FakeServer(corpus, airports=AIRPORTS) as srv:
+        monkeypatch.setattr(http_client, "HOST_OVERRIDES", srv.overrides)
+        monkeypatch.setattr(http_client, "limiter", RateLimiter(adaptive=False))
+        srv.corpus = corpus
+        yield srv
+
+
+def test_resolve_url_only_rewrites_mapped_hosts(monkeypatch):
+    monkeypatch.setattr(http_client, "HOST_OVERRIDES", {"raw.example": "127.0.0.1:9"})
+    assert resolve_url("https://raw.example/a/b.txt?x=1") == (
+        "http://127.0.0.1:9/a/b.txt?x=1"
+    )
+    assert resolve_url("https://other.example/a") == "https://other.example/a"
+    assert http_client._origin_host("http://127.0.0.1:9/a") == "raw.example"
+
+
+def test_graphql_and_rest_views_agree(server):
+    full = "user000/free-nodes-000"
+    info = fetch_repos_batch([full, "user000/missing", "forker000/free-nodes-000"], "t")
+    assert info["user000/missing"] is None
+    assert info[full]["readme"].startswith(f"# {full}")
+    assert info[full]["blobs"]["v2ray.txt"] == server.corpus.file(full, "v2ray.txt")
+    assert info["forker000/free-nodes-000"]["mirror_of"] is None
+    assert info["forker000/free-nodes-000"]["parent"] == full
+    tree, status, sha = fetch_repo_tree_info(full, "t")
+    assert status == 200 and sha == info[full]["tree_oid"]
+    gql_paths = {t["path"] for t in info[full]["tree"] if t["type"] == "blob"}
+    assert gql_paths == {t["path"] for t in tree if t["type"] == "blob"}
+
+
+def test_raw_and_cdn_serve_corpus_files(server):
+    full = "user001/free-nodes-001"
+    raw = fetch_text(f"https://raw.githubusercontent.com/{full}/main/v2ray.txt")
+    cdn = fetch_text(f"https://cdn.jsdelivr.net/gh/{full}@main/v2ray.txt")
+    assert raw == cdn == server.corpus.file(full, "v2ray.txt")
+    assert is_valid_subscription(f"https://x/{full}/v2ray.txt", raw)
+    r = http_client.request("GET", "https://api.github.com/search/repositories")
+    assert r.headers["X-RateLimit-Resource"] == "search"
+    assert int(r.headers["X-RateLimit-Remaining"]) == 29
+
+
+def test_airport_profiles(server):
+    token = "3f2a9c0d81b4e6f7a5c3d2e1f0a9b8c7"
+    urls = [f"https://{h}/api/v1/client/subscribe?token={token}" for h in AIRPORTS]
+    ok = asyncio.run(check_urls(urls[:2], timeout=5))
+    assert ok == [urls[0]]
+    assert server.hits["dead.airport.test"] == 1
+    # the second request inside the window is throttled with Retry-After
+    assert requests.get(resolve_url(urls[2])).status_code == 200
+    r = requests.get(resolve_url(urls[2]))
+    assert r.status_code == 429 and int(r.headers["Retry-After"]) > 0
@@ -0,0 +1,239 @@
+import signal
+import types
+
+import pytest
+
+from pipeline.daemon import Daemon
+from pipeline.engine import PipelineStop
+from pipeline.scheduler import Job, Scheduler
+from storage import deferred, history
+from storage.history import ensure_increment, load_history, save_history
+from utils.deadline import stage_budget, start_run
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_scheduler_runs_due_jobs_and_backs_off_failures():
+    clock = _Clock()
+    calls = []
+
+    def bad():
+        calls.append("bad")
+        raise RuntimeError("down")
+
+    jobs = [
+        Job("a", 100, lambda: calls.append("a")),
+        Job("bad", 1000, bad, delay=10),
+    ]
+    sched = Scheduler(jobs, clock=clock)
+    for j in jobs:
+        j.next_run = clock.t + j.delay
+    assert sched.run_pending() == ["a"]
+    clock.t += 10
+    assert sched.run_pending() == ["bad"]
+    assert jobs[1].failures == 1
+    # failed jobs retry after max(60, interval / 4) instead of a full interval
+    assert jobs[1].next_run == clock.t + 250
+    clock.t += 90
+    assert sched.run_pending() == ["a"]
+    sched.stop()
+    clock.t += 1000
+    assert sched.run_pending() == []
+
+
+class _Store:
+    def __init__(self):
+        self.saved = 0
+
+    def save(self):
+        self.saved += 1
+
+
+def _flow(ok):
+    """stand-in stage module: every URL in ok passes check/validate/head."""
+    calls = []
+
+    def stage_check(urls):
+        calls.append(("check", list(urls)))
+        return {"reachable": [u for u in urls if u in ok], "deferred": []}
+
+    return types.SimpleNamespace(
+        calls=calls,
+        stage_search=lambda pool: {"items": [{"url": u} for u in ok | {"u:new2"}]},
+        stage_admit=lambda items: {
+            "cand_items": items,
+            "urls": sorted(it["url"] for it in items),
+        },
+        stage_check=stage_check,
+        stage_validate=lambda reachable, deferred=(): {
+            "valid": reachable,
+            "deferred": list(deferred),
+        },
+        stage_canonical=lambda valid, cand_items: {
+            "chosen": valid,
+            "canon_meta": {},
+        },
+        stage_head=lambda chosen, deferred=(): {
+            "ok_head": chosen,
+            "removed_head": [],
+            "deferred": list(deferred),
+        },
+        stage_increment=lambda ok_head, cand_items, canon_meta, merged=(), deferred=(), checked=None: calls.append(
+            ("increment", ensure_increment(ok_head, HIST, 0, 2, checked=checked))
+        ),
+        stage_publish=lambda links: calls.append(("publish", list(links))),
+    )
+
+
+HIST = None
+
+
+@pytest.fixture()
+def hist(tmp_path, monkeypatch):
+    global HIST
+    HIST = str(tmp_path / "history.json")
+    monkeypatch.setattr(deferred, "_default_queue", deferred.DeferredQueue())
+    save_history({"links": ["u:1", "u:2", "u:3"], "seen": ["u:1", "u:2", "u:3"]}, HIST)
+    return HIST
+
+
+def test_recheck_rotates_and_only_touches_checked(hist, monkeypatch):
+    monkeypatch.setattr("pipeline.daemon.FAIL_THRESHOLD", 2)
+    flow = _flow(ok={"u:1", "u:3"})
+    d = Daemon(None, flow=flow, hist_path=hist, recheck_batch=2, stores=[])
+    d.recheck()
+    # u:2 failed once but is kept (threshold 2); u:3 was not checked yet
+    h = load_history(hist)
+    assert h["links"] == ["u:1", "u:2", "u:3"] and h["fail"] == {"u:2": 1}
+    d.recheck()
+    d.recheck()
+    assert [c[1] for c in flow.calls if c[0] == "check"] == [
+        ["u:1", "u:2"],
+        ["u:3"],
+        ["u:1", "u:2"],
+    ]
+    assert load_history(hist)["links"] == ["u:1", "u:3"]
+
+
+def test_discovery_checks_only_new_urls(hist):
+    flow = _flow(ok={"u:1", "u:new"})
+    d = Daemon(None, flow=flow, hist_path=hist, stores=[])
+    d.discover()
+    assert [c[1] for c in flow.calls if c[0] == "check"] == [["u:new", "u:new2"]]
+    # history entries were not re-evaluated, the new URL was appended
+    h = load_history(hist)
+    assert h["links"] == ["u:1", "u:2", "u:3", "u:new"] and not h["fail"]
+
+
+def test_discovery_drains_deferred_queue_first(hist):
+    flow = _flow(ok={"u:new", "u:late"})
+    deferred.get_deferred_queue().defer(["u:late", "u:1"], "head")
+    d = Daemon(None, flow=flow, hist_path=hist, stores=[])
+    d.discover()
+    # carried-over links go first; ones already in history are dropped
+    assert [c[1] for c in flow.calls if c[0] == "check"] == [
+        ["u:late", "u:new", "u:new2"]
+    ]
+    assert load_history(hist)["links"][-2:] == ["u:late", "u:new"]
+    assert not len(deferred.get_deferred_queue())
+
+
+def test_deferred_links_are_checked_without_new_candidates(hist):
+    def no_candidates(pool):
+        raise PipelineStop("empty")
+
+    flow = _flow(ok={"u:late"})
+    flow.stage_search = no_candidates
+    deferred.get_deferred_queue().defer(["u:late"], "check")
+    Daemon(None, flow=flow, hist_path=hist, stores=[]).discover()
+    assert [c[1] for c in flow.calls if c[0] == "check"] == [["u:late"]]
+
+
+def test_publish_skips_unchanged_history(hist):
+    flow = _flow(ok=set())
+    d = Daemon(None, flow=flow, hist_path=hist, stores=[])
+    d.publish()
+    d.publish()
+    assert [c[0] for c in flow.calls] == ["publish"]
+
+
+def test_signal_stops_after_current_job_then_aborts(hist):
+    store = _Store()
+    d = Daemon(
+        None, flow=_flow(ok=set()), hist_path=hist, stores=[store], report_path=None
+    )
+    d._on_signal(signal.SIGTERM, None)
+    assert d.scheduler.stopping
+    with pytest.raises(SystemExit):
+        d._on_signal(signal.SIGTERM, None)
+    d.scheduler.after_job(d.scheduler.jobs[0])
+    assert store.saved == 1
+
+
+def test_signal_mid_job_skips_remaining_stages(hist):
+    flow = _flow(ok={"u:new"})
+    d = Daemon(None, flow=flow, hist_path=hist, stores=[], report_path=None)
+    check = flow.stage_check
+
+    def interrupted_check(urls):
+        d._on_signal(signal.SIGTERM, None)
+        # the in-flight stage sees its budget as spent and stops taking work
+        assert stage_budget("check").expired()
+        return check(urls)
+
+    flow.stage_check = interrupted_check
+    deferred.get_deferred_queue().defer(["u:late"], "check")
+    d.discover()
+    assert [c[0] for c in flow.calls] == ["check"]
+    # links taken from the deferred queue go back when the job is cut short
+    assert deferred.get_deferred_queue().take() == ["u:late"]
+    assert load_history(hist)["links"] == ["u:1", "u:2", "u:3"]
+    # once stopping, a recheck starts no stages and counts no failures
+    d.recheck()
+    assert [c[0] for c in flow.calls] == ["check"]
+    assert not load_history(hist).get("fail")
+    start_run()
+
+
+def test_resident_history_reloads_on_change(tmp_path):
+    p = str(tmp_path / "h.json")
+    history.keep_resident(True)
+    try:
+        save_history({"links": ["a"]}, p)
+        first = load_history(p)
+        first["links"].append("mutated")
+        # callers get a copy; the resident entry is unaffected
+        assert load_history(p)["links"] == ["a"]
+        save_history({"links": ["a", "b"]}, p)
+        assert load_history(p)["links"] == ["a", "b"]
+    finally:
+        history.keep_resident(False)
+
+
+def test_dns_cache_reuses_lookups(monkeypatch):
+    import socket
+
+    from utils import dns_cache
+
+    calls = []
+
+    def fake(host, port, *a, **kw):
+        calls.append(host)
+        return [("addr", host)]
+
+    monkeypatch.setattr(socket, "getaddrinfo", fake)
+    dns_cache.install(ttl=60)
+    try:
+        assert socket.getaddrinfo("example.com", 443) == [("addr", "example.com")]
+        socket.getaddrinfo("example.com", 443)
+        socket.getaddrinfo("example.org", 443)
+        assert calls == ["example.com", "example.org"]
+    finally:
+        dns_cache.uninstall()
+    assert not dns_cache.installed() and socket.getaddrinfo is fake
@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main_extract_fast as mef
+from checker.async_check import check_urls
+from storage.deferred import DeferredQueue
+from storage.history import load_history, save_history
+from storage.keyword_stats import KeywordStats
+from storage.meta_cache import MetaCache
+from storage.repo_stats import RepoStats
+from utils.deadline import Budget
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_stage_budget_is_bounded_by_run_deadline_minus_reserve():
+    clock = _Clock()
+    run = Budget(600, clock=clock)
+    stage = run.child(300, reserve=120)
+    assert stage.remaining() == 300
+    clock.t += 250
+    # run has 350s left, 120s of which are reserved for publishing
+    assert stage.remaining() == 50 and stage.cap(25) == 25
+    clock.t += 60
+    assert stage.expired() and stage.cap(25) == 0
+    assert Budget().as_timeout() is None and Budget(0).unlimited
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, body=True):
+        if self.path.startswith("/slow"):
+            time.sleep(3)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", "9")
+            self.end_headers()
+            if body:
+                self.wfile.write(b"vmess://a")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up at its deadline
+            pass
+
+    def do_GET(self):
+        self._reply()
+
+    def do_HEAD(self):
+        self._reply(body=False)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def base():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.daemon_threads = True
+    srv.block_on_close = False
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_check_urls_defers_unfinished_work_at_deadline(base):
+    urls = [f"{base}/slow/1", f"{base}/fast/1", f"{base}/slow/2", f"{base}/fast/2"]
+    late = []
+    t0 = time.monotonic()
+    ok = asyncio.run(check_urls(urls, deadline=0.8, deferred=late))
+    assert time.monotonic() - t0 < 2
+    assert sorted(ok) == [f"{base}/fast/1", f"{base}/fast/2"]
+    # in original order, so priority carries over
+    assert late == [f"{base}/slow/1", f"{base}/slow/2"]
+
+
+def test_head_check_stops_waiting_when_budget_runs_out(base, monkeypatch):
+    monkeypatch.setattr(mef, "get_negative_cache", lambda: _NoCache())
+    urls = [f"{base}/fast/1", f"{base}/slow/1"]
+    late = []
+    t0 = time.monotonic()
+    ok, removed = mef.head_check_urls(urls, budget=Budget(0.8), deferred=late)
+    assert time.monotonic() - t0 < 2
+    assert ok == [f"{base}/fast/1"] and not removed
+    assert late == [f"{base}/slow/1"]
+
+
+class _NoCache:
+    def add_url(self, *a, **kw):
+        pass
+
+
+def test_expired_budget_defers_content_validation(monkeypatch):
+    monkeypatch.setattr(mef, "get_negative_cache", lambda: _NoCache())
+    monkeypatch.setattr(mef, "get_meta_cache", lambda: MetaCache())
+    fetched = []
+
+    def fake_fetch(u, timeout=10):
+        fetched.append(u)
+        return "vmess://YWJj\n" * 5
+
+    clock = _Clock()
+    budget = Budget(10, clock=clock)
+    late = []
+
+    def tick(u, timeout=10):
+        clock.t += 6
+        return fake_fetch(u, timeout)
+
+    monkeypatch.setattr(mef, "fetch_text", tick)
+    kept, pending = mef.filter_subscription_content(
+        ["u1", "u2", "u3"], budget=budget, deferred=late
+    )
+    assert fetched == ["u1", "u2"] and late == ["u3"] and not pending
+
+
+def test_deferred_queue_keeps_priority_across_runs(tmp_path):
+    q = DeferredQueue(str(tmp_path / "deferred.json"))
+    order = ["a", "b", "c", "d"]
+    q.defer(["d", "b"], "check", order=order)
+    q.defer(["c"], "head", order=order)
+    q.save()
+    q2 = DeferredQueue(q.path).load()
+    assert q2.stats() == {"entries": 3, "by_stage": {"check": 2, "head": 1}}
+    assert q2.take() == ["b", "c", "d"]
+    assert len(q2) == 0
+
+
+def test_increment_skips_fail_counts_for_deferred(tmp_path, monkeypatch):
+    hist = str(tmp_path / "history.json")
+    save_history({"links": ["h1", "h2", "h3"], "fail": {}}, hist)
+    queue = DeferredQueue(str(tmp_path / "deferred.json"))
+    monkeypatch.setattr(mef, "HIST_PATH", hist)
+    monkeypatch.setattr(mef, "get_meta_cache", lambda: MetaCache())
+    monkeypatch.setattr(mef, "get_keyword_stats", lambda: KeywordStats())
+    monkeypatch.setattr(mef, "get_repo_stats", lambda: RepoStats())
+    monkeypatch.setattr(mef, "get_deferred_queue", lambda: queue)
+    mef.stage_increment(
+        ["h1"],
+        [],
+        {},
+        merged=["h3", "h1", "h2"],
+        deferred=[["h3", "check"]],
+    )
+    h = load_history(hist)
+    # h2 was checked and failed; h3 ran out of budget and is carried over
+    assert h["fail"] == {"h2": 1}
+    assert h["links"] == ["h1", "h2", "h3"]
+    assert queue.take() == ["h3"]
+
+
+def test_negative_cache_does_not_retire_history_urls(tmp_path, monkeypatch):
+    from storage.negative_cache import NegativeCache
+
+    hist = str(tmp_path / "history.json")
+    save_history({"links": ["https://x/h.txt"], "seen": ["https://x/h.txt"]}, hist)
+    neg = NegativeCache(None)
+    neg.add_url("https://x/h.txt", "not_subscription")
+    neg.add_url("https://x/new.txt", "not_subscription")
+    monkeypatch.setattr(mef, "HIST_PATH", hist)
+    monkeypatch.setattr(mef, "get_negative_cache", lambda: neg)
+    monkeypatch.setattr(mef, "get_meta_cache", lambda: MetaCache())
+    monkeypatch.setattr(mef, "get_deferred_queue", lambda: DeferredQueue())
+    monkeypatch.setattr(mef, "get_keyword_stats", lambda: KeywordStats())
+    monkeypatch.setattr(mef, "get_repo_stats", lambda: RepoStats())
+    for _ in range(mef.FAIL_THRESHOLD + 1):
+        merged = mef.stage_merge(["https://x/new.txt"])["merged"]
+        # only the new URL is skipped; the history URL is checked and still passes
+        assert merged == ["https://x/h.txt"]
+        mef.stage_increment(merged, [], {}, merged=merged)
+    assert load_history(hist)["links"] == ["https://x/h.txt"]
+
+
+def test_crawl_stops_when_quota_outlasts_the_deadline(monkeypatch):
+    from utils.http_client import QuotaExhausted
+
+    calls = []
+
+    def parked(full, token):
+        calls.append(full)
+        raise QuotaExhausted("core 令牌配额 3600s 后恢复")
+
+    monkeypatch.setattr(
+        mef, "iter_repo_info", lambda names, token, **kw: [(n, None) for n in names]
+    )
+    monkeypatch.setattr(mef, "fetch_repo_tree_info", parked)
+    repos = [{"full_name": "a/1"}, {"full_name": "a/2"}]
+    assert mef.crawl_repos(repos, "tok", {}) == []
+    # the remaining repos are left for the next run instead of waiting out the quota
+    assert calls == ["a/1"]
@@ -0,0 +1,96 @@
+import json
+import os
+
+import main_extract_fast as mef
+from storage.meta_cache import MetaCache
+from utils import events as ev
+from utils.events import EventLog
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(x) for x in f]
+
+
+def test_quiet_run_keeps_audit_trail_and_counts(tmp_path, capsys):
+    path = str(tmp_path / "events.ndjson")
+    log = EventLog(path=path, console_level="warning", file_level="warning")
+    for i in range(100):
+        log.emit(ev.CRAWL_SAVED, url=f"u{i}")
+    log.emit(ev.URL_REJECTED, url="x", reason="blacklist", label="黑名单URL剔除")
+    log.emit(ev.URL_REJECTED, url="y", reason="no_keyword", label="剔除")
+    log.emit(ev.URL_REJECTED, url="z", reason="no_keyword", label="剔除")
+    assert capsys.readouterr().out == ""
+    assert log.summary() == {
+        "crawl.url_saved": 100,
+        "filter.rejected": 3,
+        "filter.rejected:blacklist": 1,
+        "filter.rejected:no_keyword": 2,
+    }
+    log.close()
+    recs = _lines(path)
+    assert [(r["event"], r.get("url")) for r in recs[:3]] == [
+        ("filter.rejected", "x"),
+        ("filter.rejected", "y"),
+        ("filter.rejected", "z"),
+    ]
+    assert recs[0]["level"] == "info" and recs[0]["reason"] == "blacklist"
+    assert recs[-1]["event"] == "run.summary"
+    assert recs[-1]["counts"]["filter.rejected:no_keyword"] == 2
+    assert "[事件] 汇总: crawl.url_saved 100" in capsys.readouterr().out
+
+
+def test_high_volume_events_are_sampled(capsys):
+    draws = iter([0.5, 0.001, 0.9])
+    log = EventLog(path="", console_level="debug", rand=lambda: next(draws))
+    for u in ("a", "b", "c"):
+        log.emit(ev.CRAWL_RECURSE, url=u, depth=1)
+    log.emit(ev.CRAWL_BLACKLISTED, url="d")
+    out = capsys.readouterr().out.splitlines()
+    assert out == ["[R] 递归抓取: url=b depth=1", "[R] 黑名单域名跳过: d"]
+    assert log.summary()["crawl.recurse"] == 3
+
+
+def test_ndjson_sink_rotates(tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    log = EventLog(path=path, max_bytes=300, backups=2)
+    for i in range(30):
+        log.emit(
+            ev.HEAD_REJECTED, url=f"https://h/{i}", reason="x", detail="status:404"
+        )
+    log.close()
+    assert os.path.exists(path + ".1") and os.path.exists(path + ".2")
+    assert not os.path.exists(path + ".3")
+    assert all(os.path.getsize(p) <= 300 for p in (path + ".1", path + ".2"))
+
+
+class _NoCache:
+    def add_url(self, *a, **kw):
+        pass
+
+
+def test_content_rejections_map_to_typed_events(monkeypatch, capsys, _event_log):
+    monkeypatch.setattr(mef, "get_negative_cache", lambda: _NoCache())
+    monkeypatch.setattr(mef, "get_meta_cache", lambda: MetaCache())
+    monkeypatch.setattr(mef, "fetch_text", lambda u, timeout=10: "hello world " * 5)
+    kept, pending = mef.filter_subscription_content(["https://x/a.txt"])
+    assert not kept and not pending
+    assert "[缺少订阅特征剔除] https://x/a.txt" in capsys.readouterr().out
+    _event_log.close()
+    rec = _lines(_event_log.path)[0]
+    assert rec["event"] == "validate.rejected"
+    assert rec["reason"] == "not_subscription"
+
+
+def test_owner_dedup_is_an_audited_event(capsys, _event_log):
+    found = [
+        {"owner": "a", "url": "https://x/a/sub.yaml"},
+        {"owner": "a", "url": "https://x/a/sub.txt"},
+    ]
+    assert [it["url"] for it in mef.dedup_candidates(found)] == ["https://x/a/sub.txt"]
+    out = capsys.readouterr().out
+    assert out.count("[发布者同名去重]") == 1
+    _event_log.close()
+    rec = _lines(_event_log.path)[0]
+    assert rec["event"] == "owner.dedup"
+    assert rec["kept"] == "https://x/a/sub.txt"
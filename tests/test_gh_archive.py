@@ -0,0 +1,108 @@
+import io
+import os
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetchers.gh_archive import extract_members, fetch_repo_archive
+from filters import extract
+
+
+def _tarball(files: dict) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"alice-nodes-abc123/{path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+FILES = {
+    "sub/a.txt": b"vmess://a",
+    "sub/b.yaml": b"proxies: []",
+    "noise.bin": os.urandom(200_000),
+    "sub/z.txt": b"trojan://z",
+}
+BLOB = _tarball(FILES)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/repos/alice/nodes/tarball":
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-gzip")
+        self.send_header("Content-Length", str(len(BLOB)))
+        self.end_headers()
+        self.wfile.write(BLOB)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def base():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def test_fetch_archive_returns_wanted_members(base):
+    got = fetch_repo_archive(
+        "alice/nodes", None, ["sub/a.txt", "sub/b.yaml", "sub/z.txt"], base=base
+    )
+    assert got == {
+        "sub/a.txt": "vmess://a",
+        "sub/b.yaml": "proxies: []",
+        "sub/z.txt": "trojan://z",
+    }
+
+
+def test_size_cap_keeps_members_read_before_the_cap(base):
+    got = fetch_repo_archive(
+        "alice/nodes",
+        None,
+        ["sub/a.txt", "sub/z.txt"],
+        max_bytes=len(BLOB) // 2,
+        base=base,
+    )
+    assert got == {"sub/a.txt": "vmess://a"}
+
+
+def test_missing_repo_returns_empty(base):
+    assert fetch_repo_archive("ghost/none", None, ["x.txt"], base=base) == {}
+
+
+def test_member_truncation():
+    got = extract_members(io.BytesIO(BLOB), ["sub/b.yaml"], member_max=4)
+    assert got == {"sub/b.yaml": "prox"}
+
+
+def test_prefetched_text_is_taken_once(monkeypatch):
+    monkeypatch.setattr(extract, "PREFETCH_MAX_BYTES", 10)
+    assert extract.remember_text("u1", "12345")
+    assert not extract.remember_text("u2", "1234567")
+    assert extract.take_text("u1") == "12345"
+    assert extract.take_text("u1") is None
+    assert extract.remember_text("u2", "1234567")
+    assert extract.take_text("u2") == "1234567"
+
+
+def test_clear_prefetched_starts_a_fresh_run(monkeypatch, capsys):
+    monkeypatch.setattr(extract, "PREFETCH_MAX_BYTES", 10)
+    extract.clear_prefetched()
+    assert extract.remember_text("u1", "12345678")
+    assert not extract.remember_text("u2", "12345")
+    assert not extract.remember_text("u3", "12345")
+    # the store filling up is reported once, not per rejected file
+    assert capsys.readouterr().out.count("[预取]") == 1
+    extract.clear_prefetched()
+    assert extract.take_text("u1") is None
+    assert extract.remember_text("u2", "12345")
+    extract.clear_prefetched()
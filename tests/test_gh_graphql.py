@@ -0,0 +1,202 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetchers import gh_graphql
+from fetchers.gh_graphql import fetch_repos_batch, iter_repo_info
+
+REPOS = {
+    "alice/nodes": {
+        "README.md": "see https://example.com/sub.txt",
+        "clash/sub.yaml": "proxies: []",
+        "v2ray.txt": "vmess://abc",
+        "big/sub.txt": "x" * 50,
+        "logo.png": "",
+    }
+}
+# bob/nodes 是 alice/nodes 未改动的 fork
+REPOS["bob/nodes"] = REPOS["alice/nodes"]
+FORKS = {"bob/nodes": "alice/nodes"}
+QUERIES = []
+
+
+def _entries(files, prefix=""):
+    dirs, out = {}, []
+    for path, text in files.items():
+        if not path.startswith(prefix):
+            continue
+        rest = path[len(prefix) :]
+        if "/" in rest:
+            dirs.setdefault(rest.split("/", 1)[0], None)
+        else:
+            out.append(
+                {"name": rest, "type": "blob", "object": {"byteSize": len(text)}}
+            )
+    for d in dirs:
+        sub = _entries(files, prefix + d + "/")
+        out.append({"name": d, "type": "tree", "object": {"entries": sub}})
+    return out
+
+
+_REPO_RE = re.compile(r'(\w+): repository\(owner: "([^"]+)", name: "([^"]+)"\)')
+_OBJ_RE = re.compile(r'object\(expression: "HEAD:([^"]+)"\)')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        q = body["query"]
+        QUERIES.append(q)
+        data = {}
+        for m in _REPO_RE.finditer(q):
+            alias, owner, name = m.groups()
+            files = REPOS.get(f"{owner}/{name}")
+            if files is None:
+                data[alias] = None
+                continue
+            if alias.startswith("r"):
+                node = {
+                    "nameWithOwner": f"{owner}/{name}",
+                    "pushedAt": "2025-10-01T00:00:00Z",
+                    "defaultBranchRef": {"name": "main"},
+                    "readme0": {"text": files["README.md"], "isBinary": False},
+                    "isFork": f"{owner}/{name}" in FORKS,
+                    "parent": (
+                        {"nameWithOwner": FORKS[f"{owner}/{name}"]}
+                        if f"{owner}/{name}" in FORKS
+                        else None
+                    ),
+                    "tree": {
+                        "oid": str(hash(json.dumps(files, sort_keys=True))),
+                        "entries": _entries(files),
+                    },
+                }
+            else:
+                seg = q[m.end() :].split("repository(", 1)[0]
+                path = _OBJ_RE.search(seg).group(1)
+                node = {"object": {"text": files[path], "isBinary": False}}
+            data[alias] = node
+        raw = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-RateLimit-Resource", "graphql")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def endpoint():
+    QUERIES.clear()
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/graphql"
+    srv.shutdown()
+
+
+def test_batch_returns_readme_tree_and_small_blobs(endpoint):
+    out = fetch_repos_batch(
+        ["alice/nodes", "ghost/missing"], "tok", endpoint=endpoint, blob_max=20
+    )
+    assert out["ghost/missing"] is None
+    info = out["alice/nodes"]
+    assert info["default_branch"] == "main"
+    assert "example.com" in info["readme"]
+    paths = {t["path"] for t in info["tree"] if t["type"] == "blob"}
+    assert {"clash/sub.yaml", "v2ray.txt", "big/sub.txt"} <= paths
+    # big/sub.txt exceeds blob_max and is left for raw download
+    assert info["blobs"] == {
+        "clash/sub.yaml": "proxies: []",
+        "v2ray.txt": "vmess://abc",
+    }
+    # one repo query plus one blob query for the whole batch
+    assert len(QUERIES) == 2
+
+
+def test_identical_trees_share_one_representative(endpoint):
+    seen = {}
+    out = fetch_repos_batch(
+        ["bob/nodes", "alice/nodes"], "tok", endpoint=endpoint, seen_trees=seen
+    )
+    fork, origin = out["bob/nodes"], out["alice/nodes"]
+    assert fork["fork"] and fork["parent"] == "alice/nodes"
+    # the non-fork wins even though the fork came first in priority order
+    assert fork["mirror_of"] == "alice/nodes" and fork["blobs"] == {}
+    assert origin["mirror_of"] is None and origin["blobs"]
+    assert seen == {origin["tree_oid"]: "alice/nodes"}
+    # a later batch with the same tree is folded into the earlier representative
+    again = fetch_repos_batch(["bob/nodes"], "tok", endpoint=endpoint, seen_trees=seen)
+    assert again["bob/nodes"]["mirror_of"] == "alice/nodes"
+    assert len(QUERIES) == 3
+
+
+def test_iter_repo_info_batches_and_disabled_mode(endpoint):
+    names = ["alice/nodes"] * 3
+    got = list(iter_repo_info(names, "tok", batch=2, endpoint=endpoint))
+    assert [f for f, _ in got] == names
+    assert all(info is not None for _, info in got)
+    assert len(QUERIES) == 4
+    assert list(iter_repo_info(["alice/nodes"], "tok", enabled=False)) == [
+        ("alice/nodes", None)
+    ]
+
+
+def test_failed_batch_falls_back_to_rest(monkeypatch):
+    def boom(*a, **kw):
+        raise RuntimeError("graphql down")
+
+    monkeypatch.setattr(gh_graphql, "_post", boom)
+    assert list(iter_repo_info(["a/b"], "tok")) == [("a/b", None)]
+
+
+def test_query_nests_tree_to_requested_depth():
+    q = gh_graphql.build_repo_query(["a/b"], depth=2)
+    assert q.count("entries") == 2
+
+
+def test_tree_at_depth_limit_is_flagged():
+    node = {
+        "nameWithOwner": "a/b",
+        "tree": {
+            "oid": "t",
+            "entries": [
+                {"name": "sub.yaml", "type": "blob", "object": {"byteSize": 3}},
+                # depth limit reached: the subtree came back without entries
+                {"name": "deep", "type": "tree", "object": {}},
+            ],
+        },
+    }
+    assert gh_graphql._parse_repo(node)["tree_truncated"]
+    node["tree"]["entries"][1]["object"] = {"entries": []}
+    assert not gh_graphql._parse_repo(node)["tree_truncated"]
+
+
+def test_crawl_falls_back_to_rest_tree_when_truncated(monkeypatch):
+    import main_extract_fast as mef
+
+    info = gh_graphql._parse_repo(
+        {
+            "nameWithOwner": "a/b",
+            "tree": {"entries": [{"name": "x", "type": "tree", "object": {}}]},
+        }
+    )
+    deep = [{"path": "x/y/z/sub.yaml", "type": "blob", "size": 10}]
+    calls = []
+
+    def rest_tree(full, token):
+        calls.append(full)
+        return deep, 200, "sha"
+
+    monkeypatch.setattr(
+        mef, "iter_repo_info", lambda names, token, **kw: [("a/b", info)]
+    )
+    monkeypatch.setattr(mef, "fetch_repo_tree_info", rest_tree)
+    found = mef.crawl_repos([{"full_name": "a/b"}], "tok", {})
+    assert calls == ["a/b"]
+    assert any(f["path"] == "x/y/z/sub.yaml" for f in found)
@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from config.rate_limits import PLANS, RatePlan
+from fetchers import gitee, gitee_html, gitee_smart
+from utils import http_client
+from utils.rate_limiter import RateLimiter
+
+API = {
+    "clash": [
+        {"full_name": "alice/nodes", "default_branch": "dev"},
+        {"full_name": "bob/sub", "default_branch": "master"},
+    ],
+    "empty": [],
+    "slow": [{"full_name": "carol/late", "default_branch": "master"}],
+}
+HTML = {
+    "empty": ["/dave/html-only", "/explore/x", "/alice/nodes"],
+    "slow": ["/erin/fast"],
+}
+TREES = {
+    ("alice/nodes", "dev"): [
+        {"path": "clash/sub.yaml", "type": "blob"},
+        {"path": "v2ray-sub.md", "type": "blob"},
+        {"path": "docs/sub.txt", "type": "blob"},
+    ],
+    ("dave/html-only", "main"): [{"path": "sub/free.txt", "type": "blob"}],
+}
+FILES = {"/alice/nodes/raw/dev/v2ray-sub.md": "see https://example.com/x.txt"}
+HITS = []
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _send(self, status, body=b"", ctype="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        u = urlsplit(self.path)
+        q = {k: v[0] for k, v in parse_qs(u.query).items()}
+        HITS.append((u.path, q))
+        if u.path == "/api/v5/search/repositories":
+            if q["q"] == "slow":
+                time.sleep(0.6)
+            items = API.get(q["q"], []) if q.get("page") == "1" else []
+            return self._send(200, json.dumps(items).encode())
+        if u.path == "/search":
+            paths = HTML.get(q["q"], []) if q.get("page") == "1" else []
+            html = "".join(f'<a href="{p}">x</a>' for p in paths)
+            return self._send(200, html.encode(), "text/html")
+        if u.path.startswith("/api/v5/repos/") and "/git/trees/" in u.path:
+            full, ref = u.path[len("/api/v5/repos/") :].split("/git/trees/")
+            tree = TREES.get((full, ref))
+            if tree is None:
+                return self._send(404, b"{}")
+            return self._send(200, json.dumps({"tree": tree}).encode())
+        if u.path in FILES:
+            return self._send(200, FILES[u.path].encode(), "text/plain")
+        self._send(404)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def server(monkeypatch):
+    HITS.clear()
+    monkeypatch.setitem(
+        PLANS, "127.0.0.1", RatePlan(per_minute=60000, burst=100, min_interval=0)
+    )
+    monkeypatch.setattr(http_client, "limiter", RateLimiter(adaptive=False))
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    monkeypatch.setattr(gitee, "WEB_BASE", base)
+    monkeypatch.setattr(gitee, "BASE", f"{base}/api/v5")
+    monkeypatch.setattr(gitee_html, "SEARCH_URL", f"{base}/search")
+    yield base
+    srv.shutdown()
+
+
+def _names(repos):
+    return {r["full_name"]: r["source"] for r in repos}
+
+
+def test_api_results_without_html_fallback(server):
+    repos = gitee_smart.discover_repos(["clash"], hedge_delay=5)
+    assert _names(repos) == {"alice/nodes": "api", "bob/sub": "api"}
+    assert not any(p == "/search" for p, _ in HITS)
+
+
+def test_empty_api_races_html_and_merges(server):
+    repos = gitee_smart.discover_repos(["clash", "empty"], hedge_delay=5)
+    # alice/nodes came from both streams and is kept once, with API metadata
+    assert _names(repos) == {
+        "alice/nodes": "both",
+        "bob/sub": "api",
+        "dave/html-only": "html",
+    }
+    alice = next(r for r in repos if r["full_name"] == "alice/nodes")
+    assert alice["default_branch"] == "dev"
+
+
+def test_slow_api_is_hedged_with_html(server):
+    t0 = time.monotonic()
+    repos = gitee_smart.discover_repos(["slow"], hedge_delay=0.1)
+    assert _names(repos) == {"carol/late": "api", "erin/fast": "html"}
+    html = [p for p, _ in HITS if p == "/search"]
+    assert html and time.monotonic() - t0 < 3
+
+
+def test_tree_scan_uses_candidate_paths(server):
+    repos = [
+        {"full_name": "alice/nodes", "default_branch": "dev"},
+        {"full_name": "dave/html-only", "default_branch": None},
+        {"full_name": "bob/sub", "default_branch": "master"},
+    ]
+    links = gitee_smart.collect_repo_files(repos)
+    assert set(links) == {
+        f"{server}/alice/nodes/raw/dev/clash/sub.yaml",
+        "https://example.com/x.txt",
+        f"{server}/dave/html-only/raw/main/sub/free.txt",
+    }
@@ -0,0 +1,77 @@
+import datetime as _dt
+import threading
+
+from fetchers import github_adv
+from fetchers.github_adv import plan_windows, search_recent_repos
+
+
+class _FakeSearch:
+    """Every window returns `total` hits; page N holds repos '<kw>/<N>-<i>'."""
+
+    def __init__(self, totals, per_page):
+        self.totals = totals
+        self.per_page = per_page
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, q, token, page):
+        with self.lock:
+            self.calls.append((q, page))
+        kw = q.split(" pushed:")[0]
+        total = self.totals(q)
+        n = max(0, min(self.per_page, min(total, 1000) - (page - 1) * self.per_page))
+        items = [{"full_name": f"{kw}/{page}-{i}"} for i in range(n)]
+        # repos shared across keywords to exercise dedup
+        items.append({"full_name": "shared/repo"})
+        return {"total_count": total, "items": items}
+
+
+def test_plan_expands_every_keyword_and_window(monkeypatch):
+    monkeypatch.setattr(github_adv, "DAYS_BACK", 9)
+    monkeypatch.setattr(github_adv, "SLICE_DAYS", 5)
+    tasks = plan_windows(["a", "b"], today=_dt.date(2025, 10, 10))
+    assert [t[1] for t in tasks] == ["a", "a", "b", "b"]
+    assert tasks[0][2:] == (_dt.date(2025, 10, 1), _dt.date(2025, 10, 5))
+
+
+def test_pages_fan_out_from_first_page_total(monkeypatch):
+    monkeypatch.setattr(github_adv, "PER_PAGE", 10)
+    fake = _FakeSearch(lambda q: 35, per_page=10)
+    monkeypatch.setattr(github_adv, "_search_page", fake)
+    repos = search_recent_repos(["kw"], token="t", concurrency=3)
+    names = {r["full_name"] for r in repos}
+    assert len(names) == len(repos)
+    assert len(names) == 35 + 1
+    windows = len(plan_windows(["kw"]))
+    # page 1 doubles as the preflight: 4 pages per window, no extra count calls
+    assert len(fake.calls) == 4 * windows
+
+
+def test_large_windows_are_split(monkeypatch):
+    monkeypatch.setattr(github_adv, "PER_PAGE", 10)
+    monkeypatch.setattr(github_adv, "DAYS_BACK", 1)
+    monkeypatch.setattr(github_adv, "SLICE_DAYS", 2)
+
+    def totals(q):
+        start, end = q.split("pushed:")[1].split("..")
+        return 5000 if start != end else 5
+
+    fake = _FakeSearch(totals, per_page=10)
+    monkeypatch.setattr(github_adv, "_search_page", fake)
+    search_recent_repos(["kw"], token="t")
+    single_day = [q for q, _ in fake.calls if q.split("pushed:")[1].count("-") == 4]
+    assert any(
+        q.split("pushed:")[1].split("..")[0] == q.split("pushed:")[1].split("..")[1]
+        for q in single_day
+    )
+
+
+def test_stops_once_limit_reached(monkeypatch):
+    monkeypatch.setattr(github_adv, "PER_PAGE", 10)
+    fake = _FakeSearch(lambda q: 1000, per_page=10)
+    monkeypatch.setattr(github_adv, "_search_page", fake)
+    repos = search_recent_repos(
+        [f"kw{i}" for i in range(20)], token="t", limit=15, concurrency=2
+    )
+    assert len(repos) == 15
+    assert len(fake.calls) < 10
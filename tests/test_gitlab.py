@@ -0,0 +1,143 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from config.rate_limits import PLANS, RatePlan
+from fetchers import gitlab
+from utils import http_client
+from utils.rate_limiter import RateLimiter
+
+PROJECTS = [
+    {"id": 30, "path_with_namespace": "alice/nodes", "default_branch": "trunk"},
+    {"id": 20, "path_with_namespace": "bob/free-sub", "default_branch": "main"},
+    {"id": 10, "path_with_namespace": "carol/empty", "default_branch": None},
+]
+READMES = {
+    30: "clash https://example.com/a/sub.yaml and https://example.com/home",
+    20: "v2ray https://example.com/b/nodes.txt",
+}
+TREES = {
+    30: [
+        {"path": "clash", "type": "tree"},
+        {"path": "clash/sub.yaml", "type": "blob"},
+        {"path": "v2ray-sub.md", "type": "blob"},
+        {"path": "logo.png", "type": "blob"},
+        {"path": "docs/sub.txt", "type": "blob"},
+    ],
+    20: [],
+}
+FILES = {"/alice/nodes/-/raw/trunk/v2ray-sub.md": "see https://example.com/c/x.txt"}
+HITS = []
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _json(self, body, next_url=None):
+        raw = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if next_url:
+            self.send_header("Link", f'<{next_url}>; rel="next"')
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _text(self, status, text=""):
+        raw = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _page(self, items, q, path, key):
+        # keyset：游标之后取 per_page 条，下一页链接放在 Link 头里
+        per_page = int(q.get("per_page", ["20"])[0])
+        after = q.get("cursor", [None])[0]
+        start = 0 if after is None else int(after)
+        chunk = items[start : start + per_page]
+        nxt = None
+        if start + per_page < len(items):
+            base = f"http://{self.headers['Host']}{path}"
+            nxt = f"{base}?per_page={per_page}&{key}&cursor={start + per_page}"
+        self._json(chunk, nxt)
+
+    def do_GET(self):
+        u = urlsplit(self.path)
+        q = parse_qs(u.query)
+        HITS.append((u.path, q))
+        parts = u.path.strip("/").split("/")
+        if u.path == "/api/v4/projects":
+            assert q.get("pagination") == ["keyset"] or "cursor" in q
+            # 搜索词不影响结果
+            return self._page(PROJECTS, q, u.path, "pagination=keyset")
+        if parts[:3] == ["api", "v4", "projects"] and len(parts) > 4:
+            pid = int(parts[3])
+            if parts[4:] == ["repository", "files", "README.md", "raw"]:
+                if pid in READMES and q.get("ref") == [
+                    next(p["default_branch"] for p in PROJECTS if p["id"] == pid)
+                ]:
+                    return self._text(200, READMES[pid])
+                return self._text(404)
+            if parts[4:] == ["repository", "tree"]:
+                return self._page(TREES.get(pid, []), q, u.path, "recursive=true")
+        if u.path in FILES:
+            return self._text(200, FILES[u.path])
+        self._text(404)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def base(monkeypatch):
+    HITS.clear()
+    monkeypatch.setitem(
+        PLANS, "127.0.0.1", RatePlan(per_minute=60000, burst=100, min_interval=0)
+    )
+    monkeypatch.setattr(http_client, "limiter", RateLimiter(adaptive=False))
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def test_keyset_pagination_follows_next_links(base, monkeypatch):
+    monkeypatch.setattr(gitlab, "PER_PAGE_MAX", 2)
+    got = gitlab.collect_links(["clash"], per_key=10, base=base, token="")
+    pages = [q for path, q in HITS if path == "/api/v4/projects"]
+    # two projects per page -> the second page comes from the Link header
+    assert len(pages) == 2
+    assert pages[0]["pagination"] == ["keyset"] and "cursor" in pages[1]
+    assert "https://example.com/b/nodes.txt" in got
+
+
+def test_search_stops_at_limit(base):
+    gitlab.collect_links(["clash"], per_key=1, base=base, token="")
+    assert len([h for h in HITS if h[0] == "/api/v4/projects"]) == 1
+    readmes = [h for h in HITS if h[0].endswith("/README.md/raw")]
+    assert [h[0].split("/")[4] for h in readmes] == ["30"]
+
+
+def test_readme_fetched_once_on_default_branch(base):
+    got = gitlab.collect_links(["clash", "v2ray"], per_key=5, base=base, token="")
+    assert set(got) == {
+        "https://example.com/a/sub.yaml",
+        "https://example.com/b/nodes.txt",
+    }
+    readme_hits = [h for h in HITS if h[0].endswith("/README.md/raw")]
+    # one README per project with a default branch, even across two keywords
+    assert sorted(h[0].split("/")[4] for h in readme_hits) == ["20", "30"]
+    assert not any(h[0].endswith("/tree") for h in HITS)
+
+
+def test_tree_scan_uses_candidate_paths(base):
+    got = gitlab.collect_links(
+        ["clash"], per_key=5, base=base, token="", scan_tree=True
+    )
+    assert f"{base}/alice/nodes/-/raw/trunk/clash/sub.yaml" in got
+    assert "https://example.com/c/x.txt" in got
+    # docs/ is skipped and png is not a candidate
+    assert not any("docs/sub.txt" in u or "logo.png" in u for u in got)
+    assert not any(h[0].startswith("/carol") for h in HITS)
@@ -0,0 +1,63 @@
+import time
+
+from fetchers.keyword_planner import attribute_keywords, plan_queries
+from storage.keyword_stats import KeywordStats
+
+
+def _stats_with(history: dict, ts: int = None) -> KeywordStats:
+    stats = KeywordStats(None)
+    ts = ts or int(time.time())
+    for kw, valids in history.items():
+        stats.runs[kw] = [[ts - 10 * i, 1, 1, v] for i, v in enumerate(valids)]
+    return stats
+
+
+def test_stats_accumulate_commit_and_persist(tmp_path):
+    path = str(tmp_path / "kw.json")
+    stats = KeywordStats(path, history_runs=2)
+    for _ in range(3):
+        stats.note_queried(["a", "b"])
+        stats.note("a", repos=2, candidates=5, valid=1)
+        stats.commit_run()
+    stats.save()
+    loaded = KeywordStats(path).load()
+    assert loaded.run_count("a") == 2
+    assert loaded.summary()["a"]["valid"] == 2
+    assert loaded.recent_yield("b") == 0
+
+
+def test_orders_by_yield_and_explores_unknown_first():
+    stats = _stats_with({"low kw": [1, 1, 1], "high kw": [5, 4, 6]})
+    queries, dropped = plan_queries(["low kw", "high kw", "new kw"], stats)
+    assert [q for q, _ in queries] == ["high kw", "new kw", "low kw"]
+    assert dropped == []
+
+
+def test_drops_low_yield_until_retry_window():
+    stats = _stats_with({"dead kw": [0, 0, 0], "ok kw": [2, 2, 2]})
+    queries, dropped = plan_queries(["dead kw", "ok kw"], stats)
+    assert dropped == ["dead kw"]
+    later = int(time.time()) + 8 * 86400
+    queries, dropped = plan_queries(["dead kw", "ok kw"], stats, now=later)
+    assert dropped == []
+
+
+def test_covered_keywords_and_or_merge():
+    stats = KeywordStats(None)
+    kws = ["clash", "clash config", "mihomo", "v2ray", "free vpn", "trojan"]
+    queries, dropped = plan_queries(kws, stats, or_max=2)
+    assert dropped == ["clash config"]
+    assert queries == [
+        ("clash OR mihomo", ["clash", "mihomo"]),
+        ("v2ray OR trojan", ["v2ray", "trojan"]),
+        ("free vpn", ["free vpn"]),
+    ]
+
+
+def test_attribute_or_query_hits():
+    repo = {"full_name": "x/mihomo-rules", "description": "", "topics": []}
+    assert attribute_keywords(repo, ["clash", "mihomo"]) == ["mihomo"]
+    assert attribute_keywords({"full_name": "x/y"}, ["clash", "mihomo"]) == [
+        "clash",
+        "mihomo",
+    ]
@@ -0,0 +1,113 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from storage import meta_cache as mc
+from storage.history import ensure_increment
+from storage.meta_cache import MetaCache, content_fingerprint, parse_http_date
+
+LASTMOD = "Wed, 01 Oct 2025 08:00:00 GMT"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Last-Modified", LASTMOD)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def test_upsert_get_and_ttl():
+    cache = MetaCache(None, ttl=60)
+    cache.upsert("u1", owner_key="o/r", base="sub", lastmod=100)
+    ent = cache.get("u1")
+    assert (ent.owner_key, ent.base, ent.lastmod) == ("o/r", "sub", 100)
+    assert cache.is_stale("u1")
+    cache.upsert("u1", checked_at=int(time.time()))
+    assert not cache.is_stale("u1")
+    assert cache.stale(["u1", "u2"]) == ["u2"]
+
+
+def test_eviction_by_idle_and_size():
+    cache = MetaCache(None, max_entries=2, idle_days=1)
+    for i in range(3):
+        cache.upsert(f"u{i}")
+        cache.entries[f"u{i}"].touched_at = int(time.time()) - i
+    cache.entries["old"] = mc.ResourceMeta(touched_at=int(time.time()) - 3 * 86400)
+    assert cache.evict() == 2
+    assert set(cache.entries) == {"u0", "u1"}
+
+
+def test_persist_and_import_resource_keys(tmp_path):
+    path = str(tmp_path / "meta.json")
+    cache = MetaCache(path)
+    cache.import_resource_keys({"u1": {"owner_key": "a/b", "base": "x", "lastmod": 5}})
+    cache.upsert("u2", etag='"e"', digest="d", nodes=3)
+    cache.save()
+    loaded = MetaCache(path).load()
+    assert loaded.get("u1").owner_key == "a/b"
+    assert loaded.get("u1").lastmod == 5
+    assert loaded.get("u2").nodes == 3
+
+
+@pytest.mark.parametrize("use_aiohttp", [True, False])
+def test_refresh_records_lastmod_and_etag(server, monkeypatch, use_aiohttp):
+    if not use_aiohttp:
+        monkeypatch.setattr(mc, "aiohttp", None)
+    elif mc.aiohttp is None:
+        pytest.skip("aiohttp not installed")
+    cache = MetaCache(None)
+    url = f"{server}/sub.txt"
+    out = cache.refresh([url], concurrency=2, timeout=5)
+    assert out[url] == parse_http_date(LASTMOD)
+    assert cache.get(url).etag == '"v1"'
+    assert not cache.is_stale(url)
+    # second refresh goes conditional and keeps the cached value on 304
+    assert cache.refresh([url])[url] == parse_http_date(LASTMOD)
+
+
+def test_content_fingerprint_counts_nodes():
+    digest, nodes = content_fingerprint(
+        "vmess://a\ntrojan://b\nproxies:\n  - name: x\n"
+    )
+    assert len(digest) == 40
+    assert nodes == 3
+
+
+def test_ensure_increment_prefers_cached_lastmod(tmp_path, monkeypatch):
+    monkeypatch.setenv("PER_OWNER_HISTORY_LIMIT", "1")
+    cache = MetaCache(None)
+    cache.upsert("https://x/old.txt", lastmod=100)
+    cache.upsert("https://x/new.txt", lastmod=200)
+    resource_map = {
+        "https://x/old.txt": {"owner_key": "o", "base": "old"},
+        "https://x/new.txt": {"owner_key": "o", "base": "new"},
+    }
+    final = ensure_increment(
+        ["https://x/old.txt", "https://x/new.txt"],
+        str(tmp_path / "history.json"),
+        0,
+        3,
+        resource_map=resource_map,
+        meta_cache=cache,
+    )
+    assert final == ["https://x/new.txt"]
@@ -0,0 +1,126 @@
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import utils.metrics as metrics_mod
+import utils.run_report as run_report
+from storage.history import save_history
+from utils import http_client
+from utils.metrics import Counter, Histogram, Metrics, export_run, host_label
+from utils.rate_limiter import RateLimiter
+from utils.run_report import RunReport
+
+
+@pytest.fixture()
+def metrics(monkeypatch):
+    m = Metrics()
+    monkeypatch.setattr(metrics_mod, "_default_metrics", m)
+    monkeypatch.setattr(run_report, "_default_report", RunReport())
+    return m
+
+
+def test_text_format_labels_and_cumulative_buckets():
+    c = Counter("x_total", "Things.", ("reason",))
+    c.inc(reason='say "hi"\n')
+    c.inc(2, reason="b")
+    assert c.render().splitlines() == [
+        "# HELP x_total Things.",
+        "# TYPE x_total counter",
+        'x_total{reason="b"} 2',
+        'x_total{reason="say \\"hi\\"\\n"} 1',
+    ]
+    with pytest.raises(ValueError):
+        c.inc(host="a")
+    h = Histogram("lat_seconds", "Latency.", ("host",), buckets=(0.1, 1))
+    h.observe(0.05, host="a")
+    h.observe(0.5, host="a")
+    h.observe(3, host="a")
+    lines = h.render().splitlines()[2:]
+    assert lines == [
+        'lat_seconds_bucket{host="a",le="0.1"} 1',
+        'lat_seconds_bucket{host="a",le="1"} 2',
+        'lat_seconds_bucket{host="a",le="+Inf"} 3',
+        'lat_seconds_sum{host="a"} 3.55',
+        'lat_seconds_count{host="a"} 3',
+    ]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"vmess://abc"
+        self.send_response(429 if self.path == "/limited" else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", "0.01")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def base():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_http_client_feeds_latency_waits_and_in_flight(base, metrics, monkeypatch):
+    monkeypatch.setattr(http_client, "limiter", RateLimiter(adaptive=False))
+    http_client.request("GET", f"{base}/ok")
+    http_client.request("GET", f"{base}/limited", retries=1)
+    # hosts outside METRICS_HOSTS share one label
+    host = "other"
+    assert metrics.http_duration.value(host=host)["count"] == 3
+    assert metrics.http_requests.value(host=host, code="2xx") == 1
+    assert metrics.http_requests.value(host=host, code="4xx") == 2
+    assert metrics.http_retries.value(host=host) == 1
+    assert metrics.rate_limit_wait.value(host=host) >= 0.01
+    assert metrics.http_in_flight.value(host=host) == 0
+
+
+def test_host_label_keeps_known_hosts_and_folds_the_rest(metrics):
+    assert host_label("raw.githubusercontent.com") == "raw.githubusercontent.com"
+    assert host_label("api.github.com/search") == "api.github.com/search"
+    assert host_label("sub.example.net") == "other"
+    assert host_label(None) == "other"
+    for i in range(50):
+        metrics.observe_request(f"node{i}.example.net", 10, 200, 0.1)
+    assert list(metrics.http_requests._values) == [("other", "2xx")]
+
+
+def test_endpoint_and_textfile_expose_the_same_registry(tmp_path, metrics):
+    metrics.cache_lookups.inc(cache="negative", result="hit")
+    save_history({"links": ["a", "b", "c"], "fail": {"c": 1}}, str(tmp_path / "h"))
+    srv = metrics.serve(0)
+    try:
+        url = f"http://127.0.0.1:{srv.server_port}/metrics"
+        with urllib.request.urlopen(url) as r:
+            assert r.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            text = r.read().decode("utf-8")
+    finally:
+        srv.shutdown()
+        srv.server_close()
+    assert 'sub_hunter_cache_lookups_total{cache="negative",result="hit"} 1' in text
+    assert "sub_hunter_history_links 3" in text
+    assert "sub_hunter_history_failing 1" in text
+
+    path = str(tmp_path / "collector" / "sub_hunter.prom")
+    export_run(path)
+    with open(path, encoding="utf-8") as f:
+        written = f.read()
+    assert "sub_hunter_last_run_timestamp_seconds " in written
+    assert "sub_hunter_history_links 3" in written
+
+
+def test_stage_throughput_uses_primary_keys(metrics):
+    r = run_report.get_run_report()
+    r.begin_stage("validate", {"reachable": list(range(5)), "deferred": []})
+    r.end_stage("ran", {"valid": [1, 2], "deferred": [3]})
+    assert metrics.stage_items.value(stage="validate", direction="in") == 5
+    assert metrics.stage_items.value(stage="validate", direction="out") == 2
@@ -0,0 +1,121 @@
+import json
+import os
+
+import pytest
+
+import main_extract_fast as mef
+from bench import micro
+from bench.micro_corpus import build_micro_corpus
+from filters import validator
+from filters.extract import extract_candidate_urls
+
+# the timing gate is opt-in: it takes ~15s and needs a quiet machine
+GATE = os.environ.get("MICROBENCH_GATE", "0") in ("1", "true", "True")
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return build_micro_corpus()
+
+
+def test_corpus_exercises_intended_branches(corpus):
+    # a baseline measured on inputs that short-circuit early would be meaningless
+    expected = {
+        "clash_big": True,
+        "v2_plain": True,
+        "b64_dump": True,
+        "airport_b64": True,
+        "rule_provider": False,
+        "rule_list": False,
+        "html_404": False,
+        "html_challenge": False,
+        "html_login": False,
+    }
+    for name, ok in expected.items():
+        url, body = corpus.bodies[name]
+        assert validator.is_valid_subscription(url, body) is ok, name
+    assert mef._maybe_base64_subscription(corpus.bodies["b64_dump"][1])
+    assert not mef._maybe_base64_subscription(corpus.bodies["v2_plain"][1])
+    readme = corpus.bodies["readme"][1]
+    assert len(corpus.urls) >= 2000
+    assert len(list(extract_candidate_urls(readme))) > len(corpus.urls) // 2
+    with micro.isolated():
+        kept = [u for u in corpus.urls if mef.is_subscription_url(u)]
+    assert 0 < len(kept) < len(corpus.urls)
+
+
+def test_compare_classifies_against_tolerance():
+    baseline = {
+        "tolerance": 0.5,
+        "cases": {
+            "a": {"ratio": 1.0},
+            "b": {"ratio": 1.0},
+            "c": {"ratio": 1.0, "tolerance": 0.1},
+            "d": {"ratio": 2.0},
+        },
+    }
+    results = {
+        "cases": {
+            "a": {"ratio": 1.4, "seconds": 0.1},
+            "b": {"ratio": 1.6, "seconds": 0.1},
+            "c": {"ratio": 1.2, "seconds": 0.1},
+            "d": {"ratio": 0.5, "seconds": 0.1},
+            "e": {"ratio": 9.9, "seconds": 0.1},
+        }
+    }
+    status = {r["case"]: r["status"] for r in micro.compare(results, baseline)}
+    assert status == {
+        "a": "ok",
+        "b": "regressed",
+        "c": "regressed",
+        "d": "improved",
+        "e": "new",
+    }
+    loose = micro.compare(results, baseline, tolerance=1.0)
+    assert [r["case"] for r in micro.regressions(loose)] == []
+
+
+def test_save_baseline_keeps_tolerances(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    old = {"tolerance": 0.3, "cases": {"a": {"ratio": 1.0, "tolerance": 0.8}}}
+    results = {
+        "calibration_s": 0.01,
+        "cases": {
+            "a": {"ratio": 2.0, "seconds": 0.02, "unit": "url"},
+            "b": {"ratio": 3.0, "seconds": 0.03, "unit": "KiB"},
+        },
+    }
+    micro.save_baseline(results, path, old)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["tolerance"] == 0.3
+    assert data["cases"] == {
+        "a": {"ratio": 2.0, "seconds": 0.02, "tolerance": 0.8},
+        "b": {"ratio": 3.0, "seconds": 0.03},
+    }
+    assert micro.load_baseline(path) == data
+
+
+def test_gate_retries_before_reporting(monkeypatch):
+    runs = iter([5.0, 1.1])
+
+    def fake_run(cases, *a, **kw):
+        ratio = next(runs)
+        return {"cases": {c.name: {"ratio": ratio, "seconds": 0.1} for c in cases}}
+
+    monkeypatch.setattr(micro, "run", fake_run)
+    cases = [micro.Case("a", lambda: None, 1, "url")]
+    results, rows = micro.gate(cases, {"cases": {"a": {"ratio": 1.0}}})
+    assert rows[0]["status"] == "ok" and results["cases"]["a"]["ratio"] == 1.1
+
+
+@pytest.mark.skipif(not GATE, reason="set MICROBENCH_GATE=1 to run the timing gate")
+def test_hot_paths_within_baseline():
+    baseline = micro.load_baseline()
+    tolerance = os.environ.get("MICROBENCH_TOLERANCE")
+    scale = baseline.get("scale", 1.0)
+    cases = micro.build_cases(build_micro_corpus(scale=scale))
+    _, rows = micro.gate(
+        cases, baseline, float(tolerance) if tolerance else None, scale=scale
+    )
+    assert not micro.regressions(rows), "\n" + micro.format_table(rows)
@@ -0,0 +1,76 @@
+from storage.negative_cache import (
+    BloomFilter,
+    NegativeCache,
+    reason_from_exception,
+    reason_from_status,
+)
+
+
+def test_bloom_filter_membership():
+    bf = BloomFilter(1000)
+    for i in range(500):
+        bf.add(f"url:https://example.com/{i}")
+    assert all(f"url:https://example.com/{i}" in bf for i in range(500))
+    false_hits = sum(f"url:https://other.net/{i}" in bf for i in range(2000))
+    assert false_hits < 100
+
+
+def test_reason_ttls_differ():
+    cache = NegativeCache(None)
+    cache.add_url("https://a/404.txt", "http_404")
+    cache.add_url("https://a/slow.txt", "timeout")
+    exp_404 = cache.entries[cache.url_key("https://a/404.txt")][1]
+    exp_timeout = cache.entries[cache.url_key("https://a/slow.txt")][1]
+    assert exp_404 > exp_timeout
+    assert cache.check_url("https://a/404.txt") == "http_404"
+    assert cache.check_url("https://a/unknown.txt") is None
+
+
+def test_expired_entries_are_misses():
+    cache = NegativeCache(None)
+    cache.add_url("https://a/x.txt", "timeout", ttl=-1)
+    assert cache.check_url("https://a/x.txt") is None
+
+
+def test_longer_memory_is_not_shortened():
+    cache = NegativeCache(None)
+    cache.add_url("https://a/x.txt", "http_404")
+    cache.add_url("https://a/x.txt", "timeout")
+    assert cache.check_url("https://a/x.txt") == "http_404"
+
+
+def test_persist_roundtrip(tmp_path):
+    path = str(tmp_path / "neg.json")
+    cache = NegativeCache(path)
+    cache.add_repo("Owner/Repo", "repo_not_found")
+    cache.add_url("https://a/gone.yaml", "http_404")
+    cache.add_url("https://a/stale.yaml", "timeout", ttl=-1)
+    cache.save()
+
+    loaded = NegativeCache(path).load()
+    assert loaded.check_repo("owner/repo") == "repo_not_found"
+    assert loaded.check_url("https://a/gone.yaml") == "http_404"
+    assert cache.url_key("https://a/stale.yaml") not in loaded.entries
+    kept, skipped = loaded.filter_urls(["https://a/gone.yaml", "https://a/new.yaml"])
+    assert kept == ["https://a/new.yaml"]
+    assert skipped == [("https://a/gone.yaml", "http_404")]
+
+
+def test_disabled_cache_is_noop():
+    cache = NegativeCache(None, enabled=False)
+    cache.add_url("https://a/x.txt", "http_404")
+    assert cache.check_url("https://a/x.txt") is None
+
+
+def test_reason_mapping():
+    assert reason_from_status(404) == "http_404"
+    assert reason_from_status(503) == "http_5xx"
+    assert reason_from_status(400) == "http_4xx"
+    assert reason_from_status(403) == "throttled"
+    assert reason_from_status(429) == "throttled"
+
+    class ReadTimeout(Exception):
+        pass
+
+    assert reason_from_exception(ReadTimeout("boom")) == "timeout"
+    assert reason_from_exception(ConnectionError("reset")) == "network"
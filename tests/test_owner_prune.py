@@ -0,0 +1,77 @@
+import time
+
+from filters import owner_prune
+from filters.owner_prune import prune_by_owner
+from storage.meta_cache import MetaCache
+
+
+class _RecordingCache(MetaCache):
+    def __init__(self):
+        super().__init__(None)
+        self.refresh_calls = []
+        self.saves = 0
+
+    def refresh(self, urls, concurrency=8, timeout=6, host_concurrency=4):
+        urls = list(urls)
+        self.refresh_calls.append(urls)
+        now = int(time.time())
+        for u in urls:
+            # later urls look newer
+            self.upsert(u, lastmod=int(u.rsplit("-", 1)[1]), checked_at=now)
+        return {u: self.lastmod(u) for u in urls}
+
+    def save(self):
+        self.saves += 1
+
+
+def _owner(u):
+    return u.split("/")[2]
+
+
+def test_single_refresh_pass_across_owners():
+    urls = [f"https://a/x-{i}" for i in range(25)] + [
+        f"https://b/y-{i}" for i in range(30)
+    ]
+    urls += ["https://c/z-1", "https://c/z-2"]
+    cache = _RecordingCache()
+    out, skipped = prune_by_owner(urls, 3, _owner, meta_cache=cache, sample_size=5)
+    assert len(cache.refresh_calls) == 1
+    assert len(cache.refresh_calls[0]) == 10
+    assert cache.saves == 1
+    assert out[:3] == ["https://a/x-4", "https://a/x-3", "https://a/x-2"]
+    assert out[3:6] == ["https://b/y-4", "https://b/y-3", "https://b/y-2"]
+    assert out[6:] == ["https://c/z-1", "https://c/z-2"]
+    assert skipped == 22 + 27
+
+
+def test_fresh_cache_entries_are_not_resampled():
+    urls = [f"https://a/x-{i}" for i in range(25)]
+    cache = _RecordingCache()
+    now = int(time.time())
+    for u in urls[:5]:
+        cache.upsert(u, lastmod=1, checked_at=now)
+    out, _ = prune_by_owner(urls, 2, _owner, meta_cache=cache, sample_size=5)
+    assert cache.refresh_calls == []
+    assert out == urls[:2]
+
+
+def test_small_owner_and_disabled_sampling_keep_original_order(monkeypatch):
+    urls = [f"https://a/x-{i}" for i in range(10)]
+    cache = _RecordingCache()
+    out, skipped = prune_by_owner(urls, 4, _owner, meta_cache=cache)
+    assert out == urls[:4] and skipped == 6
+    big = [f"https://a/x-{i}" for i in range(40)]
+    out, _ = prune_by_owner(big, 4, _owner, meta_cache=cache, sample_enabled=False)
+    assert out == big[:4]
+    assert cache.refresh_calls == []
+
+
+def test_owner_from_cache_takes_precedence():
+    cache = _RecordingCache()
+    cache.upsert("https://a/x-1", owner_key="shared")
+    cache.upsert("https://b/y-2", owner_key="shared")
+    out, skipped = prune_by_owner(
+        ["https://a/x-1", "https://b/y-2"], 1, _owner, meta_cache=cache
+    )
+    assert out == ["https://a/x-1"] and skipped == 1
+    assert owner_prune.OWNER_LASTMOD_TRIGGER >= 1
@@ -0,0 +1,126 @@
+import pytest
+
+from pipeline.engine import Pipeline, PipelineStop, Stage, StageOutputError
+
+CALLS = []
+
+
+class Boom(Exception):
+    pass
+
+
+def _stages(fail_at=None, source=(1, 2, 3)):
+    def search():
+        CALLS.append("search")
+        return {"items": list(source)}
+
+    def double(items):
+        CALLS.append("double")
+        return {"doubled": [i * 2 for i in items]}
+
+    def total(doubled):
+        CALLS.append("total")
+        if fail_at == "total":
+            raise Boom("network blip")
+        return {"total": sum(doubled)}
+
+    def publish(total):
+        CALLS.append("publish")
+        return {}
+
+    return [
+        Stage("search", search, (), {"items": list}),
+        Stage("double", double, ("items",), {"doubled": list}),
+        Stage("total", total, ("doubled",), {"total": int}),
+        Stage("publish", publish, ("total",), checkpoint=False),
+    ]
+
+
+@pytest.fixture(autouse=True)
+def _clear():
+    CALLS.clear()
+
+
+def test_crash_resumes_from_last_completed_stage(tmp_path):
+    with pytest.raises(Boom):
+        Pipeline(_stages(fail_at="total"), str(tmp_path)).run()
+    assert CALLS == ["search", "double", "total"]
+
+    CALLS.clear()
+    pipe = Pipeline(_stages(), str(tmp_path))
+    ctx = pipe.run()
+    assert ctx["total"] == 12
+    assert CALLS == ["total", "publish"]
+    assert pipe.trace == [
+        ("search", "resumed"),
+        ("double", "resumed"),
+        ("total", "ran"),
+        ("publish", "ran"),
+    ]
+
+
+def test_completed_run_starts_fresh(tmp_path):
+    Pipeline(_stages(), str(tmp_path)).run()
+    CALLS.clear()
+    Pipeline(_stages(), str(tmp_path)).run()
+    assert CALLS == ["search", "double", "total", "publish"]
+
+
+def test_changed_inputs_invalidate_checkpoints(tmp_path):
+    def seeded(fail_at=None):
+        stages = _stages(fail_at=fail_at)
+        stages[0] = Stage(
+            "search", lambda seed: {"items": [seed]}, ("seed",), {"items": list}
+        )
+        return stages
+
+    with pytest.raises(Boom):
+        Pipeline(seeded(fail_at="total"), str(tmp_path)).run({"seed": 1})
+    CALLS.clear()
+    # search reruns with the new seed, so double's checkpoint no longer matches
+    out = Pipeline(seeded(), str(tmp_path)).run({"seed": 7})
+    assert out["total"] == 14
+    assert CALLS == ["double", "total", "publish"]
+
+
+def test_stale_or_disabled_resume_reruns_everything(tmp_path):
+    with pytest.raises(Boom):
+        Pipeline(_stages(fail_at="total"), str(tmp_path)).run()
+    CALLS.clear()
+    Pipeline(_stages(), str(tmp_path), max_age_hours=0).run()
+    assert CALLS == ["search", "double", "total", "publish"]
+
+    with pytest.raises(Boom):
+        Pipeline(_stages(fail_at="total"), str(tmp_path)).run()
+    CALLS.clear()
+    Pipeline(_stages(), str(tmp_path), resume=False).run()
+    assert CALLS[0] == "search"
+
+
+def test_stop_and_output_type_check(tmp_path):
+    def empty():
+        raise PipelineStop("nothing found")
+
+    pipe = Pipeline(
+        [Stage("search", empty, (), {"items": list})] + _stages()[1:], str(tmp_path)
+    )
+    assert "total" not in pipe.run()
+    assert pipe.trace == [("search", "stopped")]
+
+    bad = Pipeline(
+        [Stage("search", lambda: {"items": "oops"}, (), {"items": list})],
+        str(tmp_path / "bad"),
+    )
+    with pytest.raises(StageOutputError):
+        bad.run()
+
+
+def test_main_pipeline_wiring():
+    from main_extract_fast import build_pipeline
+
+    pipe = build_pipeline(pool=None)
+    produced = set()
+    for st in pipe.stages:
+        assert set(st.inputs) <= produced, st.name
+        produced |= set(st.outputs)
+    assert [s.name for s in pipe.stages][-1] == "publish"
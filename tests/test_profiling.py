@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import utils.profiling as profiling
+import utils.run_report as run_report
+from checker.async_check import check_urls
+from pipeline.engine import Pipeline, Stage
+from utils.profiling import LoopLagMonitor, Profiler, StackSampler
+from utils.run_report import RunReport
+
+
+@pytest.fixture()
+def report(monkeypatch):
+    r = RunReport()
+    monkeypatch.setattr(run_report, "_default_report", r)
+    return r
+
+
+def _use(monkeypatch, prof):
+    monkeypatch.setattr(profiling, "_default_profiler", prof)
+    return prof
+
+
+def test_cpu_and_memory_profiles_per_stage(tmp_path, report, monkeypatch):
+    out = str(tmp_path / "profile")
+    _use(monkeypatch, Profiler(out_dir=out, cpu=True, memory=True))
+    keep = []
+
+    def build():
+        keep.append([str(i) * 20 for i in range(20000)])
+        return {"items": keep[0][:3]}
+
+    Pipeline([Stage("build", build, (), {"items": list})], str(tmp_path)).run()
+    assert sorted(os.listdir(out)) == ["build.cpu.txt", "build.mem.txt", "build.pstats"]
+    prof = report.to_dict()["stages"][0]["profile"]
+    assert any("build" in row["func"] for row in prof["cpu"])
+    assert prof["memory"]["peak_kb"] > 500
+    assert prof["memory"]["top"][0]["where"].startswith("test_profiling.py:")
+
+
+def test_disabled_profiler_adds_nothing(tmp_path, report, monkeypatch):
+    _use(monkeypatch, Profiler(out_dir=str(tmp_path / "p")))
+    Pipeline([Stage("s", lambda: {"x": []}, (), {"x": list})], str(tmp_path)).run()
+    assert "profile" not in report.to_dict()["stages"][0]
+    assert not os.path.exists(tmp_path / "p")
+
+
+def test_loop_lag_monitor_sees_blocking_code():
+    async def main():
+        mon = LoopLagMonitor(interval=0.02).start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # blocks the loop
+        await asyncio.sleep(0.05)
+        return await mon.stop()
+
+    summary = asyncio.run(main())
+    assert summary["samples"] >= 2 and summary["max_ms"] >= 150
+
+
+def test_check_urls_records_loop_lag(tmp_path, report, monkeypatch):
+    _use(monkeypatch, Profiler(out_dir=str(tmp_path), loop_lag=True))
+    report.begin_stage("check")
+    asyncio.run(check_urls([]))
+    report.end_stage("ran")
+    assert "samples" in report.to_dict()["stages"][0]["profile"]["loop_lag"]
+    with open(tmp_path / "check.looplag.json", encoding="utf-8") as f:
+        assert "samples" in json.load(f)
+
+
+def test_stack_sampler_tags_samples_with_stage():
+    done = threading.Event()
+
+    def slow_network_wait():
+        done.wait(2)
+
+    t = threading.Thread(target=slow_network_wait, name="fetcher")
+    t.start()
+    sampler = StackSampler(0.01, lambda: "validate")
+    sampler.start()
+    time.sleep(0.1)
+    sampler.stop()
+    done.set()
+    t.join()
+    rows = [r for r in sampler.folded().splitlines() if "slow_network_wait" in r]
+    assert rows and all(r.startswith("validate;fetcher;") for r in rows)
@@ -0,0 +1,96 @@
+import time
+
+from config.rate_limits import ADAPT_MIN_PER_MINUTE, DEFAULT, PLANS
+from utils.rate_limiter import RateLimiter
+
+
+def test_additive_increase_per_concurrency_window():
+    lim = RateLimiter(adaptive=True)
+    host = "cdn.example.com"
+    for _ in range(DEFAULT.concurrency):
+        lim.feedback(host, 200)
+    snap = lim.snapshot()[host]
+    assert snap["learned"]
+    assert snap["rate_per_minute"] > DEFAULT.per_minute
+    assert snap["concurrency"] == DEFAULT.concurrency + 1
+    assert lim.buckets[host].refill_rate * 60 == snap["rate_per_minute"]
+
+
+def test_multiplicative_decrease_and_retry_after_pause():
+    lim = RateLimiter(adaptive=True)
+    host = "api.github.com/search"
+    lim.feedback(host, 429, {"Retry-After": "3"})
+    snap = lim.snapshot()[host]
+    assert snap["rate_per_minute"] == max(
+        ADAPT_MIN_PER_MINUTE, PLANS[host].per_minute / 2
+    )
+    assert 2 <= snap["paused_for"] <= 3
+    assert lim.reserve(host) >= 2
+
+
+def test_plain_403_is_not_a_throttle():
+    lim = RateLimiter(adaptive=True)
+    lim.feedback("gitee.com", 403, {})
+    snap = lim.snapshot()["gitee.com"]
+    assert snap["throttles"] == 0
+    assert snap["rate_per_minute"] == PLANS["gitee.com"].per_minute
+
+
+def test_rate_capped_by_remaining_budget():
+    lim = RateLimiter(adaptive=True)
+    headers = {
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Remaining": "60",
+        "X-RateLimit-Reset": str(int(time.time()) + 600),
+    }
+    lim.feedback("api.github.com", 200, headers)
+    assert lim.snapshot()["api.github.com"]["rate_per_minute"] <= 6.1
+
+
+def test_static_mode_keeps_plan_rate():
+    lim = RateLimiter(adaptive=False)
+    lim.feedback("gitlab.com", 429, {})
+    for _ in range(50):
+        lim.feedback("gitlab.com", 200)
+    assert lim.snapshot()["gitlab.com"]["rate_per_minute"] == 600
+    assert lim.snapshot()["gitlab.com"]["throttles"] == 1
+
+
+def test_slot_bounds_in_flight():
+    lim = RateLimiter(adaptive=True)
+    with lim.slot("h"):
+        assert lim.snapshot()["h"]["in_flight"] == 1
+    assert lim.snapshot()["h"]["in_flight"] == 0
+
+
+def test_scale_multiplies_per_token_plan():
+    lim = RateLimiter(adaptive=True)
+    key = "api.github.com/search"
+    plan = PLANS[key]
+    lim.feedback(key, 200)
+    lim.scale(key, 3)
+    snap = lim.snapshot()
+    assert key not in snap  # learned state is rebuilt from the scaled plan
+    lim.reserve(key)
+    snap = lim.snapshot()[key]
+    assert snap["base_per_minute"] == plan.per_minute * 3
+    assert snap["concurrency"] == plan.concurrency * 3
+    assert lim.buckets[key].capacity == plan.burst * 3
+    lim.scale(key, 3)
+    assert key in lim.snapshot()  # unchanged factor keeps the state
+
+
+def test_hard_quota_rate_never_exceeds_plan_times_tokens():
+    lim = RateLimiter(adaptive=True)
+    key = "api.github.com/search"
+    lim.scale(key, 3)
+    cap = PLANS[key].per_minute * 3
+    # multi-token mode gives no X-RateLimit headers, only statuses
+    for _ in range(500):
+        lim.feedback(key, 200)
+    assert lim.snapshot()[key]["rate_per_minute"] == cap
+    assert lim.buckets[key].refill_rate * 60 <= cap
+    # other known hosts may still probe above their plan
+    for _ in range(500):
+        lim.feedback("api.github.com", 200)
+    assert lim.snapshot()["api.github.com"]["rate_per_minute"] > 900
@@ -0,0 +1,36 @@
+from fetchers.repo_dedup import TreeDeduper, is_unmodified_fork
+
+
+def test_first_repo_per_tree_is_representative():
+    d = TreeDeduper()
+    assert d.claim("alice/nodes", "sha1") is None
+    assert d.claim("bob/nodes", "sha1") == "alice/nodes"
+    assert d.claim("carol/nodes", "sha1") == "alice/nodes"
+    assert d.claim("dave/other", "sha2") is None
+    # unknown tree sha never dedups
+    assert d.claim("erin/nodes", None) is None
+    assert d.mirrors_of("alice/nodes") == ["bob/nodes", "carol/nodes"]
+    assert d.mirrors_of("dave/other") == []
+    assert d.stats() == {"trees": 2, "mirrors": 2}
+
+
+def test_add_mirror_ignores_self_and_duplicates():
+    d = TreeDeduper()
+    d.add_mirror("alice/nodes", "alice/nodes")
+    d.add_mirror("alice/nodes", "bob/nodes")
+    d.add_mirror("alice/nodes", "bob/nodes")
+    assert d.mirrors_of("alice/nodes") == ["bob/nodes"]
+
+
+def test_unmodified_fork_detection():
+    base = {"created_at": "2025-10-01T00:00:00Z"}
+    assert is_unmodified_fork(
+        {**base, "fork": True, "pushed_at": "2025-09-01T00:00:00Z"}
+    )
+    assert not is_unmodified_fork(
+        {**base, "fork": True, "pushed_at": "2025-10-02T00:00:00Z"}
+    )
+    assert not is_unmodified_fork(
+        {**base, "fork": False, "pushed_at": "2025-09-01T00:00:00Z"}
+    )
+    assert not is_unmodified_fork({"fork": True})
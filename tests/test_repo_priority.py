@@ -0,0 +1,80 @@
+import time
+
+from fetchers.repo_priority import expected_yield, prioritize_repos
+from storage.repo_stats import RepoStats
+
+NOW = int(time.time())
+
+
+def _stats(entries: dict) -> RepoStats:
+    stats = RepoStats(None)
+    stats.entries = entries
+    return stats
+
+
+def test_commit_run_updates_yield_history(tmp_path):
+    path = str(tmp_path / "repo_stats.json")
+    stats = RepoStats(path)
+    stats.note_crawl("a/b", ok=True, candidates=4, pushed_at="2025-10-01T00:00:00Z")
+    stats.note_valid("a/b", 2)
+    stats.note_crawl("c/d", ok=False)
+    stats.commit_run(ts=NOW)
+    stats.save()
+    loaded = RepoStats(path).load()
+    assert loaded.get("a/b")["ewma"] == 1.0
+    assert loaded.get("a/b")["valid_total"] == 2
+    assert loaded.get("a/b")["pushed_at"] > 0
+    assert loaded.get("c/d")["fails"] == 1
+    assert loaded.stats() == {"entries": 2, "productive": 1}
+
+
+def test_expected_yield_penalises_stale_and_failing_repos():
+    fresh = {"ewma": 2.0, "crawls": 2, "fails": 0, "pushed_at": NOW}
+    stale = dict(fresh, pushed_at=NOW - 365 * 86400)
+    flaky = dict(fresh, fails=1)
+    assert expected_yield(fresh, now=NOW) == 2.0
+    assert expected_yield(stale, now=NOW) < 1.01
+    assert expected_yield(flaky, now=NOW) == 1.0
+
+
+def test_high_yield_repos_survive_budget_and_explore_slots_reserved():
+    stats = _stats(
+        {
+            "good/repo": {"ewma": 3.0, "crawls": 3, "valid_total": 9, "pushed_at": NOW},
+            "meh/repo": {"ewma": 0.5, "crawls": 3, "valid_total": 1, "pushed_at": NOW},
+            "dud/repo": {"ewma": 0.0, "crawls": 3, "valid_total": 0},
+        }
+    )
+    # search order puts the proven repo last and omits one productive repo entirely
+    repos = [{"full_name": f"new/{i}"} for i in range(5)]
+    repos += [{"full_name": "dud/repo"}, {"full_name": "good/repo"}]
+    out = [r["full_name"] for r in prioritize_repos(repos, stats, budget=4, now=NOW)]
+    assert out[0] == "good/repo"
+    assert "meh/repo" in out
+    # a known dud scores below the prior for unexplored repos, so new repos take its slot
+    assert sum(n.startswith("new/") for n in out) == 2
+    assert "dud/repo" not in out
+
+
+def test_low_yield_known_repos_rank_after_new_repos():
+    stats = _stats(
+        {
+            "good/repo": {"ewma": 3.0, "crawls": 3, "valid_total": 9, "pushed_at": NOW},
+            "dud/repo": {"ewma": 0.0, "crawls": 3, "valid_total": 0},
+        }
+    )
+    repos = [{"full_name": "dud/repo"}, {"full_name": "good/repo"}]
+    repos += [{"full_name": f"new/{i}"} for i in range(2)]
+    out = [r["full_name"] for r in prioritize_repos(repos, stats, now=NOW)]
+    assert out == ["good/repo", "new/0", "new/1", "dud/repo"]
+    # with no new repos left, the dud still fills an otherwise empty slot
+    out = prioritize_repos(repos[:2], stats, budget=2, now=NOW)
+    assert [r["full_name"] for r in out] == ["good/repo", "dud/repo"]
+
+
+def test_unused_known_slots_go_to_new_repos():
+    stats = _stats({})
+    repos = [{"full_name": f"new/{i}"} for i in range(5)]
+    out = prioritize_repos(repos, stats, budget=3, now=NOW)
+    assert [r["full_name"] for r in out] == ["new/0", "new/1", "new/2"]
+    assert len(prioritize_repos(repos, stats, budget=None)) == 5
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+from storage.history import ensure_increment, load_history
+from storage.meta_cache import MetaCache
+from storage.reserve_archive import (
+    ReserveArchive,
+    archive_path_for,
+    import_legacy_exports,
+    restore_urls,
+)
+
+
+def _run(hist_path, valid, resource_map=None):
+    return ensure_increment(
+        valid, hist_path, 0, 2, resource_map=resource_map, meta_cache=MetaCache(None)
+    )
+
+
+def test_fail_threshold_retires_into_archive(tmp_path, monkeypatch):
+    monkeypatch.setenv("PER_OWNER_HISTORY_LIMIT", "0")
+    hist_path = str(tmp_path / "history.json")
+    _run(hist_path, ["https://a/1.txt", "https://a/2.txt"])
+    _run(hist_path, ["https://a/1.txt"])
+    final = _run(hist_path, ["https://a/1.txt"])
+    assert final == ["https://a/1.txt"]
+
+    archive = ReserveArchive(archive_path_for(hist_path)).load()
+    assert archive.entries["https://a/2.txt"]["reason"] == "fail_threshold"
+    assert "https://a/2.txt" not in load_history(hist_path)["fail"]
+    assert not [f for f in os.listdir(tmp_path) if f.startswith("reserve-")]
+
+
+def test_owner_limit_reason_and_reactivation(tmp_path, monkeypatch):
+    monkeypatch.setenv("PER_OWNER_HISTORY_LIMIT", "1")
+    hist_path = str(tmp_path / "history.json")
+    rm = {
+        "https://a/1.txt": {"owner_key": "a", "base": "1"},
+        "https://a/2.txt": {"owner_key": "a", "base": "2"},
+    }
+    _run(hist_path, list(rm), resource_map=rm)
+    archive = ReserveArchive(archive_path_for(hist_path)).load()
+    assert archive.entries["https://a/2.txt"]["reason"] == "owner_limit"
+    assert archive.entries["https://a/2.txt"]["owner_key"] == "a"
+
+    monkeypatch.setenv("PER_OWNER_HISTORY_LIMIT", "0")
+    _run(hist_path, ["https://a/2.txt"])
+    assert "https://a/2.txt" not in ReserveArchive(archive_path_for(hist_path)).load()
+
+
+def test_retention_drops_old_and_caps_size():
+    archive = ReserveArchive("unused", retention_days=1, max_entries=2)
+    now = int(time.time())
+    archive.retire("old", "fail_threshold", ts=now - 3 * 86400)
+    for i in range(3):
+        archive.retire(f"u{i}", "owner_limit", ts=now - i)
+    assert archive.apply_retention() == 2
+    assert set(archive.entries) == {"u0", "u1"}
+
+
+def test_restore_by_reason(tmp_path):
+    hist_path = str(tmp_path / "history.json")
+    _run(hist_path, ["https://a/keep.txt"])
+    archive = ReserveArchive(archive_path_for(hist_path)).load()
+    archive.retire("https://a/x.txt", "owner_limit")
+    archive.retire("https://a/y.txt", "fail_threshold")
+    archive.save()
+
+    restored = restore_urls(hist_path, reason="owner_limit")
+    assert restored == ["https://a/x.txt"]
+    assert load_history(hist_path)["links"] == ["https://a/keep.txt", "https://a/x.txt"]
+    assert set(ReserveArchive(archive_path_for(hist_path)).load().entries) == {
+        "https://a/y.txt"
+    }
+
+
+def test_import_legacy_exports(tmp_path):
+    hist_path = str(tmp_path / "history.json")
+    for i, urls in enumerate((["https://a/1"], ["https://a/1", "https://a/2"])):
+        p = tmp_path / f"reserve-{1700000000 + i}.json"
+        p.write_text(json.dumps(urls))
+        os.utime(p, (1700000000 + i, 1700000000 + i))
+    assert import_legacy_exports(hist_path, delete=True) == 2
+    assert not list(tmp_path.glob("reserve-*.json"))
+    assert ReserveArchive(archive_path_for(hist_path)).load().select(reason="legacy")
+
+
+def test_legacy_reserve_survives_archive_write_failure(tmp_path, monkeypatch):
+    monkeypatch.setenv("PER_OWNER_HISTORY_LIMIT", "0")
+    hist_path = str(tmp_path / "history.json")
+    with open(hist_path, "w", encoding="utf-8") as f:
+        json.dump({"seen": [], "reserve": ["https://old/1.txt"]}, f)
+
+    def boom(self):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ReserveArchive, "save", boom)
+    _run(hist_path, ["https://a/1.txt"])
+    assert load_history(hist_path)["reserve"] == ["https://old/1.txt"]
+
+    monkeypatch.undo()
+    monkeypatch.setenv("PER_OWNER_HISTORY_LIMIT", "0")
+    _run(hist_path, ["https://a/1.txt"])
+    assert load_history(hist_path)["reserve"] == []
+    archive = ReserveArchive(archive_path_for(hist_path)).load()
+    assert archive.entries["https://old/1.txt"]["reason"] == "legacy"
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import utils.run_report as run_report
+from pipeline.daemon import Daemon
+from pipeline.engine import Pipeline, PipelineStop, Stage
+from storage.negative_cache import NegativeCache
+from utils import http_client
+from utils.rate_limiter import RateLimiter
+from utils.run_report import RunReport
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture()
+def report(monkeypatch):
+    r = RunReport()
+    monkeypatch.setattr(run_report, "_default_report", r)
+    return r
+
+
+def test_counters_are_kept_per_stage_and_totalled():
+    clock = _Clock()
+    r = RunReport(clock=clock)
+    r.request("a.example", 100, 200)
+    r.begin_stage("check", {"urls": ["u1", "u2", "u3"], "pool": object()})
+    clock.t += 2.5
+    r.request("a.example", 10, 200)
+    r.request("a.example", 0, 503)
+    r.request("b.example")
+    r.retry("a.example")
+    r.limiter_sleep("a.example", 1.25)
+    r.cache("negative", True)
+    r.cache("negative", False)
+    r.cache("negative", False)
+    r.reject("http_404")
+    r.end_stage("ran", {"reachable": ["u1"]})
+
+    d = r.to_dict()
+    check, outside = d["stages"]
+    assert check["name"] == "check" and check["wall_s"] == 2.5
+    # values without a length are left out
+    assert check["in"] == {"urls": 3} and check["out"] == {"reachable": 1}
+    a = check["hosts"]["a.example"]
+    assert (a["requests"], a["bytes"], a["retries"], a["errors"]) == (2, 10, 1, 0)
+    assert a["status"] == {"2xx": 1, "5xx": 1} and a["limiter_sleep_s"] == 1.25
+    assert check["hosts"]["b.example"]["errors"] == 1
+    assert check["cache"]["negative"]["hit_ratio"] == 0.3333
+    assert check["rejected"] == {"http_404": 1}
+    # counts recorded outside any stage are reported under "-"
+    assert outside["name"] == "-"
+    assert d["totals"]["hosts"]["a.example"]["requests"] == 3
+    assert d["totals"]["hosts"]["a.example"]["bytes"] == 110
+
+
+def test_pipeline_records_stage_status_and_sizes(tmp_path, report):
+    def search():
+        report.request("api.example", 42, 200)
+        return {"items": [1, 2, 3]}
+
+    def check(items):
+        raise PipelineStop("nothing left")
+
+    stages = [
+        Stage("search", search, (), {"items": list}),
+        Stage("check", check, ("items",), {"ok": list}),
+    ]
+    Pipeline(stages, str(tmp_path)).run()
+    d = report.to_dict()
+    assert [(s["name"], s["status"]) for s in d["stages"]] == [
+        ("search", "ran"),
+        ("check", "stopped"),
+    ]
+    assert d["stages"][0]["out"] == {"items": 3}
+    assert d["stages"][1]["in"] == {"items": 3}
+    assert d["stages"][0]["hosts"]["api.example"]["bytes"] == 42
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        code = 503 if type(self).hits == 1 else 200
+        body = b"vmess://abc"
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def base():
+    _Handler.hits = 0
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_http_client_counts_requests_retries_and_bytes(base, report, monkeypatch):
+    monkeypatch.setattr(http_client, "MAX_BACKOFF", 0.01)
+    monkeypatch.setattr(http_client, "limiter", RateLimiter(adaptive=False))
+    r = http_client.request("GET", f"{base}/sub", retries=2)
+    assert r.status_code == 200
+    h = report.to_dict()["totals"]["hosts"]["127.0.0.1"]
+    assert h["requests"] == 2 and h["retries"] == 1
+    assert h["status"] == {"5xx": 1, "2xx": 1}
+    assert h["bytes"] == 2 * len(b"vmess://abc")
+
+
+def test_negative_cache_feeds_hit_ratio_and_rejections(report):
+    neg = NegativeCache()
+    neg.add_url("https://x.example/a", "http_404")
+    neg.add_url("https://x.example/b", "not_subscription")
+    assert neg.check_url("https://x.example/a") == "http_404"
+    assert neg.check_url("https://x.example/c") is None
+    totals = report.to_dict()["totals"]
+    assert totals["rejected"] == {"http_404": 1, "not_subscription": 1}
+    assert totals["cache"]["negative"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_report_write_is_valid_json(tmp_path, report):
+    report.begin_stage("publish")
+    report.end_stage("ran", {"links": ["a", "b"]})
+    path = report.write(str(tmp_path / "out" / "run_report.json"))
+    with open(path, encoding="utf-8") as f:
+        d = json.load(f)
+    assert d["stages"][0]["out"] == {"links": 2}
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_daemon_writes_a_report_per_job(tmp_path, report):
+    d = Daemon(
+        None,
+        flow=object(),
+        hist_path=str(tmp_path / "history.json"),
+        stores=[],
+        report_path=str(tmp_path / "run_report.json"),
+    )
+    job = d.scheduler.jobs[0]
+    d.scheduler.before_job(job)
+    d._stage("check", lambda urls: {"reachable": urls[:1]}, ["u1", "u2"])
+    d.scheduler.after_job(job)
+    with open(tmp_path / f"run_report.{job.name}.json", encoding="utf-8") as f:
+        stages = json.load(f)["stages"]
+    assert stages[0]["in"] == {"items": 2} and stages[0]["out"] == {"reachable": 1}
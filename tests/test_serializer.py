@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from storage import serializer
+from storage.history import load_history, save_history
+
+SAMPLE = {
+    "seen": [
+        "https://raw.githubusercontent.com/a/b/main/sub.txt",
+        "https://x/订阅.yaml",
+    ],
+    "fail": {"https://x/dead.txt": 2},
+    "resource_keys": {"https://x/订阅.yaml": {"owner_key": "x", "base": "订阅"}},
+    "last_total": 2,
+}
+
+
+@pytest.mark.parametrize("fmt", ["json", "zjson", "msgpack"])
+def test_roundtrip_and_detect(fmt):
+    if fmt == "msgpack" and serializer.msgpack is None:
+        pytest.skip("msgpack not installed")
+    data = serializer.dumps(SAMPLE, fmt)
+    assert serializer.detect_format(data) == fmt
+    assert serializer.loads(data) == SAMPLE
+
+
+def test_msgpack_falls_back_when_missing(monkeypatch):
+    monkeypatch.setattr(serializer, "msgpack", None)
+    assert serializer.resolve_format("msgpack") == "zjson"
+    assert serializer.resolve_format("auto") == "zjson"
+
+
+def test_auto_keeps_json_files_as_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(serializer, "STORAGE_FORMAT", "auto")
+    p = str(tmp_path / "history.json")
+    save_history(dict(SAMPLE), p)
+    with open(p, encoding="utf-8") as f:
+        assert json.load(f)["fail"] == SAMPLE["fail"]
+    ckpt = str(tmp_path / "stage.ckpt")
+    serializer.dump_file(SAMPLE, ckpt)
+    with open(ckpt, "rb") as f:
+        assert serializer.detect_format(f.read(4)) != "json"
+
+
+def test_legacy_indented_json_is_readable(tmp_path):
+    p = tmp_path / "history.json"
+    p.write_text(json.dumps(SAMPLE, ensure_ascii=False, indent=2), encoding="utf-8")
+    hist = load_history(str(p))
+    assert hist["seen"] == SAMPLE["seen"]
+    assert hist["reserve"] == []
+
+
+def test_history_binary_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.setattr(serializer, "STORAGE_FORMAT", "zjson")
+    p = str(tmp_path / "history.json")
+    save_history(dict(SAMPLE), p)
+    with open(p, "rb") as f:
+        assert f.read(4) == serializer.MAGIC_ZJSON
+    assert load_history(p)["fail"] == SAMPLE["fail"]
+
+
+def test_corrupt_history_falls_back_to_defaults(tmp_path):
+    p = tmp_path / "history.json"
+    p.write_bytes(serializer.MAGIC_ZJSON + b"not zlib")
+    assert load_history(str(p))["seen"] == []
+
+
+def test_export_json_is_human_readable(tmp_path):
+    src = str(tmp_path / "history.json")
+    serializer.dump_file(SAMPLE, src, "zjson")
+    dst = serializer.export_json(src)
+    text = open(dst, encoding="utf-8").read()
+    assert "\n  " in text and "订阅" in text
+    assert json.loads(text) == SAMPLE
@@ -0,0 +1,145 @@
+import threading
+import time
+import types
+
+from pipeline.sharded import Coordinator, Worker
+from pipeline.workqueue import HashRing, WorkQueue
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_ring_is_stable_and_moves_few_keys_when_resized():
+    keys = [f"owner{i}/repo{i}" for i in range(2000)]
+    ring8, ring9 = HashRing(8), HashRing(9)
+    a = [ring8.shard_for(k) for k in keys]
+    assert a == [HashRing(8).shard_for(k) for k in keys]
+    assert set(a) == set(range(8))
+    moved = sum(x != ring9.shard_for(k) for x, k in zip(a, keys))
+    # roughly 1/9 of the keys move to the new shard, the rest stay put
+    assert moved < len(keys) * 0.25
+
+
+def test_lease_expiry_hands_shard_over_and_rejects_stale_commit(tmp_path):
+    clock = _Clock()
+    q = WorkQueue(str(tmp_path / "q.db"), clock=clock)
+    ring = HashRing(1)
+    q.enqueue("r1", "validate", {"u1": None, "u2": None}, ring)
+    claim = q.claim("w1", lease=60)
+    assert claim == ("r1", "validate", 0)
+    assert q.claim("w2", lease=60) is None
+    clock.t += 61
+    assert q.claim("w2", lease=60) == claim
+    # w1 crashed past its lease; its late commit is discarded
+    assert not q.complete(*claim, "w1", {"u1": True, "u2": True})
+    assert q.complete(*claim, "w2", {"u1": True, "u2": False})
+    assert q.remaining("r1", "validate") == 0
+    assert q.results("r1", "validate") == {"u1": True, "u2": False}
+    assert q.claim("w1", lease=60) is None
+    q.drop("r1")
+    assert q.stats() == []
+
+
+def _flow(crawled):
+    lock = threading.Lock()
+
+    def crawl_repos(repos, token, keywords, budget=None):
+        names = [r["full_name"] for r in repos]
+        with lock:
+            crawled.append(names)
+        return [
+            {"url": f"https://x/{n}.txt", "src": n, "owner": n, "keywords": keywords[n]}
+            for n in names
+        ]
+
+    return types.SimpleNamespace(
+        plan_repos=lambda pool: (None, None),
+        crawl_repos=crawl_repos,
+        dedup_candidates=lambda found: found,
+        stage_check=lambda urls: {
+            "reachable": [u for u in urls if "bad" not in u and "slow" not in u],
+            "deferred": [[u, "check"] for u in urls if "slow" in u],
+        },
+        stage_validate=lambda reachable, deferred: {
+            "valid": reachable,
+            "deferred": deferred,
+        },
+        canonicalize_url=lambda u: u.rstrip("/"),
+    )
+
+
+def test_workers_split_crawl_without_double_work(tmp_path):
+    q = WorkQueue(str(tmp_path / "q.db"))
+    crawled = []
+    flow = _flow(crawled)
+    repos = [{"full_name": f"o{i}/r"} for i in range(40)]
+    coord = Coordinator(q, None, flow=flow, ring=HashRing(8), work=False, poll=0.01)
+    workers = [Worker(q, f"w{i}", flow=flow) for i in range(3)]
+    threads = [
+        threading.Thread(target=w.run, kwargs={"exit_when_idle": True, "poll": 0})
+        for w in workers
+    ]
+    out = {}
+
+    def coordinate():
+        out.update(coord.stage_crawl(repos, {"o0/r": ["k"]}))
+
+    t = threading.Thread(target=coordinate)
+    t.start()
+    # workers start once the tasks are queued
+    while not q.stats():
+        time.sleep(0.01)
+    for th in threads:
+        th.start()
+    for th in threads + [t]:
+        th.join()
+    names = [n for batch in crawled for n in batch]
+    assert sorted(names) == sorted(r["full_name"] for r in repos)
+    assert len(crawled) == 8
+    # merged in plan order, keywords carried through the queue
+    assert [it["src"] for it in out["items"]] == [r["full_name"] for r in repos]
+    assert out["items"][0]["keywords"] == ["k"]
+    assert q.stats() == []
+
+
+def test_coordinator_validates_with_its_own_worker(tmp_path):
+    q = WorkQueue(str(tmp_path / "q.db"))
+    coord = Coordinator(q, None, flow=_flow([]), ring=HashRing(4), poll=0.01)
+    merged = ["https://a/1", "https://bad/2", "https://slow/4", "https://c/3/"]
+    assert coord.stage_validate(merged) == {
+        "valid": ["https://a/1", "https://c/3/"],
+        "deferred": [["https://slow/4", "validate"]],
+    }
+
+
+def test_failed_shard_is_released_for_retry(tmp_path):
+    q = WorkQueue(str(tmp_path / "q.db"))
+    q.enqueue("r", "validate", {"u": None}, HashRing(1))
+    flow = _flow([])
+    flow.stage_check = lambda urls: (_ for _ in ()).throw(OSError("net down"))
+    w = Worker(q, "w1", flow=flow, retry_after=0)
+    assert w.run_once()
+    assert q.remaining("r", "validate") == 1
+    w.flow = _flow([])
+    assert w.run_once()
+    assert q.results("r", "validate") == {"u": True}
+
+
+def test_sharded_pipeline_wiring(tmp_path):
+    import main_extract_fast
+
+    q = WorkQueue(str(tmp_path / "q.db"))
+    coord = Coordinator(q, pool=None, flow=main_extract_fast)
+    pipe = coord.build_pipeline()
+    names = [s.name for s in pipe.stages]
+    assert names[:3] == ["plan", "crawl", "admit"]
+    assert "check" not in names and names[-1] == "publish"
+    produced = set()
+    for st in pipe.stages:
+        assert set(st.inputs) <= produced, st.name
+        produced |= set(st.outputs)
@@ -0,0 +1,131 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import http_client
+from utils.token_pool import TokenPool, resource_for
+
+
+def _hdrs(remaining, reset, resource="search", limit=30):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(int(reset)),
+        "X-RateLimit-Resource": resource,
+    }
+
+
+def test_resource_for():
+    assert resource_for("https://api.github.com/search/repositories") == "search"
+    assert resource_for("https://api.github.com/search/code") == "code_search"
+    assert resource_for("https://api.github.com/repos/a/b/git/trees/HEAD") == "core"
+
+
+def test_routes_to_token_with_most_headroom_per_resource():
+    pool = TokenPool(["a", "b"])
+    reset = time.time() + 60
+    pool.update("a", _hdrs(3, reset))
+    pool.update("b", _hdrs(20, reset))
+    pool.update("a", _hdrs(4000, reset + 3000, "core", 5000))
+    pool.update("b", _hdrs(10, reset + 3000, "core", 5000))
+    assert pool.acquire("search") == ("b", 0.0)
+    assert pool.acquire("core") == ("a", 0.0)
+
+
+def test_exhausted_token_parks_until_reset():
+    pool = TokenPool(["a", "b"])
+    now = time.time()
+    pool.update("a", _hdrs(0, now + 30))
+    pool.update("b", _hdrs(1, now + 50))
+    assert pool.acquire("search")[0] == "b"
+    pool.update("b", _hdrs(0, now + 50))
+    tok, wait = pool.acquire("search", now=now)
+    assert tok == "a" and 29 <= wait <= 30
+    # after the reset time the budget is restored
+    assert pool.acquire("search", now=now + 31) == ("a", 0.0)
+
+
+def test_secondary_limit_parks_for_retry_after():
+    pool = TokenPool(["a", "b"])
+    pool.update("a", {**_hdrs(10, time.time() + 60), "Retry-After": "5"}, 403)
+    assert pool.acquire("search")[0] == "b"
+    snap = {row["token"]: row for row in pool.snapshot()}
+    assert snap["...a"]["budgets"]["search"]["parked"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        auth = self.headers.get("Authorization")
+        reset = str(int(time.time()) + 60)
+        if auth == "Bearer spent":
+            self.send_response(403)
+            self.send_header("X-RateLimit-Remaining", "0")
+        else:
+            self.send_response(200)
+            self.send_header("X-RateLimit-Remaining", "29")
+        self.send_header("X-RateLimit-Limit", "30")
+        self.send_header("X-RateLimit-Reset", reset)
+        self.send_header("X-RateLimit-Resource", "search")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    addr = f"127.0.0.1:{srv.server_address[1]}"
+    yield {"api.github.com": addr, "raw.githubusercontent.com": addr}
+    srv.shutdown()
+
+
+def test_request_rotates_away_from_exhausted_token(server, monkeypatch):
+    monkeypatch.setattr(http_client, "HOST_OVERRIDES", server)
+    pool = TokenPool(["spent", "fresh"])
+    # make the exhausted token look like the best choice at first
+    pool.update("spent", _hdrs(30, time.time() + 60))
+    pool.update("fresh", _hdrs(5, time.time() + 60))
+    resp = http_client.request(
+        "GET", "https://api.github.com/search/repositories", token=pool
+    )
+    assert resp.status_code == 200
+    snap = {row["token"]: row for row in pool.snapshot()}
+    assert snap["...pent"]["budgets"]["search"]["parked"]
+    assert snap["...resh"]["budgets"]["search"]["remaining"] == 29
+
+
+def test_non_api_hosts_do_not_spend_quota(server, monkeypatch):
+    monkeypatch.setattr(http_client, "HOST_OVERRIDES", server)
+    pool = TokenPool(["fresh"])
+    for _ in range(3):
+        resp = http_client.request(
+            "GET", "https://raw.githubusercontent.com/u/r/main/a.txt", token=pool
+        )
+        assert resp.status_code == 200
+    assert pool.snapshot()[0]["budgets"]["core"]["remaining"] == 5000
+
+
+def test_missing_headers_refund_the_reservation():
+    pool = TokenPool(["a"])
+    tok, _ = pool.acquire("core")
+    pool.update(tok, {}, 200, "core")
+    assert pool.snapshot()[0]["budgets"]["core"]["remaining"] == 5000
+
+
+def test_parked_pool_does_not_sleep_past_the_run_deadline(server, monkeypatch):
+    monkeypatch.setattr(http_client, "HOST_OVERRIDES", server)
+    monkeypatch.setattr(http_client, "run_remaining", lambda: 5.0)
+    pool = TokenPool(["spent"])
+    pool.update("spent", _hdrs(0, time.time() + 3600, "core", 5000))
+    t0 = time.monotonic()
+    with pytest.raises(http_client.QuotaExhausted):
+        http_client.request("GET", "https://api.github.com/repos/a/b", token=pool)
+    assert time.monotonic() - t0 < 1
+    # the reservation taken for the abandoned request is handed back
+    assert pool.snapshot()[0]["budgets"]["core"]["remaining"] == 0
@@ -0,0 +1,102 @@
+"""运行时限与阶段预算。
+
+整次运行有一个总时限（RUN_DEADLINE_MINUTES），每个阶段再有各自的预算
+（*_BUDGET_SECONDS）；阶段预算同时受总时限约束，并为写回历史与发布预留
+PUBLISH_RESERVE_SECONDS。阶段在预算用尽时停止领取新工作，未完成的条目交给
+storage.deferred 推迟到下次运行。
+"""
+
+import math
+import time
+
+from config import (
+    CHECK_BUDGET_SECONDS,
+    HEAD_BUDGET_SECONDS,
+    PUBLISH_RESERVE_SECONDS,
+    RUN_DEADLINE_MINUTES,
+    SEARCH_BUDGET_SECONDS,
+    VALIDATE_BUDGET_SECONDS,
+)
+
+STAGE_BUDGETS = {
+    "search": SEARCH_BUDGET_SECONDS,
+    "check": CHECK_BUDGET_SECONDS,
+    "validate": VALIDATE_BUDGET_SECONDS,
+    "head": HEAD_BUDGET_SECONDS,
+}
+
+
+class Budget:
+    """从创建时刻起 seconds 秒的预算；seconds 为空或 <= 0 表示不限。
+
+    parent 不为空时剩余时间同时不超过 parent 剩余时间减去 reserve。
+    """
+
+    def __init__(
+        self,
+        seconds: float = None,
+        parent: "Budget" = None,
+        reserve: float = 0.0,
+        clock=time.monotonic,
+    ):
+        self.clock = clock
+        self.ends = clock() + seconds if seconds and seconds > 0 else math.inf
+        self.parent = parent
+        self.reserve = reserve
+
+    def remaining(self) -> float:
+        left = self.ends - self.clock()
+        if self.parent is not None:
+            left = min(left, self.parent.remaining() - self.reserve)
+        return max(0.0, left)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def unlimited(self) -> bool:
+        return math.isinf(self.remaining())
+
+    def as_timeout(self):
+        """剩余秒数，不限时返回 None（可直接传给 asyncio.wait 等的 timeout）。"""
+        left = self.remaining()
+        return None if math.isinf(left) else left
+
+    def cap(self, timeout: float) -> float:
+        """把单次请求的超时截断到剩余预算内。"""
+        return min(timeout, self.remaining())
+
+    def child(self, seconds: float = None, reserve: float = 0.0) -> "Budget":
+        return Budget(seconds, parent=self, reserve=reserve, clock=self.clock)
+
+
+_run_budget = None
+
+
+def start_run(minutes: float = RUN_DEADLINE_MINUTES) -> Budget:
+    """从现在开始计算整次运行的时限（守护进程每个任务各自开始计时）。"""
+    global _run_budget
+    _run_budget = Budget(minutes * 60 if minutes else None)
+    return _run_budget
+
+
+def expire_run() -> None:
+    """让当前运行的时限立即到期：进行中的阶段不再领取新工作（守护进程收到退出信号时调用）。"""
+    budget = run_budget()
+    budget.ends = budget.clock()
+
+
+def run_budget() -> Budget:
+    if _run_budget is None:
+        return start_run()
+    return _run_budget
+
+
+def run_remaining() -> float:
+    """整次运行扣除发布预留后的剩余秒数，不限时为 inf。"""
+    return run_budget().child(reserve=PUBLISH_RESERVE_SECONDS).remaining()
+
+
+def stage_budget(name: str) -> Budget:
+    """阶段预算：从调用时刻开始计时，并为发布预留时间。"""
+    return run_budget().child(STAGE_BUDGETS.get(name), reserve=PUBLISH_RESERVE_SECONDS)
@@ -0,0 +1,54 @@
+"""进程内 DNS 缓存：包装 socket.getaddrinfo，按 (host, port, ...) 缓存解析结果 ttl 秒。
+
+Python 自身不缓存 DNS，长驻进程每次新建连接都会重新解析；install() 后同一 host 的
+解析在 ttl 内直接命中内存。解析失败不缓存。
+"""
+
+import socket
+import threading
+import time
+
+_orig_getaddrinfo = socket.getaddrinfo
+_cache: dict = {}
+_lock = threading.Lock()
+_ttl = 300.0
+# 条目上限，超过时整体清空（host 数量通常远小于该值）
+MAX_ENTRIES = 4096
+
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+    res = _orig_getaddrinfo(host, port, *args, **kwargs)
+    with _lock:
+        if len(_cache) >= MAX_ENTRIES:
+            _cache.clear()
+        _cache[key] = (now + _ttl, res)
+    return res
+
+
+def install(ttl: float = 300.0):
+    global _ttl, _orig_getaddrinfo
+    _ttl = float(ttl)
+    if not installed():
+        # 包装安装时的解析函数，uninstall() 时原样还原
+        _orig_getaddrinfo = socket.getaddrinfo
+        socket.getaddrinfo = _cached_getaddrinfo
+
+
+def uninstall():
+    socket.getaddrinfo = _orig_getaddrinfo
+    clear()
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def installed() -> bool:
+    return socket.getaddrinfo is _cached_getaddrinfo
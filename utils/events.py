@@ -0,0 +1,277 @@
+"""结构化事件日志：替代热循环中逐 URL 的 print()。
+
+每条事件有类型（EventType：名称、级别、控制台文本模板、是否高频抽样、是否审计）：
+
+- 计数：每次 emit 都按 (事件名, reason) 累加，运行结束 close() 时打印汇总，
+  即使事件本身未输出也能看到各原因的数量
+- 控制台：级别 >= EVENT_CONSOLE_LEVEL 时按模板打印（与原 print 文本一致）；
+  高频事件（sampled=True）按 EVENT_SAMPLE_RATE 抽样
+- NDJSON：级别 >= EVENT_FILE_LEVEL 的事件（高频事件同样抽样）与全部审计事件
+  （剔除类）写入 EVENT_LOG_PATH，超过 EVENT_LOG_MAX_BYTES 时轮转，保留
+  EVENT_LOG_BACKUPS 份。每行 {"ts", "level", "event", ...字段}
+
+两个输出都不需要时 emit 只做一次计数，生产环境把 EVENT_CONSOLE_LEVEL 设为 warning
+即可安静运行，剔除记录仍完整保留在 NDJSON 中。
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from config import (
+    EVENT_CONSOLE_LEVEL,
+    EVENT_FILE_LEVEL,
+    EVENT_LOG_BACKUPS,
+    EVENT_LOG_MAX_BYTES,
+    EVENT_LOG_PATH,
+    EVENT_SAMPLE_RATE,
+)
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {v: k for k, v in LEVELS.items()}
+# 汇总打印的条目上限
+SUMMARY_TOP = 20
+
+
+def parse_level(v) -> int:
+    if isinstance(v, int):
+        return v
+    s = str(v).strip().lower()
+    if s == "warn":
+        s = "warning"
+    if s not in LEVELS:
+        raise ValueError(f"未知日志级别: {v}")
+    return LEVELS[s]
+
+
+@dataclass(frozen=True)
+class EventType:
+    name: str
+    level: int
+    # 控制台文本，按 emit 的字段 str.format
+    template: str
+    # 高频事件：控制台与 NDJSON 按 EVENT_SAMPLE_RATE 抽样（计数不抽样）
+    sampled: bool = False
+    # 审计事件：无论级别与抽样都写入 NDJSON
+    audit: bool = False
+
+
+# ---- 抓取 / 递归抽取 ----
+CRAWL_VISIT_CAP = EventType(
+    "crawl.visit_cap", WARNING, "[R] 访问集合过大，跳过剩余: {visited}"
+)
+CRAWL_BAD_URL = EventType(
+    "crawl.bad_url", DEBUG, "[R] urlparse失败跳过: {url} ({error})"
+)
+CRAWL_BLACKLISTED = EventType("crawl.blacklisted", DEBUG, "[R] 黑名单域名跳过: {url}")
+CRAWL_SAVED = EventType(
+    "crawl.url_saved",
+    DEBUG,
+    "[R] 直接保存URL（命中白名单/关键词）: {url}",
+    sampled=True,
+)
+CRAWL_RECURSE = EventType(
+    "crawl.recurse", DEBUG, "[R] 递归抓取: url={url} depth={depth}", sampled=True
+)
+CRAWL_FETCH_FAILED = EventType(
+    "crawl.fetch_failed",
+    INFO,
+    "[R] 抓取失败或超时: url={url} depth={depth}",
+    audit=True,
+)
+CRAWL_EXTRACTED = EventType(
+    "crawl.extracted",
+    DEBUG,
+    "[R] url={url} depth={depth} 抽取到新链接数: {count}",
+    sampled=True,
+)
+REPO_NEG_CACHED = EventType(
+    "repo.neg_cached", DEBUG, "[负缓存跳过仓库] {repo} ({reason})"
+)
+REPO_MIRROR_SKIPPED = EventType(
+    "repo.mirror_skipped", DEBUG, "[镜像去重] 仓库:{repo} 与 {rep} 内容相同，跳过抓取"
+)
+REPO_META_LINKS = EventType(
+    "repo.meta_links", DEBUG, "[D] 仓库:{repo} meta页面抽取到链接数:{count}"
+)
+REPO_FILE_SAVED = EventType(
+    "repo.file_saved",
+    DEBUG,
+    "[D] 仓库:{repo} 路径:{path} 直接保存订阅文件URL: {url}",
+    sampled=True,
+)
+REPO_TXT_SAVED = EventType(
+    "repo.txt_saved",
+    DEBUG,
+    "[D] 仓库:{repo} 路径:{path} 保存并递归解析TXT: {url}",
+    sampled=True,
+)
+REPO_EXTRACTED = EventType(
+    "repo.extracted",
+    DEBUG,
+    "[D] 仓库:{repo} 路径:{path} 抽取到链接数:{count}",
+    sampled=True,
+)
+
+# ---- 规范化 ----
+CANONICAL_REWRITE = EventType(
+    "canonical.rewrite", DEBUG, "[{label}] {src} -> {dst}", sampled=True
+)
+
+# ---- 入选 / 剔除 ----
+URL_KEPT = EventType("filter.kept", DEBUG, "[{label}] {url}", sampled=True)
+URL_REJECTED = EventType("filter.rejected", INFO, "[{label}] {url}", audit=True)
+TRUSTED_GET = EventType("filter.trusted_get", DEBUG, "[{label}] {url} {detail}")
+CONTENT_RETRY = EventType("validate.retry", INFO, "[内容获取失败缓存] {url}")
+CONTENT_REJECTED = EventType("validate.rejected", INFO, "[{label}] {url}", audit=True)
+VALIDATOR_ERROR = EventType(
+    "validate.error", WARNING, "[验证器异常] {url} -> {error}", audit=True
+)
+OWNER_DEDUP = EventType(
+    "owner.dedup", INFO, "[发布者同名去重] 保留：{kept}，剔除：{url}", audit=True
+)
+HEAD_REJECTED = EventType(
+    "head.rejected", INFO, "[可用性剔除] {url} -> {detail}", audit=True
+)
+
+
+class EventLog:
+    def __init__(
+        self,
+        path: str = EVENT_LOG_PATH,
+        console_level=EVENT_CONSOLE_LEVEL,
+        file_level=EVENT_FILE_LEVEL,
+        max_bytes: int = EVENT_LOG_MAX_BYTES,
+        backups: int = EVENT_LOG_BACKUPS,
+        sample_rate: float = EVENT_SAMPLE_RATE,
+        rand=random.random,
+        clock=time.time,
+    ):
+        self.path = path
+        self.console_level = parse_level(console_level)
+        self.file_level = parse_level(file_level)
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        self.sample_rate = sample_rate
+        self.rand = rand
+        self.clock = clock
+        # (事件名, reason) -> 次数
+        self.counts: dict = {}
+        self._fh = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def emit(self, etype: EventType, **fields):
+        key = (etype.name, fields.get("reason"))
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+        console = etype.level >= self.console_level
+        to_file = bool(self.path) and (etype.audit or etype.level >= self.file_level)
+        if not console and not to_file:
+            return
+        sampled = not etype.sampled or self.rand() < self.sample_rate
+        if console and sampled:
+            print(etype.template.format(**fields))
+        if to_file and (sampled or etype.audit):
+            rec = {
+                "ts": round(self.clock(), 3),
+                "level": LEVEL_NAMES.get(etype.level, etype.level),
+                "event": etype.name,
+                **fields,
+            }
+            self._write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+    # ---- NDJSON 输出 ----
+    def _open(self):
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._fh = open(self.path, "a", encoding="utf-8")
+        self._size = self._fh.tell()
+
+    def _rotate(self):
+        self._fh.close()
+        self._fh = None
+        if self.backups:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _write(self, line: str):
+        data = line.encode("utf-8")
+        with self._lock:
+            try:
+                if self._fh is None:
+                    self._open()
+                full = self._size + len(data) > self.max_bytes
+                if self.max_bytes and self._size and full:
+                    self._rotate()
+                self._fh.write(line)
+                self._size += len(data)
+            except OSError as e:
+                print(f"[事件] 写入失败，停用 NDJSON 输出: {self.path} -> {e}")
+                self.path = ""
+
+    # ---- 汇总 ----
+    def summary(self) -> dict:
+        """{"事件名": 次数} 与 {"事件名:reason": 次数}。"""
+        out = {}
+        with self._lock:
+            items = list(self.counts.items())
+        for (name, reason), n in items:
+            out[name] = out.get(name, 0) + n
+            if reason is not None:
+                out[f"{name}:{reason}"] = n
+        return out
+
+    def close(self):
+        """打印并写出本次运行的计数汇总，重置计数并关闭文件（下次 emit 时重新打开）。"""
+        with self._lock:
+            items = sorted(self.counts.items(), key=lambda kv: -kv[1])
+            self.counts = {}
+        if items:
+            shown = ", ".join(
+                f"{name}{'' if reason is None else f'[{reason}]'} {n}"
+                for (name, reason), n in items[:SUMMARY_TOP]
+            )
+            more = len(items) - SUMMARY_TOP
+            print(f"[事件] 汇总: {shown}" + (f" …另 {more} 项" if more > 0 else ""))
+            if self.path:
+                counts = {}
+                for (name, reason), n in items:
+                    counts[name if reason is None else f"{name}:{reason}"] = n
+                rec = {
+                    "ts": round(self.clock(), 3),
+                    "level": "info",
+                    "event": "run.summary",
+                    "counts": counts,
+                }
+                self._write(json.dumps(rec, ensure_ascii=False) + "\n")
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+_default_log = None
+
+
+def get_event_log() -> EventLog:
+    """进程内共享的事件日志。"""
+    global _default_log
+    if _default_log is None:
+        _default_log = EventLog()
+    return _default_log
+
+
+def emit(etype: EventType, **fields):
+    get_event_log().emit(etype, **fields)
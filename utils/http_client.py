@@ -1,23 +1,93 @@
+import threading
 import time
 import urllib.parse
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Union
 
 import certifi
 import requests
 import urllib3
 
+from config import HTTP_HOST_OVERRIDES
 from config.rate_limits import MAX_BACKOFF, MAX_RETRIES
+from utils.deadline import run_remaining
+from utils.metrics import get_metrics
 from utils.rate_limiter import limiter
+from utils.run_report import get_run_report
+from utils.token_pool import TokenPool, resource_for
 
 urllib3.disable_warnings()
 UA = "sub-hunter/1.0"
 CA_BUNDLE = certifi.where()
+# 共享连接池大小（每 host 保持的 keep-alive 连接数）
+POOL_MAXSIZE = 64
+
+_session = None
+_session_lock = threading.Lock()
+# host -> 本地替身地址（见 config.HTTP_HOST_OVERRIDES，基准测试可在运行时替换）
+HOST_OVERRIDES = HTTP_HOST_OVERRIDES
+
+
+def get_session() -> requests.Session:
+    """进程内共享的 Session：复用 keep-alive 连接，长驻（守护）模式下跨轮次保持。"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE
+                )
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
 
 
 def _host(url: str) -> str:
     return urllib.parse.urlsplit(url).hostname or ""
 
 
+def resolve_url(url: str) -> str:
+    """按 HOST_OVERRIDES 把请求改发到本地替身；未命中时原样返回。
+
+    只改实际连接的地址，调用方仍用原 URL 计算限速键、令牌资源与报告中的 host。
+    """
+    if not HOST_OVERRIDES:
+        return url
+    parts = urllib.parse.urlsplit(url)
+    target = HOST_OVERRIDES.get((parts.hostname or "").lower())
+    if not target:
+        return url
+    return urllib.parse.urlunsplit(
+        ("http", target, parts.path, parts.query, parts.fragment)
+    )
+
+
+def _content_length(resp: requests.Response) -> int:
+    try:
+        return int(resp.headers.get("Content-Length") or 0)
+    except ValueError:
+        return 0
+
+
+def _origin_host(url: str) -> str:
+    """resolve_url 的逆映射：发往本地替身的响应仍按原 host 计。"""
+    parts = urllib.parse.urlsplit(url)
+    for host, target in HOST_OVERRIDES.items():
+        if target == parts.netloc:
+            return host
+    return parts.hostname or ""
+
+
+def record_response(resp: requests.Response, *args, **kwargs):
+    """requests 响应钩子：把独立 Session 发出的请求计入运行报告（流式按 Content-Length）。"""
+    head = resp.request is not None and resp.request.method == "HEAD"
+    nbytes = 0 if head else _content_length(resp)
+    get_run_report().request(
+        _origin_host(resp.url), nbytes, resp.status_code, resp.elapsed.total_seconds()
+    )
+
+
 def _sleep_from_headers(resp: requests.Response):
     ra = resp.headers.get("Retry-After")
     if ra:
@@ -36,6 +106,101 @@ def _sleep_from_headers(resp: requests.Response):
     return None
 
 
+class QuotaExhausted(requests.exceptions.RequestException):
+    """所有令牌都在停放且恢复时间超出运行剩余时限：放弃请求，由调用方跳过或推迟。"""
+
+
+def _limit_key(host: str, url: str, pool) -> str:
+    """限速键：GitHub 搜索接口有独立配额与二级限流，单独计量。"""
+    if host != "api.github.com" or not urllib.parse.urlsplit(url).path.startswith(
+        "/search/"
+    ):
+        return host
+    key = f"{host}/search"
+    if pool is not None:
+        # 搜索配额按令牌计：N 个令牌时整体可达计划的 N 倍
+        limiter.scale(key, len(pool))
+    return key
+
+
+def _pick_token(pool: TokenPool, resource: str, api: bool, limit_key: str) -> str:
+    """从令牌池挑一个令牌；全部停放时等最早恢复的那个，但不越过运行时限。"""
+    picked, wait = pool.acquire(resource, charge=api)
+    if wait > 0:
+        left = run_remaining()
+        if wait > left:
+            if api:
+                pool.update(picked, None, resource=resource)
+            raise QuotaExhausted(
+                f"{limit_key} 令牌配额 {wait:.0f}s 后恢复，超出剩余时限 {left:.0f}s"
+            )
+        get_run_report().limiter_sleep(limit_key, wait)
+        time.sleep(wait)
+    return picked
+
+
+def _send(method: str, url: str, limit_key: str, **kw) -> requests.Response:
+    """发出一次请求并计入运行报告（耗时不含等待并发名额的时间）。"""
+    report = get_run_report()
+    t0 = time.monotonic()
+    try:
+        with limiter.slot(limit_key), get_metrics().in_flight(limit_key):
+            t0 = time.monotonic()
+            resp = get_session().request(method.upper(), resolve_url(url), **kw)
+    except requests.exceptions.RequestException:
+        report.request(limit_key, seconds=time.monotonic() - t0)
+        raise
+    # 流式响应不在这里读正文，按 Content-Length 计
+    nbytes = _content_length(resp) if kw.get("stream") else len(resp.content or b"")
+    report.request(limit_key, nbytes, resp.status_code, time.monotonic() - t0)
+    return resp
+
+
+def _backoff(backoff: float) -> float:
+    """按指数退避睡眠一次，返回下一次的退避时长。"""
+    time.sleep(min(backoff, MAX_BACKOFF))
+    return min(backoff * 2, MAX_BACKOFF)
+
+
+def _retry_after_error(exc, last: bool, tried_insecure: bool, backoff: float):
+    """网络异常：SSL 错误先关闭证书校验重试一次，其余按指数退避；已是最后一次尝试时抛出。
+
+    返回 (是否已关闭证书校验, 下一次退避时长)。
+    """
+    ssl = isinstance(exc, requests.exceptions.SSLError)
+    if last and not (ssl and not tried_insecure):
+        raise exc
+    return tried_insecure or ssl, _backoff(backoff)
+
+
+def _wait_throttled(resp, limit_key: str, backoff: float, rotate: bool) -> float:
+    """403/429：可换令牌时直接重试，否则按响应头（或指数退避）等待。"""
+    rate_limited = (
+        resp.headers.get("X-RateLimit-Remaining") == "0"
+        or "Retry-After" in resp.headers
+    )
+    if rotate and rate_limited:
+        # 该令牌已被停放，下一轮直接换令牌重试
+        return backoff
+    wait = _sleep_from_headers(resp)
+    if wait is None:
+        wait = min(backoff, MAX_BACKOFF)
+        backoff = min(backoff * 2, MAX_BACKOFF)
+    get_run_report().limiter_sleep(limit_key, wait)
+    time.sleep(wait)
+    return backoff
+
+
+def _feedback(resp, limit_key: str, pool, picked, api: bool, resource) -> bool:
+    """把响应反馈给限速器与令牌池；返回本次是否为多令牌请求。"""
+    # 多令牌时限流头只反映单个令牌（由令牌池停放），不据此给整个 host 降速
+    multi_token = picked is not None and len(pool) > 1
+    limiter.feedback(limit_key, resp.status_code, None if multi_token else resp.headers)
+    if picked is not None and api:
+        pool.update(picked, resp.headers, resp.status_code, resource)
+    return multi_token
+
+
 def request(
     method: str,
     url: str,
@@ -45,71 +210,60 @@ def request(
     data: Any = None,
     json: Any = None,
     timeout: float = 20,
-    token: Optional[str] = None,
+    token: Optional[Union[str, TokenPool]] = None,
     retries: int = MAX_RETRIES,
+    stream: bool = False,
 ) -> requests.Response:
+    """token 可以是单个令牌，也可以是 TokenPool：后者每次尝试都按配额余量挑选令牌。"""
     headers = dict(headers or {})
     headers.setdefault("User-Agent", UA)
-    if token and "Authorization" not in headers:
+    pool = token if isinstance(token, TokenPool) and token else None
+    if token and pool is None and "Authorization" not in headers:
         headers["Authorization"] = f"Bearer {token}"
+    use_pool = pool is not None and "Authorization" not in headers
 
     host = _host(url)
+    resource = resource_for(url) if pool is not None else None
+    # 只有 API 请求消耗令牌配额、返回限流头；raw / codeload 等只借用令牌做认证
+    api = host == "api.github.com"
+    limit_key = _limit_key(host, url, pool)
+    send_kw = dict(params=params, data=data, json=json, timeout=timeout, stream=stream)
     backoff = 1.0
     last_resp = None
     tried_insecure = False
 
     for attempt in range(retries + 1):
-        limiter.acquire(host)
+        if attempt:
+            get_run_report().retry(limit_key)
+        picked, req_headers = None, headers
+        if use_pool:
+            picked = _pick_token(pool, resource, api, limit_key)
+            req_headers = {**headers, "Authorization": f"Bearer {picked}"}
+        limiter.acquire(limit_key)
         try:
-            verify = CA_BUNDLE if not tried_insecure else False
-            resp = requests.request(
-                method.upper(),
+            resp = _send(
+                method,
                 url,
-                headers=headers,
-                params=params,
-                data=data,
-                json=json,
-                timeout=timeout,
-                verify=verify,
+                limit_key,
+                headers=req_headers,
+                verify=CA_BUNDLE if not tried_insecure else False,
+                **send_kw,
+            )
+        except requests.exceptions.RequestException as e:
+            tried_insecure, backoff = _retry_after_error(
+                e, attempt >= retries, tried_insecure, backoff
             )
-        except requests.exceptions.SSLError:
-            if not tried_insecure:
-                tried_insecure = True
-                wait = min(backoff, MAX_BACKOFF)
-                backoff = min(backoff * 2, MAX_BACKOFF)
-                time.sleep(wait)
-                continue
-            if attempt < retries:
-                wait = min(backoff, MAX_BACKOFF)
-                backoff = min(backoff * 2, MAX_BACKOFF)
-                time.sleep(wait)
-                continue
-            raise
-        except requests.exceptions.RequestException:
-            if attempt < retries:
-                wait = min(backoff, MAX_BACKOFF)
-                backoff = min(backoff * 2, MAX_BACKOFF)
-                time.sleep(wait)
-                continue
-            raise
+            continue
 
         last_resp = resp
+        multi_token = _feedback(resp, limit_key, pool, picked, api, resource)
         if resp.status_code < 400:
             return resp
-
         if resp.status_code in (403, 429):
-            wait = _sleep_from_headers(resp)
-            if wait is None:
-                wait = min(backoff, MAX_BACKOFF)
-                backoff *= 2
-            time.sleep(wait)
+            backoff = _wait_throttled(resp, limit_key, backoff, multi_token)
             continue
-
         if 500 <= resp.status_code < 600 and attempt < retries:
-            wait = min(backoff, MAX_BACKOFF)
-            backoff *= 2
-            time.sleep(wait)
+            backoff = _backoff(backoff)
             continue
-
         return resp
     return last_resp
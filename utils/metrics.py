@@ -0,0 +1,333 @@
+"""Prometheus 文本格式的指标注册表，可写成 node_exporter textfile，或在守护进程模式下
+经本地 HTTP 端点（/metrics）暴露。
+
+指标随进程累积（与每次运行重置的运行报告不同）。数据来自已有的埋点：运行报告的
+request / retry / limiter_sleep / cache / reject / end_stage 在记账的同时更新这里
+的指标，http_client 与 checker.async_check 另外统计进行中的请求数与请求耗时。
+
+    sub_hunter_http_request_duration_seconds{host}     请求耗时直方图
+    sub_hunter_http_requests_total{host,code}          请求数（code 为 2xx/4xx/…/error）
+    sub_hunter_http_response_bytes_total{host}         响应字节数
+    sub_hunter_http_retries_total{host}                重试次数
+    sub_hunter_http_requests_in_flight{host}           进行中的请求数
+    sub_hunter_rate_limit_wait_seconds_total{host}     限速 / 令牌 / Retry-After 等待
+    sub_hunter_cache_lookups_total{cache,result}       缓存命中（hit）与未命中（miss）
+    sub_hunter_rejections_total{reason}                按原因的剔除数
+    sub_hunter_stage_items_total{stage,direction}      各阶段输入（in）/ 输出（out）条数
+    sub_hunter_stage_duration_seconds{stage}           各阶段最近一次耗时
+    sub_hunter_history_links / sub_hunter_history_failing  历史条目数 / 有失败计数的条目数
+    sub_hunter_last_run_timestamp_seconds              最近一次运行（或守护任务）结束时间
+
+host 标签只单列 METRICS_HOSTS 中的主机，其余记为 other。
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+from config import METRICS_HOSTS, METRICS_TEXTFILE
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def host_label(host: str, known=METRICS_HOSTS) -> str:
+    """host 或限速键（如 api.github.com/search）-> 指标标签值，不在 known 中的记为 other。"""
+    base = (host or "").split("/", 1)[0].lower()
+    return host if base in known else "other"
+
+
+def _fmt_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return (
+        repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+    )
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, kw) -> tuple:
+        if set(kw) != set(self.labels):
+            raise ValueError(f"{self.name} 需要标签 {self.labels}，收到 {sorted(kw)}")
+        return tuple(str(kw[k]) for k in self.labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+    def _samples(self):
+        for key, v in sorted(self._values.items()):
+            yield self.name, _fmt_labels(self.labels, key), v
+
+    def render(self) -> str:
+        with self._lock:
+            samples = list(self._samples())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{n}{lab} {_fmt_value(v)}" for n, lab, v in samples]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, n: float = 1, **labels):
+        if n < 0:
+            raise ValueError("计数器只能增加")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, v: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = v
+
+    def inc(self, n: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def dec(self, n: float = 1, **labels):
+        self.inc(-n, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, v: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            ent = self._values.get(key)
+            if ent is None:
+                ent = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0}
+            for i, b in enumerate(self.buckets):
+                if v <= b:
+                    ent["counts"][i] += 1
+            ent["sum"] += v
+
+    def value(self, **labels):
+        ent = self._values.get(self._key(labels))
+        return None if ent is None else {"count": ent["counts"][-1], "sum": ent["sum"]}
+
+    def _samples(self):
+        for key, ent in sorted(self._values.items()):
+            for b, n in zip(self.buckets, ent["counts"]):
+                le = (("le", _fmt_value(b)),)
+                yield f"{self.name}_bucket", _fmt_labels(self.labels, key, le), n
+            lab = _fmt_labels(self.labels, key)
+            yield f"{self.name}_sum", lab, ent["sum"]
+            yield f"{self.name}_count", lab, ent["counts"][-1]
+
+
+class Metrics:
+    def __init__(self):
+        self._metrics = []
+        self.http_duration = self._add(
+            Histogram(
+                "sub_hunter_http_request_duration_seconds",
+                "HTTP request latency by host.",
+                ("host",),
+            )
+        )
+        self.http_requests = self._add(
+            Counter(
+                "sub_hunter_http_requests_total",
+                "HTTP requests by host and status class (error for network failures).",
+                ("host", "code"),
+            )
+        )
+        self.http_bytes = self._add(
+            Counter(
+                "sub_hunter_http_response_bytes_total",
+                "Response bytes read by host.",
+                ("host",),
+            )
+        )
+        self.http_retries = self._add(
+            Counter("sub_hunter_http_retries_total", "HTTP retries by host.", ("host",))
+        )
+        self.http_in_flight = self._add(
+            Gauge(
+                "sub_hunter_http_requests_in_flight",
+                "HTTP requests currently in flight by host.",
+                ("host",),
+            )
+        )
+        self.rate_limit_wait = self._add(
+            Counter(
+                "sub_hunter_rate_limit_wait_seconds_total",
+                "Time spent waiting on rate limits, token pool and Retry-After by host.",
+                ("host",),
+            )
+        )
+        self.cache_lookups = self._add(
+            Counter(
+                "sub_hunter_cache_lookups_total",
+                "Cache lookups by cache and result (hit/miss).",
+                ("cache", "result"),
+            )
+        )
+        self.rejections = self._add(
+            Counter(
+                "sub_hunter_rejections_total", "Rejected URLs by reason.", ("reason",)
+            )
+        )
+        self.stage_items = self._add(
+            Counter(
+                "sub_hunter_stage_items_total",
+                "Items entering (in) and leaving (out) each pipeline stage.",
+                ("stage", "direction"),
+            )
+        )
+        self.stage_duration = self._add(
+            Gauge(
+                "sub_hunter_stage_duration_seconds",
+                "Wall time of the latest run of each stage.",
+                ("stage",),
+            )
+        )
+        self.history_links = self._add(
+            Gauge("sub_hunter_history_links", "Links in history.")
+        )
+        self.history_failing = self._add(
+            Gauge("sub_hunter_history_failing", "History links with a failure count.")
+        )
+        self.last_run = self._add(
+            Gauge(
+                "sub_hunter_last_run_timestamp_seconds",
+                "Unix time the latest run or daemon job finished.",
+            )
+        )
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # ---- 埋点入口 ----
+    @contextmanager
+    def in_flight(self, host: str):
+        host = host_label(host)
+        self.http_in_flight.inc(host=host)
+        try:
+            yield
+        finally:
+            self.http_in_flight.dec(host=host)
+
+    def observe_request(self, host, nbytes=0, status=None, seconds=None):
+        host = host_label(host)
+        code = "error" if status is None else f"{int(status) // 100}xx"
+        self.http_requests.inc(host=host, code=code)
+        if nbytes:
+            self.http_bytes.inc(nbytes, host=host)
+        if seconds is not None:
+            self.http_duration.observe(seconds, host=host)
+
+    def observe_retry(self, host):
+        self.http_retries.inc(host=host_label(host))
+
+    def observe_wait(self, host, seconds: float):
+        self.rate_limit_wait.inc(seconds, host=host_label(host))
+
+    def observe_stage(self, stage: str, seconds: float, n_in: int, n_out: int):
+        self.stage_duration.set(seconds, stage=stage)
+        self.stage_items.inc(n_in, stage=stage, direction="in")
+        self.stage_items.inc(n_out, stage=stage, direction="out")
+
+    def observe_history(self, history: dict):
+        self.history_links.set(len(history.get("links") or []))
+        self.history_failing.set(len(history.get("fail") or {}))
+
+    # ---- 导出 ----
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+    def write_textfile(self, path: str) -> str:
+        """写出 node_exporter textfile（临时文件 + rename，避免被采集到写了一半的文件）。"""
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+        return path
+
+    def mark_run(self):
+        self.last_run.set(int(time.time()))
+
+    def serve(self, port: int, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """在后台线程提供 GET /metrics，返回 server（shutdown() 停止）。"""
+        metrics = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        srv = ThreadingHTTPServer((addr, port), _Handler)
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return srv
+
+
+def export_run(path: str = METRICS_TEXTFILE):
+    """一次运行（或守护任务）结束时调用：记录结束时间，配置了 textfile 时写出。"""
+    metrics = get_metrics()
+    metrics.mark_run()
+    if not path:
+        return
+    try:
+        metrics.write_textfile(path)
+    except OSError as e:
+        print(f"[指标] textfile 写出失败 {path}: {e}")
+
+
+_default_metrics = None
+
+
+def get_metrics() -> Metrics:
+    """进程内共享的指标注册表。"""
+    global _default_metrics
+    if _default_metrics is None:
+        _default_metrics = Metrics()
+    return _default_metrics
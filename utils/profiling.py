@@ -0,0 +1,285 @@
+"""可选的性能剖析（环境变量开启，默认全部关闭）。
+
+- PROFILE_CPU:      每个阶段一份 cProfile（<stage>.pstats，可用 snakeviz / pstats 查看）
+                    与按累计耗时排序的文本摘要（<stage>.cpu.txt）。cProfile 只记录执行
+                    阶段函数的线程，线程池中的工作由栈采样覆盖
+- PROFILE_MEMORY:   tracemalloc 在阶段前后各取一次快照，按代码行列出增长最多的分配点
+                    （<stage>.mem.txt）及阶段内峰值
+- PROFILE_LOOP_LAG: check_urls 运行期间监测 asyncio 事件循环延迟（定时 sleep 的超时量），
+                    区分“网络慢”与“事件循环被同步代码阻塞”
+- PROFILE_STACKS:   后台线程每 PROFILE_STACK_INTERVAL 秒采样所有线程的调用栈，写成
+                    folded 格式（stacks.folded，首帧为阶段名，可直接生成火焰图）
+
+文件写入 PROFILE_DIR（默认为运行报告所在目录下的 profile/），各阶段的摘要（前几名）
+同时记入运行报告该阶段的 "profile" 字段。
+"""
+
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from config import (
+    PROFILE_CPU,
+    PROFILE_DIR,
+    PROFILE_LOOP_LAG,
+    PROFILE_MEMORY,
+    PROFILE_STACK_INTERVAL,
+    PROFILE_STACKS,
+    PROFILE_TOP,
+)
+from utils.run_report import get_run_report
+
+# 记入运行报告的条目数（完整列表见文件）
+REPORT_TOP = 5
+# tracemalloc 记录的栈深度
+MEMORY_FRAMES = 10
+# 事件循环延迟的探测间隔（秒）
+LOOP_LAG_INTERVAL = 0.1
+
+
+def _safe(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name) or "stage"
+
+
+class LoopLagMonitor:
+    """在当前事件循环中定时 sleep，记录每次醒来比预期晚了多少。"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - t - self.interval))
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._probe())
+        return self
+
+    async def stop(self) -> dict:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        return self.summary()
+
+    def summary(self) -> dict:
+        s = sorted(self.samples)
+        if not s:
+            return {"samples": 0}
+        return {
+            "samples": len(s),
+            "mean_ms": round(sum(s) / len(s) * 1000, 1),
+            "p95_ms": round(s[min(len(s) - 1, int(len(s) * 0.95))] * 1000, 1),
+            "max_ms": round(s[-1] * 1000, 1),
+        }
+
+
+class StackSampler:
+    """后台线程定时采样所有线程的调用栈，按 folded 格式累计次数。"""
+
+    def __init__(self, interval: float, stage_of=None):
+        self.interval = interval
+        # 返回当前阶段名的函数，作为栈的首帧
+        self.stage_of = stage_of or (lambda: "-")
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stage = self.stage_of()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+                    f"{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            key = ";".join([stage, names.get(ident, str(ident))] + frames[::-1])
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def folded(self) -> str:
+        rows = sorted(self.counts.items(), key=lambda kv: -kv[1])
+        return "".join(f"{k} {n}\n" for k, n in rows)
+
+
+class Profiler:
+    def __init__(
+        self,
+        out_dir: str = PROFILE_DIR,
+        cpu: bool = PROFILE_CPU,
+        memory: bool = PROFILE_MEMORY,
+        loop_lag: bool = PROFILE_LOOP_LAG,
+        stacks: bool = PROFILE_STACKS,
+        stack_interval: float = PROFILE_STACK_INTERVAL,
+        top: int = PROFILE_TOP,
+    ):
+        self.out_dir = out_dir
+        self.cpu = cpu
+        self.memory = memory
+        self.loop_lag = loop_lag
+        self.stacks = stacks
+        self.stack_interval = stack_interval
+        self.top = top
+        self._sampler = None
+        self._started_tracemalloc = False
+
+    @property
+    def active(self) -> bool:
+        return self.cpu or self.memory or self.loop_lag or self.stacks
+
+    def _path(self, name: str) -> str:
+        os.makedirs(self.out_dir, exist_ok=True)
+        return os.path.join(self.out_dir, name)
+
+    # ---- 整次运行 ----
+    def start_run(self):
+        if self.stacks and self._sampler is None:
+            report = get_run_report()
+            self._sampler = StackSampler(
+                self.stack_interval, lambda: report.current_stage or "-"
+            )
+            self._sampler.start()
+
+    def finish_run(self):
+        if self._sampler is not None:
+            self._sampler.stop()
+            with open(self._path("stacks.folded"), "w", encoding="utf-8") as f:
+                f.write(self._sampler.folded())
+            self._sampler = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        if self.active:
+            print(f"[剖析] 输出目录: {self.out_dir}")
+
+    # ---- 单个阶段 ----
+    @contextmanager
+    def stage(self, name: str):
+        if not (self.cpu or self.memory):
+            yield
+            return
+        report = get_run_report()
+        prof = before = None
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(MEMORY_FRAMES)
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        if self.cpu:
+            prof = cProfile.Profile()
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof is not None:
+                prof.disable()
+                report.annotate("cpu", self._dump_cpu(name, prof))
+            if before is not None:
+                report.annotate("memory", self._dump_memory(name, before))
+
+    def _dump_cpu(self, name: str, prof: cProfile.Profile) -> list:
+        prof.dump_stats(self._path(f"{_safe(name)}.pstats"))
+        buf = io.StringIO()
+        stats = pstats.Stats(prof, stream=buf).sort_stats("cumulative")
+        stats.print_stats(self.top)
+        with open(self._path(f"{_safe(name)}.cpu.txt"), "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+        rows = []
+        for (fn, line, func), (_, nc, tt, ct, _) in stats.stats.items():
+            rows.append(
+                {
+                    "func": f"{func} ({os.path.basename(fn)}:{line})",
+                    "calls": nc,
+                    "tottime_s": round(tt, 4),
+                    "cumtime_s": round(ct, 4),
+                }
+            )
+        rows.sort(key=lambda r: -r["tottime_s"])
+        return rows[:REPORT_TOP]
+
+    def _dump_memory(self, name: str, before) -> dict:
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        diff = after.compare_to(before, "lineno")
+        lines = [f"peak {peak / 1024:.1f} KiB", ""]
+        lines += [str(s) for s in diff[: self.top]]
+        with open(self._path(f"{_safe(name)}.mem.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return {
+            "peak_kb": round(peak / 1024, 1),
+            "top": [
+                {
+                    "where": f"{os.path.basename(s.traceback[0].filename)}:"
+                    f"{s.traceback[0].lineno}",
+                    "size_diff_kb": round(s.size_diff / 1024, 1),
+                    "count_diff": s.count_diff,
+                }
+                for s in diff[:REPORT_TOP]
+            ],
+        }
+
+    # ---- 事件循环 ----
+    def loop_lag_monitor(self):
+        """PROFILE_LOOP_LAG 开启时返回已启动的 LoopLagMonitor（须在事件循环中调用）。"""
+        return LoopLagMonitor().start() if self.loop_lag else None
+
+    def record_loop_lag(self, summary: dict):
+        """记入当前阶段，并写出 <stage>.looplag.json。"""
+        report = get_run_report()
+        report.annotate("loop_lag", summary)
+        name = _safe(report.current_stage or "check_urls")
+        with open(self._path(f"{name}.looplag.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+        print(f"[剖析] 事件循环延迟: {summary}")
+
+
+_default_profiler = None
+
+
+def get_profiler() -> Profiler:
+    """进程内共享的剖析器。"""
+    global _default_profiler
+    if _default_profiler is None:
+        _default_profiler = Profiler()
+    return _default_profiler
+
+
+def profile_stage(name: str):
+    return get_profiler().stage(name)
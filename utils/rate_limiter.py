@@ -1,10 +1,27 @@
+import asyncio
 import random
 import threading
 import time
 from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import replace
 from typing import Dict
 
-from config.rate_limits import DEFAULT, PLANS
+from config.rate_limits import (
+    ADAPT_DECREASE,
+    ADAPT_INCREASE_RATIO,
+    ADAPT_MAX_CONCURRENCY,
+    ADAPT_MAX_FACTOR,
+    ADAPT_MAX_PER_MINUTE,
+    ADAPT_MIN_PER_MINUTE,
+    ADAPTIVE_RATE,
+    DEFAULT,
+    PLANS,
+)
+from utils.run_report import get_run_report
+
+# 视为“服务端要求降速”的状态码（403 需同时带限流头，见 _is_throttle）
+THROTTLE_STATUSES = (403, 429, 503)
 
 
 class _TokenBucket:
@@ -21,44 +38,234 @@ class _TokenBucket:
         self.last = now
         self.tokens = min(self.capacity, self.tokens + delta * self.refill_rate)
 
+    def set_rate(self, rate_per_minute: float):
+        with self.lock:
+            self._refill()
+            self.refill_rate = max(0.1, rate_per_minute / 60.0)
+
     def take(self, n=1):
+        # 令牌允许透支为负数：并发的预约依次排队，而不是都拿到同一个等待时间
         with self.lock:
             self._refill()
-            if self.tokens >= n:
-                self.tokens -= n
+            self.tokens -= n
+            if self.tokens >= 0:
                 return 0.0
-            need = n - self.tokens
-            wait = need / self.refill_rate
-            self.tokens = 0.0
-            return max(0.0, wait)
+            return -self.tokens / self.refill_rate
+
+
+class _HostState:
+    """单个 host（或 host/资源）的自适应状态：速率与并发做 AIMD，暂停期来自响应头。"""
+
+    def __init__(self, key: str, plan=None):
+        plan = plan or PLANS.get(key)
+        self.known = plan is not None
+        plan = plan or DEFAULT
+        self.base_rate = float(plan.per_minute)
+        self.rate = float(plan.per_minute)  # 当前速率（次/分钟）
+        if plan.hard_quota:
+            # 服务端硬性限额：只在计划值以下做 AIMD，不去试探上限
+            self.max_rate = float(plan.per_minute)
+        elif self.known:
+            self.max_rate = plan.per_minute * ADAPT_MAX_FACTOR
+        else:
+            self.max_rate = max(ADAPT_MAX_PER_MINUTE, plan.per_minute)
+        self.concurrency = max(1, plan.concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0  # monotonic
+        self.streak = 0
+        self.successes = 0
+        self.throttles = 0
+        self.cond = threading.Condition()
 
 
 class RateLimiter:
-    def __init__(self):
+    def __init__(self, adaptive: bool = ADAPTIVE_RATE):
+        self.adaptive = adaptive
         self.buckets: Dict[str, _TokenBucket] = {}
+        self.states: Dict[str, _HostState] = {}
         self.min_interval: Dict[str, float] = defaultdict(float)
         self._last_ts: Dict[str, float] = defaultdict(lambda: 0.0)
+        # host -> 计划倍数（按令牌计量的配额随令牌数放大，见 scale）
+        self.scales: Dict[str, int] = {}
         self._glock = threading.Lock()
 
-    def _bucket_for(self, host: str) -> _TokenBucket:
-        plan = PLANS.get(host, DEFAULT)
+    def _plan_for(self, host: str):
+        plan = PLANS.get(host)
+        factor = self.scales.get(host, 1)
+        if plan is None or factor == 1:
+            return plan
+        return replace(
+            plan,
+            per_minute=plan.per_minute * factor,
+            burst=plan.burst * factor,
+            min_interval=plan.min_interval / factor,
+            concurrency=plan.concurrency * factor,
+        )
+
+    def _ensure(self, host: str):
         with self._glock:
             if host not in self.buckets:
-                self.buckets[host] = _TokenBucket(plan.per_minute, plan.burst)
-                self.min_interval[host] = plan.min_interval
-        return self.buckets[host]
+                plan = self._plan_for(host)
+                base = plan or DEFAULT
+                self.buckets[host] = _TokenBucket(base.per_minute, base.burst)
+                self.min_interval[host] = base.min_interval
+                self.states[host] = _HostState(host, plan)
+            return self.buckets[host], self.states[host]
 
-    def acquire(self, host: str):
-        b = self._bucket_for(host)
+    def _bucket_for(self, host: str) -> _TokenBucket:
+        return self._ensure(host)[0]
+
+    def scale(self, host: str, factor: int):
+        """把 host 的计划（速率、突发、并发）放大 factor 倍。
+
+        用于按令牌计量的配额：GitHub 搜索接口每个令牌约 30 次/分钟，令牌池有 N 个
+        令牌时整体可达 N 倍。倍数变化时丢弃该 host 已学到的状态，按新计划重建。
+        """
+        factor = max(1, int(factor))
+        with self._glock:
+            if self.scales.get(host, 1) == factor:
+                return
+            self.scales[host] = factor
+            self.buckets.pop(host, None)
+            self.states.pop(host, None)
+
+    def _state_for(self, host: str) -> _HostState:
+        return self._ensure(host)[1]
+
+    def reserve(self, host: str) -> float:
+        """预约一次请求配额，返回调用方需要等待的秒数（本身不睡眠）。"""
+        b, st = self._ensure(host)
         wait = b.take(1)
         mi = self.min_interval[host]
-        gap = time.monotonic() - self._last_ts[host]
-        extra = max(0.0, mi - gap)
-        jitter = random.uniform(0, mi * 0.2) if mi > 0 else 0.0
-        sleep_s = max(wait, extra) + jitter
+        with self._glock:
+            now = time.monotonic()
+            paused = max(0.0, st.paused_until - now)
+            gap = now - self._last_ts[host]
+            extra = max(0.0, mi - gap)
+            jitter = random.uniform(0, mi * 0.2) if mi > 0 else 0.0
+            sleep_s = max(wait, extra, paused) + jitter
+            self._last_ts[host] = now + sleep_s
+        return sleep_s
+
+    def acquire(self, host: str):
+        sleep_s = self.reserve(host)
         if sleep_s > 0:
+            get_run_report().limiter_sleep(host, sleep_s)
             time.sleep(sleep_s)
-        self._last_ts[host] = time.monotonic()
+
+    async def acquire_async(self, host: str):
+        sleep_s = self.reserve(host)
+        if sleep_s > 0:
+            get_run_report().limiter_sleep(host, sleep_s)
+            await asyncio.sleep(sleep_s)
+
+    @contextmanager
+    def slot(self, host: str):
+        """占用 host 的一个并发槽位（上限随反馈自适应），退出时释放。"""
+        st = self._state_for(host)
+        with st.cond:
+            while self.adaptive and st.in_flight >= st.concurrency:
+                st.cond.wait(timeout=1.0)
+            st.in_flight += 1
+        try:
+            yield
+        finally:
+            with st.cond:
+                st.in_flight -= 1
+                st.cond.notify()
+
+    def feedback(self, host: str, status: int = None, headers=None):
+        """根据响应调整 host 的速率与并发。
+
+        - 成功：每满一个并发窗口，速率加性增长一步、并发 +1（不超过上限）
+        - 429/503 与带限流头的 403：速率与并发乘性减小，并按 Retry-After / X-RateLimit-Reset 暂停
+        - X-RateLimit-Remaining 接近耗尽时，把速率压到“剩余额度 / 距 reset 的时间”
+        """
+        st = self._state_for(host)
+        headers = headers or {}
+        now = time.monotonic()
+        pause = _pause_from_headers(headers, status)
+        with st.cond:
+            if pause:
+                st.paused_until = max(st.paused_until, now + pause)
+            if _is_throttle(status, headers):
+                st.throttles += 1
+                st.streak = 0
+                if self.adaptive:
+                    st.rate = max(ADAPT_MIN_PER_MINUTE, st.rate * ADAPT_DECREASE)
+                    st.concurrency = max(1, int(st.concurrency * ADAPT_DECREASE))
+            elif status is not None and status < 400:
+                st.successes += 1
+                st.streak += 1
+                if self.adaptive and st.streak >= st.concurrency:
+                    st.streak = 0
+                    step = max(1.0, st.base_rate * ADAPT_INCREASE_RATIO)
+                    st.rate = min(st.max_rate, st.rate + step)
+                    st.concurrency = min(ADAPT_MAX_CONCURRENCY, st.concurrency + 1)
+            ceiling = _sustainable_rate(headers)
+            if self.adaptive and ceiling is not None:
+                st.rate = max(ADAPT_MIN_PER_MINUTE, min(st.rate, ceiling))
+            rate = st.rate
+            st.cond.notify_all()
+        if self.adaptive:
+            self._bucket_for(host).set_rate(rate)
+
+    def snapshot(self) -> dict:
+        """各 host 当前状态：速率（次/分钟）、并发上限、在途请求、暂停剩余秒数等。"""
+        now = time.monotonic()
+        with self._glock:
+            states = dict(self.states)
+        return {
+            host: {
+                "rate_per_minute": round(st.rate, 1),
+                "base_per_minute": st.base_rate,
+                "concurrency": st.concurrency,
+                "in_flight": st.in_flight,
+                "paused_for": round(max(0.0, st.paused_until - now), 1),
+                "successes": st.successes,
+                "throttles": st.throttles,
+                "learned": not st.known,
+            }
+            for host, st in states.items()
+        }
+
+
+def _num(v):
+    try:
+        return float(v) if v not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_throttle(status, headers) -> bool:
+    if status in (429, 503):
+        return True
+    # 403 也可能只是无权限；只有带限流信号时才算降速请求
+    return status == 403 and (
+        "Retry-After" in headers or _num(headers.get("X-RateLimit-Remaining")) == 0
+    )
+
+
+def _pause_from_headers(headers, status) -> float:
+    ra = _num(headers.get("Retry-After"))
+    if ra is not None:
+        return max(0.0, ra)
+    if status in THROTTLE_STATUSES and _num(headers.get("X-RateLimit-Remaining")) == 0:
+        reset = _num(headers.get("X-RateLimit-Reset"))
+        if reset is not None:
+            return max(0.0, reset - time.time())
+    return 0.0
+
+
+def _sustainable_rate(headers):
+    """剩余额度不足一成时，返回能撑到 reset 的速率（次/分钟），否则 None。"""
+    remaining = _num(headers.get("X-RateLimit-Remaining"))
+    limit = _num(headers.get("X-RateLimit-Limit"))
+    reset = _num(headers.get("X-RateLimit-Reset"))
+    if remaining is None or limit is None or reset is None or remaining > limit * 0.1:
+        return None
+    secs = max(1.0, reset - time.time())
+    return remaining / secs * 60.0
 
 
 limiter = RateLimiter()
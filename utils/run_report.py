@@ -0,0 +1,240 @@
+"""运行报告：按阶段记录耗时、输入/输出条数、按 host 的请求数/字节数/重试/出错、
+限速等待、缓存命中率与按原因的剔除数，运行结束写成 JSON（RUN_REPORT_PATH）。
+
+阶段边界由流水线设置（pipeline.engine 在每个阶段前后调用 begin_stage/end_stage），
+守护进程的任务用 stage() 上下文；阶段之外记录的计数归入 "-"。计数方法线程安全，
+可在线程池与 asyncio 回调中直接调用。各计数同时转给 utils.metrics 的进程级指标。
+
+    {"started", "finished", "wall_s",
+     "stages": [{"name", "status", "wall_s", "in": {键: 条数}, "out": {键: 条数},
+                 "hosts": {host: {"requests", "bytes", "retries", "errors",
+                                  "limiter_sleep_s", "status": {"2xx": n, ...}}},
+                 "cache": {名称: {"hits", "misses", "hit_ratio"}},
+                 "rejected": {原因: n}, "counters": {名称: n}}],
+     "totals": {与单个阶段相同的 hosts / cache / rejected / counters 汇总}}
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import RUN_REPORT_PATH
+from utils.metrics import get_metrics
+
+OUTSIDE = "-"
+
+
+def _size(v):
+    try:
+        return len(v)
+    except TypeError:
+        return None
+
+
+def _sizes(values: dict) -> dict:
+    out = {}
+    for k, v in (values or {}).items():
+        n = _size(v)
+        if n is not None:
+            out[k] = n
+    return out
+
+
+def _first(sizes: dict) -> int:
+    return next(iter(sizes.values()), 0)
+
+
+def _new_bucket() -> dict:
+    return {"hosts": {}, "cache": {}, "rejected": {}, "counters": {}}
+
+
+def _host_entry(bucket: dict, host: str) -> dict:
+    return bucket["hosts"].setdefault(
+        host or "?",
+        {
+            "requests": 0,
+            "bytes": 0,
+            "retries": 0,
+            "errors": 0,
+            "limiter_sleep_s": 0.0,
+            "status": {},
+        },
+    )
+
+
+class RunReport:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = self.clock()
+            self.stages = []
+            self._current = None
+            self._outside = {"name": OUTSIDE, **_new_bucket()}
+
+    # ---- 阶段 ----
+    def begin_stage(self, name: str, inputs: dict = None):
+        with self._lock:
+            self._current = {
+                "name": name,
+                "status": "running",
+                "t0": self.clock(),
+                "wall_s": 0.0,
+                "in": _sizes(inputs),
+                "out": {},
+                **_new_bucket(),
+            }
+            self.stages.append(self._current)
+
+    def end_stage(self, status: str = "ran", outputs: dict = None):
+        with self._lock:
+            st = self._current
+            if st is None:
+                return
+            st["status"] = status
+            st["wall_s"] = round(self.clock() - st.pop("t0"), 3)
+            st["out"] = _sizes(outputs)
+            self._current = None
+        if status == "ran":
+            # 吞吐按第一个输入 / 输出键计（各阶段的主列表）
+            get_metrics().observe_stage(
+                st["name"], st["wall_s"], _first(st["in"]), _first(st["out"])
+            )
+
+    @contextmanager
+    def stage(self, name: str, inputs: dict = None):
+        self.begin_stage(name, inputs)
+        try:
+            yield
+        except BaseException:
+            self.end_stage("failed")
+            raise
+        self.end_stage("ran")
+
+    @property
+    def current_stage(self):
+        st = self._current
+        return st["name"] if st is not None else None
+
+    def _bucket(self) -> dict:
+        return self._current if self._current is not None else self._outside
+
+    # ---- 计数 ----
+    def request(
+        self, host: str, nbytes: int = 0, status: int = None, seconds: float = None
+    ):
+        """记录一次完成的请求；status 为空表示网络错误，seconds 为请求耗时。"""
+        get_metrics().observe_request(host, nbytes, status, seconds)
+        with self._lock:
+            h = _host_entry(self._bucket(), host)
+            h["requests"] += 1
+            h["bytes"] += int(nbytes or 0)
+            if status is None:
+                h["errors"] += 1
+            else:
+                cls = f"{int(status) // 100}xx"
+                h["status"][cls] = h["status"].get(cls, 0) + 1
+
+    def retry(self, host: str):
+        get_metrics().observe_retry(host)
+        with self._lock:
+            _host_entry(self._bucket(), host)["retries"] += 1
+
+    def limiter_sleep(self, host: str, seconds: float):
+        if seconds <= 0:
+            return
+        get_metrics().observe_wait(host, seconds)
+        with self._lock:
+            h = _host_entry(self._bucket(), host)
+            h["limiter_sleep_s"] = round(h["limiter_sleep_s"] + seconds, 3)
+
+    def cache(self, name: str, hit: bool):
+        get_metrics().cache_lookups.inc(cache=name, result="hit" if hit else "miss")
+        with self._lock:
+            c = self._bucket()["cache"].setdefault(name, {"hits": 0, "misses": 0})
+            c["hits" if hit else "misses"] += 1
+
+    def reject(self, reason: str):
+        get_metrics().rejections.inc(reason=reason)
+        with self._lock:
+            r = self._bucket()["rejected"]
+            r[reason] = r.get(reason, 0) + 1
+
+    def annotate(self, key: str, value):
+        """给当前阶段附加一项说明（如剖析摘要），记在该阶段的 "profile" 字段下。"""
+        with self._lock:
+            self._bucket().setdefault("profile", {})[key] = value
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            c = self._bucket()["counters"]
+            c[name] = c.get(name, 0) + n
+
+    # ---- 输出 ----
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = [dict(s) for s in self.stages]
+            outside = dict(self._outside)
+        now = self.clock()
+        for s in stages:
+            if "t0" in s:
+                # 仍在执行（或异常中断）的阶段按当前时刻计算耗时
+                s["wall_s"] = round(now - s.pop("t0"), 3)
+        if any(outside[k] for k in ("hosts", "cache", "rejected", "counters")):
+            stages.append(outside)
+        totals = _new_bucket()
+        for s in stages:
+            for host, h in s["hosts"].items():
+                t = _host_entry(totals, host)
+                for k in ("requests", "bytes", "retries", "errors"):
+                    t[k] += h[k]
+                t["limiter_sleep_s"] = round(
+                    t["limiter_sleep_s"] + h["limiter_sleep_s"], 3
+                )
+                for cls, n in h["status"].items():
+                    t["status"][cls] = t["status"].get(cls, 0) + n
+            for name, c in s["cache"].items():
+                t = totals["cache"].setdefault(name, {"hits": 0, "misses": 0})
+                t["hits"] += c["hits"]
+                t["misses"] += c["misses"]
+            for key in ("rejected", "counters"):
+                for k, n in s[key].items():
+                    totals[key][k] = totals[key].get(k, 0) + n
+        for bucket in stages + [totals]:
+            for c in bucket["cache"].values():
+                seen = c["hits"] + c["misses"]
+                c["hit_ratio"] = round(c["hits"] / seen, 4) if seen else None
+        return {
+            "started": int(self.started),
+            "finished": int(now),
+            "wall_s": round(now - self.started, 3),
+            "stages": stages,
+            "totals": totals,
+        }
+
+    def write(self, path: str = RUN_REPORT_PATH) -> str:
+        """写出 JSON 报告（临时文件 + rename，读者不会看到写了一半的文件）。"""
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return path
+
+
+_default_report = None
+
+
+def get_run_report() -> RunReport:
+    """进程内共享的运行报告。"""
+    global _default_report
+    if _default_report is None:
+        _default_report = RunReport()
+    return _default_report
@@ -0,0 +1,202 @@
+"""GitHub API 令牌池：按响应中的 X-RateLimit-* 头分别跟踪每个令牌的 search / core 配额。
+
+- 每次请求选择对应资源剩余配额最多的令牌（并列时取最久未使用的，自然轮转）
+- 剩余为 0 或被限流（403/429）的令牌停放到 reset 时间，期间不再被选中
+- 所有令牌都停放时返回最早恢复的令牌与需要等待的秒数
+
+令牌来源（storage.secure.get_secret，钥匙串优先、环境变量兜底）：
+GITHUB_TOKENS（逗号/空白分隔的多个令牌）、GITHUB_TOKEN，均为空时回退 GIST_TOKEN。
+"""
+
+import re
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Optional
+
+from storage.secure import get_secret
+
+# 未观测到响应头前的乐观默认值（GitHub 文档中的认证用户配额）
+DEFAULT_LIMITS = {"core": 5000, "search": 30, "code_search": 10, "graphql": 5000}
+
+
+def resource_for(url: str) -> str:
+    """按请求路径推断 GitHub 配额类别（与 X-RateLimit-Resource 取值一致）。"""
+    path = urllib.parse.urlsplit(url).path
+    if path.startswith("/search/code"):
+        return "code_search"
+    if path.startswith("/search/"):
+        return "search"
+    if path.startswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+@dataclass
+class _Budget:
+    limit: int
+    remaining: int
+    reset: float = 0.0
+    # 停放截止时间（unix 时间戳，与 X-RateLimit-Reset 同基准）
+    parked_until: float = 0.0
+
+
+@dataclass
+class _TokenState:
+    token: str
+    budgets: dict = field(default_factory=dict)
+    last_used: float = 0.0
+    requests: int = 0
+
+    def budget(self, resource: str) -> _Budget:
+        b = self.budgets.get(resource)
+        if b is None:
+            lim = DEFAULT_LIMITS.get(resource, DEFAULT_LIMITS["core"])
+            b = _Budget(limit=lim, remaining=lim)
+            self.budgets[resource] = b
+        return b
+
+
+class TokenPool:
+    def __init__(self, tokens):
+        self._states = [_TokenState(t) for t in dict.fromkeys(t for t in tokens if t)]
+        self._by_token = {s.token: s for s in self._states}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __bool__(self) -> bool:
+        return bool(self._states)
+
+    def acquire(
+        self, resource: str = "core", now: Optional[float] = None, charge: bool = True
+    ):
+        """选择令牌并预扣一次配额，返回 (token, wait_s)；池为空时返回 (None, 0)。
+
+        charge=False 只挑令牌不预扣：用于 raw / codeload 等不返回限流头、
+        也不消耗 API 配额的 host。
+        """
+        now = now or time.time()
+        with self._lock:
+            if not self._states:
+                return None, 0.0
+            best = None
+            best_key = None
+            for s in self._states:
+                b = s.budget(resource)
+                if b.reset and now >= b.reset:
+                    # 窗口已重置，等下一次响应头给出新的 reset
+                    b.remaining = b.limit
+                    b.reset = 0.0
+                if b.parked_until and now >= b.parked_until:
+                    b.parked_until = 0.0
+                    b.remaining = max(b.remaining, 1)
+                parked = bool(b.parked_until) or b.remaining <= 0
+                # 可用优先，其次剩余最多，再次最久未用；全部停放时取最早恢复
+                key = (
+                    (0, -b.remaining, s.last_used)
+                    if not parked
+                    else (1, max(b.parked_until, b.reset), s.last_used)
+                )
+                if best_key is None or key < best_key:
+                    best, best_key = s, key
+            b = best.budget(resource)
+            wait = 0.0
+            if best_key[0] == 1:
+                wait = max(0.0, max(b.parked_until, b.reset) - now)
+            if charge:
+                b.remaining -= 1
+            best.last_used = now
+            best.requests += 1
+            return best.token, wait
+
+    def update(
+        self,
+        token: str,
+        headers,
+        status: int = 200,
+        resource: Optional[str] = None,
+    ):
+        """用响应头刷新令牌配额；配额耗尽或被限流时停放到 reset 时间。
+
+        响应没带 X-RateLimit-Remaining 且未被限流时，退回 acquire 的预扣。
+        """
+        s = self._by_token.get(token)
+        if s is None:
+            return
+        headers = headers or {}
+        resource = headers.get("X-RateLimit-Resource") or resource or "core"
+        now = time.time()
+        with self._lock:
+            b = s.budget(resource)
+            lim = _int(headers.get("X-RateLimit-Limit"))
+            rem = _int(headers.get("X-RateLimit-Remaining"))
+            reset = _int(headers.get("X-RateLimit-Reset"))
+            if lim is not None:
+                b.limit = lim
+            if rem is not None:
+                b.remaining = rem
+            elif status not in (403, 429):
+                b.remaining = min(b.limit, b.remaining + 1)
+            if reset is not None:
+                b.reset = float(reset)
+            if status in (403, 429):
+                retry_after = _int(headers.get("Retry-After"))
+                if retry_after is not None:
+                    # 二级限流：只停放 Retry-After 秒
+                    b.parked_until = now + retry_after
+                elif b.remaining <= 0 or rem is None:
+                    b.parked_until = b.reset if b.reset > now else now + 60
+            elif b.remaining <= 0:
+                b.parked_until = b.reset if b.reset > now else now + 60
+
+    def snapshot(self) -> list:
+        """各令牌配额快照（令牌只保留末 4 位）。"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "token": f"...{s.token[-4:]}",
+                    "requests": s.requests,
+                    "budgets": {
+                        r: {
+                            "remaining": b.remaining,
+                            "limit": b.limit,
+                            "reset_in": max(0, int(b.reset - now)) if b.reset else None,
+                            "parked": bool(b.parked_until and b.parked_until > now),
+                        }
+                        for r, b in s.budgets.items()
+                    },
+                }
+                for s in self._states
+            ]
+
+
+def _int(v):
+    try:
+        return int(v) if v is not None and v != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def load_github_tokens() -> list:
+    tokens = re.split(r"[\s,;]+", get_secret("sub-hunter", "GITHUB_TOKENS") or "")
+    tokens.append(get_secret("sub-hunter", "GITHUB_TOKEN") or "")
+    tokens = [t.strip() for t in tokens if t and t.strip()]
+    if not tokens:
+        gist = get_secret("sub-hunter", "GIST_TOKEN")
+        tokens = [gist] if gist else []
+    return list(dict.fromkeys(tokens))
+
+
+_default_pool = None
+
+
+def get_token_pool() -> TokenPool:
+    """进程内共享的 GitHub 令牌池（首次调用时读取令牌）。"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = TokenPool(load_github_tokens())
+    return _default_pool